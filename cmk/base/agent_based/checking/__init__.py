@@ -325,8 +325,11 @@ def check_host_services(
     plugins_missing_data: Set[CheckPluginName] = set()
 
     with plugin_contexts.current_host(host_config.hostname):
-        with value_store.load_host_value_store(host_config.hostname,
-                                               store_changes=not dry_run) as value_store_manager:
+        with value_store.load_host_value_store(
+                host_config.hostname,
+                store_changes=not dry_run,
+                binary_format=config.use_binary_value_store,
+        ) as value_store_manager:
             for service in _filter_services_to_check(
                     services=services,
                     run_plugin_names=run_plugin_names,
@@ -1140,7 +1140,11 @@ def get_check_preview(
         on_error,
     )
 
-    with load_host_value_store(host_name, store_changes=False) as value_store_manager:
+    with load_host_value_store(
+            host_name,
+            store_changes=False,
+            binary_format=config.use_binary_value_store,
+    ) as value_store_manager:
         table = [
             _check_preview_table_row(
                 host_config=host_config,
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Binary file format of the value store
+
+The file is a log of the changes made to the values of a host:
+
+    magic | record | record | ...
+
+Every record holds the updated values and the removed keys of one commit, as
+length prefixed pickle of a fixed protocol. The magic names the version of
+the format, it is raised whenever the encoding changes. The first record
+holds all values. A commit only
+appends the values it changed, so the unchanged ones are not written again.
+Once the appended records are larger than the first one, the file is rewritten
+with a single record.
+"""
+
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import cmk.utils.store as store
+from cmk.utils.log import logger
+
+MAGIC = b"CMKVST02"
+
+# Pickle keeps reading the older protocols, the file survives a Python update
+_PROTOCOL = 4
+
+_LENGTH = struct.Struct("<I")
+
+# updated values, removed keys
+Changes = Tuple[Dict[Any, Any], List[Any]]
+
+
+def _record(updated: Mapping[Any, Any], removed: Iterable[Any]) -> bytes:
+    payload = pickle.dumps((dict(updated), list(removed)), protocol=_PROTOCOL)
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def read_changes(path: Path, offset: int) -> List[Tuple[Changes, int]]:
+    """Read the records behind offset
+
+    Returns the changes of every record together with the position of its end.
+    An offset of 0 reads the whole file. A record which is not complete, e.g.
+    because the writing process has been killed, is ignored and overwritten by
+    the next commit. The same is done with a record which can not be decoded
+    and all records behind it. A file of another format has no records.
+    """
+    with path.open("rb") as f:
+        if offset == 0:
+            if f.read(len(MAGIC)) != MAGIC:
+                logger.warning("%s is not a value store file of this version, ignoring it", path)
+                return []
+            offset = len(MAGIC)
+        f.seek(offset)
+        raw = memoryview(f.read())
+
+    changes: List[Tuple[Changes, int]] = []
+    position = 0
+    while position + _LENGTH.size <= len(raw):
+        (length,) = _LENGTH.unpack_from(raw, position)
+        end = position + _LENGTH.size + length
+        if end > len(raw):
+            break
+        try:
+            record = pickle.loads(raw[position + _LENGTH.size:end])
+        except Exception as e:
+            logger.warning("%s: Ignoring the values behind offset %d: %s", path, offset + position,
+                           e)
+            break
+        changes.append((record, offset + end))
+        position = end
+
+    return changes
+
+
+def read_values(path: Path) -> Dict[Any, Any]:
+    """Read the current values"""
+    values: Dict[Any, Any] = {}
+    for (updated, removed), _end in read_changes(path, 0):
+        for key in removed:
+            values.pop(key, None)
+        values.update(updated)
+    return values
+
+
+def append_changes(path: Path, offset: int, updated: Mapping[Any, Any],
+                   removed: Iterable[Any]) -> int:
+    """Write a record at offset and return the end of the file"""
+    record = _record(updated, removed)
+    with path.open("r+b") as f:
+        f.seek(offset)
+        f.write(record)
+        f.truncate()
+    return offset + len(record)
+
+
+def write_values(path: Path, values: Mapping[Any, Any]) -> int:
+    """Replace the file by one holding only the values and return its size"""
+    content = MAGIC + _record(values, ())
+    store.save_bytes_to_file(path, content)
+    return len(content)
@@ -37,15 +37,20 @@ def load_host_value_store(
     host_name: HostName,
     *,
     store_changes: bool,
+    binary_format: bool = False,
 ) -> Generator[ValueStoreManager, None, None]:
-    """Create and load the value store for the host"""
+    """Create and load the value store for the host
+
+    The values are either stored as Python literal or, if binary_format is
+    set, in the binary format which only writes the changed values.
+    """
     global _active_host_value_store
 
     pushed_back_store = _active_host_value_store
 
     try:
 
-        _active_host_value_store = ValueStoreManager(host_name)
+        _active_host_value_store = ValueStoreManager(host_name, binary_format=binary_format)
         yield _active_host_value_store
 
         if store_changes:
@@ -26,6 +26,8 @@ from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.type_defs import CheckPluginName, HostName, Item
 from cmk.utils.log import logger
 
+from . import _binary
+
 _PluginName = str
 _UserKey = str
 _ValueStoreKey = Tuple[_PluginName, Item, _UserKey]
@@ -112,6 +114,9 @@ class _StaticValueStore(Mapping[_ValueStoreKey, Any]):
             else:
                 self._log_debug("value store: loading from disk")
                 self._data = store.load_object_from_file(self._path, default={}, lock=False)
+                if self._path.stat().st_size == 0:
+                    # Just created by the lock
+                    self._data = self._migrate_binary()
 
             if removed or updated:
                 data = {k: v for k, v in self._data.items() if k not in removed}
@@ -126,6 +131,132 @@ class _StaticValueStore(Mapping[_ValueStoreKey, Any]):
         finally:
             store.release_lock(self._path)
 
+    def _migrate_binary(self) -> Dict[_ValueStoreKey, Any]:
+        """Take over the values of the binary format, e.g. after it has been disabled"""
+        binary_path = _BinaryStaticValueStore.STORAGE_PATH / self._path.name
+        if not binary_path.exists():
+            return {}
+
+        self._log_debug("value store: migrating %s" % binary_path)
+        values = _binary.read_values(binary_path)
+        store.save_object_to_file(self._path, values, pretty=False)
+        binary_path.unlink()
+        return values
+
+
+class _BinaryStaticValueStore(_StaticValueStore):
+    """Represents the values stored on disk in the binary format
+
+    Instead of rewriting all values, disksync only appends the changed ones
+    to the file (see `_binary`). Values written by other processes are read
+    incrementally as long as the file has not been compacted in the meantime.
+
+    A file of the default format is migrated on first access and vice versa,
+    so the values are kept when the binary format is enabled or disabled.
+    """
+
+    STORAGE_PATH = _StaticValueStore.STORAGE_PATH / ".binary"
+
+    def __init__(self, host_name: HostName, log_debug: Callable[[str], None]) -> None:
+        self._legacy_path: Final = _StaticValueStore.STORAGE_PATH / host_name
+        # inode and end offset of the loaded data
+        self._loaded: Optional[Tuple[int, int]] = None
+        # size of the file after the last compaction
+        self._compacted_size = 0
+        self._values: Dict[_ValueStoreKey, Any] = {}
+        super().__init__(host_name, log_debug)
+
+    def disksync(
+            self,
+            *,
+            removed: Container[_ValueStoreKey] = (),
+            updated: Iterable[Tuple[_ValueStoreKey, Any]] = (),
+    ) -> None:
+        """Re-load and write the changes of the stored values
+
+        See `_StaticValueStore.disksync`. Only the changes are written.
+        """
+        self._log_debug("value store: synchronizing")
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            store.aquire_lock(self._path)
+            self._load()
+
+            removed_keys = [k for k in self._values if k in removed]
+            updated_values = {
+                k: v for k, v in updated if k not in self._values or self._values[k] != v
+            }
+            if removed_keys or updated_values:
+                for key in removed_keys:
+                    del self._values[key]
+                self._values.update(updated_values)
+                self._write(updated_values, removed_keys)
+
+            self._data = self._values
+        except Exception as exc:
+            raise MKGeneralException from exc
+        finally:
+            store.release_lock(self._path)
+
+    def _load(self) -> None:
+        stat = self._path.stat()
+        if stat.st_size == 0:
+            # Just created by the lock
+            self._values = self._migrate()
+            return
+
+        if self._loaded is not None and self._loaded[0] == stat.st_ino:
+            if self._loaded[1] == stat.st_size:
+                self._log_debug("value store: already loaded")
+                return
+            self._log_debug("value store: loading changes from disk")
+            records = _binary.read_changes(self._path, self._loaded[1])
+            end = self._loaded[1]
+        else:
+            self._log_debug("value store: loading from disk")
+            records = _binary.read_changes(self._path, 0)
+            self._values = {}
+            if not records:
+                # Nothing readable, the next commit rewrites the file
+                self._loaded = None
+                return
+            self._compacted_size = end = records[0][1]
+
+        for (updated, removed), end in records:
+            for key in removed:
+                self._values.pop(key, None)
+            self._values.update(updated)
+        self._loaded = (stat.st_ino, end)
+
+    def _migrate(self) -> Dict[_ValueStoreKey, Any]:
+        """Take over the values of the default format"""
+        self._loaded = None
+        if not self._legacy_path.exists():
+            return {}
+
+        self._log_debug("value store: migrating %s" % self._legacy_path)
+        values = store.load_object_from_file(self._legacy_path, default={}, lock=False)
+        self._compact(values)
+        self._legacy_path.unlink()
+        return values
+
+    def _write(self, updated: Mapping[_ValueStoreKey, Any],
+               removed: Iterable[_ValueStoreKey]) -> None:
+        if self._loaded is None or self._loaded[1] > 2 * self._compacted_size:
+            self._log_debug("value store: writing to disk")
+            self._compact(self._values)
+            return
+
+        self._log_debug("value store: appending changes to disk")
+        end = _binary.append_changes(self._path, self._loaded[1], updated, removed)
+        self._loaded = (self._loaded[0], end)
+
+    def _compact(self, values: Mapping[_ValueStoreKey, Any]) -> None:
+        self._compacted_size = _binary.write_values(self._path, values)
+        self._loaded = (self._path.stat().st_ino, self._compacted_size)
+
 
 class _EffectiveValueStore(MutableMapping[_ValueStoreKey, Any]):  # pylint: disable=too-many-ancestors
     """Implements the overlay logic between dynamic and static value store"""
@@ -235,10 +366,11 @@ class ValueStoreManager:
     .. automethod:: ValueStoreManager.save
 
     """
-    def __init__(self, host_name: HostName) -> None:
+    def __init__(self, host_name: HostName, *, binary_format: bool = False) -> None:
+        static_store_class = _BinaryStaticValueStore if binary_format else _StaticValueStore
         self._value_store = _EffectiveValueStore(
             dynamic=_DynamicValueStore(),
-            static=_StaticValueStore(host_name, logger.debug),
+            static=static_store_class(host_name, logger.debug),
         )
         self.active_service_interface: Optional[_ValueStore] = None
 
@@ -412,6 +412,9 @@ class AutomationRenameHosts(Automation):
             if self._rename_host_file(tmp_dir + "/" + d + "/", oldname, newname):
                 actions.append(d)
 
+        if self._rename_host_file(counters_dir + "/.binary/", oldname, newname):
+            actions.append("counters")
+
         if self._rename_host_dir(tmp_dir + "/piggyback/", oldname, newname):
             actions.append("piggyback-load")
 
@@ -429,6 +432,7 @@ class AutomationRenameHosts(Automation):
         # SNMP walks
         if self._rename_host_file(snmpwalks_dir, oldname, newname):
             actions.append("snmpwalk")
+        self._rename_host_file(snmpwalks_dir + "/.compiled", oldname, newname)
 
         # HW/SW-Inventory
         if self._rename_host_file(var_dir + "/inventory", oldname, newname):
@@ -806,6 +810,7 @@ class AutomationDeleteHosts(Automation):
                 "%s/%s.py" % (precompiled_hostchecks_dir, hostname),
                 "%s/%s.mk" % (autochecks_dir, hostname),
                 "%s/%s" % (counters_dir, hostname),
+                "%s/.binary/%s" % (counters_dir, hostname),
                 "%s/%s" % (tcp_cache_dir, hostname),
                 "%s/persisted/%s" % (var_dir, hostname),
                 "%s/inventory/%s" % (var_dir, hostname),
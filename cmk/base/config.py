@@ -106,6 +106,7 @@ import cmk.base.autochecks as autochecks
 import cmk.base.check_utils
 import cmk.base.default_config as default_config
 import cmk.base.ip_lookup as ip_lookup
+import cmk.base.sharded_config as sharded_config
 from cmk.base.api.agent_based.checking_classes import CheckPlugin
 from cmk.base.api.agent_based.register.check_plugins_legacy import create_check_plugin_from_legacy
 from cmk.base.api.agent_based.register.section_plugins_legacy import (
@@ -742,9 +743,29 @@ class PackedConfigGenerator:
 
 
 class PackedConfigStore:
-    """Caring about persistence of the packed configuration"""
-    def __init__(self, path: Path) -> None:
+    """Caring about persistence of the packed configuration
+
+    By default the configuration is pickled as a whole. With sharded=True the
+    values of the host specific variables are stored per host and are only
+    loaded when a helper accesses them (see cmk.base.sharded_config). Both
+    formats can be read.
+
+    The sharded format is not the default yet: The rulesets, host tags and
+    host paths stay in the global record, so the memory of the helpers still
+    grows with the number of hosts until the rule results are stored per host.
+    """
+
+    # Host specific variables which are only looked up for single hosts by the helpers
+    sharded_variable_names = [
+        "host_attributes",
+        "ipaddresses",
+        "ipv6addresses",
+        "explicit_snmp_communities",
+    ]
+
+    def __init__(self, path: Path, sharded: bool = False) -> None:
         self.path: Final = path
+        self.sharded: Final = sharded
 
     @classmethod
     def from_serial(cls, serial: OptionalConfigSerial) -> "PackedConfigStore":
@@ -752,6 +773,11 @@ class PackedConfigStore:
             cmk.core_helpers.paths.make_helper_config_path(serial) / "precompiled_check_config.mk")
 
     def write(self, helper_config: Mapping[str, Any]) -> None:
+        if self.sharded:
+            sharded_config.write_sharded_config(self.path, helper_config,
+                                                self.sharded_variable_names)
+            return
+
         self.path.parent.mkdir(parents=True, exist_ok=True)
         tmp_path = self.path.with_suffix(self.path.suffix + ".compiled")
         with tmp_path.open("wb") as compiled_file:
@@ -759,6 +785,9 @@ class PackedConfigStore:
         tmp_path.rename(self.path)
 
     def read(self) -> Mapping[str, Any]:
+        if sharded_config.is_sharded_config(self.path):
+            return sharded_config.read_sharded_config(self.path)
+
         with self.path.open("rb") as f:
             return pickle.load(f)
 
@@ -2588,8 +2617,14 @@ class HostConfig:
                 return SNMPBackendEnum.INLINE
             if host_backend == "classic":
                 return SNMPBackendEnum.CLASSIC
+            if host_backend == "async":
+                return SNMPBackendEnum.ASYNC
             raise MKGeneralException("Bad Host SNMP Backend configuration: %s" % host_backend)
 
+        # The asynchronous backend does not use netsnmp, see below
+        if snmp_backend_default == "async":
+            return SNMPBackendEnum.ASYNC
+
         # TODO(sk): remove this when netsnmp is fixed
         # NOTE: Force usage of CLASSIC with SNMP-v1 to prevent memory leak in the netsnmp
         if self._is_host_snmp_v1():
@@ -36,12 +36,14 @@ default_host_group = 'check_mk'
 
 check_max_cachefile_age = 0  # per default do not use cache files when checking
 cluster_max_cachefile_age = 90  # secs.
+max_concurrent_fetchers = 1  # fetchers of a host that may run at the same time
 piggyback_max_cachefile_age = 3600  # secs
 # Ruleset for translating piggyback host names
 piggyback_translation: _List = []
 # Ruleset for translating service descriptions
 service_description_translation: _List = []
 simulation_mode = False
+use_binary_value_store = False  # store the counters of the checks in binary format
 fake_dns: _Optional[str] = None
 agent_simulator = False
 perfdata_format = "pnp"  # also possible: "standard"
@@ -4,6 +4,7 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import multiprocessing
 import os
 import sys
 from pathlib import Path
@@ -56,6 +57,8 @@ from cmk.utils.type_defs import (
 import cmk.snmplib.snmp_modes as snmp_modes
 
 import cmk.core_helpers.factory as snmp_factory
+import cmk.core_helpers.snmp_backend.compiled_walk as compiled_walk
+from cmk.core_helpers.snmp_backend import StoredWalkSNMPBackend
 import cmk.core_helpers.cache
 from cmk.core_helpers.type_defs import Mode as FetchMode
 from cmk.core_helpers.type_defs import NO_SELECTION, SectionNameCollection
@@ -76,6 +79,7 @@ import cmk.base.localize
 import cmk.base.obsolete_output as out
 import cmk.base.packaging
 import cmk.base.parent_scan
+import cmk.base.prediction_precompute as prediction_precompute
 import cmk.base.profiling as profiling
 from cmk.base.api.agent_based.type_defs import SNMPSectionPlugin
 from cmk.base.core_factory import create_core
@@ -934,6 +938,54 @@ modes.register(
         ],
     ))
 
+#.
+#   .--compile-snmpwalk----------------------------------------------------.
+#   |                                _ _                      _ _          |
+#   |       ___ ___  _ __ ___  _ __ (_) | ___  __      ____ _| | | __      |
+#   |      / __/ _ \| '_ ` _ \| '_ \| | |/ _ \ \ \ /\ / / _` | | |/ /      |
+#   |     | (_| (_) | | | | | | |_) | | |  __/  \ V  V / (_| | |   <       |
+#   |      \___\___/|_| |_| |_| .__/|_|_|\___|   \_/\_/ \__,_|_|_|\_\      |
+#   |                         |_|                                          |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+
+def mode_compile_snmpwalk(hostnames: List[str]) -> None:
+    if not hostnames:
+        hostnames = sorted(
+            f.name for f in Path(cmk.utils.paths.snmpwalks_dir).iterdir() if f.is_file())
+
+    for hostname in hostnames:
+        path = Path(cmk.utils.paths.snmpwalks_dir, hostname)
+        try:
+            lines = StoredWalkSNMPBackend.read_walk_data(str(path))
+        except IOError:
+            raise MKGeneralException("No snmpwalk file %s" % path)
+
+        target = compiled_walk.compiled_walk_path(hostname)
+        num_entries = compiled_walk.compile_walk(lines, target)
+        console.verbose("Compiled %d OIDs of %s to %s\n" % (num_entries, path, target))
+
+
+modes.register(
+    Mode(
+        long_option="compile-snmpwalk",
+        handler_function=mode_compile_snmpwalk,
+        needs_config=False,
+        needs_checks=False,
+        argument=True,
+        argument_descr="HOST1 HOST2...",
+        argument_optional=True,
+        short_help="Compile stored snmpwalks",
+        long_help=[
+            "Converts the stored snmpwalks of the given hosts, or of all hosts "
+            "having one, in the directory %s to an indexed binary format. As long "
+            "as the compiled walk is not older than the stored walk, it is used "
+            "instead of the stored walk for simulating the SNMP device." %
+            cmk.utils.paths.snmpwalks_dir,
+        ],
+    ))
+
 #.
 #   .--snmpget-------------------------------------------------------------.
 #   |                                                   _                  |
@@ -1005,12 +1057,19 @@ def mode_flush(hosts: List[HostName]) -> None:
         flushed = False
 
         # counters
-        try:
-            os.remove(cmk.utils.paths.counters_dir + "/" + host)
+        counters_flushed = False
+        for counters_path in [
+                cmk.utils.paths.counters_dir + "/" + host,
+                cmk.utils.paths.counters_dir + "/.binary/" + host,
+        ]:
+            try:
+                os.remove(counters_path)
+                counters_flushed = True
+            except OSError:
+                pass
+        if counters_flushed:
             out.output(tty.bold + tty.blue + " counters")
             flushed = True
-        except OSError:
-            pass
 
         # cache files
         d = 0
@@ -1398,6 +1457,65 @@ modes.register(
         ],
     ))
 
+#.
+#   .--predictions---------------------------------------------------------.
+#   |                            _  _        _    _                        |
+#   |     _ __   _ __   ___   __| |(_)  ___ | |_ (_)  ___   _ __   ___     |
+#   |    | '_ \ | '__| / _ \ / _` || | / __|| __|| | / _ \ | '_ \ / __|    |
+#   |    | |_) || |   |  __/| (_| || || (__ | |_ | || (_) || | | |\__ \    |
+#   |    | .__/ |_|    \___| \__,_||_| \___| \__||_| \___/ |_| |_||___/    |
+#   |    |_|                                                               |
+#   '----------------------------------------------------------------------'
+
+
+def mode_precompute_predictions(options: Dict) -> None:
+    processes = options.get("procs", max(1, multiprocessing.cpu_count() - 1))
+    prediction_precompute.precompute_predictions(processes)
+
+
+modes.register(
+    Mode(
+        long_option="precompute-predictions",
+        handler_function=mode_precompute_predictions,
+        short_help="Compute the predictions of predictive levels",
+        long_help=[
+            "Computes the predictions of all services with predictive levels, "
+            "which are outdated or will be outdated at the beginning of the next "
+            "time slice, in parallel. The checks only use the computed predictions "
+            "(or the last known ones) and never compute them on their own. "
+            "This is done regularly by a cron job of the site.",
+        ],
+        sub_options=[
+            Option(
+                long_option="procs",
+                argument=True,
+                argument_descr="N",
+                argument_conv=int,
+                short_help="Start up to N processes in parallel. Defaults to the "
+                "number of CPUs minus one.",
+            ),
+        ],
+    ))
+
+
+def mode_check_predictions(hostname: HostName) -> int:
+    return prediction_precompute.active_check_predictions(hostname)
+
+
+modes.register(
+    Mode(
+        long_option="check-predictions",
+        handler_function=mode_check_predictions,
+        argument=True,
+        argument_descr="HOSTNAME",
+        short_help="Check the computation of the predictions",
+        long_help=[
+            "Make Check_MK behave as monitoring plugin that reports the coverage "
+            "and the compute time of the last run of precompute-predictions. "
+            "HOSTNAME is the host the service is assigned to.",
+        ],
+    ))
+
 #.
 #   .--discover------------------------------------------------------------.
 #   |                     _ _                                              |
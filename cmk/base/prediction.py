@@ -7,7 +7,6 @@
 
 import json
 import logging
-import math
 import time
 from typing import (
     Callable,
@@ -16,8 +15,11 @@ from typing import (
     NamedTuple,
     Optional,
     Tuple,
+    Union,
 )
 
+import numpy as np  # type: ignore[import]
+
 import cmk.utils.debug
 import cmk.utils.defines as defines
 from cmk.utils.log import VERBOSE
@@ -34,6 +36,7 @@ from cmk.utils.prediction import (
     PredictionData,
     PredictionInfo,
     PredictionParameters as _PredictionParameters,
+    PredictionRequest,
     PredictionStore,
     ConsolidationFunctionName,
     EstimatedLevels,
@@ -153,41 +156,54 @@ def _time_slices(
 def _retrieve_grouped_data_from_rrd(
     rrd_column: RRDColumnFunction,
     time_windows: _TimeSlices,
-) -> Tuple[TimeWindow, List[TimeSeriesValues]]:
-    "Collect all time slices and up-sample them to same resolution"
+) -> Tuple[TimeWindow, np.ndarray]:
+    """Collect all time slices and up-sample them to same resolution
+
+    Returns one row per slice, missing values are NaN."""
     from_time = time_windows[0][0]
 
-    slices = [(rrd_column(start, end), from_time - start) for start, end in time_windows]
+    series = rrd_column(time_windows)
 
     # The resolutions of the different time ranges differ. We upsample
     # to the best resolution. We assume that the youngest slice has the
     # finest resolution.
-    twindow = slices[0][0].twindow
+    twindow = series[0].twindow
     if twindow[2] == 0:
         raise MKGeneralException("Got no historic metrics")
 
-    return twindow, [ts.bfill_upsample(twindow, shift) for ts, shift in slices]
+    return twindow, np.array([
+        ts.bfill_upsample_array(twindow, from_time - start)
+        for ts, (start, _end) in zip(series, time_windows)
+    ])
 
 
-def _data_stats(slices: List[TimeSeriesValues]) -> DataStats:
+def _data_stats(slices: Union[np.ndarray, List[TimeSeriesValues]]) -> DataStats:
     "Statistically summarize all the upsampled RRD data"
+    data = np.array(slices, dtype=float, ndmin=2)
+    if data.size == 0:
+        return []
+
+    valid = ~np.isnan(data)
+    samples = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = np.where(valid, data, 0.0).sum(axis=0) / samples
+        squares = np.where(valid, data**2, 0.0).sum(axis=0)
+        # In the case of a single data-point an unbiased standard deviation is
+        # undefined. In this case we take the magnitude of the measured value
+        # itself as a measure of the dispersion.
+        stdev = np.where(
+            samples == 1,
+            np.abs(average),
+            np.sqrt(np.abs(squares - average**2 * samples) / (samples - 1)),
+        )
+    descriptors = np.stack(
+        [average, np.fmin.reduce(data, axis=0),
+         np.fmax.reduce(data, axis=0), stdev], axis=1)
 
-    descriptors: DataStats = []
-
-    for time_column in zip(*slices):
-        point_line = [x for x in time_column if x is not None]
-        if point_line:
-            average = sum(point_line) / float(len(point_line))
-            descriptors.append([
-                average,
-                min(point_line),
-                max(point_line),
-                _std_dev(point_line, average),
-            ])
-        else:
-            descriptors.append([None, None, None, None])
-
-    return descriptors
+    return [
+        stats if count else [None, None, None, None]
+        for stats, count in zip(descriptors.tolist(), samples.tolist())
+    ]
 
 
 def _calculate_data_for_prediction(
@@ -207,20 +223,11 @@ def _calculate_data_for_prediction(
     )
 
 
-def _std_dev(point_line: List[float], average: float) -> float:
-    samples = len(point_line)
-    # In the case of a single data-point an unbiased standard deviation is
-    # undefined. In this case we take the magnitude of the measured value
-    # itself as a measure of the dispersion.
-    if samples == 1:
-        return abs(average)
-    return math.sqrt(abs(sum(p**2 for p in point_line) - average**2 * samples) / float(samples - 1))
-
-
 def _is_prediction_up_to_date(
     last_info: Optional[PredictionInfo],
     timegroup: Timegroup,
     params: _PredictionParameters,
+    now: float,
 ) -> bool:
     """Check, if we need to (re-)compute the prediction file.
 
@@ -233,8 +240,7 @@ def _is_prediction_up_to_date(
         return False
 
     period_info = _PREDICTION_PERIODS[params["period"]]
-    now = time.time()
-    if last_info.time + period_info.valid * period_info.slice < now:
+    if last_info.time + period_info.valid * period_info.slice <= now:
         logger.log(VERBOSE, "Prediction of %s outdated", timegroup)
         return False
 
@@ -246,6 +252,69 @@ def _is_prediction_up_to_date(
     return True
 
 
+def due_predictions(
+    hostname: HostName,
+    service_description: ServiceName,
+    request: PredictionRequest,
+    now: Timestamp,
+    ahead: Seconds,
+) -> List[Timestamp]:
+    """The times the predictions of the request need to be computed for
+
+    That is now, if the prediction of the current time group is outdated, and
+    the start of the next slice, if it begins within the given seconds and the
+    prediction of its time group will be outdated by then."""
+    period_info = _PREDICTION_PERIODS[request.params["period"]]
+    next_slice = _get_prediction_timegroup(now, period_info)[2]
+    timestamps = [now] if next_slice - now > ahead else [now, next_slice]
+
+    prediction_store = PredictionStore(hostname, service_description, request.dsname)
+    due = []
+    for timestamp in timestamps:
+        timegroup = period_info.groupby(timestamp)[0]
+        if not _is_prediction_up_to_date(
+                last_info=prediction_store.get_info(timegroup),
+                timegroup=timegroup,
+                params=request.params,
+                now=timestamp,
+        ):
+            due.append(timestamp)
+    return due
+
+
+def compute_prediction(
+    hostname: HostName,
+    service_description: ServiceName,
+    request: PredictionRequest,
+    timestamp: Timestamp,
+) -> Timegroup:
+    """Compute and save the prediction for the time group of the given time"""
+    period_info = _PREDICTION_PERIODS[request.params["period"]]
+    timegroup = period_info.groupby(timestamp)[0]
+    logger.log(VERBOSE, "Calculating prediction data for time group %s", timegroup)
+
+    time_windows = _time_slices(timestamp, int(request.params["horizon"] * 86400), period_info,
+                                timegroup)
+
+    rrd_datacolumn = cmk.utils.prediction.rrd_datacolum(hostname, service_description,
+                                                        request.dsname, request.cf)
+
+    data_for_pred = _calculate_data_for_prediction(time_windows, rrd_datacolumn)
+
+    info = PredictionInfo(
+        name=timegroup,
+        time=timestamp,
+        range=time_windows[0],
+        cf=request.cf,
+        dsname=request.dsname,
+        slice=period_info.slice,
+        params=request.params,
+    )
+    PredictionStore(hostname, service_description,
+                    request.dsname).save_predictions(info, data_for_pred)
+    return timegroup
+
+
 # cf: consilidation function (MAX, MIN, AVERAGE)
 # levels_factor: this multiplies all absolute levels. Usage for example
 # in the cpu.loads check the multiplies the levels by the number of CPU
@@ -258,6 +327,11 @@ def get_levels(
     cf: ConsolidationFunctionName,
     levels_factor: float = 1.0,
 ) -> Tuple[Optional[float], EstimatedLevels]:
+    """Estimate the levels from the prediction of the current time group
+
+    The predictions are computed ahead of time by "cmk --precompute-predictions".
+    As long as the prediction is outdated or computed with other parameters,
+    the last known one is used, without one there are no levels yet."""
     now = int(time.time())
     period_info = _PREDICTION_PERIODS[params["period"]]
 
@@ -266,38 +340,23 @@ def get_levels(
     prediction_store = PredictionStore(hostname, service_description, dsname)
     prediction_store.clean_prediction_files(timegroup)
 
-    data_for_pred: Optional[PredictionData] = None
-    if _is_prediction_up_to_date(
-            last_info=prediction_store.get_info(timegroup),
+    last_info = prediction_store.get_info(timegroup)
+    if not _is_prediction_up_to_date(
+            last_info=last_info,
             timegroup=timegroup,
             params=params,
+            now=now,
     ):
-        data_for_pred = prediction_store.get_data(timegroup)
+        prediction_store.save_request(PredictionRequest(dsname=dsname, cf=cf, params=params))
 
+    data_for_pred = None if last_info is None else prediction_store.get_data(timegroup)
     if data_for_pred is None:
-        logger.log(VERBOSE, "Calculating prediction data for time group %s", timegroup)
-        prediction_store.clean_prediction_files(timegroup, force=True)
-
-        time_windows = _time_slices(now, int(params["horizon"] * 86400), period_info, timegroup)
-
-        rrd_datacolumn = cmk.utils.prediction.rrd_datacolum(hostname, service_description, dsname,
-                                                            cf)
-
-        data_for_pred = _calculate_data_for_prediction(time_windows, rrd_datacolumn)
-
-        info = PredictionInfo(
-            name=timegroup,
-            time=now,
-            range=time_windows[0],
-            cf=cf,
-            dsname=dsname,
-            slice=period_info.slice,
-            params=params,
-        )
-        prediction_store.save_predictions(info, data_for_pred)
+        return None, (None, None, None, None)
 
     # Find reference value in data_for_pred
     index = int(rel_time / data_for_pred.step)
+    if index >= len(data_for_pred.points):
+        return None, (None, None, None, None)
     reference = dict(zip(data_for_pred.columns, data_for_pred.points[index]))
 
     return reference["average"], cmk.utils.prediction.estimate_levels(
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Compute the predictions of predictive levels ahead of time
+
+The checks don't compute predictions themselves, they only record which
+metric they need a prediction of with which parameters (see get_levels()).
+A regular job computes all of them, which are outdated or will be outdated
+at the beginning of the next slice, in parallel worker processes. The result
+of the last run is monitored by "cmk --check-predictions".
+"""
+
+import multiprocessing
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import cmk.utils.debug
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.check_utils import ActiveCheckResult
+from cmk.utils.log import console
+from cmk.utils.prediction import PredictionRequest, PredictionStore
+from cmk.utils.type_defs import HostName, ServiceName, Timestamp
+
+import cmk.base.agent_based.decorator as decorator
+import cmk.base.check_table as check_table
+import cmk.base.config as config
+import cmk.base.prediction as prediction
+from cmk.base.check_utils import LegacyCheckParameters
+
+# Predictions of the next slice are computed this many seconds before it begins
+COMPUTE_AHEAD = 3600
+
+# The job is expected to run every 10 minutes
+MAX_STATUS_AGE = 3600
+
+
+class _Job(NamedTuple):
+    host_name: HostName
+    service_description: ServiceName
+    request: PredictionRequest
+    timestamp: Timestamp
+
+
+def _status_file() -> Path:
+    return Path(cmk.utils.paths.var_dir, "prediction_precompute.status")
+
+
+def has_predictive_levels(params: LegacyCheckParameters) -> bool:
+    """Whether the (possibly time specific) check parameters contain predictive levels"""
+    if isinstance(params, dict):
+        if "period" in params and "horizon" in params:
+            return True
+        return any(has_predictive_levels(value) for value in params.values())
+    if isinstance(params, (list, tuple)):
+        return any(has_predictive_levels(value) for value in params)
+    return False
+
+
+def services_with_predictive_levels() -> Iterator[Tuple[HostName, ServiceName]]:
+    config_cache = config.get_config_cache()
+    for host_name in sorted(config_cache.all_active_hosts()):
+        for service in check_table.get_check_table(host_name).values():
+            if has_predictive_levels(service.parameters):
+                yield host_name, service.description
+
+
+def _due_jobs(services: List[Tuple[HostName, ServiceName]], now: Timestamp) -> Iterator[_Job]:
+    for host_name, service_description in services:
+        for request in PredictionStore.requests(host_name, service_description):
+            for timestamp in prediction.due_predictions(host_name, service_description, request,
+                                                        now, COMPUTE_AHEAD):
+                yield _Job(host_name, service_description, request, timestamp)
+
+
+def _compute(job: _Job) -> Tuple[_Job, float, Optional[str]]:
+    start = time.time()
+    try:
+        prediction.compute_prediction(job.host_name, job.service_description, job.request,
+                                      job.timestamp)
+        error = None
+    except Exception as e:
+        if cmk.utils.debug.enabled():
+            raise
+        error = "%s" % e
+    return job, time.time() - start, error
+
+
+def _is_covered(host_name: HostName, service_description: ServiceName, now: Timestamp) -> bool:
+    """Whether there is an up to date prediction for all metrics the service asked for"""
+    requests = list(PredictionStore.requests(host_name, service_description))
+    return bool(requests) and not any(
+        now in prediction.due_predictions(host_name, service_description, request, now, 0)
+        for request in requests)
+
+
+def precompute_predictions(processes: int) -> Dict[str, Any]:
+    start = time.time()
+    now = int(start)
+    services = list(services_with_predictive_levels())
+    jobs = list(_due_jobs(services, now))
+    console.verbose("Computing %d predictions of %d services (%d processes)\n", len(jobs),
+                    len(services), processes)
+
+    compute_time = 0.0
+    failed = 0
+    with multiprocessing.Pool(processes=max(processes, 1)) as pool:
+        for job, duration, error in pool.imap_unordered(_compute, jobs):
+            compute_time += duration
+            if error is not None:
+                failed += 1
+                console.warning("Cannot compute prediction of %s/%s/%s: %s", job.host_name,
+                                job.service_description, job.request.dsname, error)
+
+    status = {
+        "time": now,
+        "duration": time.time() - start,
+        "compute_time": compute_time,
+        "computed": len(jobs) - failed,
+        "failed": failed,
+        "services": len(services),
+        "covered": sum(1 for service in services if _is_covered(*service, now)),
+    }
+    store.save_object_to_file(_status_file(), status)
+    console.verbose("Computed %d predictions in %.2f s, %d failed, %d of %d services covered\n",
+                    status["computed"], status["duration"], status["failed"], status["covered"],
+                    status["services"])
+    return status
+
+
+@decorator.handle_check_mk_check_result("predictions", "Check_MK Predictions")
+def active_check_predictions(host_name: HostName) -> ActiveCheckResult:
+    """Report the last run of the precomputation"""
+    status = store.load_object_from_file(_status_file(), default=None)
+    if status is None:
+        return ActiveCheckResult(3, ["Predictions have not been computed yet"], [], [])
+
+    age = time.time() - status["time"]
+    state = 1 if age > MAX_STATUS_AGE or status["failed"] else 0
+    coverage = 100.0 * status["covered"] / status["services"] if status["services"] else 100.0
+    return ActiveCheckResult(
+        state,
+        [
+            "%d of %d services with predictive levels covered (%.1f%%)" %
+            (status["covered"], status["services"], coverage),
+            "%d predictions computed in %.2f s (%.2f s compute time)" %
+            (status["computed"], status["duration"], status["compute_time"]),
+            "%d failed%s" % (status["failed"], "(!)" if status["failed"] else ""),
+            "Last run %d s ago%s" % (age, "(!)" if age > MAX_STATUS_AGE else ""),
+        ],
+        [],
+        [
+            "coverage=%.1f%%;;;0;100" % coverage,
+            "computed=%d" % status["computed"],
+            "failed=%d" % status["failed"],
+            "duration=%.3fs" % status["duration"],
+            "compute_time=%.3fs" % status["compute_time"],
+        ],
+    )
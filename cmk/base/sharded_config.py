@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Sharded file format of the packed helper configuration
+
+The helpers only need the host specific parts of the configuration for the
+hosts they are currently working on. Instead of one big pickle the file is
+split into separately pickled records:
+
+    header | global record | host records | host names | index
+
+The global record holds all settings which are not host specific. Each host
+record holds the host specific values of the sharded variables. The index is
+sorted by host name and is searched in place, so opening the file does not
+depend on the number of hosts. The file is memory mapped and a host record is
+only unpickled when it is accessed.
+"""
+
+import mmap
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from cmk.utils.type_defs import HostName
+
+MAGIC = b"CMKSHRD1"
+
+# magic, global record offset, global record length, index offset, number of hosts
+_HEADER = struct.Struct("<8sQQQQ")
+# name offset, name length, record offset, record length
+_INDEX_ENTRY = struct.Struct("<QIQI")
+
+HostRecords = Mapping[HostName, Mapping[str, Any]]
+
+
+def is_sharded_config(path: Path) -> bool:
+    with path.open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _split_host_records(
+    config: Mapping[str, Any],
+    sharded_variables: Sequence[str],
+) -> Tuple[Dict[str, Any], List[str], HostRecords]:
+    """Move the host specific values of the sharded variables to per host records"""
+    global_config = dict(config)
+    present_variables = []
+    host_records: Dict[HostName, Dict[str, Any]] = {}
+    for varname in sharded_variables:
+        if varname not in global_config:
+            continue
+        present_variables.append(varname)
+        for hostname, value in global_config.pop(varname).items():
+            host_records.setdefault(hostname, {})[varname] = value
+    return global_config, present_variables, host_records
+
+
+def write_sharded_config(path: Path, config: Mapping[str, Any],
+                         sharded_variables: Sequence[str]) -> None:
+    """Write the configuration. The sharded variables need to be dicts keyed by host name"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".compiled")
+
+    global_config, present_variables, host_records = _split_host_records(config, sharded_variables)
+    global_record = pickle.dumps({
+        "config": global_config,
+        "sharded_variables": present_variables,
+    })
+
+    with tmp_path.open("wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        global_offset = f.tell()
+        f.write(global_record)
+
+        records: Dict[bytes, Tuple[int, int]] = {}
+        for hostname, record in host_records.items():
+            raw = pickle.dumps(dict(record))
+            records[hostname.encode("utf-8")] = (f.tell(), len(raw))
+            f.write(raw)
+
+        names = sorted(records)
+        name_offsets = []
+        for name in names:
+            name_offsets.append(f.tell())
+            f.write(name)
+
+        index_offset = f.tell()
+        for name, name_offset in zip(names, name_offsets):
+            f.write(_INDEX_ENTRY.pack(name_offset, len(name), *records[name]))
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, global_offset, len(global_record), index_offset, len(names)))
+
+    tmp_path.rename(path)
+
+
+class ShardedConfigReader:
+    """Reads the records of a sharded configuration file on demand"""
+    def __init__(self, path: Path) -> None:
+        super(ShardedConfigReader, self).__init__()
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._global_offset, self._global_length, self._index_offset, self._num_hosts = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a sharded configuration file" % path)
+
+        self._host_records: Dict[HostName, Optional[Dict[str, Any]]] = {}
+
+    def read_global(self) -> Tuple[Dict[str, Any], Sequence[str]]:
+        record = pickle.loads(self._mm[self._global_offset:self._global_offset +
+                                       self._global_length])
+        return record["config"], record["sharded_variables"]
+
+    def host_record(self, hostname: HostName) -> Optional[Dict[str, Any]]:
+        try:
+            return self._host_records[hostname]
+        except KeyError:
+            pass
+
+        record = None
+        location = self._find(hostname.encode("utf-8"))
+        if location is not None:
+            offset, length = location
+            record = pickle.loads(self._mm[offset:offset + length])
+
+        self._host_records[hostname] = record
+        return record
+
+    def hostnames(self) -> Iterator[HostName]:
+        for pos in range(self._num_hosts):
+            yield self._name_at(pos).decode("utf-8")
+
+    def _entry_at(self, pos: int) -> Tuple[int, int, int, int]:
+        return _INDEX_ENTRY.unpack_from(self._mm, self._index_offset + pos * _INDEX_ENTRY.size)
+
+    def _name_at(self, pos: int) -> bytes:
+        name_offset, name_length, _offset, _length = self._entry_at(pos)
+        return self._mm[name_offset:name_offset + name_length]
+
+    def _find(self, name: bytes) -> Optional[Tuple[int, int]]:
+        low, high = 0, self._num_hosts
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_at(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == self._num_hosts:
+            return None
+
+        name_offset, name_length, offset, length = self._entry_at(low)
+        if self._mm[name_offset:name_offset + name_length] != name:
+            return None
+        return offset, length
+
+
+class LazyHostMapping(Mapping[HostName, Any]):
+    """The host specific values of one sharded variable, loaded on access"""
+    def __init__(self, reader: ShardedConfigReader, varname: str) -> None:
+        super(LazyHostMapping, self).__init__()
+        self._reader = reader
+        self._varname = varname
+
+    def __getitem__(self, hostname: HostName) -> Any:
+        record = self._reader.host_record(hostname)
+        if record is None or self._varname not in record:
+            raise KeyError(hostname)
+        return record[self._varname]
+
+    def __iter__(self) -> Iterator[HostName]:
+        for hostname in self._reader.hostnames():
+            if hostname in self:
+                yield hostname
+
+    def __len__(self) -> int:
+        return sum(1 for _hostname in self)
+
+    def __repr__(self) -> str:
+        return "%s(%r)" % (self.__class__.__name__, self._varname)
+
+    def __reduce__(self):
+        # The memory map can not be pickled, use a regular dict instead
+        return dict, (dict(self.items()),)
+
+
+def read_sharded_config(path: Path) -> Dict[str, Any]:
+    reader = ShardedConfigReader(path)
+    config, sharded_variables = reader.read_global()
+    for varname in sharded_variables:
+        config[varname] = LazyHostMapping(reader, varname)
+    return config
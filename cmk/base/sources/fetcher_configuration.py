@@ -9,12 +9,16 @@ from typing import Any, Dict, Optional
 
 from cmk.utils.type_defs import HostAddress
 
+from cmk.core_helpers.controller import GlobalConfig
+
+import cmk.base.config as config
 import cmk.base.core_config as core_config
 from cmk.base.config import HostConfig
 
 from ._checkers import make_sources
+from .snmp import make_plugin_store
 
-__all__ = ["fetchers", "clusters"]
+__all__ = ["fetchers", "clusters", "global_config"]
 
 
 def get_ip_address(host_config: HostConfig) -> Optional[HostAddress]:
@@ -36,3 +40,12 @@ def fetchers(host_config: HostConfig) -> Dict[str, Any]:
 
 def clusters(host_config: HostConfig) -> Dict[str, Any]:
     return {"clusters": {"nodes": host_config.nodes or ()}}
+
+
+def global_config(cmc_log_level: int) -> Dict[str, Any]:
+    return GlobalConfig(
+        cmc_log_level=cmc_log_level,
+        cluster_max_cachefile_age=config.cluster_max_cachefile_age,
+        snmp_plugin_store=make_plugin_store(),
+        max_concurrent_fetchers=config.max_concurrent_fetchers,
+    ).serialize()
@@ -211,6 +211,14 @@ class ParserState(abc.ABC):
     def on_piggyback_footer(self, line: bytes) -> "ParserState":
         raise NotImplementedError()
 
+    def do_body(self, body: memoryview, selection: SectionNameCollection) -> None:
+        """Handle the lines between two markers at once
+
+        This is the same as calling `do_action()` for all of its non-empty
+        lines. The lines are only split if the section is selected.
+        """
+        # Outside of a section -> ignore the lines.
+
     def to_noop_parser(self) -> "NOOPParser":
         self._logger.debug("Transition %s -> %s", type(self).__name__, NOOPParser.__name__)
         return NOOPParser(
@@ -421,6 +429,14 @@ class PiggybackSectionParser(ParserState):
         self.piggyback_sections[self.current_host][self.current_section].append(AgentRawData(line))
         return self
 
+    def do_body(self, body: memoryview, selection: SectionNameCollection) -> None:
+        if not (selection is NO_SELECTION or self.current_section.name in selection):
+            return
+        self.piggyback_sections[self.current_host][self.current_section].extend(
+            AgentRawData(line.rstrip(b"\r"))
+            for line in body.tobytes().split(b"\n")
+            if line.strip())
+
     def on_piggyback_header(self, line: bytes) -> "ParserState":
         piggyback_header = PiggybackMarker.from_headerline(
             line,
@@ -472,6 +488,17 @@ class HostSectionParser(ParserState):
         self.sections[self.current_section].append(AgentRawData(line))
         return self
 
+    def do_body(self, body: memoryview, selection: SectionNameCollection) -> None:
+        if not (selection is NO_SELECTION or self.current_section.name in selection):
+            return
+        lines = body.tobytes().split(b"\n")
+        if self.current_section.nostrip:
+            self.sections[self.current_section].extend(
+                AgentRawData(line.rstrip(b"\r")) for line in lines if line.strip())
+        else:
+            self.sections[self.current_section].extend(
+                AgentRawData(line) for line in (line.strip() for line in lines) if line)
+
     def on_piggyback_header(self, line: bytes) -> "ParserState":
         piggyback_header = PiggybackMarker.from_headerline(
             line,
@@ -531,7 +558,7 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
         # Transform to seconds and give the piggybacked host a little bit more time
         cache_age = int(1.5 * 60 * self.check_interval)
 
-        sections, piggyback_sections = self._parse_host_section(raw_data)
+        sections, piggyback_sections = self._parse_host_section(raw_data, selection=selection)
         section_info = {
             header.name: header
             for header in sections
@@ -614,8 +641,14 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
     def _parse_host_section(
         self,
         raw_data: AgentRawData,
+        *,
+        selection: SectionNameCollection = NO_SELECTION,
     ) -> Tuple[ImmutableSection, Mapping[PiggybackMarker, ImmutableSection]]:
-        """Split agent output in chunks, splits lines by whitespaces."""
+        """Split agent output in chunks, splits lines by whitespaces.
+
+        Only the marker lines are passed through the state machine. The lines
+        of the sections which are not selected are skipped.
+        """
         parser: ParserState = NOOPParser(
             self.hostname,
             {},
@@ -624,12 +657,45 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
             encoding_fallback=self.encoding_fallback,
             logger=self._logger,
         )
-        for line in raw_data.split(b"\n"):
-            parser = parser(line.rstrip(b"\r"))
+        for marker, body in _scan_markers(raw_data):
+            parser = parser(marker)
+            parser.do_body(body, selection)
 
         return parser.sections, parser.piggyback_sections
 
 
+def _scan_markers(raw_data: bytes) -> Iterator[Tuple[bytes, memoryview]]:
+    """The marker lines of the agent output, each with the data up to the next one
+
+    A marker line is a line starting with "<<<" and ending with ">>>", apart
+    from white space. This covers the section and the piggyback markers. The
+    data in front of the first marker is skipped.
+
+    >>> [(m, b.tobytes()) for m, b in _scan_markers(b"x\\n<<<a>>>\\n1 <<<b>>>\\n <<<<c>>>>\\r\\n")]
+    [(b'<<<a>>>', b'1 <<<b>>>\\n'), (b' <<<<c>>>>', b'')]
+    """
+    view = memoryview(raw_data)
+    length = len(raw_data)
+    marker: Optional[bytes] = None
+    body_start = 0
+    position = 0
+    while (position := raw_data.find(b"<<<", position)) != -1:
+        line_start = raw_data.rfind(b"\n", 0, position) + 1
+        line_end = raw_data.find(b"\n", position)
+        if line_end == -1:
+            line_end = length
+        line = raw_data[line_start:line_end].rstrip(b"\r")
+        if not raw_data[line_start:position].strip() and line.strip().endswith(b">>>"):
+            if marker is not None:
+                yield marker, view[body_start:line_start]
+            marker = line
+            body_start = line_end + 1
+        position = line_end
+
+    if marker is not None:
+        yield marker, view[body_start:]
+
+
 class AgentSummarizer(Summarizer[AgentHostSections]):
     pass
 
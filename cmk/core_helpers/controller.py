@@ -7,12 +7,14 @@
 import contextlib
 import json
 import logging
+import multiprocessing
 import os
 import signal
 import sys
+import time
 import traceback
 from types import FrameType
-from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import cmk.utils.cleanup
 from cmk.utils.cpu_tracking import CPUTracker, Snapshot
@@ -33,6 +35,9 @@ class GlobalConfig(NamedTuple):
     cmc_log_level: int
     cluster_max_cachefile_age: int
     snmp_plugin_store: SNMPPluginStore
+    # Number of fetchers of a host (or the nodes of a cluster) that may run
+    # at the same time. 1 runs them one after another.
+    max_concurrent_fetchers: int = 1
 
     @property
     def log_level(self) -> int:
@@ -60,6 +65,7 @@ class GlobalConfig(NamedTuple):
             cmc_log_level=fetcher_config["cmc_log_level"],
             cluster_max_cachefile_age=fetcher_config["cluster_max_cachefile_age"],
             snmp_plugin_store=SNMPPluginStore.deserialize(fetcher_config["snmp_plugin_store"]),
+            max_concurrent_fetchers=fetcher_config.get("max_concurrent_fetchers", 1),
         )
 
     def serialize(self) -> Dict[str, Any]:
@@ -68,6 +74,7 @@ class GlobalConfig(NamedTuple):
                 "cmc_log_level": self.cmc_log_level,
                 "cluster_max_cachefile_age": self.cluster_max_cachefile_age,
                 "snmp_plugin_store": self.snmp_plugin_store.serialize(),
+                "max_concurrent_fetchers": self.max_concurrent_fetchers,
             },
         }
 
@@ -114,7 +121,10 @@ def process_command(raw_command: str, observer: ABCResourceObserver) -> None:
             global_config = load_global_config(command.serial)
             logging.getLogger().setLevel(global_config.log_level)
             SNMPFetcher.plugin_store = global_config.snmp_plugin_store
-            run_fetchers(**command._asdict())
+            run_fetchers(
+                **command._asdict(),
+                max_concurrent_fetchers=global_config.max_concurrent_fetchers,
+            )
             observer.check_resources(raw_command)
         except Exception as e:
             crash_info = create_fetcher_crash_dump(serial, host_name)
@@ -131,11 +141,23 @@ def _confirm_command_processed() -> Iterator[None]:
         write_bytes(bytes(protocol.CMCMessage.end_of_reply()))
 
 
-def run_fetchers(serial: ConfigSerial, host_name: HostName, mode: Mode, timeout: int) -> None:
+def run_fetchers(
+    serial: ConfigSerial,
+    host_name: HostName,
+    mode: Mode,
+    timeout: int,
+    max_concurrent_fetchers: int = 1,
+) -> None:
     """Entry point from bin/fetcher"""
     try:
         # Usually OMD_SITE/var/check_mk/core/fetcher-config/[config-serial]/[host].json
-        _run_fetchers_from_file(serial, host_name, mode=mode, timeout=timeout)
+        _run_fetchers_from_file(
+            serial,
+            host_name,
+            mode=mode,
+            timeout=timeout,
+            max_concurrent_fetchers=max_concurrent_fetchers,
+        )
     except FileNotFoundError:
         # Not an error.
         logger.warning("fetcher file for host %r and %s is absent", host_name, serial)
@@ -174,6 +196,76 @@ def _run_fetcher(fetcher: Fetcher, mode: Mode) -> protocol.FetcherMessage:
     )
 
 
+# The fetchers of the current command. The worker processes of the concurrent
+# mode are forked and access them by index, so they do not need to be pickled.
+_concurrent_fetchers: Tuple[Fetcher, ...] = ()
+
+
+def _run_fetchers_concurrently(
+    fetchers: Tuple[Fetcher, ...],
+    mode: Mode,
+    *,
+    deadline: float,
+    timeout_message: str,
+    max_workers: int,
+    messages: List[protocol.FetcherMessage],
+) -> None:
+    """Run the fetchers in a bounded pool of worker processes
+
+    Every fetcher gets its own timeout: The remaining time of the command is
+    split among the rounds the workers need for all fetchers, so a slow data
+    source does not make the ones waiting for a worker time out. The messages
+    are appended in the order of the fetchers. In case the deadline of the whole
+    command is reached, MKTimeout is raised and the caller fills in the missing
+    messages.
+    """
+    global _concurrent_fetchers
+    _concurrent_fetchers = fetchers
+    workers = min(max_workers, len(fetchers))
+    rounds = -(-len(fetchers) // workers)
+    fetcher_timeout = max(1, int((deadline - time.monotonic()) / rounds))
+    pool = multiprocessing.get_context("fork").Pool(processes=workers)
+    try:
+        pending = [
+            pool.apply_async(_run_fetcher_with_timeout, (index, mode, fetcher_timeout, deadline))
+            for index in range(len(fetchers))
+        ]
+        for fetcher, async_result in zip(fetchers, pending):
+            try:
+                messages.append(
+                    protocol.FetcherMessage.from_bytes(
+                        async_result.get(timeout=max(0.0, deadline - time.monotonic()))))
+            except multiprocessing.TimeoutError:
+                raise MKTimeout(timeout_message)
+            except MKTimeout:
+                raise
+            except Exception as exc:
+                # The worker process itself failed, the fetcher errors are in the message
+                messages.append(
+                    protocol.FetcherMessage.error(FetcherType.from_fetcher(fetcher), exc))
+    finally:
+        pool.terminate()
+        pool.join()
+        _concurrent_fetchers = ()
+
+
+def _run_fetcher_with_timeout(index: int, mode: Mode, timeout: int, deadline: float) -> bytes:
+    """Executed in a worker process of the concurrent mode"""
+    fetcher = _concurrent_fetchers[index]
+    # Stay below the deadline of the whole command to report the own timeout
+    timeout = max(1, min(timeout, int(deadline - time.monotonic())))
+    try:
+        with timeout_control(timeout, message=f"{fetcher} timed out after {timeout} seconds"):
+            return bytes(_run_fetcher(fetcher, mode))
+    except MKTimeout as exc:
+        return bytes(
+            protocol.FetcherMessage.timeout(
+                FetcherType.from_fetcher(fetcher),
+                exc,
+                Snapshot.null(),
+            ))
+
+
 def _parse_config(serial: ConfigSerial, host_name: HostName) -> Iterator[Fetcher]:
     with make_local_config_path(serial, host_name).open() as f:
         data = json.load(f)
@@ -206,6 +298,7 @@ def _run_fetchers_from_file(
     host_name: HostName,
     mode: Mode,
     timeout: int,
+    max_concurrent_fetchers: int = 1,
 ) -> None:
     """ Writes to the stdio next data:
     Count Answer        Content               Action
@@ -216,15 +309,24 @@ def _run_fetchers_from_file(
 
     """
     messages: List[protocol.FetcherMessage] = []
-    with timeout_control(
-            timeout,
-            message=f"Fetcher for host \"{host_name}\" timed out after {timeout} seconds",
-    ):
+    deadline = time.monotonic() + timeout
+    timeout_message = f"Fetcher for host \"{host_name}\" timed out after {timeout} seconds"
+    with timeout_control(timeout, message=timeout_message):
         fetchers = tuple(_parse_config(serial, host_name))
         try:
-            # fill as many messages as possible before timeout exception raised
-            for fetcher in fetchers:
-                messages.append(_run_fetcher(fetcher, mode))
+            if max_concurrent_fetchers > 1 and len(fetchers) > 1:
+                _run_fetchers_concurrently(
+                    fetchers,
+                    mode,
+                    deadline=deadline,
+                    timeout_message=timeout_message,
+                    max_workers=max_concurrent_fetchers,
+                    messages=messages,
+                )
+            else:
+                # fill as many messages as possible before timeout exception raised
+                for fetcher in fetchers:
+                    messages.append(_run_fetcher(fetcher, mode))
         except MKTimeout as exc:
             # fill missing entries with timeout errors
             messages.extend(
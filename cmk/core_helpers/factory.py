@@ -53,7 +53,13 @@ def backend(snmp_config: SNMPHostConfig,
             # is native fallback for pysnmp
             pass
 
-    if snmp_config.snmp_backend == SNMPBackendEnum.CLASSIC:
+    if snmp_config.snmp_backend == SNMPBackendEnum.ASYNC and not snmp_config.is_snmpv3_host:
+        # NOTE: delay import, only the protocol layer of PySNMP is used by this backend.
+        from .snmp_backend.asynchronous import AsyncSNMPBackend  # pylint: disable=import-outside-toplevel
+        return AsyncSNMPBackend(snmp_config, logger)
+
+    # The classic backend is also the fallback of the asynchronous one for SNMPv3 hosts
+    if snmp_config.snmp_backend in (SNMPBackendEnum.CLASSIC, SNMPBackendEnum.ASYNC):
         return ClassicSNMPBackend(snmp_config, logger)
 
     raise NotImplementedError(f"Unknown SNMP backend: {snmp_config.snmp_backend}")
@@ -257,7 +257,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
         verify_ipaddress(self.snmp_config.ipaddress)
 
     def close(self) -> None:
-        pass
+        self._backend.close()
 
     def _detect(self, *, select_from: Set[SectionName]) -> Set[SectionName]:
         """Detect the applicable sections for the device in question"""
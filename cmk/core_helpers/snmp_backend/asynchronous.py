@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""In-process SNMP backend which walks several OIDs at the same time
+
+The requests are encoded and decoded with the protocol layer of PySNMP and sent
+over one UDP socket per host. Every walk is a generator which yields the PDUs
+it wants to send and receives the responses. Several of them are run at the
+same time: up to `max_pending_requests` requests are in flight and the
+responses are dispatched using their request ids.
+
+Only SNMP v1 and v2c are supported.
+"""
+
+import logging
+import random
+import socket
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Generator, List, Optional, Sequence, Tuple
+
+from pyasn1.codec.ber import decoder, encoder  # type: ignore[import]
+from pyasn1.error import PyAsn1Error  # type: ignore[import]
+from pyasn1.type import univ  # type: ignore[import]
+from pysnmp.proto import api, rfc1902, rfc1905  # type: ignore[import]
+
+from cmk.utils.exceptions import MKSNMPError
+from cmk.utils.log import console
+
+from cmk.snmplib.type_defs import (
+    OID,
+    SNMPBackend,
+    SNMPContextName,
+    SNMPHostConfig,
+    SNMPRawValue,
+    SNMPRowInfo,
+)
+
+__all__ = ["AsyncSNMPBackend"]
+
+# error status, error index, var binds
+_Response = Tuple[int, int, List[Tuple[str, Any]]]
+_Job = Generator[Any, _Response, Any]
+
+_NO_SUCH_NAME = 2  # Error status of SNMP v1 agents at the end of the MIB
+
+_END_OF_WALK_TAGS = frozenset([
+    rfc1905.endOfMibView.tagSet,
+    rfc1905.noSuchObject.tagSet,
+    rfc1905.noSuchInstance.tagSet,
+])
+
+
+class AsyncSNMPBackend(SNMPBackend):
+    max_pending_requests = 16
+
+    def __init__(self, snmp_config: SNMPHostConfig, logger: logging.Logger) -> None:
+        super(AsyncSNMPBackend, self).__init__(snmp_config, logger)
+        self._socket: Optional[socket.socket] = None
+        self._request_id = random.randint(1, 2**30)
+
+        if self.config.is_bulkwalk_host or self.config.is_snmpv2or3_without_bulkwalk_host:
+            self._proto = api.protoModules[api.protoVersion2c]
+        else:
+            self._proto = api.protoModules[api.protoVersion1]
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def get(self,
+            oid: OID,
+            context_name: Optional[SNMPContextName] = None) -> Optional[SNMPRawValue]:
+        try:
+            if oid.endswith(".*"):
+                return self._run([self._get_next_job(oid[:-2])])[0]
+            return self._run([self._get_job(oid)])[0]
+        except MKSNMPError as e:
+            console.verbose("%s\n" % e)
+            return None
+
+    def walk(self,
+             oid: OID,
+             check_plugin_name: Optional[str] = None,
+             table_base_oid: Optional[OID] = None,
+             context_name: Optional[SNMPContextName] = None) -> SNMPRowInfo:
+        return self.walk_columns([oid])[0]
+
+    def walk_columns(self,
+                     oids: Sequence[OID],
+                     check_plugin_name: Optional[str] = None,
+                     table_base_oid: Optional[OID] = None,
+                     context_name: Optional[SNMPContextName] = None) -> List[SNMPRowInfo]:
+        return self._run([self._walk_job(oid) for oid in oids])
+
+    #   .--jobs----------------------------------------------------------------.
+
+    def _get_job(self, oid: OID) -> _Job:
+        error_status, _error_index, var_binds = yield self._pdu(self._proto.GetRequestPDU(), oid)
+        if error_status or not var_binds:
+            return None
+        _name, value = var_binds[0]
+        if value.tagSet in _END_OF_WALK_TAGS:
+            return None
+        return _raw_value(value)
+
+    def _get_next_job(self, oid: OID) -> _Job:
+        error_status, _error_index, var_binds = yield self._pdu(self._proto.GetNextRequestPDU(),
+                                                                oid)
+        if error_status or not var_binds:
+            return None
+        name, value = var_binds[0]
+        if value.tagSet in _END_OF_WALK_TAGS or not name.startswith(oid.lstrip(".") + "."):
+            return None
+        return _raw_value(value)
+
+    def _walk_job(self, oid: OID) -> _Job:
+        prefix = oid.lstrip(".") + "."
+        rowinfo: SNMPRowInfo = []
+        seen = set()
+        next_oid = oid
+        done = False
+        while not done:
+            if self.config.is_bulkwalk_host:
+                pdu = self._bulk_pdu(next_oid)
+            else:
+                pdu = self._pdu(self._proto.GetNextRequestPDU(), next_oid)
+
+            error_status, error_index, var_binds = yield pdu
+            if error_status == _NO_SUCH_NAME:
+                break
+            if error_status:
+                raise MKSNMPError("SNMP Error on %s: error status %d at index %d" %
+                                  (self.config.ipaddress, error_status, error_index))
+
+            done = True
+            for name, value in var_binds:
+                # Stop at the end of the subtree and if the agent is looping
+                if value.tagSet in _END_OF_WALK_TAGS or not name.startswith(prefix) or name in seen:
+                    break
+                seen.add(name)
+                rowinfo.append(("." + name, _raw_value(value)))
+                next_oid = name
+            else:
+                done = not var_binds
+
+        if not rowinfo:
+            # Like snmpwalk, try to get the OID itself if there is nothing below it
+            value = yield from self._get_job(oid)
+            if value is not None:
+                rowinfo.append((oid, value))
+
+        return rowinfo
+
+    #   .--PDUs----------------------------------------------------------------.
+
+    def _pdu(self, pdu: Any, oid: OID) -> Any:
+        self._proto.apiPDU.setDefaults(pdu)
+        self._proto.apiPDU.setVarBinds(pdu, [(oid.lstrip("."), self._proto.null)])
+        return pdu
+
+    def _bulk_pdu(self, oid: OID) -> Any:
+        pdu = self._proto.GetBulkRequestPDU()
+        self._proto.apiBulkPDU.setDefaults(pdu)
+        self._proto.apiBulkPDU.setNonRepeaters(pdu, 0)
+        self._proto.apiBulkPDU.setMaxRepetitions(pdu, self.config.bulk_walk_size_of)
+        self._proto.apiBulkPDU.setVarBinds(pdu, [(oid.lstrip("."), self._proto.null)])
+        return pdu
+
+    def _encode(self, pdu: Any, request_id: int) -> bytes:
+        if not isinstance(self.config.credentials, str):
+            raise MKSNMPError("SNMPv3 is not supported by the asynchronous SNMP backend")
+
+        self._proto.apiPDU.setRequestID(pdu, request_id)
+        message = self._proto.Message()
+        self._proto.apiMessage.setDefaults(message)
+        self._proto.apiMessage.setCommunity(message, self.config.credentials)
+        self._proto.apiMessage.setPDU(message, pdu)
+        return encoder.encode(message)
+
+    def _decode(self, data: bytes) -> Optional[Tuple[int, _Response]]:
+        try:
+            message, _rest = decoder.decode(data, asn1Spec=self._proto.Message())
+        except PyAsn1Error:
+            console.vverbose("Ignoring undecodable SNMP message from %s\n" % self.config.ipaddress)
+            return None
+
+        pdu = self._proto.apiMessage.getPDU(message)
+        return int(self._proto.apiPDU.getRequestID(pdu)), (
+            int(self._proto.apiPDU.getErrorStatus(pdu)),
+            int(self._proto.apiPDU.getErrorIndex(pdu, muteErrors=True)),
+            [(str(name), value) for name, value in self._proto.apiPDU.getVarBinds(pdu)],
+        )
+
+    #   .--transport-----------------------------------------------------------.
+
+    def _connect(self) -> socket.socket:
+        if self._socket is not None:
+            return self._socket
+
+        family = socket.AF_INET6 if self.config.is_ipv6_primary else socket.AF_INET
+        try:
+            address = socket.getaddrinfo(self.config.ipaddress, self.config.port, family,
+                                         socket.SOCK_DGRAM)[0][4]
+        except socket.gaierror:
+            raise MKSNMPError("SNMP Error on %s: Unknown host (%s)" %
+                              (self.config.ipaddress, self.config.ipaddress))
+
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        # A connected socket only receives the datagrams of the agent
+        sock.connect(address)
+        self._socket = sock
+        return sock
+
+    def _send(self, sock: socket.socket, request: bytes) -> None:
+        try:
+            sock.send(request)
+        except ConnectionRefusedError:
+            # ICMP port unreachable of a previous request. Lost requests are retried.
+            pass
+
+    def _receive(self, sock: socket.socket, timeout: float) -> Optional[bytes]:
+        sock.settimeout(max(timeout, 0.0))
+        try:
+            return sock.recv(65535)
+        except (socket.timeout, BlockingIOError):
+            return None
+        except ConnectionRefusedError:
+            # ICMP port unreachable: handled like a missing response
+            return None
+
+    def _run(self, jobs: Sequence[_Job]) -> List[Any]:
+        """Run the jobs concurrently and return their results"""
+        sock = self._connect()
+        timeout = float(self.config.timing.get("timeout", 1))
+        retries = int(self.config.timing.get("retries", 5))
+
+        results: List[Any] = [None] * len(jobs)
+        # Jobs with their next PDU, waiting for a free slot
+        waiting: Deque[Tuple[int, Any]] = deque()
+        # request id -> job index, encoded request, deadline, retries left
+        pending: Dict[int, Tuple[int, bytes, float, int]] = {}
+
+        for index, job in enumerate(jobs):
+            waiting.append((index, next(job)))
+
+        while waiting or pending:
+            while waiting and len(pending) < self.max_pending_requests:
+                index, pdu = waiting.popleft()
+                self._request_id = self._request_id % (2**31 - 1) + 1
+                request = self._encode(pdu, self._request_id)
+                self._send(sock, request)
+                pending[self._request_id] = (index, request, time.monotonic() + timeout, retries)
+
+            data = self._receive(sock,
+                                 min(entry[2] for entry in pending.values()) - time.monotonic())
+            if data is None:
+                self._retry_expired(sock, pending, timeout)
+                continue
+
+            decoded = self._decode(data)
+            if decoded is None or decoded[0] not in pending:
+                continue  # e.g. a late response to a retried request
+
+            request_id, response = decoded
+            index = pending.pop(request_id)[0]
+            try:
+                waiting.append((index, jobs[index].send(response)))
+            except StopIteration as e:
+                results[index] = e.value
+
+        return results
+
+    def _retry_expired(self, sock: socket.socket, pending: Dict[int, Tuple[int, bytes, float, int]],
+                       timeout: float) -> None:
+        now = time.monotonic()
+        for request_id, (index, request, deadline, retries_left) in list(pending.items()):
+            if deadline > now:
+                continue
+            if not retries_left:
+                raise MKSNMPError("SNMP Error on %s: Timeout: No Response from %s" %
+                                  (self.config.ipaddress, self.config.ipaddress))
+            self._send(sock, request)
+            pending[request_id] = (index, request, now + timeout, retries_left - 1)
+
+
+def _raw_value(value: Any) -> SNMPRawValue:
+    """Format the value like the classic backend receives it from the Net-SNMP tools"""
+    if isinstance(value, rfc1902.IpAddress):
+        return ".".join(str(octet) for octet in value.asNumbers()).encode("ascii")
+    if isinstance(value, univ.OctetString):
+        return value.asOctets()
+    if isinstance(value, univ.ObjectIdentifier):
+        return (".%s" % value).encode("ascii")
+    if isinstance(value, univ.Integer):
+        return str(int(value)).encode("ascii")
+    return b""
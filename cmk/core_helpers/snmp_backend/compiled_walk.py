@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Compiled format of the stored snmpwalks
+
+The text format written by "cmk --snmpwalk" has to be parsed line by line and
+its OIDs are converted to integers on every comparison. The compiled format
+holds the same data in a form which can be searched in place:
+
+    header | keys | OIDs | values | table
+
+Each OID is stored as key of big-endian 32 bit sub-identifiers. The bytewise
+order of these keys is the numeric order of the OIDs and an OID is a prefix of
+another one exactly if its key is a prefix of the other key. The keys are
+sorted. The OIDs are also stored as text, so a walk does not need to convert
+the keys back. The table holds the start positions of the key, the OID and the
+value of every entry, followed by the end positions of the last ones.
+
+A value is stored the way the backend returns it, prefixed by a flag byte. The
+values containing agent simulator tags are stored as text instead and are
+processed when they are read.
+"""
+
+import array
+import mmap
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from six import ensure_binary, ensure_str
+
+import cmk.utils.agent_simulator as agent_simulator
+import cmk.utils.cleanup
+import cmk.utils.paths
+from cmk.utils.exceptions import MKGeneralException
+from cmk.utils.log import console
+from cmk.utils.type_defs import AgentRawData, HostName
+
+from cmk.snmplib.type_defs import OID, SNMPRawValue, SNMPRowInfo
+
+from ._utils import strip_snmp_value
+
+__all__ = [
+    "CompiledWalk",
+    "compile_walk",
+    "compiled_walk_path",
+    "load_compiled_walk",
+]
+
+MAGIC = b"CMKWALK1"
+
+# magic, number of entries, table offset
+_HEADER = struct.Struct("<8sQQ")
+# key offset, OID offset and value offset, as little-endian unsigned 64 bit integers
+_TABLE_ENTRY_SIZE = 3 * 8
+
+_VALUE = b"\x00"
+_SIMULATED_VALUE = b"\x01"
+
+_g_compiled_walks: Dict[HostName, Optional["CompiledWalk"]] = {}
+
+
+def compiled_walk_path(hostname: HostName) -> Path:
+    return Path(cmk.utils.paths.snmpwalks_dir, ".compiled", hostname)
+
+
+def oid_to_key(oid: OID) -> bytes:
+    """
+    >>> oid_to_key(".1.3.6")
+    b'\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x03\\x00\\x00\\x00\\x06'
+    """
+    try:
+        sub_ids = [int(s) for s in oid.strip(".").split(".")]
+        return struct.pack(">%dI" % len(sub_ids), *sub_ids)
+    except (ValueError, struct.error):
+        raise MKGeneralException("Invalid OID %s" % oid)
+
+
+def _parse_lines(lines: List[str]) -> Iterator[Tuple[bytes, bytes, bytes]]:
+    """Key, OID and value of every line"""
+    for line in lines:
+        parts = line.split(None, 1)
+        key = oid_to_key(parts[0])
+        # The OID is stored the way the text backend returns it
+        oid = ensure_binary(parts[0])
+        if len(parts) < 2:
+            yield key, oid, _VALUE
+            continue
+
+        raw_value = ensure_binary(parts[1])
+        if b"%{" in raw_value:
+            yield key, oid, _SIMULATED_VALUE + raw_value
+        else:
+            # Same processing as StoredWalkSNMPBackend does for the text format
+            yield key, oid, _VALUE + strip_snmp_value(ensure_str(raw_value))
+
+
+def compile_walk(lines: List[str], target: Path) -> int:
+    """Compile the lines of a text walk and return the number of entries"""
+    entries = sorted(_parse_lines(lines), key=lambda entry: entry[0])
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_suffix(target.suffix + ".new")
+    with tmp_path.open("wb") as f:
+        f.write(b"\0" * _HEADER.size)
+
+        offsets: List[List[int]] = []
+        for region in range(3):
+            region_offsets = []
+            for entry in entries:
+                region_offsets.append(f.tell())
+                f.write(entry[region])
+            region_offsets.append(f.tell())
+            offsets.append(region_offsets)
+
+        table_offset = f.tell()
+        table = array.array("Q", (offset for entry in zip(*offsets) for offset in entry))
+        if sys.byteorder != "little":
+            table.byteswap()
+        table.tofile(f)
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, len(entries), table_offset))
+
+    tmp_path.rename(target)
+    return len(entries)
+
+
+class CompiledWalk:
+    """Memory mapped compiled walk of a host"""
+    def __init__(self, path: Path) -> None:
+        super(CompiledWalk, self).__init__()
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, table_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise MKGeneralException("%s is not a compiled snmpwalk" % path)
+
+        table_end = table_offset + (self._count + 1) * _TABLE_ENTRY_SIZE
+        if sys.byteorder == "little":
+            self._table: Sequence[int] = memoryview(self._mm)[table_offset:table_end].cast("Q")
+        else:
+            table = array.array("Q", self._mm[table_offset:table_end])
+            table.byteswap()
+            self._table = table
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, index: int) -> bytes:
+        position = index * 3
+        return self._mm[self._table[position]:self._table[position + 3]]
+
+    def _bisect(self, prefix: bytes, *, right: bool) -> int:
+        """Position of the first key starting with / greater than all keys starting with prefix"""
+        low, high = 0, self._count
+        length = len(prefix)
+        while low < high:
+            middle = (low + high) // 2
+            key = self._key(middle)[:length]
+            if key < prefix or (right and key == prefix):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def walk(self,
+             oid: OID,
+             *,
+             below_only: bool = False,
+             limit: Optional[int] = None) -> SNMPRowInfo:
+        """The OID and all OIDs below it, like the text backend returns them"""
+        prefix = oid_to_key(oid)
+        first = self._bisect(prefix, right=False)
+        end = self._bisect(prefix, right=True)
+        if below_only and first < end and self._key(first) == prefix:
+            first += 1
+        if limit is not None:
+            end = min(end, first + limit)
+        if first >= end:
+            return []
+
+        # Read the OIDs and values of the whole range at once and split them afterwards
+        table = self._table[first * 3:end * 3 + 3]
+        oid_base, value_base = table[1], table[2]
+        oids = self._mm[oid_base:table[-2]].decode("ascii")
+        values = self._mm[value_base:table[-1]]
+
+        rowinfo: SNMPRowInfo = []
+        for position in range(0, len(table) - 3, 3):
+            value = values[table[position + 2] - value_base:table[position + 5] - value_base]
+            rowinfo.append((
+                oids[table[position + 1] - oid_base:table[position + 4] - oid_base],
+                self._value(value),
+            ))
+        return rowinfo
+
+    @staticmethod
+    def _value(value: bytes) -> SNMPRawValue:
+        if value[:1] == _SIMULATED_VALUE:
+            return strip_snmp_value(ensure_str(agent_simulator.process(AgentRawData(value[1:]))))
+        return value[1:]
+
+
+def load_compiled_walk(hostname: HostName) -> Optional[CompiledWalk]:
+    """The compiled walk of the host, unless the text walk is newer than it"""
+    try:
+        return _g_compiled_walks[hostname]
+    except KeyError:
+        pass
+
+    walk = None
+    path = compiled_walk_path(hostname)
+    try:
+        compiled_mtime = path.stat().st_mtime
+        text_path = Path(cmk.utils.paths.snmpwalks_dir, hostname)
+        if not text_path.exists() or text_path.stat().st_mtime <= compiled_mtime:
+            console.vverbose("  Using compiled snmpwalk %s\n" % path)
+            walk = CompiledWalk(path)
+    except FileNotFoundError:
+        pass
+
+    _g_compiled_walks[hostname] = walk
+    return walk
+
+
+def cleanup_compiled_walks() -> None:
+    _g_compiled_walks.clear()
+
+
+cmk.utils.cleanup.register_cleanup(cleanup_compiled_walks)
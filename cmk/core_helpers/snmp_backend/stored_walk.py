@@ -19,6 +19,7 @@ import cmk.snmplib.snmp_cache as snmp_cache
 from cmk.snmplib.type_defs import SNMPBackend, OID, SNMPContextName, SNMPRawValue, SNMPRowInfo
 
 from ._utils import strip_snmp_value
+from .compiled_walk import load_compiled_walk
 
 __all__ = ["StoredWalkSNMPBackend"]
 
@@ -51,6 +52,12 @@ class StoredWalkSNMPBackend(SNMPBackend):
             oid_prefix = oid
             dot_star = False
 
+        compiled_walk = load_compiled_walk(self.config.hostname)
+        if compiled_walk is not None:
+            return compiled_walk.walk(oid_prefix,
+                                      below_only=dot_star,
+                                      limit=1 if dot_star else None)
+
         host_cache = snmp_cache.host_cache()
         try:
             lines = host_cache[self.config.hostname]
@@ -86,7 +93,7 @@ class StoredWalkSNMPBackend(SNMPBackend):
         rowinfo += StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current + 1, 1)
 
         if dot_star:
-            return [rowinfo[0]]
+            return rowinfo[:1]
 
         return rowinfo
 
@@ -192,7 +192,7 @@ class SNMPCredential(SNMPCredentialBase, total=False):
 # This is what we get from the outside.
 class ConfigFromWATO(TypedDict):
     actions: Sequence[Action]
-    archive_mode: Union[Literal['file'], Literal['mongodb']]
+    archive_mode: Union[Literal['file'], Literal['mongodb'], Literal['sqlite']]
     archive_orphans: bool
     debug_rules: bool
     event_limit: EventLimits
@@ -204,6 +204,7 @@ class ConfigFromWATO(TypedDict):
     log_level: LogConfig  # TODO: Mutable???
     log_messages: bool
     log_rulehits: bool
+    message_queue_len: int
     mkp_rule_packs: Mapping[Any, Any]  # TODO: Move to Config (not from WATO!). TypedDict
     remote_status: Optional[Tuple[int, bool, Optional[Sequence[str]]]]
     replication: Optional[Replication]
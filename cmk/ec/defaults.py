@@ -55,6 +55,7 @@ def default_config() -> ConfigFromWATO:
         "remote_status": None,
         "socket_queue_len": 10,
         "eventsocket_queue_len": 10,
+        "message_queue_len": 100000,
         "hostname_translation": {},
         "archive_orphans": False,
         "archive_mode": "file",
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""The open events of the Event Console
+
+The events are kept in the order of their creation, which is the order of
+the status table. Additional indexes by rule, host and (rule, match groups)
+make looking up the events of an incoming message independent of the total
+number of open events. Every index holds its events in the same order as the
+store, so the first event of an index is the oldest one.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from .event import Event
+
+# event id -> event, in the order of the store
+_Bucket = Dict[int, Event]
+
+
+class _Index:
+    def __init__(self) -> None:
+        super().__init__()
+        self._buckets: Dict[Hashable, _Bucket] = {}
+
+    def add(self, key: Hashable, event: Event, position: Dict[int, int]) -> None:
+        bucket = self._buckets.setdefault(key, {})
+        event_id = event["id"]
+        needs_sort = bool(bucket) and position[next(reversed(bucket))] > position[event_id]
+        bucket[event_id] = event
+        if needs_sort:
+            # Only happens when an indexed field of an existing event changes
+            self._buckets[key] = dict(sorted(bucket.items(), key=lambda e: position[e[0]]))
+
+    def remove(self, key: Hashable, event_id: int) -> None:
+        bucket = self._buckets[key]
+        del bucket[event_id]
+        if not bucket:
+            del self._buckets[key]
+
+    def get(self, key: Hashable) -> _Bucket:
+        return self._buckets.get(key, {})
+
+
+def _match_groups_key(match_groups: Any) -> Tuple[Any, ...]:
+    return tuple(match_groups or ())
+
+
+class EventStore:
+    """Open events by id, in the order of their creation, plus secondary indexes
+
+    The indexed fields of an event ("rule_id", "host" and "match_groups") may
+    be changed while it is in the store, but update() has to be called
+    afterwards.
+    """
+    def __init__(self, events: Iterable[Event] = ()) -> None:
+        super().__init__()
+        self._events: _Bucket = {}
+        # event id -> insertion number, defines the order within the indexes
+        self._position: Dict[int, int] = {}
+        self._next_position = 0
+        # event id -> the keys the event is indexed with
+        self._keys: Dict[int, Tuple[Hashable, Hashable, Hashable]] = {}
+        self._by_rule = _Index()
+        self._by_host = _Index()
+        self._by_rule_and_match_groups = _Index()
+        for event in events:
+            self.add(event)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[Event]:
+        return iter(self._events.values())
+
+    def __contains__(self, event_id: object) -> bool:
+        return event_id in self._events
+
+    def to_list(self) -> List[Event]:
+        return list(self._events.values())
+
+    def get(self, event_id: int) -> Optional[Event]:
+        return self._events.get(event_id)
+
+    def add(self, event: Event) -> None:
+        event_id = event["id"]
+        if event_id in self._events:
+            raise KeyError("Event %d is already present" % event_id)
+        self._events[event_id] = event
+        self._position[event_id] = self._next_position
+        self._next_position += 1
+        self._index(event)
+
+    def remove(self, event: Event) -> None:
+        """Remove the event, raises a KeyError if it is not present"""
+        event_id = event["id"]
+        if self._events.get(event_id) is not event:
+            raise KeyError(event_id)
+        self._unindex(event_id)
+        del self._events[event_id]
+        del self._position[event_id]
+
+    def update(self, event: Event) -> None:
+        """Move the event to the right index entries after its fields changed"""
+        if self._keys.get(event["id"]) != self._index_keys(event):
+            self._unindex(event["id"])
+            self._index(event)
+
+    def oldest(self) -> Optional[Event]:
+        return next(iter(self._events.values()), None)
+
+    def by_rule(self, rule_id: Optional[str]) -> Iterator[Event]:
+        return iter(self._by_rule.get(rule_id).values())
+
+    def by_host(self, host: str) -> Iterator[Event]:
+        return iter(self._by_host.get(host).values())
+
+    def by_rule_and_match_groups(self, rule_id: Optional[str],
+                                 match_groups: Iterable[str]) -> Iterator[Event]:
+        return iter(
+            self._by_rule_and_match_groups.get((rule_id, _match_groups_key(match_groups))).values())
+
+    def num_by_rule(self, rule_id: Optional[str]) -> int:
+        return len(self._by_rule.get(rule_id))
+
+    def num_by_host(self, host: str) -> int:
+        return len(self._by_host.get(host))
+
+    def _index_keys(self, event: Event) -> Tuple[Hashable, Hashable, Hashable]:
+        rule_id = event.get("rule_id")
+        return (
+            rule_id,
+            event.get("host", ""),
+            (rule_id, _match_groups_key(event.get("match_groups"))),
+        )
+
+    def _index(self, event: Event) -> None:
+        keys = self._index_keys(event)
+        self._keys[event["id"]] = keys
+        self._by_rule.add(keys[0], event, self._position)
+        self._by_host.add(keys[1], event, self._position)
+        self._by_rule_and_match_groups.add(keys[2], event, self._position)
+
+    def _unindex(self, event_id: int) -> None:
+        rule_key, host_key, match_groups_key = self._keys.pop(event_id)
+        self._by_rule.remove(rule_key, event_id)
+        self._by_host.remove(host_key, event_id)
+        self._by_rule_and_match_groups.remove(match_groups_key, event_id)
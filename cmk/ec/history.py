@@ -5,11 +5,14 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import os
+import re
+import sqlite3
 import struct
 import subprocess
 import threading
 import time
 from logging import Logger
+from contextlib import closing
 from pathlib import Path
 from typing import Any, AnyStr, Dict, Iterable, List, Optional, Tuple, Union
 
@@ -19,6 +22,7 @@ from cmk.utils.render import date_and_time
 from .config import Config
 from .event import Event
 from .query import QueryGET
+from .rule_prefilter import required_literals
 from .settings import Settings
 
 # TODO: As one can see clearly below, we should really have a class hierarchy here...
@@ -36,6 +40,7 @@ class History:
         self._history_columns = history_columns
         self._lock = threading.Lock()
         self._mongodb = MongoDB()
+        self._sqlite = SQLiteDB()
         self._active_history_period = ActiveHistoryPeriod()
         self.reload_configuration(config)
 
@@ -43,29 +48,39 @@ class History:
         self._config = config
         if self._config['archive_mode'] == 'mongodb':
             _reload_configuration_mongodb(self)
+        elif self._config['archive_mode'] == 'sqlite':
+            _reload_configuration_sqlite(self)
         else:
             _reload_configuration_files(self)
 
     def flush(self) -> None:
         if self._config['archive_mode'] == 'mongodb':
             _flush_mongodb(self)
+        elif self._config['archive_mode'] == 'sqlite':
+            _flush_sqlite(self)
         else:
             _flush_files(self)
 
     def add(self, event: Event, what: str, who: str = "", addinfo: str = "") -> None:
         if self._config['archive_mode'] == 'mongodb':
             _add_mongodb(self, event, what, who, addinfo)
+        elif self._config['archive_mode'] == 'sqlite':
+            _add_sqlite(self, event, what, who, addinfo)
         else:
             _add_files(self, event, what, who, addinfo)
 
     def get(self, query: QueryGET) -> Iterable[Any]:
         if self._config['archive_mode'] == 'mongodb':
             return _get_mongodb(self, query)
+        if self._config['archive_mode'] == 'sqlite':
+            return _get_sqlite(self, query)
         return _get_files(self, self._logger, query)
 
     def housekeeping(self) -> None:
         if self._config['archive_mode'] == 'mongodb':
             _housekeeping_mongodb(self)
+        elif self._config['archive_mode'] == 'sqlite':
+            _housekeeping_sqlite(self)
         else:
             _housekeeping_files(self)
 
@@ -276,6 +291,254 @@ def _get_mongodb(history: History, query: QueryGET) -> Iterable[Any]:
     return history_entries
 
 
+#.
+#   .--SQLite--------------------------------------------------------------.
+#   |                   ____   ___  _     _ _                              |
+#   |                  / ___| / _ \| |   (_) |_ ___                        |
+#   |                  \___ \| | | | |   | | __/ _ \                       |
+#   |                   ___) | |_| | |___| | ||  __/                       |
+#   |                  |____/ \__\_\_____|_|\__\___|                       |
+#   |                                                                      |
+#   +----------------------------------------------------------------------+
+#   | The Event Log Archive can be stored in a local SQLite database. The  |
+#   | filters on the time, host and event id are answered by its indexes. |
+#   '----------------------------------------------------------------------'
+
+# These columns contain tuples, which are stored like in the history files
+_SPLIT_COLUMNS = {
+    "event_match_groups",
+    "event_contact_groups",
+    "event_match_groups_syslog_application",
+}
+
+_INDEXED_COLUMNS = ["history_time", "event_id", "event_host", "event_host_lower"]
+
+_COMPARISON_OPERATORS = {"=", ">", "<", ">=", "<="}
+
+
+class SQLiteDB:
+    def __init__(self) -> None:
+        super().__init__()
+        self.connection: Optional[sqlite3.Connection] = None
+
+
+def _sqlite_connect(path: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def _sqlite_columns(history: History) -> List[Tuple[str, Any]]:
+    """The history columns stored in the database, history_line is the row id"""
+    return history._history_columns[1:]
+
+
+def _sqlite_type(default: Any) -> str:
+    if isinstance(default, (bool, int)):
+        return "INTEGER"
+    if isinstance(default, float):
+        return "REAL"
+    return "TEXT"
+
+
+def _reload_configuration_sqlite(history: History) -> None:
+    with history._lock:
+        if history._sqlite.connection is None:
+            path = history._settings.paths.history_db.value
+            path.parent.mkdir(parents=True, exist_ok=True)
+            history._sqlite.connection = _sqlite_connect(path)
+        connection = history._sqlite.connection
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS history"
+                               " (history_line INTEGER PRIMARY KEY, event_host_lower TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS imported_files (name TEXT PRIMARY KEY)")
+            # Columns added in newer versions are appended to existing databases
+            existing = {row[1] for row in connection.execute("PRAGMA table_info(history)")}
+            for column_name, default in _sqlite_columns(history):
+                if column_name not in existing:
+                    connection.execute("ALTER TABLE history ADD COLUMN %s %s" %
+                                       (column_name, _sqlite_type(default)))
+            for column_name in _INDEXED_COLUMNS:
+                connection.execute("CREATE INDEX IF NOT EXISTS history_%s ON history (%s)" %
+                                   (column_name, column_name))
+        _migrate_history_files(history, connection)
+
+
+def _migrate_history_files(history: History, connection: sqlite3.Connection) -> None:
+    """Import the history files written in the file archive mode
+
+    Every file is imported once, the files are kept and expired as before."""
+    history_dir = history._settings.paths.history_dir.value
+    if not history_dir.exists():
+        return
+    imported = {name for name, in connection.execute("SELECT name FROM imported_files")}
+    num_columns = len(_sqlite_columns(history))
+    for _ts, path in sorted((int(str(path.name)[:-4]), path) for path in history_dir.glob('*.log')):
+        if path.name in imported:
+            continue
+        rows = []
+        with path.open(mode="rb") as f:
+            for line in f:
+                try:
+                    parts: List[Any] = line.decode('utf-8').rstrip('\n').split('\t')
+                    _convert_history_line(history, parts)
+                    rows.append(_sqlite_row(history, parts[:num_columns]))
+                except Exception as e:
+                    history._logger.exception("Invalid line '%r' in history file %s: %s" %
+                                              (line, path, e))
+        with connection:
+            connection.executemany(_sqlite_insert_statement(history), rows)
+            connection.execute("INSERT INTO imported_files VALUES (?)", (path.name,))
+        history._logger.info("Imported %d entries of history file %s into %s" %
+                             (len(rows), path, history._settings.paths.history_db.value))
+
+
+def _sqlite_insert_statement(history: History) -> str:
+    column_names = [name for name, _default in _sqlite_columns(history)] + ["event_host_lower"]
+    return "INSERT INTO history (%s) VALUES (%s)" % (", ".join(column_names), ", ".join(
+        "?" * len(column_names)))
+
+
+def _sqlite_row(history: History, values: List[Any]) -> List[Any]:
+    """Returns the values of the history columns as stored in the database"""
+    row = []
+    host = ""
+    for (column_name, _default), value in zip(_sqlite_columns(history), values):
+        if column_name in _SPLIT_COLUMNS and (value is None or isinstance(value, (list, tuple))):
+            value = quote_tab(value).decode("utf-8")
+        elif column_name == "event_host":
+            host = value
+        row.append(value)
+    row.append(host.lower() if isinstance(host, str) else host)
+    return row
+
+
+def _add_sqlite(history: History, event: Event, what: str, who: str, addinfo: str) -> None:
+    _log_event(history._config, history._logger, event, what, who, addinfo)
+    values = [time.time(), what, who, addinfo]
+    values += [
+        event.get(colname[6:], defval)  # drop "event_"
+        for colname, defval in history._event_columns
+    ]
+    with history._lock:
+        if history._sqlite.connection is None:
+            raise Exception("The history database has not been opened")
+        with history._sqlite.connection as connection:
+            connection.execute(_sqlite_insert_statement(history), _sqlite_row(history, values))
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _sqlite_text_condition(column_name: str, operator_name: str,
+                           argument: str) -> Optional[Tuple[str, List[Any]]]:
+    """Selects the rows which contain the texts needed by a regex or case insensitive filter"""
+    if operator_name == "=~":
+        patterns = [_like_escape(argument.lower())]
+    elif operator_name in ["~", "~~"]:
+        try:
+            regex = re.compile(argument.lower() if operator_name == "~~" else argument)
+        except re.error:
+            return None
+        literals = required_literals(regex)
+        if literals is None:
+            return None
+        patterns = ["%%%s%%" % _like_escape(literal) for literal in sorted(literals)]
+    else:
+        return None
+    conditions = ["%s LIKE ? ESCAPE '\\'" % column_name] * len(patterns)
+    # LIKE only ignores the case of ASCII letters, texts with other characters are always
+    # selected. Their length in bytes differs from their number of characters.
+    conditions.append("length(%s) != length(CAST(%s AS BLOB))" % (column_name, column_name))
+    return "(%s)" % " OR ".join(conditions), patterns
+
+
+def _sqlite_condition(column_name: str, operator_name: str, argument: Any,
+                      default: Any) -> Optional[Tuple[str, List[Any]]]:
+    """Translates a filter to an SQL condition selecting at least the same rows or None"""
+    if column_name == "event_host" and operator_name == "in":
+        # filter_operator_in compares in lower case
+        return ("event_host_lower IN (%s)" % ", ".join("?" * len(argument)),
+                [a.lower() for a in argument])
+    if column_name in _SPLIT_COLUMNS:
+        return None
+    if isinstance(default, str) and operator_name not in _COMPARISON_OPERATORS:
+        return _sqlite_text_condition(column_name, operator_name, argument)
+    if operator_name not in _COMPARISON_OPERATORS:
+        return None
+    if type(default) in (int, float) or (isinstance(default, str) and operator_name == "="):
+        return "%s %s ?" % (column_name, operator_name), [argument]
+    return None
+
+
+def _get_sqlite(history: History, query: QueryGET) -> Iterable[Any]:
+    filters, limit = query.filters, query.limit
+    defaults = dict(history._history_columns)
+
+    # The filters are applied to the rows afterwards anyway, the conditions
+    # only spare reading the rows which cannot match.
+    conditions: List[str] = []
+    arguments: List[Any] = []
+    only_time_conditions = True
+    for column_name, operator_name, _predicate, argument in filters:
+        condition = _sqlite_condition(column_name, operator_name, argument,
+                                      defaults.get(column_name))
+        if condition is not None:
+            conditions.append(condition[0])
+            arguments += condition[1]
+            only_time_conditions &= column_name == "history_time"
+
+    column_names = ["history_line"] + [name for name, _default in _sqlite_columns(history)]
+    statement = "SELECT %s FROM history" % ", ".join(column_names)
+    if conditions:
+        statement += " WHERE " + " AND ".join(conditions)
+    # Walk the time index backwards, unless other conditions select the rows by themselves
+    statement += " ORDER BY %shistory_time DESC" % ("" if only_time_conditions else "+")
+    history._logger.debug("History query: %s %r", statement, arguments)
+
+    bool_indexes = [
+        index for index, name in enumerate(column_names) if isinstance(defaults[name], bool)
+    ]
+    split_indexes = [index for index, name in enumerate(column_names) if name in _SPLIT_COLUMNS]
+
+    history_entries: List[Any] = []
+    with closing(_sqlite_connect(history._settings.paths.history_db.value)) as connection:
+        for row in connection.execute(statement, arguments):
+            if limit is not None and len(history_entries) > limit:
+                break
+            values = list(row)
+            for index in bool_indexes:
+                values[index] = bool(values[index])
+            for index in split_indexes:
+                values[index] = _unsplit(values[index])
+            try:
+                if query.filter_row(values):
+                    history_entries.append(values)
+            except Exception as e:
+                history._logger.exception("Invalid history entry %r: %s" % (values, e))
+    return history_entries
+
+
+def _flush_sqlite(history: History) -> None:
+    with history._lock:
+        if history._sqlite.connection is not None:
+            with history._sqlite.connection as connection:
+                connection.execute("DELETE FROM history")
+    _flush_files(history)
+
+
+def _housekeeping_sqlite(history: History) -> None:
+    min_time = time.time() - history._config["history_lifetime"] * 86400
+    with history._lock:
+        if history._sqlite.connection is not None:
+            with history._sqlite.connection as connection:
+                connection.execute("DELETE FROM history WHERE history_time < ?", (min_time,))
+    # Expire the imported history files
+    _housekeeping_files(history)
+
+
 #.
 #   .--History-------------------------------------------------------------.
 #   |                   _   _ _     _                                      |
@@ -13,6 +13,7 @@
 
 import abc
 import ast
+from collections import deque
 import errno
 import json
 from logging import Logger, getLogger
@@ -27,11 +28,13 @@ import sys
 import threading
 import time
 import traceback
+import uuid
 from types import FrameType
 from typing import (
     Any,
     AnyStr,
     Callable,
+    Deque,
     Dict,
     Iterable,
     Iterator,
@@ -72,12 +75,15 @@ from .config import ConfigFromWATO, Config, Rule
 from .core_queries import query_hosts_scheduled_downtime_depth, query_timeperiods_in
 from .crash_reporting import ECCrashReport, CrashReportStore
 from .event import Event, create_event_from_line
+from .event_store import EventStore
 from .history import ActiveHistoryPeriod, History, scrub_string, quote_tab, get_logfile
 from .host_config import HostConfig, HostInfo
 from .query import MKClientError, Query, QueryGET, filter_operator_in
 from .rule_packs import load_config as load_config_using
+from .rule_prefilter import RulePrefilter
 from .settings import FileDescriptor, PortNumber, Settings, settings as create_settings
 from .snmp import SNMPTrapEngine
+from .status_journal import apply_records, EventChanges, Position, Record, StatusJournal
 
 
 class MatchPriority(NamedTuple):
@@ -443,6 +449,8 @@ class Perfcounters:
         "overflows",
         "events",
         "connects",
+        "rule_skips",
+        "queue_drops",
     ]
 
     # Average processing times
@@ -450,6 +458,7 @@ class Perfcounters:
         "processing": 0.99,  # event processing
         "sync": 0.95,  # Replication sync
         "request": 0.95,  # Client requests
+        "latency": 0.99,  # From receiving a message until processing it
     }
 
     # TODO: Why aren't self._times / self._rates / ... not initialized with their defaults?
@@ -465,11 +474,16 @@ class Perfcounters:
         self._times: Dict[str, float] = {}
         self._last_statistics: Optional[float] = None
 
+        # Per rule id: tried, skipped by the prefilter and the time spent matching
+        self._rule_tries: Dict[str, int] = {}
+        self._rule_skips: Dict[str, int] = {}
+        self._rule_times: Dict[str, float] = {}
+
         self._logger = logger.getChild("Perfcounters")
 
-    def count(self, counter: str) -> None:
+    def count(self, counter: str, amount: int = 1) -> None:
         with self._lock:
-            self._counters[counter] += 1
+            self._counters[counter] += amount
 
     def count_time(self, counter: str, ptime: float) -> None:
         with self._lock:
@@ -478,6 +492,36 @@ class Perfcounters:
             else:
                 self._times[counter] = ptime
 
+    def count_rule_try(self, rule_id: str, duration: float) -> None:
+        with self._lock:
+            self._counters["rule_tries"] += 1
+            self._rule_tries[rule_id] = self._rule_tries.get(rule_id, 0) + 1
+            self._rule_times[rule_id] = self._rule_times.get(rule_id, 0.0) + duration
+
+    def count_rule_skips(self, rule_ids: Iterable[str]) -> None:
+        with self._lock:
+            for rule_id in rule_ids:
+                self._counters["rule_skips"] += 1
+                self._rule_skips[rule_id] = self._rule_skips.get(rule_id, 0) + 1
+
+    def reset_rule_counters(self, rule_id: Optional[str]) -> None:
+        with self._lock:
+            for counters in [self._rule_tries, self._rule_skips, self._rule_times]:
+                if rule_id is None:
+                    counters.clear()
+                else:
+                    counters.pop(rule_id, None)
+
+    def get_rule_status(self) -> Dict[str, Tuple[int, int, float]]:
+        with self._lock:
+            return {
+                rule_id: (
+                    self._rule_tries.get(rule_id, 0),
+                    self._rule_skips.get(rule_id, 0),
+                    self._rule_times.get(rule_id, 0.0),
+                ) for rule_id in set(self._rule_tries) | set(self._rule_skips)
+            }
+
     def do_statistics(self) -> None:
         with self._lock:
             now = time.time()
@@ -541,6 +585,42 @@ class Perfcounters:
 #   '----------------------------------------------------------------------'
 
 
+class MessageQueue:
+    """The received lines waiting for being processed
+
+    Lines from datagrams are dropped when the queue is full. The stream
+    sources are not read while the queue is full, so their lines are always
+    added, possibly a chunk beyond the maximum length.
+    """
+    def __init__(self, max_length: int) -> None:
+        super().__init__()
+        self.max_length = max_length
+        self._lines: Deque[Tuple[bytes, Optional[Tuple[str, int]], float]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def is_full(self) -> bool:
+        return len(self._lines) >= self.max_length
+
+    def put(self, data: bytes, address: Optional[Tuple[str, int]], drop_when_full: bool) -> int:
+        """Adds the lines of the data, returns the number of dropped lines"""
+        received = time.time()
+        lines = data.splitlines()
+        if drop_when_full:
+            free = max(0, self.max_length - len(self._lines))
+            dropped = len(lines) - free
+            if dropped > 0:
+                lines = lines[:free]
+        else:
+            dropped = 0
+        self._lines.extend((line, address, received) for line in lines)
+        return max(0, dropped)
+
+    def get_batch(self, size: int) -> List[Tuple[bytes, Optional[Tuple[str, int]], float]]:
+        return [self._lines.popleft() for _nr in range(min(size, len(self._lines)))]
+
+
 class MatchFailure:
     pass
 
@@ -554,6 +634,11 @@ MatchResult = Union[MatchFailure, MatchSuccess]
 
 
 class EventServer(ECServerThread):
+    # Number of queued lines processed before reading from the sockets again
+    message_batch_size = 200
+    # Maximum number of datagrams read from the syslog UDP socket at once
+    max_datagrams_per_read = 1000
+
     def __init__(self,
                  logger: Logger,
                  settings: Settings,
@@ -589,6 +674,7 @@ class EventServer(ECServerThread):
         self._event_status = event_status
         self._event_columns = event_columns
         self._message_period = ActiveHistoryPeriod()
+        self._message_queue = MessageQueue(config["message_queue_len"])
         self._rule_matcher = RuleMatcher(self._logger, config)
 
         # HACK for testing: The real fix would involve breaking up these huge
@@ -610,6 +696,7 @@ class EventServer(ECServerThread):
         columns += Perfcounters.status_columns()
         columns += cls._replication_columns()
         columns += cls._event_limit_columns()
+        columns += cls._message_queue_columns()
         return columns
 
     @classmethod
@@ -639,12 +726,20 @@ class EventServer(ECServerThread):
             ("status_event_limit_active_overall", False),
         ]
 
+    @classmethod
+    def _message_queue_columns(cls) -> List[Tuple[str, Any]]:
+        return [
+            ("status_message_queue_length", 0),
+            ("status_message_queue_max_length", 0),
+        ]
+
     def get_status(self) -> List[List[Any]]:
         row: List[Any] = []
         row += self._add_general_status()
         row += self._perfcounters.get_status()
         row += self._add_replication_status()
         row += self._add_event_limit_status()
+        row += self._add_message_queue_status()
         return [row]
 
     def _add_general_status(self) -> List[Any]:
@@ -677,6 +772,12 @@ class EventServer(ECServerThread):
             self.is_overall_event_limit_active(),
         ]
 
+    def _add_message_queue_status(self) -> List[Any]:
+        return [
+            len(self._message_queue),
+            self._message_queue.max_length,
+        ]
+
     def create_pipe(self) -> None:
         path = self.settings.paths.event_pipe.value
         try:
@@ -789,9 +890,15 @@ class EventServer(ECServerThread):
         client_sockets: Dict[FileDescr, Tuple[socket.socket, Optional[Tuple[str, int]], bytes]] = {}
         select_timeout = 1
         while not self._terminate_event.is_set():
+            # While the message queue is full, the senders of the pipe and the stream sockets
+            # have to wait. Only the datagram sockets are read, their overflow is dropped.
+            if self._message_queue.is_full():
+                wait_for = [s for s in [self._syslog_udp, self._snmptrap] if s is not None]
+            else:
+                wait_for = listen_list + list(client_sockets.keys())
             try:
-                readable = select.select(listen_list + list(client_sockets.keys()), [], [],
-                                         select_timeout)[0]
+                readable = select.select(wait_for, [], [],
+                                         0 if self._message_queue else select_timeout)[0]
             except select.error as e:
                 if e.args[0] != errno.EINTR:
                     raise
@@ -841,14 +948,14 @@ class EventServer(ECServerThread):
                         # Do we have any complete messages?
                         if b'\n' in data:
                             complete, rest = data.rsplit(b"\n", 1)
-                            self.process_raw_lines(complete + b"\n", address)
+                            self.enqueue_raw_lines(complete + b"\n", address)
                         else:
                             rest = data  # keep for next time
 
                     # Only complete messages
                     else:
                         if data:
-                            self.process_raw_lines(data, address)
+                            self.enqueue_raw_lines(data, address)
                         rest = b""
 
                     # Connection still open?
@@ -871,11 +978,11 @@ class EventServer(ECServerThread):
                         if data[-1:] != b'\n':
                             if b'\n' in data:  # at least one complete message contained
                                 messages, pipe_fragment = data.rsplit(b'\n', 1)
-                                self.process_raw_lines(messages + b'\n', None)  # got lost in split
+                                self.enqueue_raw_lines(messages + b'\n', None)  # got lost in split
                             else:
                                 pipe_fragment = data  # keep beginning of message, wait for \n
                         else:
-                            self.process_raw_lines(data, None)
+                            self.enqueue_raw_lines(data, None)
                     else:  # EOF
                         os.close(pipe)
                         pipe = self.open_pipe()
@@ -891,15 +998,7 @@ class EventServer(ECServerThread):
 
             # Read events from builtin syslog server
             if self._syslog_udp is not None and self._syslog_udp in readable:
-                message, address = self._syslog_udp.recvfrom(4096)
-                # We have an AF_INET socket, so the remote address is a pair (host: str, port: int),
-                # where host can be the domain name or an IPv4 address.
-                if not (isinstance(address, tuple) and  #
-                        isinstance(address[0], str) and  #
-                        isinstance(address[1], int)):
-                    raise ValueError("Invalid remote address '%r' for syslog socket (UDP)" %
-                                     (address,))
-                self.process_raw_lines(message, address)
+                self.receive_syslog_datagrams(self._syslog_udp)
 
             # Read events from builtin snmptrap server
             if self._snmptrap is not None and self._snmptrap in readable:
@@ -918,6 +1017,8 @@ class EventServer(ECServerThread):
                     self._logger.exception(
                         'exception while handling an SNMP trap, skipping this one')
 
+            self.process_message_queue()
+
             try:
                 # process the first spool file we get
                 spool_file = next(self.settings.paths.spool_dir.value.glob('[!.]*'))
@@ -927,6 +1028,42 @@ class EventServer(ECServerThread):
             except StopIteration:
                 select_timeout = 1  # restore default select timeout
 
+        self.drain_message_queue()
+
+    def drain_message_queue(self) -> None:
+        """Processes all queued lines, they have already been accepted from the senders"""
+        if self._message_queue:
+            self._logger.info("Processing %d queued lines before terminating",
+                              len(self._message_queue))
+        while self._message_queue:
+            self.process_message_queue()
+
+    def receive_syslog_datagrams(self, sock: socket.socket) -> None:
+        """Drains the received datagrams into the message queue"""
+        for _nr in range(self.max_datagrams_per_read):
+            try:
+                message, address = sock.recvfrom(4096, socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return
+            # We have an AF_INET socket, so the remote address is a pair (host: str, port: int),
+            # where host can be the domain name or an IPv4 address.
+            if not (isinstance(address, tuple) and  #
+                    isinstance(address[0], str) and  #
+                    isinstance(address[1], int)):
+                raise ValueError("Invalid remote address '%r' for syslog socket (UDP)" % (address,))
+            dropped = self._message_queue.put(message, address, drop_when_full=True)
+            if dropped:
+                self._perfcounters.count("queue_drops", dropped)
+
+    def enqueue_raw_lines(self, data: bytes, address: Optional[Tuple[str, int]]) -> None:
+        self._message_queue.put(data, address, drop_when_full=False)
+
+    def process_message_queue(self) -> None:
+        """Processes a batch of the queued lines"""
+        for line_bytes, address, received in self._message_queue.get_batch(self.message_batch_size):
+            self._perfcounters.count_time("latency", time.time() - received)
+            self.process_raw_lines(line_bytes, address)
+
     # Processes incoming data, just a wrapper between the real data and the
     # handler function to record some statistics etc.
     def process_raw_data(self, handler: Callable[[], None]) -> None:
@@ -1033,6 +1170,7 @@ class EventServer(ECServerThread):
                             event["count"] = max(0, event["count"] - new_tokens)
                             event[
                                 "last_token"] = last_token + new_tokens * secs_per_token  # not now! would be unfair
+                            self._event_status.update_event(event)
                             if event["count"] == 0:
                                 self._logger.info(
                                     "Rule %s/%s, event %d: again without allowed rate, dropping event"
@@ -1058,6 +1196,7 @@ class EventServer(ECServerThread):
                     self._logger.info("Delayed event %d of rule %s is now activated." %
                                       (event["id"], event["rule_id"]))
                     event["phase"] = "open"
+                    self._event_status.update_event(event)
                     self._history.add(event, "DELAYOVER")
                     if rule:
                         event_has_opened(self._history, self.settings, self._config, self._logger,
@@ -1199,6 +1338,7 @@ class EventServer(ECServerThread):
             # Better rewrite (again). Rule might have changed. Also we have changed
             # the text and the user might have his own text added via set_text.
             self.rewrite_event(rule, merge_event, {}, set_first=False)
+            self._event_status.update_event(merge_event)
             self._history.add(merge_event, "COUNTFAILED")
         else:
             # Create artifical event from scratch. Make sure that all important
@@ -1236,6 +1376,7 @@ class EventServer(ECServerThread):
 
     def reload_configuration(self, config: Config) -> None:
         self._config = config
+        self._message_queue.max_length = config["message_queue_len"]
         self._snmp_trap_engine = SNMPTrapEngine(self.settings, self._config,
                                                 self._logger.getChild("snmp"), self.handle_snmptrap)
         self.compile_rules(self._config["rule_packs"])
@@ -1312,6 +1453,9 @@ class EventServer(ECServerThread):
 
         self._logger.info("Compiled %d active rules (ignoring %d disabled rules)" %
                           (count_rules, count_disabled))
+        self._rule_prefilter = RulePrefilter(self._rules)
+        self._logger.info("Rule prefilter: %d rules are only tried on messages with their texts" %
+                          self._rule_prefilter.num_filtered_rules)
         if self._config["rule_optimizer"]:
             self._logger.info(
                 "Rule hash: %d rules - %d hashed, %d unspecific" %
@@ -1394,6 +1538,14 @@ class EventServer(ECServerThread):
                                    verbose=self._config["debug_rules"]))
 
     def process_event(self, event: Event) -> None:
+        skipped_rules: List[str] = []
+        try:
+            self._process_event(event, skipped_rules)
+        finally:
+            if skipped_rules:
+                self._perfcounters.count_rule_skips(skipped_rules)
+
+    def _process_event(self, event: Event, skipped_rules: List[str]) -> None:
         self.do_translate_hostname(event)
 
         # Log all incoming messages into a syslog-like text file if that is enabled
@@ -1407,12 +1559,22 @@ class EventServer(ECServerThread):
         else:
             rule_candidates = self._rules
 
+        # Rules which need texts not contained in the message are treated as not matching
+        impossible_rules = self._rule_prefilter.impossible_rules(event)
+
         skip_pack = None
         for rule in rule_candidates:
             if skip_pack and rule["pack"] == skip_pack:
                 continue  # still in the rule pack that we want to skip
             skip_pack = None  # new pack, reset skipping
 
+            if rule["id"] in impossible_rules:
+                if self._config["debug_rules"]:
+                    self._logger.info("Skipping rule %s/%s, the message lacks its texts" %
+                                      (rule["pack"], rule["id"]))
+                skipped_rules.append(rule["id"])
+                continue
+
             try:
                 result = self.event_rule_matches(rule, event)
             except Exception as e:
@@ -1484,6 +1646,7 @@ class EventServer(ECServerThread):
                                                   rule["delay"])
                             existing_event["delay_until"] = time.time() + rule["delay"]
                             existing_event["phase"] = "delayed"
+                            self._event_status.update_event(existing_event)
                         else:
                             event_has_opened(self._history, self.settings, self._config,
                                              self._logger, self.host_config, self._event_columns,
@@ -1561,7 +1724,13 @@ class EventServer(ECServerThread):
     # if matched regex groups in either text (normal) or match_ok (cancelling)
     # match.
     def event_rule_matches(self, rule: Rule, event: Event) -> MatchResult:
-        self._perfcounters.count("rule_tries")
+        before = time.perf_counter()
+        try:
+            return self._event_rule_matches(rule, event)
+        finally:
+            self._perfcounters.count_rule_try(rule["id"], time.perf_counter() - before)
+
+    def _event_rule_matches(self, rule: Rule, event: Event) -> MatchResult:
         with self._lock_configuration:
             result = self._rule_matcher.event_rule_matches_non_inverted(rule, event)
             if rule.get("invert_matching"):
@@ -2325,14 +2494,22 @@ class StatusTableRules(StatusTable):
     columns = [
         ("rule_id", ""),
         ("rule_hits", 0),
+        ("rule_tries", 0),
+        ("rule_skips", 0),
+        ("rule_match_time", 0.0),
     ]
 
-    def __init__(self, logger: Logger, event_status: 'EventStatus') -> None:
+    def __init__(self, logger: Logger, event_status: 'EventStatus',
+                 perfcounters: Perfcounters) -> None:
         super().__init__(logger)
         self._event_status = event_status
+        self._perfcounters = perfcounters
 
     def _enumerate(self, query: QueryGET) -> Iterable[List[Any]]:
-        return self._event_status.get_rule_stats()
+        hits = dict(self._event_status.get_rule_stats())
+        rule_status = self._perfcounters.get_rule_status()
+        for rule_id in sorted(set(hits) | set(rule_status)):
+            yield [rule_id, hits.get(rule_id, 0), *rule_status.get(rule_id, (0, 0, 0.0))]
 
 
 class StatusTableStatus(StatusTable):
@@ -2378,7 +2555,7 @@ class StatusServer(ECServerThread):
 
         self._table_events = StatusTableEvents(logger, event_status)
         self._table_history = StatusTableHistory(logger, history)
-        self._table_rules = StatusTableRules(logger, event_status)
+        self._table_rules = StatusTableRules(logger, event_status, perfcounters)
         self._table_status = StatusTableStatus(logger, event_server)
         self._perfcounters = perfcounters
         self._lock_configuration = lock_configuration
@@ -2643,6 +2820,7 @@ class StatusServer(ECServerThread):
             event["contact"] = contact
         if user:
             event["owner"] = user
+        self._event_status.update_event(event)
         self._history.add(event, "UPDATE", user)
 
     def handle_command_create(self, arguments: List[str]) -> None:
@@ -2662,6 +2840,7 @@ class StatusServer(ECServerThread):
         event["state"] = int(newstate)
         if user:
             event["owner"] = user
+        self._event_status.update_event(event)
         self._history.add(event, "CHANGESTATE", user)
 
     def handle_command_reload(self) -> None:
@@ -2703,6 +2882,7 @@ class StatusServer(ECServerThread):
         event = self._event_status.event(int(event_id))
         if user:
             event["owner"] = user
+            self._event_status.update_event(event)
 
         # TODO: De-duplicate code from do_event_actions()
         if action_id == "@NOTIFY":
@@ -2738,9 +2918,12 @@ class StatusServer(ECServerThread):
         self._logger.info("Switched replication mode to '%s' by external command." % new_mode)
 
     def handle_replicate(self, argument, client_ip):
-        # Last time our slave got a config update
+        # Last time our slave got a config update, optionally followed by the position of the
+        # changes of our event status the slave has got
         try:
-            last_update = int(argument)
+            arguments = argument.split()
+            last_update = int(arguments[0])
+            position = (arguments[1], int(arguments[2])) if len(arguments) == 3 else None
             if self.settings.options.debug:
                 self._logger.info("Replication: sync request from %s, last update %d seconds ago" %
                                   (client_ip, time.time() - last_update))
@@ -2748,7 +2931,7 @@ class StatusServer(ECServerThread):
         except Exception:
             raise MKClientError("Invalid arguments to command REPLICATE")
         return replication_send(self._config, self._lock_configuration, self._event_status,
-                                last_update)
+                                last_update, position)
 
 
 #.
@@ -2848,6 +3031,10 @@ def run_eventd(terminate_main_event: Any, settings: Settings, config: Config,
 
 
 class EventStatus:
+    # The journal is compacted into a new snapshot when it has more records than this or
+    # than the number of open events
+    min_journal_records = 10000
+
     def __init__(self, settings: Settings, config: Config, perfcounters: Perfcounters,
                  history: History, logger: Logger) -> None:
         self.settings = settings
@@ -2856,19 +3043,20 @@ class EventStatus:
         self.lock = threading.Lock()
         self._history = history
         self._logger = logger
+        self._journal = StatusJournal(settings.paths.status_journal_file.value, logger)
         self.flush()
 
     def reload_configuration(self, config: Config) -> None:
         self._config = config
 
     def flush(self) -> None:
-        # TODO: Improve types!
-        self._events: List[Any] = []
+        self._events = EventStore()
         self._next_event_id = 1
         self._rule_stats: Dict[str, int] = {}
         # needed for expecting rules
         self._interval_starts: Dict[str, int] = {}
         self._initialize_event_limit_status()
+        self._reset_changes()
 
         # TODO: might introduce some performance counters, like:
         # - number of received messages
@@ -2877,12 +3065,16 @@ class EventStatus:
 
     def events(self) -> List[Any]:
         # TODO: Improve type!
-        return self._events
+        return self._events.to_list()
 
     def event(self, eid):
-        for event in self._events:
-            if event["id"] == eid:
-                return event
+        return self._events.get(eid)
+
+    def update_event(self, event: Event) -> None:
+        """Needs to be called after an open event changed"""
+        if event["id"] in self._events:
+            self._events.update(event)
+            self._changes.changed(event["id"])
 
     # Return beginning of current expectation interval. For new rules
     # we start with the next interval in future.
@@ -2925,20 +3117,69 @@ class EventStatus:
     def pack_status(self):
         return {
             "next_event_id": self._next_event_id,
-            "events": self._events,
+            "events": self._events.to_list(),
             "rule_stats": self._rule_stats,
             "interval_starts": self._interval_starts,
         }
 
-    def unpack_status(self, status):
+    def _pack_counters(self) -> Dict[str, Any]:
+        return {
+            "next_event_id": self._next_event_id,
+            "rule_stats": self._rule_stats,
+            "interval_starts": self._interval_starts,
+        }
+
+    def _unpack_counters(self, status: Dict[str, Any]) -> None:
         self._next_event_id = status["next_event_id"]
-        self._events = status["events"]
         self._rule_stats = status["rule_stats"]
-        self._interval_starts = status["interval_starts"]
+        self._interval_starts = status.get("interval_starts", {})
+
+    def unpack_status(self, status):
+        self._unpack_counters(status)
+        self._events = EventStore(status["events"])
+        self._initialize_event_limit_status()
+        self._reset_changes()
+
+    def _reset_changes(self) -> None:
+        self._changes = EventChanges()
+        self._saved_seq = 0
+        # The journal doesn't fit to the new changes anymore, a new snapshot is needed
+        self._journal.intact = False
+        self._replicated_seq: Optional[int] = None
+        self._master_position: Optional[Position] = None
+
+    def _change_records(self, changed: Iterable[int], removed: Iterable[int]) -> List[Record]:
+        records: List[Record] = [("remove", event_id) for event_id in removed]
+        for event_id in sorted(changed):
+            event = self._events.get(event_id)
+            if event is not None:
+                records.append(("event", event))
+        records.append(("status", self._pack_counters()))
+        return records
 
     def save_status(self):
+        """Appends the changes since the last save to the journal
+
+        A new snapshot is written instead, when the journal would become larger
+        than it or when the changes are not known anymore.
+        """
         now = time.time()
+        seq = self._changes.seq
+        changes = self._changes.since(self._saved_seq)
+        if changes is None or not self._journal.intact or \
+           self._journal.num_records + len(changes[0]) + len(changes[1]) > \
+           max(self.min_journal_records, len(self._events)):
+            path = self._save_snapshot()
+        else:
+            path = self.settings.paths.status_journal_file.value
+            self._journal.append(self._change_records(*changes))
+        self._saved_seq = seq
+        elapsed = time.time() - now
+        self._logger.log(VERBOSE, "Saved event state to %s in %.3fms.", path, elapsed * 1000)
+
+    def _save_snapshot(self) -> Path:
         status = self.pack_status()
+        status["journal_id"] = uuid.uuid4().hex
         path = self.settings.paths.status_file.value
         path_new = path.parent / (path.name + '.new')
         # Believe it or not: cPickle is more than two times slower than repr()
@@ -2947,8 +3188,8 @@ class EventStatus:
             f.flush()
             os.fsync(f.fileno())
         path_new.rename(path)
-        elapsed = time.time() - now
-        self._logger.log(VERBOSE, "Saved event state to %s in %.3fms.", path, elapsed * 1000)
+        self._journal.start(status["journal_id"])
+        return path
 
     def reset_counters(self, rule_id):
         if rule_id:
@@ -2956,24 +3197,26 @@ class EventStatus:
                 del self._rule_stats[rule_id]
         else:
             self._rule_stats = {}
+        self._perfcounters.reset_rule_counters(rule_id)
         self.save_status()
 
     def load_status(self, event_server):
         path = self.settings.paths.status_file.value
+        events = self._events.to_list()
         if path.exists():
             try:
                 status = ast.literal_eval(path.read_text(encoding="utf-8"))
-                self._next_event_id = status["next_event_id"]
-                self._events = status["events"]
-                self._rule_stats = status["rule_stats"]
-                self._interval_starts = status.get("interval_starts", {})
-                self._logger.info("Loaded event state from %s." % path)
+                events = status["events"]
+                last_status = apply_records(events, self._journal.read(status.get("journal_id")))
+                self._unpack_counters(last_status or status)
+                self._logger.info("Loaded event state from %s and %d changes from its journal." %
+                                  (path, self._journal.num_records))
             except Exception as e:
                 self._logger.exception("Error loading event state from %s: %s" % (path, e))
                 raise
 
         # Add new columns and fix broken events
-        for event in self._events:
+        for event in events:
             event.setdefault("ipaddress", "")
             event.setdefault("host", "")
             event.setdefault("application", "")
@@ -2982,6 +3225,7 @@ class EventStatus:
             if "core_host" not in event:
                 event_server.add_core_host_to_event(event)
                 event["host_in_downtime"] = False
+        self._events = EventStore(events)
 
         # core_host is needed to initialize the status
         self._initialize_event_limit_status()
@@ -3020,7 +3264,8 @@ class EventStatus:
         self._perfcounters.count("events")
         event["id"] = self._next_event_id
         self._next_event_id += 1
-        self._events.append(event)
+        self._events.add(event)
+        self._changes.changed(event["id"])
         self.num_existing_events += 1
         self._count_event_add(event)
         self._history.add(event, "NEW")
@@ -3035,20 +3280,18 @@ class EventStatus:
     def remove_event(self, event: Event) -> None:
         try:
             self._events.remove(event)
+            self._changes.removed(event["id"])
             self._count_event_remove(event)
-        except ValueError:
+        except KeyError:
             self._logger.exception("Cannot remove event %d: not present" % event["id"])
 
-    # protected by self.lock
-    def _remove_event_by_nr(self, index: int) -> None:
-        event = self._events.pop(index)
-        self._count_event_remove(event)
-
     # protected by self.lock
     def remove_oldest_event(self, ty, event):
         if ty == "overall":
             self._logger.log(VERBOSE, "  Removing oldest event")
-            self._remove_event_by_nr(0)
+            oldest = self._events.oldest()
+            if oldest is not None:
+                self.remove_event(oldest)
         elif ty == "by_rule":
             self._logger.log(VERBOSE, "  Removing oldest event of rule \"%s\"", event["rule_id"])
             self._remove_oldest_event_of_rule(event["rule_id"])
@@ -3058,17 +3301,15 @@ class EventStatus:
 
     # protected by self.lock
     def _remove_oldest_event_of_rule(self, rule_id) -> None:
-        for event in self._events:
-            if event["rule_id"] == rule_id:
-                self.remove_event(event)
-                return
+        for event in self._events.by_rule(rule_id):
+            self.remove_event(event)
+            return
 
     # protected by self.lock
     def _remove_oldest_event_of_host(self, hostname: str) -> None:
-        for event in self._events:
-            if event["host"] == hostname:
-                self.remove_event(event)
-                return
+        for event in self._events.by_host(hostname):
+            self.remove_event(event)
+            return
 
     # protected by self.lock
     def get_num_existing_events_by(self, ty: str, event: Event) -> int:
@@ -3085,7 +3326,7 @@ class EventStatus:
     def cancel_events(self, event_server, event_columns, new_event, match_groups, rule):
         with self.lock:
             to_delete = []
-            for nr, event in enumerate(self._events):
+            for event in list(self._events.by_rule(rule["id"])):
                 if event["rule_id"] == rule["id"]:
                     if self.cancelling_match(match_groups, new_event, event, rule):
                         # Fill a few fields of the cancelled event with data from
@@ -3122,10 +3363,10 @@ class EventStatus:
                                                  event,
                                                  is_cancelling=True)
 
-                        to_delete.append(nr)
+                        to_delete.append(event)
 
-            for nr in to_delete[::-1]:
-                self._remove_event_by_nr(nr)
+            for event in to_delete:
+                self.remove_event(event)
 
     def cancelling_match(self, match_groups, new_event, event, rule):
         debug = self._config["debug_rules"]
@@ -3220,9 +3461,11 @@ class EventStatus:
                 preserve["contact"] = found["contact"]
         found.update(event)
         found.update(preserve)
+        if self._events.get(found["id"]) is found:
+            self.update_event(found)
 
     def count_expected_event(self, event_server, event):
-        for ev in self._events:
+        for ev in self._events.by_rule(event["rule_id"]):
             if ev["rule_id"] == event["rule_id"] and ev["phase"] == "counting":
                 self.count_event_up(ev, event)
                 return
@@ -3238,7 +3481,17 @@ class EventStatus:
         # we do never modify events that are already in the state "open"
         # since the event has been created because the count was too
         # low in the specified period of time.
-        for ev in self._events:
+        # Only the events which can match are looked at, in the same order.
+        if count["separate_match_groups"]:
+            candidates = self._events.by_rule_and_match_groups(event["rule_id"],
+                                                               event["match_groups"])
+        elif count["separate_host"] and self._events.num_by_host(
+                event["host"]) < self._events.num_by_rule(event["rule_id"]):
+            candidates = self._events.by_host(event["host"])
+        else:
+            candidates = self._events.by_rule(event["rule_id"])
+
+        for ev in candidates:
             if ev["rule_id"] == event["rule_id"]:
                 if ev["phase"] == "ack" and not count["count_ack"]:
                     continue  # skip acknowledged events
@@ -3272,27 +3525,76 @@ class EventStatus:
         # Did we just count the event that was just one too much?
         if found["phase"] == "counting" and found["count"] >= count["count"]:
             found["phase"] = "open"
+            self.update_event(found)
             return found  # do event action, return found copy of event
         return False  # do not do event action
 
     # locked with self.lock
     def delete_event(self, event_id, user):
-        for nr, event in enumerate(self._events):
-            if event["id"] == event_id:
-                event["phase"] = "closed"
-                if user:
-                    event["owner"] = user
-                self._history.add(event, "DELETE", user)
-                self._remove_event_by_nr(nr)
-                return
-        raise MKClientError("No event with id %s" % event_id)
+        event = self._events.get(event_id)
+        if event is None:
+            raise MKClientError("No event with id %s" % event_id)
+        event["phase"] = "closed"
+        if user:
+            event["owner"] = user
+        self._history.add(event, "DELETE", user)
+        self.remove_event(event)
 
     def get_events(self):
-        return self._events
+        return self._events.to_list()
 
     def get_rule_stats(self):
         return sorted(self._rule_stats.items(), key=lambda x: x[0])
 
+    def change_position(self) -> Position:
+        return self._changes.position
+
+    def changes_since(self, position: Position) -> Optional[List[Record]]:
+        """Returns the changes after the position or None if they are not known"""
+        epoch, seq = position
+        if epoch != self._changes.epoch:
+            return None
+        changes = self._changes.since(seq)
+        return None if changes is None else self._change_records(*changes)
+
+    def apply_changes(self, records: Iterable[Record]) -> None:
+        """Applies the changes of the replication master"""
+        for kind, value in records:
+            if kind == "event":
+                existing = self._events.get(value["id"])
+                if existing is None:
+                    self._events.add(value)
+                    self.num_existing_events += 1
+                    self._count_event_add(value)
+                else:
+                    self._count_event_remove(existing)
+                    existing.clear()
+                    existing.update(value)
+                    self._events.update(existing)
+                    self.num_existing_events += 1
+                    self._count_event_add(existing)
+                self._changes.changed(value["id"])
+            elif kind == "remove":
+                event = self._events.get(value)
+                if event is not None:
+                    self.remove_event(event)
+            elif kind == "status":
+                self._unpack_counters(value)
+
+    @property
+    def master_position(self) -> Optional[Position]:
+        """The position of the replication master this status is a copy of
+
+        None if the events have been changed locally since the last replication.
+        """
+        if self._changes.seq != self._replicated_seq:
+            return None
+        return self._master_position
+
+    def replicated(self, master_position: Optional[Position]) -> None:
+        self._master_position = master_position
+        self._replicated_seq = self._changes.seq
+
 
 #.
 #   .--Replication---------------------------------------------------------.
@@ -3319,11 +3621,20 @@ def replication_allow_command(config: Config, command: str, slave_status: SlaveS
                             "while it is in sync mode.")
 
 
-def replication_send(config: Config, lock_configuration: ECLock, event_status: EventStatus,
-                     last_update: int) -> Dict[str, Any]:
-    response = {}
+def replication_send(config: Config,
+                     lock_configuration: ECLock,
+                     event_status: EventStatus,
+                     last_update: int,
+                     position: Optional[Position] = None) -> Dict[str, Any]:
+    response: Dict[str, Any] = {}
     with lock_configuration:
-        response["status"] = event_status.pack_status()
+        # Changes made while the response is assembled are sent again next time
+        response["position"] = event_status.change_position()
+        changes = event_status.changes_since(position) if position is not None else None
+        if changes is None:
+            response["status"] = event_status.pack_status()
+        else:
+            response["changes"] = changes
         if last_update < config["last_reload"]:
             response["rules"] = config[
                 "rules"]  # Remove one bright day, where legacy rules are not needed anymore
@@ -3359,7 +3670,9 @@ def replication_pull(settings: Settings, config: Config, lock_configuration: ECL
             with lock_configuration:
 
                 try:
-                    new_state = get_state_from_master(config, slave_status)
+                    # After a takeover the own changes are overwritten with the complete state
+                    position = event_status.master_position if mode == "sync" else None
+                    new_state = get_state_from_master(config, slave_status, position)
                     replication_update_state(settings, config, event_status, event_server,
                                              new_state)
                     if repl_settings.get("logging"):
@@ -3421,7 +3734,12 @@ def replication_update_state(settings: Settings, config: Config, event_status: E
         config["actions"] = new_state["actions"]
 
     # Update to the masters' event state
-    event_status.unpack_status(new_state["status"])
+    if "changes" in new_state:
+        event_status.apply_changes(new_state["changes"])
+    else:
+        event_status.unpack_status(new_state["status"])
+    # Older masters don't send their position
+    event_status.replicated(new_state.get("position"))
 
 
 def save_master_config(settings: Settings, new_state: Dict[str, Any]) -> None:
@@ -3450,7 +3768,10 @@ def load_master_config(settings: Settings, config: ConfigFromWATO, logger: Logge
             logger.error("Replication: no previously saved master state available")
 
 
-def get_state_from_master(config: Config, slave_status: SlaveStatus) -> Any:
+def get_state_from_master(config: Config,
+                          slave_status: SlaveStatus,
+                          position: Optional[Position] = None) -> Any:
+    """Returns the complete state of the master or its changes since the position"""
     repl_settings = config["replication"]
     if repl_settings is None:
         raise ValueError('no replication settings')
@@ -3458,8 +3779,10 @@ def get_state_from_master(config: Config, slave_status: SlaveStatus) -> Any:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.settimeout(repl_settings["connect_timeout"])
         sock.connect(repl_settings["master"])
-        sock.sendall(b"REPLICATE %d\n" %
-                     (slave_status["last_sync"] if slave_status["last_sync"] else 0))
+        request = b"REPLICATE %d" % (slave_status["last_sync"] if slave_status["last_sync"] else 0)
+        if position is not None:
+            request += b" %s %d" % (position[0].encode("ascii"), position[1])
+        sock.sendall(request + b"\n")
         sock.shutdown(socket.SHUT_WR)
 
         response_text = b""
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Skip the rules which cannot match a message before evaluating them
+
+Most message patterns of the rules contain some text which has to be present
+in every message they match, e.g. "backup" in "backup of (.*) failed". These
+required literals are extracted from all rules when they are compiled and
+searched in a message with a single scan. Only the rules whose literals were
+found (or which don't have any) need to be evaluated completely.
+
+The rules are matching case insensitive, so the scan works on the lower case
+text. This is only exact for ASCII texts, other texts are not prefiltered.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Set, Tuple, Union
+
+try:
+    import re._parser as sre_parse  # type: ignore[import]
+except ImportError:
+    import sre_parse  # type: ignore[import,no-redef]
+
+from .config import Rule
+from .event import Event
+
+# Shorter literals are present in nearly every message, scanning for them does not pay off
+MIN_LITERAL_LENGTH = 3
+
+Literals = FrozenSet[str]
+
+_REPEATS = {
+    sre_parse.MAX_REPEAT,
+    sre_parse.MIN_REPEAT,
+    getattr(sre_parse, "POSSESSIVE_REPEAT", sre_parse.MAX_REPEAT),
+}
+
+
+def _quality(literals: Literals) -> Tuple[int, int]:
+    return min(len(literal) for literal in literals), -len(literals)
+
+
+def _required_in_parsed(parsed: Iterable[Tuple[int, object]]) -> Optional[Literals]:
+    """Returns literals of which at least one is part of every match"""
+    candidates: List[Literals] = []
+    run: List[str] = []
+    for op, av in parsed:
+        if op is sre_parse.LITERAL and isinstance(av, int) and av < 128:
+            run.append(chr(av).lower())
+            continue
+
+        if run:
+            candidates.append(frozenset(["".join(run)]))
+            run = []
+
+        required: Optional[Literals] = None
+        if op is sre_parse.SUBPATTERN:
+            required = _required_in_parsed(av[-1])  # type: ignore[index]
+        elif op in _REPEATS and av[0] >= 1:  # type: ignore[index]
+            required = _required_in_parsed(av[2])  # type: ignore[index]
+        elif op is sre_parse.BRANCH:
+            alternatives = [_required_in_parsed(a) for a in av[1]]  # type: ignore[index]
+            if all(alternatives):
+                required = frozenset().union(*alternatives)  # type: ignore[arg-type]
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            required = _required_in_parsed(av)  # type: ignore[arg-type]
+
+        if required:
+            candidates.append(required)
+
+    if run:
+        candidates.append(frozenset(["".join(run)]))
+    return max(candidates, key=_quality, default=None)
+
+
+def required_literals(pattern: Union[str, Pattern[str]]) -> Optional[Literals]:
+    """Returns lower case literals of which one is contained in every ASCII text matching the
+    pattern or None if there are no useful ones
+
+    >>> sorted(required_literals(re.compile("(Backup|Restore) of (.*) failed", re.I)))
+    [' failed']
+    >>> sorted(required_literals(re.compile("(Backup|Restore) of", re.I)))
+    ['backup', 'restore']
+    >>> required_literals(re.compile("a.*b"))
+    """
+    if isinstance(pattern, str):
+        required: Optional[Literals] = frozenset([pattern])
+    else:
+        try:
+            required = _required_in_parsed(sre_parse.parse(pattern.pattern, pattern.flags))
+        except Exception:
+            return None
+    if not required or _quality(required)[0] < MIN_LITERAL_LENGTH:
+        return None
+    return required
+
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    trie: Dict[str, dict] = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alternatives = [
+            re.escape(char) + build(child) for char, child in sorted(node.items()) if char
+        ]
+        if not alternatives:
+            return ""
+        regex = alternatives[0] if len(alternatives) == 1 else "(?:%s)" % "|".join(alternatives)
+        # Greedy, so the longest literal starting at a position is found
+        return "(?:%s)?" % regex if "" in node else regex
+
+    return build(trie)
+
+
+class LiteralScanner:
+    """Finds all of the given literals contained in a text with a single scan
+
+    The literals are compiled into one regular expression shaped like a trie
+    which is tried at every position of the text. It finds the longest literal
+    starting at a position, the shorter ones starting there are its prefixes.
+    """
+    def __init__(self, literals: Iterable[str]) -> None:
+        super().__init__()
+        literal_set = set(literals)
+        self._regex = re.compile("(?=(%s))" % _trie_regex(literal_set)) if literal_set else None
+        self._prefixes = {
+            literal: frozenset(literal[:end]
+                               for end in range(1,
+                                                len(literal) + 1)
+                               if literal[:end] in literal_set) for literal in literal_set
+        }
+
+    def scan(self, text: str) -> Set[str]:
+        if self._regex is None:
+            return set()
+        found: Set[str] = set()
+        for longest in {m.group(1) for m in self._regex.finditer(text)}:
+            found.update(self._prefixes[longest])
+        return found
+
+
+class _Requirements:
+    """The rules which need one of some literals in a field of the event"""
+    def __init__(self) -> None:
+        super().__init__()
+        self.rule_ids: Set[str] = set()
+        self.rules_by_literal: Dict[str, Set[str]] = {}
+
+    def add(self, rule_id: str, literals: Literals) -> None:
+        self.rule_ids.add(rule_id)
+        for literal in literals:
+            self.rules_by_literal.setdefault(literal, set()).add(rule_id)
+
+    def impossible_rules(self, found: Set[str]) -> Set[str]:
+        possible: Set[str] = set()
+        for literal in found:
+            possible.update(self.rules_by_literal.get(literal, ()))
+        return self.rule_ids - possible
+
+
+def _required_by_any(rule: Rule, keys: Iterable[str]) -> Optional[Literals]:
+    """Returns the literals of which one is needed to match one of the patterns"""
+    present = [key for key in keys if key in rule]
+    if not present:
+        return None
+    required: Set[str] = set()
+    for key in present:
+        literals = required_literals(rule[key])
+        if literals is None:
+            return None
+        required.update(literals)
+    return frozenset(required)
+
+
+class RulePrefilter:
+    """Determines the compiled rules which cannot match an event because of its text
+
+    A rule needs the text of an event to match "match" or "match_ok" and the
+    application to match "match_application" or "cancel_application", if they
+    are set. Inverted rules and rules with duplicate ids are never skipped.
+    """
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        super().__init__()
+        self._text = _Requirements()
+        self._application = _Requirements()
+
+        seen: Set[str] = set()
+        duplicates: Set[str] = set()
+        candidates = []
+        for rule in rules:
+            if rule["id"] in seen:
+                duplicates.add(rule["id"])
+            seen.add(rule["id"])
+            if not rule.get("disabled") and not rule.get("invert_matching"):
+                candidates.append(rule)
+
+        for rule in candidates:
+            if rule["id"] in duplicates:
+                continue
+            # Without "match" every text matches
+            text_literals = _required_by_any(rule, ["match", "match_ok"]) \
+                if "match" in rule else None
+            if text_literals:
+                self._text.add(rule["id"], text_literals)
+            application_literals = _required_by_any(rule,
+                                                    ["match_application", "cancel_application"])
+            if application_literals:
+                self._application.add(rule["id"], application_literals)
+
+        self._scanner = LiteralScanner(
+            list(self._text.rules_by_literal) + list(self._application.rules_by_literal))
+
+    @property
+    def num_filtered_rules(self) -> int:
+        return len(self._text.rule_ids | self._application.rule_ids)
+
+    def impossible_rules(self, event: Event) -> Set[str]:
+        """Returns the ids of the rules which cannot match the event"""
+        impossible: Set[str] = set()
+        for requirements, text in [
+            (self._text, event["text"]),
+            (self._application, event["application"]),
+        ]:
+            if requirements.rule_ids and isinstance(text, str) and text.isascii():
+                impossible |= requirements.impossible_rules(self._scanner.scan(text.lower()))
+        return impossible
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Incremental persistence and replication of the event status
+
+The event status is saved as a snapshot (the status file) plus a journal of
+the changes made since the snapshot was written. Saving appends the current
+state of the events changed since the last save and the ids of the removed
+ones to the journal. When the journal has grown larger than the snapshot, a
+new snapshot is written and the journal is started over.
+
+The changes are numbered, a replication slave asks its master for the
+changes after the last number it has seen instead of the complete status.
+"""
+
+import ast
+import os
+import threading
+import uuid
+from collections import deque, OrderedDict
+from logging import Logger
+from pathlib import Path
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+
+# ("event", event), ("remove", event_id) or ("status", status without events)
+Record = Tuple[str, Any]
+
+# Identifies a state of the changes of one event daemon process: (epoch, seq)
+Position = Tuple[str, int]
+
+
+class EventChanges:
+    """The ids of the changed and removed events, numbered in the order of the changes
+
+    Only the last change of an existing event is remembered, the removals up
+    to the given number. The changes since a number are known completely, as
+    long as none of the removals after it has been forgotten. The events are
+    changed by the event server while the status server asks for changes.
+    """
+    def __init__(self, max_removals: int = 100000) -> None:
+        super().__init__()
+        # Differs between processes, so a number is only compared to numbers of the same epoch
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+        self._changed: 'OrderedDict[int, int]' = OrderedDict()
+        self._removed: Deque[Tuple[int, int]] = deque(maxlen=max_removals)
+        self._complete_since = 0
+        self._lock = threading.Lock()
+
+    @property
+    def position(self) -> Position:
+        return self.epoch, self.seq
+
+    def changed(self, event_id: int) -> None:
+        with self._lock:
+            self.seq += 1
+            self._changed[event_id] = self.seq
+            self._changed.move_to_end(event_id)
+
+    def removed(self, event_id: int) -> None:
+        with self._lock:
+            self.seq += 1
+            self._changed.pop(event_id, None)
+            if len(self._removed) == self._removed.maxlen:
+                self._complete_since = self._removed[0][0]
+            self._removed.append((self.seq, event_id))
+
+    def since(self, seq: int) -> Optional[Tuple[List[int], List[int]]]:
+        """Returns the ids of the changed and of the removed events after the given number or
+        None if they are not known anymore"""
+        with self._lock:
+            if seq < self._complete_since or seq > self.seq:
+                return None
+            changed = []
+            for event_id, change_seq in reversed(self._changed.items()):
+                if change_seq <= seq:
+                    break
+                changed.append(event_id)
+            removed = []
+            for change_seq, event_id in reversed(self._removed):
+                if change_seq <= seq:
+                    break
+                removed.append(event_id)
+            return changed, removed
+
+
+class StatusJournal:
+    """The records appended to the snapshot with the given id, one repr() per line"""
+    def __init__(self, path: Path, logger: Logger) -> None:
+        super().__init__()
+        self._path = path
+        self._logger = logger
+        self.num_records = 0
+        # False when records can't be appended, because the read journal was not complete
+        self.intact = False
+
+    def start(self, snapshot_id: str) -> None:
+        path_new = self._path.parent / (self._path.name + '.new')
+        path_new.write_text(repr(("snapshot", snapshot_id)) + "\n", encoding="utf-8")
+        path_new.rename(self._path)
+        self.num_records = 0
+        self.intact = True
+
+    def append(self, records: Iterable[Record]) -> None:
+        lines = [repr(record) + "\n" for record in records]
+        with self._path.open(mode="a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.num_records += len(lines)
+
+    def read(self, snapshot_id: str) -> Iterator[Record]:
+        """Yields the records belonging to the snapshot
+
+        A journal of another snapshot is left over from an interrupted writing
+        of a new snapshot, all of its records are contained in the snapshot. A
+        broken line is the result of an interrupted append, the following
+        records are not replayed.
+        """
+        self.num_records = 0
+        self.intact = False
+        try:
+            f = self._path.open(encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            lines = enumerate(f)
+            for nr, line in lines:
+                record = self._parse(line, nr)
+                if record != ("snapshot", snapshot_id):
+                    self._logger.info("Ignoring %s of another snapshot", self._path)
+                    return
+                break
+            else:
+                return
+
+            for nr, line in lines:
+                record = self._parse(line, nr)
+                if record is None:
+                    return
+                self.num_records += 1
+                yield record
+        self.intact = True
+
+    def _parse(self, line: str, nr: int) -> Optional[Record]:
+        try:
+            # Without the newline the appending was interrupted
+            record = ast.literal_eval(line) if line.endswith("\n") else None
+            if isinstance(record, tuple) and len(record) == 2:
+                return record
+        except (SyntaxError, ValueError):
+            pass
+        self._logger.warning("Ignoring broken %s from line %d on", self._path, nr + 1)
+        return None
+
+
+def apply_records(events: List[Any], records: Iterable[Record]) -> Optional[dict]:
+    """Replays the records on the events, returns the last status record"""
+    by_id = {event["id"]: event for event in events}
+    status = None
+    for kind, value in records:
+        if kind == "event":
+            by_id[value["id"]] = value
+        elif kind == "remove":
+            by_id.pop(value, None)
+        elif kind == "status":
+            status = value
+    events[:] = sorted(by_id.values(), key=lambda e: e["id"])
+    return status
@@ -930,10 +930,14 @@ def singlehost_table(view, columns, query, only_sites, limit, all_active_filters
 class BIManager:
     def __init__(self):
         sites_callback = SitesCallback(cmk.gui.sites.states, bi_livestatus_query)
-        self.compiler = BICompiler(self.bi_configuration_file(), sites_callback)
+        self.compiler = BICompiler(self.bi_configuration_file(),
+                                   sites_callback,
+                                   processes=config.bi_compilation_processes)
         self.compiler.load_compiled_aggregations()
         self.status_fetcher = BIStatusFetcher(sites_callback)
-        self.computer = BIComputer(self.compiler.compiled_aggregations, self.status_fetcher)
+        self.computer = BIComputer(self.compiler.compiled_aggregations, self.status_fetcher,
+                                   self.compiler.branch_index,
+                                   self.compiler.compiled_aggregation_digests)
 
     @classmethod
     def bi_configuration_file(cls) -> str:
@@ -956,7 +960,9 @@ def get_cached_bi_manager() -> BIManager:
 def get_cached_bi_compiler() -> BICompiler:
     if "bi_compiler" not in g:
         sites_callback = SitesCallback(cmk.gui.sites.states, bi_livestatus_query)
-        g.bi_compiler = BICompiler(BIManager.bi_configuration_file(), sites_callback)
+        g.bi_compiler = BICompiler(BIManager.bi_configuration_file(),
+                                   sites_callback,
+                                   processes=config.bi_compilation_processes)
     return g.bi_compiler
 
 
@@ -45,6 +45,7 @@ log_levels = {
     "cmk.web.automations": 30,
     "cmk.web.background-job": 30,
     "cmk.web.slow-views": 30,
+    "cmk.web.graphs": 30,
 }
 
 slow_views_duration_threshold = 60
@@ -521,6 +522,7 @@ bi_packs: _Dict = {}
 
 default_bi_layout = {"node_style": "builtin_hierarchy", "line_style": "straight"}
 bi_layouts: _Dict[str, _Dict] = {"templates": {}, "aggregations": {}}
+bi_compilation_processes = 1
 
 # Deprecated. Kept for compatibility.
 bi_compile_log = None
@@ -515,7 +515,9 @@ graph_info["message_processing"] = {
     "metrics": [
         ("average_message_rate", "area"),
         ("average_drop_rate", "area"),
+        ("average_queue_drop_rate", "area"),
     ],
+    "optional_metrics": ["average_queue_drop_rate"],
 }
 
 graph_info["rule_efficiency"] = {
@@ -639,6 +639,12 @@ metric_info["average_drop_rate"] = {
     "color": "21/b",
 }
 
+metric_info["average_queue_drop_rate"] = {
+    "title": _("Dropped messages of the message queue"),
+    "unit": "1/s",
+    "color": "22/a",
+}
+
 metric_info["average_sync_time"] = {
     "title": _("Average slave sync time"),
     "unit": "s",
@@ -681,6 +687,12 @@ metric_info["average_processing_time"] = {
     "color": "13/a",
 }
 
+metric_info["average_latency_time"] = {
+    "title": _("Message queue latency"),
+    "unit": "s",
+    "color": "12/a",
+}
+
 metric_info["average_rule_hit_ratio"] = {
     "title": _("Rule hit ratio"),
     "unit": "%",
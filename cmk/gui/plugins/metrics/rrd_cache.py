@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Cache of the RRD data fetched for graphs, shared by the GUI processes via redis
+
+Dashboards and graphs which are refreshed automatically request the same
+time range shifted by a few steps again and again. The RRD columns fetched
+are cached per (site, host, service, metric, consolidation function, step)
+and a refresh only fetches the missing tail of the cached data.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from redis.exceptions import RedisError
+
+from cmk.utils.redis import get_redis_client
+
+import cmk.gui.hooks as hooks
+from cmk.gui.log import logger
+
+if TYPE_CHECKING:
+    from cmk.utils.redis import RedisDecoded
+
+# The last steps of cached data may have been incomplete, they are fetched again
+OVERLAP_STEPS = 2
+
+# Cached data is fetched completely again after this time, the RRDs may have
+# been consolidated or changed meanwhile
+MAX_AGE = 3600
+
+# Cached data nobody asked for in this time is dropped
+TTL = 900
+
+# Longer columns are not cached
+MAX_POINTS = 10000
+
+_NAMESPACE = "graphs:rrd_cache"
+_STATS_KEY = _NAMESPACE + ":stats"
+
+cache_logger = logger.getChild("graphs")
+
+RRDColumnKey = Tuple[str, str, str, str, str, float]  # site, host, service, perfvar, cf, scale
+RRDColumnData = List[Any]  # start, end, step, *values as returned by livestatus
+
+
+class RRDCache:
+    """Caches the RRD columns per step, i.e. for graphs of the same time range size"""
+    def __init__(self) -> None:
+        super().__init__()
+        self._redis_client: Optional['RedisDecoded'] = None
+        self._usable = True
+
+    def _client(self) -> 'RedisDecoded':
+        if self._redis_client is None:
+            self._redis_client = get_redis_client()
+        return self._redis_client
+
+    def _key(self, column: RRDColumnKey, step: float) -> str:
+        return "%s:%s:%s" % (_NAMESPACE, json.dumps(column), step)
+
+    def load(self, columns: List[RRDColumnKey], step: float,
+             start_time: float) -> Dict[RRDColumnKey, Tuple[float, RRDColumnData]]:
+        """Creation time and data of the cached columns which can be continued from start_time"""
+        if not self._usable or not columns:
+            return {}
+        try:
+            entries = self._client().mget([self._key(column, step) for column in columns])
+        except RedisError as e:
+            self._disable(e)
+            return {}
+
+        cached = {}
+        now = time.time()
+        for column, entry in zip(columns, entries):
+            if entry is None:
+                continue
+            created, data = json.loads(entry)
+            if now - created <= MAX_AGE and data[0] <= start_time <= data[1]:
+                cached[column] = (created, data)
+        return cached
+
+    def save(self, columns: Dict[RRDColumnKey, Tuple[float, RRDColumnData]], step: float, hits: int,
+             misses: int, points_fetched: int) -> None:
+        if not self._usable:
+            return
+        try:
+            with self._client().pipeline(transaction=False) as pipeline:
+                for column, (created, data) in columns.items():
+                    if len(data) - 3 <= MAX_POINTS:
+                        pipeline.set(self._key(column, step), json.dumps([created, data]), ex=TTL)
+                pipeline.hincrby(_STATS_KEY, "hits", hits)
+                pipeline.hincrby(_STATS_KEY, "misses", misses)
+                pipeline.hincrby(_STATS_KEY, "points_fetched", points_fetched)
+                pipeline.hincrby(_STATS_KEY, "points_served",
+                                 sum(len(data) - 3 for _created, data in columns.values()))
+                pipeline.execute()
+        except RedisError as e:
+            self._disable(e)
+
+    def statistics(self) -> Dict[str, int]:
+        """Counters of all GUI processes since the redis daemon started"""
+        stats = {"hits": 0, "misses": 0, "points_fetched": 0, "points_served": 0}
+        if self._usable:
+            try:
+                stats.update(
+                    {key: int(value) for key, value in self._client().hgetall(_STATS_KEY).items()})
+            except RedisError as e:
+                self._disable(e)
+        return stats
+
+    def _disable(self, e: Exception) -> None:
+        cache_logger.warning("Cannot use the graph data cache: %s", e)
+        self._usable = False
+
+
+@hooks.request_memoize()
+def get_rrd_cache() -> RRDCache:
+    """The cache of the current request
+
+    All graphs of a request share it, a failing redis is only reported once."""
+    return RRDCache()
+
+
+def tail_start(cached: RRDColumnData) -> int:
+    """The time from which the data has to be fetched to continue the cached data"""
+    return cached[1] - OVERLAP_STEPS * cached[2]
+
+
+def merge(cached: RRDColumnData, tail: RRDColumnData, start_time: float) -> Optional[RRDColumnData]:
+    """Continue the cached data with the fetched tail, starting at the step of start_time
+
+    Returns None if the tail does not fit the cached data, e.g. because the
+    RRD returned another resolution."""
+    cached_start, cached_end, step = cached[:3]
+    tail_start_time, tail_end, tail_step = tail[:3]
+    if (tail_step != step or not cached_start <= tail_start_time <= cached_end or
+        (tail_start_time - cached_start) % step):
+        return None
+
+    values = cached[3:3 + (tail_start_time - cached_start) // step] + tail[3:]
+    skip = max(0, int(start_time - cached_start) // step)
+    return [cached_start + skip * step, tail_end, step] + values[skip:]
@@ -6,35 +6,71 @@
 """Core for getting the actual raw data points via Livestatus from RRD"""
 
 import time
+import logging
 import collections
-from typing import Any, Callable, Dict, List, Set, Tuple, Union, Optional, Iterator
+from typing import (Any, Callable, Dict, List, NamedTuple, Set, Tuple, Union, Optional, Iterator,
+                    FrozenSet)
 
 import livestatus
 
 import cmk.utils.version as cmk_version
 from cmk.gui.plugins.metrics.utils import check_metrics, reverse_translate_metric_name
 import cmk.gui.plugins.metrics.timeseries as ts
-from cmk.utils.prediction import livestatus_lql, TimeSeries
+import cmk.gui.plugins.metrics.rrd_cache as rrd_cache
+from cmk.utils.prediction import lq_logic, TimeSeries
 from cmk.gui.i18n import _
 from cmk.gui.exceptions import MKGeneralException
+from cmk.gui.log import logger
 import cmk.gui.sites as sites
 
 from cmk.gui.type_defs import ColumnName
 
+graph_logger = logger.getChild("graphs")
+
+RRDEntry = Tuple[str, Optional[str], float]  # perfvar, cf, scale
+
+
+class RRDFetchBatch(NamedTuple):
+    """Services of a site of which the same RRD columns are fetched with one query"""
+    site: str
+    services: List[Tuple[str, str]]
+    entries: List[RRDEntry]
+
 
 def fetch_rrd_data_for_graph(graph_recipe, graph_data_range):
     needed_rrd_data = get_needed_sources(graph_recipe["metrics"])
 
-    by_service = group_needed_rrd_data_by_service(needed_rrd_data)
+    step = graph_data_range["step"]
+    cache = rrd_cache.get_rrd_cache() if isinstance(step, (int, float)) else None
+
     rrd_data: Dict[Tuple[str, str, str, str, str, str], TimeSeries] = {}
-    for (site, host_name, service_description), entries in by_service.items():
-        try:
-            for (perfvar, cf, scale), data in \
-                fetch_rrd_data(site, host_name, service_description, entries, graph_recipe, graph_data_range):
-                rrd_data[(site, host_name, service_description, perfvar, cf,
-                          scale)] = TimeSeries(data)
-        except livestatus.MKLivestatusNotFoundError:
-            pass
+    for site, batches in group_needed_rrd_data_by_site(needed_rrd_data).items():
+        site_start = time.time()
+        for batch in batches:
+            batch_start = time.time()
+            if cache is None:
+                fetched = fetch_rrd_data_batch(batch, graph_recipe, graph_data_range)
+                hits = 0
+            else:
+                fetched, hits = fetch_rrd_data_batch_cached(batch, graph_recipe, graph_data_range,
+                                                            cache)
+            for (host_name, service_description), rows in fetched.items():
+                for (perfvar, cf, scale), data in rows:
+                    rrd_data[(site, host_name, service_description, perfvar, cf,
+                              scale)] = TimeSeries(data)
+            graph_logger.debug(
+                "Site %s: fetched %d RRD columns of %d of %d services in %.3f s (%d from cache)",
+                site, len(batch.entries), len(fetched), len(batch.services),
+                time.time() - batch_start, hits)
+        graph_logger.debug("Site %s: fetched RRD data of %d services with %d queries in %.3f s",
+                           site, sum(len(batch.services) for batch in batches), len(batches),
+                           time.time() - site_start)
+
+    if cache is not None and graph_logger.isEnabledFor(logging.DEBUG):
+        stats = cache.statistics()
+        graph_logger.debug("Graph data cache: %d hits, %d misses, %d of %d points fetched",
+                           stats["hits"], stats["misses"], stats["points_fetched"],
+                           stats["points_served"])
 
     align_and_resample_rrds(rrd_data, graph_recipe["consolidation_function"])
     chop_last_empty_step(graph_data_range, rrd_data)
@@ -64,9 +100,10 @@ def align_and_resample_rrds(rrd_data, cf):
         else:
             if (start_time, end_time, step) != rrddata.twindow:
                 if step >= rrddata.twindow[2]:
-                    rrddata.values = rrddata.downsample((start_time, end_time, step), spec[4] or cf)
+                    rrddata.array = rrddata.downsample_array((start_time, end_time, step),
+                                                             spec[4] or cf)
                 elif step < rrddata.twindow[2]:
-                    rrddata.values = rrddata.bfill_upsample((start_time, end_time, step), 0)
+                    rrddata.array = rrddata.bfill_upsample_array((start_time, end_time, step), 0)
 
 
 # The idea is to omit the empty last step of graphs which are showing the
@@ -134,7 +171,23 @@ def group_needed_rrd_data_by_service(needed_rrd_data):
     return by_service
 
 
-def fetch_rrd_data(site, host_name, service_description, entries, graph_recipe, graph_data_range):
+def group_needed_rrd_data_by_site(needed_rrd_data) -> Dict[str, List[RRDFetchBatch]]:
+    """Batch the services of each site needing the same RRD columns
+
+    Host metrics ("_HOST_") are kept apart, they are fetched from the hosts table."""
+    batches: Dict[Tuple[str, bool, FrozenSet[RRDEntry]], List[Tuple[str, str]]] = {}
+    for (site, host_name, service_description), entries in sorted(
+            group_needed_rrd_data_by_service(needed_rrd_data).items()):
+        key = (site, service_description == "_HOST_", frozenset(entries))
+        batches.setdefault(key, []).append((host_name, service_description))
+
+    by_site: Dict[str, List[RRDFetchBatch]] = collections.defaultdict(list)
+    for (site, _is_host, entries), services in batches.items():
+        by_site[site].append(RRDFetchBatch(site, services, list(entries)))
+    return by_site
+
+
+def _point_range(graph_data_range) -> str:
     start_time, end_time = graph_data_range["time_range"]
 
     step: Union[int, float, str] = graph_data_range["step"]
@@ -142,12 +195,103 @@ def fetch_rrd_data(site, host_name, service_description, entries, graph_recipe,
     if not isinstance(step, str):
         step = max(1, step)
 
-    point_range = ":".join(map(str, (start_time, end_time, step)))
-    lql_columns = list(rrd_columns(entries, graph_recipe["consolidation_function"], point_range))
-    query = livestatus_lql([host_name], lql_columns, service_description)
+    return ":".join(map(str, (start_time, end_time, step)))
+
+
+def rrd_batch_query(batch: RRDFetchBatch, columns: List[ColumnName]) -> str:
+    if batch.services[0][1] == "_HOST_":
+        query = "GET hosts\nColumns: host_name %s\n" % " ".join(columns)
+        return query + lq_logic("Filter: host_name =", [h for h, _s in batch.services], "Or")
+
+    query = "GET services\nColumns: host_name description %s\n" % " ".join(columns)
+    for host_name, service_description in batch.services:
+        query += "Filter: host_name = %s\nFilter: description = %s\nAnd: 2\n" % (
+            livestatus.lqencode(host_name), livestatus.lqencode(service_description))
+    if len(batch.services) > 1:
+        query += "Or: %d\n" % len(batch.services)
+    return query
 
-    with sites.only_sites(site):
-        return list(zip(entries, sites.live().query_row(query)))
+
+def fetch_rrd_data_batch(batch: RRDFetchBatch, graph_recipe,
+                         graph_data_range) -> Dict[Tuple[str, str], List[Tuple[RRDEntry, Any]]]:
+    """Fetch the RRD data of all services of the batch with one livestatus query
+
+    Services not known to the site are missing in the result."""
+    lql_columns = list(
+        rrd_columns(batch.entries, graph_recipe["consolidation_function"],
+                    _point_range(graph_data_range)))
+    query = rrd_batch_query(batch, lql_columns)
+
+    with sites.only_sites(batch.site):
+        rows = sites.live().query(query)
+
+    fetched: Dict[Tuple[str, str], List[Tuple[RRDEntry, Any]]] = {}
+    for row in rows:
+        if batch.services[0][1] == "_HOST_":
+            service, data = (row[0], "_HOST_"), row[1:]
+        else:
+            service, data = (row[0], row[1]), row[2:]
+        fetched[service] = list(zip(batch.entries, data))
+    return fetched
+
+
+def fetch_rrd_data_batch_cached(
+        batch: RRDFetchBatch, graph_recipe, graph_data_range,
+        cache: rrd_cache.RRDCache) -> Tuple[Dict[Tuple[str, str], List[Tuple[RRDEntry, Any]]], int]:
+    """Like fetch_rrd_data_batch, but only fetch what is missing in the cache
+
+    If all columns of the batch are cached, only the tail since the end of
+    the cached data is fetched, otherwise the whole time range. Returns the
+    data and the number of columns served from the cache."""
+    start_time, end_time = graph_data_range["time_range"]
+    rrd_consolidation = graph_recipe["consolidation_function"]
+    columns = {(host_name, service_description, entry):
+               (batch.site, host_name, service_description, entry[0], rrd_consolidation or
+                entry[1] or "max", entry[2]) for host_name, service_description in batch.services
+               for entry in batch.entries}
+    step = graph_data_range["step"]
+    cached = cache.load(list(columns.values()), step, start_time)
+
+    if len(cached) == len(columns):
+        fetch_start = min(rrd_cache.tail_start(data) for _created, data in cached.values())
+        if fetch_start < end_time:
+            tail_range = dict(graph_data_range, time_range=(fetch_start, end_time))
+            merged = _merge_cached(columns, cached,
+                                   fetch_rrd_data_batch(batch, graph_recipe, tail_range),
+                                   start_time)
+            if merged is not None:
+                fetched, to_cache, points_fetched = merged
+                cache.save(to_cache, step, len(to_cache), 0, points_fetched)
+                return fetched, len(to_cache)
+
+    fetched = fetch_rrd_data_batch(batch, graph_recipe, graph_data_range)
+    now = time.time()
+    to_cache = {
+        columns[service + (entry,)]: (now, data) for service, rows in fetched.items()
+        for entry, data in rows
+        if isinstance(data, list) and len(data) >= 3
+    }
+    cache.save(to_cache, step, 0, len(to_cache),
+               sum(len(data) - 3 for _now, data in to_cache.values()))
+    return fetched, 0
+
+
+def _merge_cached(columns, cached, tails, start_time):
+    fetched: Dict[Tuple[str, str], List[Tuple[RRDEntry, Any]]] = {}
+    to_cache = {}
+    points_fetched = 0
+    for service, rows in tails.items():
+        fetched[service] = []
+        for entry, tail in rows:
+            column = columns[service + (entry,)]
+            created, data = cached[column]
+            merged = rrd_cache.merge(data, tail, start_time) if tail else None
+            if merged is None:
+                return None
+            fetched[service].append((entry, merged))
+            to_cache[column] = (created, merged)
+            points_fetched += len(tail) - 3
+    return fetched, to_cache, points_fetched
 
 
 def rrd_columns(metrics: List[Tuple[str, Optional[str], float]], rrd_consolidation: str,
@@ -212,7 +356,6 @@ def merge_multicol(row: Dict, rrdcols: List[ColumnName], params: Dict) -> TimeSe
     if not relevant_ts:
         return TimeSeries([0, 0, 0])
 
-    _op_title, op_func = ts.time_series_operators()['MERGE']
-    single_value_series = [ts.op_func_wrapper(op_func, tsp) for tsp in zip(*relevant_ts)]
-
-    return TimeSeries(single_value_series)
+    merged = ts.time_series_math("MERGE", [TimeSeries(data) for data in relevant_ts])
+    assert merged is not None
+    return merged
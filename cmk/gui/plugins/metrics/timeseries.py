@@ -6,9 +6,11 @@
 
 import operator
 import functools
-from typing import List, Literal, Optional
+from typing import Callable, Dict, List, Literal, Optional
 from itertools import chain
 
+import numpy as np  # type: ignore[import]
+
 from cmk.utils.prediction import TimeSeries
 import cmk.utils.version as cmk_version
 import cmk.gui.escaping as escaping
@@ -106,10 +108,10 @@ def evaluate_time_series_expression(expression, rrd_data) -> List[TimeSeries]:
         key = tuple(expression[1:])
         if key in rrd_data:
             return [rrd_data[key]]
-        return [TimeSeries([None] * num_points, twindow)]
+        return [TimeSeries(np.full(num_points, np.nan), twindow)]
 
     if expression[0] == "constant":
-        return [TimeSeries([expression[1]] * num_points, twindow)]
+        return [TimeSeries(np.full(num_points, float(expression[1])), twindow)]
 
     if expression[0] == "combined":
         metrics = resolve_combined_single_metric_spec(expression[1])
@@ -140,10 +142,13 @@ def time_series_math(operator_id: Literal["+", "*", "-", "/", "MAX", "MIN", "AVE
         # Silently return so to get an empty graph slot
         return None
 
-    _op_title, op_func = operators[operator_id]
     twindow = operands_evaluated[0].twindow
+    # One row per operand, like zip() the points beyond the shortest one are ignored
+    num_points = min(len(ts) for ts in operands_evaluated)
+    points = np.stack([ts.array[:num_points] for ts in operands_evaluated])
 
-    return TimeSeries([op_func_wrapper(op_func, tsp) for tsp in zip(*operands_evaluated)], twindow)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        return TimeSeries(_vectorized_operators[operator_id](points), twindow)
 
 
 def op_func_wrapper(op_func, tsp):
@@ -206,3 +211,38 @@ def time_series_operators():
         "AVERAGE": (_("Average"), time_series_operator_average),
         "MERGE": ("First non None", lambda x: next(iter(clean_time_series_point(x)))),
     }
+
+
+# The operators on all points of the operands at once, missing values are NaN. They give
+# the same results as the point wise operators above.
+def _all_missing(points: np.ndarray) -> np.ndarray:
+    return np.isnan(points).all(axis=0)
+
+
+def _vectorized_sum(points: np.ndarray) -> np.ndarray:
+    return np.where(_all_missing(points), np.nan, np.nansum(points, axis=0))
+
+
+def _vectorized_fraction(points: np.ndarray) -> np.ndarray:
+    return np.where(points[1] == 0, np.nan, points[0] / points[1])
+
+
+def _vectorized_average(points: np.ndarray) -> np.ndarray:
+    return np.nansum(points, axis=0) / (~np.isnan(points)).sum(axis=0)
+
+
+def _vectorized_merge(points: np.ndarray) -> np.ndarray:
+    first_present = np.argmax(~np.isnan(points), axis=0)
+    return points[first_present, np.arange(points.shape[1])]
+
+
+_vectorized_operators: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "+": _vectorized_sum,
+    "*": lambda points: np.prod(points, axis=0),
+    "-": lambda points: points[0] - points[1],
+    "/": _vectorized_fraction,
+    "MAX": lambda points: np.fmax.reduce(points, axis=0),
+    "MIN": lambda points: np.fmin.reduce(points, axis=0),
+    "AVERAGE": _vectorized_average,
+    "MERGE": _vectorized_merge,
+}
@@ -815,11 +815,12 @@ class RowTableLivestatus(RowTable):
 def query_livestatus(query: LivestatusQuery, only_sites: OnlySites, limit: Optional[int],
                      auth_domain: str) -> List[LivestatusRow]:
 
-    if all((
-            config.debug_livestatus_queries,
-            html.output_format == "html",
-            display_options.enabled(display_options.W),
-    )):
+    debug = all((
+        config.debug_livestatus_queries,
+        html.output_format == "html",
+        display_options.enabled(display_options.W),
+    ))
+    if debug:
         html.open_div(class_=["livestatus", "message"])
         html.tt(query.replace('\n', '<br>\n'))
         html.close_div()
@@ -830,9 +831,31 @@ def query_livestatus(query: LivestatusQuery, only_sites: OnlySites, limit: Optio
 
     sites.live().set_auth_domain("read")
 
+    if debug:
+        _show_livestatus_query_stats()
+
     return data
 
 
+def _show_livestatus_query_stats() -> None:
+    """Show the response times and sizes of the sites to the last query"""
+    query_stats = sites.live().query_stats
+    if not query_stats:
+        return
+
+    html.open_div(class_=["livestatus", "message"])
+    for site_id, stats in sorted(query_stats.items()):
+        html.tt(
+            _("%s: first byte after %s, complete after %s, %s") % (
+                site_id,
+                cmk.utils.render.approx_age(stats.latency),
+                cmk.utils.render.approx_age(stats.duration),
+                cmk.utils.render.fmt_bytes(stats.bytes_received),
+            ))
+        html.br()
+    html.close_div()
+
+
 # TODO: Return value of render() could be cleaned up e.g. to a named tuple with an
 # optional CSS class. A lot of painters don't specify CSS classes.
 # TODO: Since we have the reporting also working with the painters it could be useful
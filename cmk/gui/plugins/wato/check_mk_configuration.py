@@ -232,6 +232,10 @@ class ConfigVariableLogLevels(ConfigVariable):
                "can use this log level to individually enable more detailed logging for the "
                "background jobs.")),
             ("cmk.web.slow-views", _("Slow views"), _slow_view_logging_help()),
+            ("cmk.web.graphs", _("Graphs"),
+             _("In the debug level, the livestatus queries fetching the RRD data of the graphs "
+               "are logged with the number of services and the time they took per query and "
+               "per site.")),
         ]:
             elements.append((level_id,
                              LogLevelChoice(
@@ -332,7 +336,8 @@ class ConfigVariableDebugLivestatusQueries(ConfigVariable):
             title=_("Debug Livestatus queries"),
             label=_("enable debug of Livestatus queries"),
             help=_("With this option turned on all Livestatus queries made by Multisite "
-                   "in order to render views are being displayed."),
+                   "in order to render views are being displayed, together with the response "
+                   "time and size of every site."),
         )
 
 
@@ -615,6 +620,29 @@ class ConfigVariableBIDefaultLayout(ConfigVariable):
         return [("round", _("Round")), ("straight", _("Straight")), ('elbow', _("Elbow"))]
 
 
+@config_variable_registry.register
+class ConfigVariableBICompilationProcesses(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupUserInterface
+
+    def domain(self):
+        return ConfigDomainGUI
+
+    def ident(self):
+        return "bi_compilation_processes"
+
+    def valuespec(self):
+        return Integer(
+            title=_("BI compilation processes"),
+            help=_("Number of processes used to compile the BI aggregations after changes of "
+                   "the BI configuration or of the monitored hosts and services. The "
+                   "aggregation packs are compiled in parallel when using more than one "
+                   "process. This speeds up the compilation of large BI configurations on "
+                   "systems with multiple CPU cores."),
+            minvalue=1,
+        )
+
+
 @config_variable_registry.register
 class ConfigVariablePagetitleDateFormat(ConfigVariable):
     def group(self):
@@ -2334,6 +2362,30 @@ class ConfigVariableSimulationMode(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableUseBinaryValueStore(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self):
+        return ConfigDomainCore
+
+    def ident(self):
+        return "use_binary_value_store"
+
+    def valuespec(self):
+        return Checkbox(
+            title=_("Binary storage of counters"),
+            label=_("Store the counters of the checks in binary format"),
+            help=_("The checks keep counters and other values of a host between two check "
+                   "executions. By default all of them are written after every check of the "
+                   "host. If you enable this option, they are stored in a binary format and "
+                   "only the changed values are written. This reduces the load for hosts with "
+                   "many counters, e.g. switches with thousands of interfaces. The existing "
+                   "counters are converted when the host is checked the next time."),
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableRestartLocking(ConfigVariable):
     def group(self):
@@ -2429,6 +2481,29 @@ class ConfigVariableClusterMaxCachefileAge(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableMaxConcurrentFetchers(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self):
+        return ConfigDomainCore
+
+    def ident(self):
+        return "max_concurrent_fetchers"
+
+    def valuespec(self):
+        return Integer(
+            title=_("Maximum concurrent data sources per host"),
+            help=_("The number of data sources of a host, e.g. the agent and SNMP, that "
+                   "the fetcher of the Checkmk Micro Core queries at the same time. "
+                   "With the default of 1 the data sources are queried one after another. "
+                   "The timeout of the host is shared among the data sources that have "
+                   "to wait for each other."),
+            minvalue=1,
+        )
+
+
 @config_variable_registry.register
 class ConfigVariablePiggybackMaxCachefileAge(ConfigVariable):
     def group(self):
@@ -2508,6 +2583,8 @@ def transform_snmp_backend_default_forth(backend):
         return SNMPBackendEnum.PYSNMP
     if backend in [False, "classic"]:
         return SNMPBackendEnum.CLASSIC
+    if backend == "async":
+        return SNMPBackendEnum.ASYNC
     raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
 
@@ -2518,6 +2595,8 @@ def transform_snmp_backend_back(backend):
         return "classic"
     if backend == SNMPBackendEnum.INLINE:
         return "inline"
+    if backend == SNMPBackendEnum.ASYNC:
+        return "async"
     raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
 
@@ -2540,6 +2619,7 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                     (SNMPBackendEnum.CLASSIC, _("Use Classic SNMP Backend")),
                     (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
                     (SNMPBackendEnum.PYSNMP, _("Use Inline SNMP (PySNMP) Backend (experimental)")),
+                    (SNMPBackendEnum.ASYNC, _("Use Asynchronous SNMP Backend (experimental)")),
                 ],
                 help=
                 _("By default Checkmk uses command line calls of Net-SNMP tools like snmpget or "
@@ -2548,7 +2628,9 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                   "which calls the respective libraries directly via its python bindings. This "
                   "should increase the performance of SNMP checks in a significant way. Both "
                   "SNMP modes are features which improve the performance for large installations and are "
-                  "only available via our subscription."),
+                  "only available via our subscription. The asynchronous SNMP backend sends the "
+                  "requests of SNMP v1 and v2c hosts itself and walks several OIDs at the same "
+                  "time. SNMPv3 hosts are queried with the classic backend."),
             ),
             forth=transform_snmp_backend_default_forth,
             back=transform_snmp_backend_back,
@@ -4489,6 +4571,8 @@ def transform_snmp_backend_hosts_forth(backend):
         return SNMPBackendEnum.PYSNMP
     if backend in [True, "classic"]:
         return SNMPBackendEnum.CLASSIC
+    if backend == "async":
+        return SNMPBackendEnum.ASYNC
     raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
 
@@ -4500,6 +4584,7 @@ def _valuespec_snmp_backend():
                 (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
                 (SNMPBackendEnum.PYSNMP, _("Use Inline SNMP (PySNMP) Backend (experimental)")),
                 (SNMPBackendEnum.CLASSIC, _("Use Classic Backend")),
+                (SNMPBackendEnum.ASYNC, _("Use Asynchronous SNMP Backend (experimental)")),
             ],
         ),
         forth=transform_snmp_backend_hosts_forth,
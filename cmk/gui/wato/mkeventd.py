@@ -3778,6 +3778,32 @@ class ConfigVariableEventConsoleEventSocketQueueLength(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableEventConsoleMessageQueueLength(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupEventConsoleGeneric
+
+    def domain(self):
+        return ConfigDomainEventConsole
+
+    def ident(self):
+        return "message_queue_len"
+
+    def valuespec(self):
+        return Integer(
+            title=_("Max. number of queued messages"),
+            help=_("The Event Console reads the received messages in bulk and queues them "
+                   "until they are processed. When the queue is full, the pipe and the "
+                   "stream sockets are not read anymore and the messages received via the "
+                   "builtin syslog server (UDP) are dropped. The rate of dropped messages "
+                   "and the latency of the queue are shown by the service \"OMD [SITE] "
+                   "Event Console\"."),
+            minvalue=1,
+            label="max.",
+            unit=_("messages"),
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableEventConsoleTranslateSNMPTraps(ConfigVariable):
     def group(self):
@@ -7,7 +7,8 @@
 import os
 import re
 import pprint
-from typing import Any, Dict, cast, Container, List, Optional, Tuple
+import itertools
+from typing import Any, Dict, cast, Container, Iterator, List, Optional, Set, Tuple
 
 from cmk.utils.type_defs import (
     Labels,
@@ -56,6 +57,9 @@ config.register_post_config_load_hook(cmk.base.export.reset_config)
 # to_config_with_folder_macro() for further information.
 _FOLDER_PATH_MACRO = "%#%FOLDER_PATH%#%"
 
+# Makes the IDs of the rulesets compiled for the rule analysis unique within the process
+_compilation_counter = itertools.count()
+
 
 class RuleConditions:
     def __init__(
@@ -423,6 +427,11 @@ class Ruleset:
         # Temporary needed during search result processing
         self.search_matching_rules = []
 
+        # The rules compiled for the ruleset matcher and the matching rules of the
+        # objects analysed with them, see _compiled_rules()
+        self._compiled: Optional[Tuple[Tuple[str, str, int], List[RuleSpec]]] = None
+        self._matching_rule_ids: Dict[Tuple, Set[str]] = {}
+
         # Converts pre 1.6 tuple rulesets in place to 1.6+ format
         self.tuple_transformer = ruleset_matcher.RulesetToDictTransformer(
             tag_to_group_map=tag_to_group_map)
@@ -510,6 +519,7 @@ class Ruleset:
 
         # Resets the rules of this ruleset for this folder!
         self._rules[folder.path()] = []
+        self._invalidate_compiled_rules()
 
         self.tuple_transformer.transform_in_place(rules_config,
                                                   is_service=self.rulespec.is_for_services,
@@ -631,11 +641,16 @@ class Ruleset:
     def get_rule_by_id(self, rule_id: str) -> "Rule":
         return self._rules_by_id[rule_id]
 
+    def is_rule(self, rule: "Rule") -> bool:
+        """Whether or not the rule object is part of this ruleset"""
+        return self._rules_by_id.get(rule.id) is rule
+
     def edit_rule(self, orig_rule, rule):
         folder_rules = self._rules[orig_rule.folder.path()]
         index = folder_rules.index(orig_rule)
 
         folder_rules[index] = rule
+        self._rules_by_id[rule.id] = rule
 
         add_change("edit-rule",
                    _("Changed properties of rule #%d in ruleset \"%s\" in folder \"%s\"") %
@@ -665,6 +680,7 @@ class Ruleset:
         old_index = rules.index(rule)
         rules.remove(rule)
         rules.insert(index, rule)
+        self._invalidate_compiled_rules()
         add_change("edit-ruleset",
                    _("Moved rule %s from position #%d to #%d in ruleset \"%s\" in folder \"%s\"") %
                    (rule.id, old_index, index, self.title(), rule.folder.alias_path()),
@@ -703,22 +719,62 @@ class Ruleset:
         return self.rulespec.is_optional
 
     def _on_change(self):
+        self._invalidate_compiled_rules()
         if has_agent_bakery():
             import cmk.gui.cee.agent_bakery as agent_bakery  # pylint: disable=no-name-in-module
             agent_bakery.ruleset_changed(self.name)
 
+    def _compiled_rules(self) -> Tuple[Tuple[str, str, int], List[RuleSpec]]:
+        """The ID and the rules of this ruleset in the format of the ruleset matcher
+
+        The rules are only compiled once as long as the ruleset is not changed. Their
+        values are replaced by the rule IDs, the values the matcher returns are the IDs of
+        the matching rules. Rules changed in place (without the methods of the ruleset)
+        are not noticed."""
+        if self._compiled is None:
+            self._compiled = _compile_rules(self.name, [rule for _f, _i, rule in self.get_rules()])
+        return self._compiled
+
+    def _invalidate_compiled_rules(self) -> None:
+        self._compiled = None
+        self._matching_rule_ids.clear()
+
+    def matching_rule_ids(self,
+                          host_folder,
+                          hostname,
+                          svc_desc_or_item,
+                          svc_desc,
+                          only_host_conditions=False) -> Set[str]:
+        """The IDs of all enabled rules matching the given folder/host/item
+
+        With only_host_conditions only the host related conditions are evaluated, even if
+        the ruleset is a service ruleset."""
+        key = (host_folder.path(), hostname, svc_desc_or_item, svc_desc, only_host_conditions)
+        try:
+            return self._matching_rule_ids[key]
+        except KeyError:
+            pass
+
+        matching_rule_ids = _matching_rule_ids(self, self._compiled_rules(), host_folder, hostname,
+                                               svc_desc_or_item, svc_desc, only_host_conditions)
+        self._matching_rule_ids[key] = matching_rule_ids
+        return matching_rule_ids
+
     # Returns the outcoming value or None and a list of matching rules. These are pairs
     # of rule_folder and rule_number
     def analyse_ruleset(self, hostname, svc_desc_or_item, svc_desc):
         resultlist = []
         resultdict: Dict[str, Any] = {}
         effectiverules = []
+        matching_rule_ids: Optional[Set[str]] = None
         for folder, rule_index, rule in self.get_rules():
             if rule.is_disabled():
                 continue
 
-            if not rule.matches_host_and_item(Folder.current(), hostname, svc_desc_or_item,
-                                              svc_desc):
+            if matching_rule_ids is None:
+                matching_rule_ids = self.matching_rule_ids(Folder.current(), hostname,
+                                                           svc_desc_or_item, svc_desc)
+            if rule.id not in matching_rule_ids:
                 continue
 
             if self.match_type() == "all":
@@ -770,6 +826,63 @@ class Ruleset:
         return None, []  # No match
 
 
+def _compile_rules(ruleset_name: str,
+                   rules: List["Rule"]) -> Tuple[Tuple[str, str, int], List[RuleSpec]]:
+    compiled = []
+    for rule in rules:
+        rule_dict = rule.to_config()
+        rule_dict["condition"]["host_folder"] = rule.folder.path_for_rule_matching()
+        rule_dict["value"] = rule.id
+        compiled.append(rule_dict)
+    return ("rule_analysis", ruleset_name, next(_compilation_counter)), compiled
+
+
+def _matching_rule_ids(ruleset: Ruleset, compiled: Tuple[Tuple[str, str, int],
+                                                         List[RuleSpec]], host_folder, hostname,
+                       svc_desc_or_item, svc_desc, only_host_conditions) -> Set[str]:
+    host = host_folder.host(hostname)
+    if host is None:
+        raise MKGeneralException("Failed to get host from folder %r." % host_folder.path())
+
+    # BE AWARE: Depending on the service ruleset the service_description of
+    # the rules is only a check item or a full service description. For
+    # example the check parameters rulesets only use the item, and other
+    # service rulesets like disabled services ruleset use full service
+    # descriptions.
+    #
+    # The service_description attribute of the match_object must be set to
+    # either the item or the full service description, depending on the
+    # ruleset, but the labels of a service need to be gathered using the
+    # real service description.
+    if only_host_conditions:
+        match_object = ruleset_matcher.RulesetMatchObject(hostname)
+    elif ruleset.item_type() == "service":
+        match_object = cmk.base.export.ruleset_match_object_of_service(hostname, svc_desc_or_item)
+    elif ruleset.item_type() == "item":
+        match_object = cmk.base.export.ruleset_match_object_for_checkgroup_parameters(
+            hostname, svc_desc_or_item, svc_desc)
+    elif not ruleset.item_type():
+        match_object = ruleset_matcher.RulesetMatchObject(hostname)
+    else:
+        raise NotImplementedError()
+
+    # The matcher caches the preprocessed rules by the unique ID of the compilation, so the
+    # rules are preprocessed once and all of them are matched in one go
+    matcher = cmk.base.export.get_ruleset_matcher()
+    ruleset_id, rules = compiled
+    if ruleset.rulespec.is_for_services and not only_host_conditions:
+        return set(
+            matcher.get_service_ruleset_values(match_object,
+                                               rules,
+                                               is_binary=ruleset.rulespec.is_binary_ruleset,
+                                               ruleset_id=ruleset_id))
+    return set(
+        matcher.get_host_ruleset_values(match_object,
+                                        rules,
+                                        is_binary=ruleset.rulespec.is_binary_ruleset,
+                                        ruleset_id=ruleset_id))
+
+
 class Rule:
     @classmethod
     def create(cls, folder, ruleset):
@@ -905,72 +1018,21 @@ class Rule:
             host_folder, hostname, svc_desc_or_item, svc_desc, only_host_conditions=False))
 
     def get_mismatch_reasons(self, host_folder, hostname, svc_desc_or_item, svc_desc,
-                             only_host_conditions):
+                             only_host_conditions) -> Iterator[str]:
         """A generator that provides the reasons why a given folder/host/item not matches this rule"""
-        host = host_folder.host(hostname)
-        if host is None:
-            raise MKGeneralException("Failed to get host from folder %r." % host_folder.path())
-
-        # BE AWARE: Depending on the service ruleset the service_description of
-        # the rules is only a check item or a full service description. For
-        # example the check parameters rulesets only use the item, and other
-        # service rulesets like disabled services ruleset use full service
-        # descriptions.
-        #
-        # The service_description attribute of the match_object must be set to
-        # either the item or the full service description, depending on the
-        # ruleset, but the labels of a service need to be gathered using the
-        # real service description.
-        if only_host_conditions:
-            match_object = ruleset_matcher.RulesetMatchObject(hostname)
-        elif self.ruleset.item_type() == "service":
-            match_object = cmk.base.export.ruleset_match_object_of_service(
-                hostname, svc_desc_or_item)
-        elif self.ruleset.item_type() == "item":
-            match_object = cmk.base.export.ruleset_match_object_for_checkgroup_parameters(
-                hostname, svc_desc_or_item, svc_desc)
-        elif not self.ruleset.item_type():
-            match_object = ruleset_matcher.RulesetMatchObject(hostname)
+        if self.ruleset.is_rule(self):
+            matching_rule_ids = self.ruleset.matching_rule_ids(host_folder, hostname,
+                                                               svc_desc_or_item, svc_desc,
+                                                               only_host_conditions)
         else:
-            raise NotImplementedError()
-
-        match_service_conditions = self.ruleset.rulespec.is_for_services
-        if only_host_conditions:
-            match_service_conditions = False
-
-        for reason in self._get_mismatch_reasons_of_match_object(match_object,
-                                                                 match_service_conditions):
-            yield reason
-
-    def _get_mismatch_reasons_of_match_object(self, match_object, match_service_conditions):
-        matcher = cmk.base.export.get_ruleset_matcher()
-
-        rule_dict = self.to_config()
-        rule_dict["condition"]["host_folder"] = self.folder.path_for_rule_matching()
-
-        # The cache uses some id(ruleset) to build indexes for caches. When we are using
-        # dynamically allocated ruleset list objects, that are quickly invalidated, it
-        # may happen that the address space is reused for other objects, resulting in
-        # duplicate id() results for different rulesets (because ID returns the memory
-        # address the object is located at).
-        # Since we do not work with regular rulesets here, we need to clear the cache
-        # (that is not useful in this situation)
-        matcher.ruleset_optimizer.clear_ruleset_caches()
-
-        ruleset = [rule_dict]
-
-        if match_service_conditions:
-            if list(
-                    matcher.get_service_ruleset_values(
-                        match_object, ruleset, is_binary=self.ruleset.rulespec.is_binary_ruleset)):
-                return
-        else:
-            if list(
-                    matcher.get_host_ruleset_values(
-                        match_object, ruleset, is_binary=self.ruleset.rulespec.is_binary_ruleset)):
-                return
-
-        yield _("The rule does not match")
+            # E.g. a rule which is currently being edited
+            matching_rule_ids = _matching_rule_ids(self.ruleset,
+                                                   _compile_rules(self.ruleset.name,
+                                                                  [self]), host_folder, hostname,
+                                                   svc_desc_or_item, svc_desc, only_host_conditions)
+
+        if self.id not in matching_rule_ids:
+            yield _("The rule does not match")
 
     def matches_search(self, search_options):
         if "rule_folder" in search_options and self.folder.name() not in self._get_search_folders(
@@ -5,7 +5,17 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Provide methods to get an snmp table with or without caching
 """
-from typing import Callable, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from pathlib import Path
 from six import ensure_binary
@@ -119,6 +129,13 @@ def get_snmp_table(
     max_len = 0
     max_len_col = -1
 
+    rowinfos = _get_snmpwalks(
+        section_name,
+        tree,
+        walk_cache=walk_cache,
+        backend=backend,
+    )
+
     for oid in tree.oids:
         fetchoid: OID = "%s.%s" % (tree.base, oid.column)
         # column may be integer or string like "1.5.4.2.3"
@@ -138,14 +155,7 @@ def get_snmp_table(
             index_column = len(columns)
             index_format = oid.column
         else:
-            rowinfo = _get_snmpwalk(
-                section_name,
-                tree.base,
-                fetchoid,
-                walk_cache=walk_cache,
-                save_walk_cache=oid.save_to_cache,
-                backend=backend,
-            )
+            rowinfo = rowinfos[fetchoid]
             if len(rowinfo) > max_len:
                 max_len_col = len(columns)
 
@@ -228,40 +238,57 @@ def _key_oid_pairs(pair1: Tuple[OID, SNMPRawValue]) -> List[int]:
     return _oid_to_intlist(pair1[0].lstrip('.'))
 
 
-def _get_snmpwalk(
+def _get_snmpwalks(
     section_name: Optional[SectionName],
-    base: str,
-    fetchoid: OID,
+    tree: BackendSNMPTree,
     *,
     walk_cache: MutableMapping[str, Tuple[bool, SNMPRowInfo]],
-    save_walk_cache: bool,
     backend: SNMPBackend,
-) -> SNMPRowInfo:
-    try:
-        rowinfo = walk_cache[fetchoid][1]
-        console.vverbose(f"Already fetched OID: {fetchoid}\n")
-        return rowinfo
-    except KeyError:
-        pass
+) -> Dict[OID, SNMPRowInfo]:
+    rowinfos: Dict[OID, SNMPRowInfo] = {}
+    # The fetchoids to walk and whether or not to save them to the walk cache
+    missing: Dict[OID, bool] = {}
+    for oid in tree.oids:
+        if isinstance(oid.column, SpecialColumn):
+            continue
 
-    rowinfo = _perform_snmpwalk(section_name, base, fetchoid, backend=backend)
-    walk_cache[fetchoid] = (save_walk_cache, rowinfo)
-    return rowinfo
+        fetchoid: OID = "%s.%s" % (tree.base, oid.column)
+        if fetchoid in rowinfos or fetchoid in missing:
+            continue
 
+        try:
+            rowinfos[fetchoid] = walk_cache[fetchoid][1]
+            console.vverbose(f"Already fetched OID: {fetchoid}\n")
+        except KeyError:
+            missing[fetchoid] = oid.save_to_cache
 
-def _perform_snmpwalk(
+    if not missing:
+        return rowinfos
+
+    walked = _perform_snmpwalks(section_name, tree.base, list(missing), backend=backend)
+    for fetchoid, save_walk_cache in missing.items():
+        walk_cache[fetchoid] = (save_walk_cache, walked[fetchoid])
+        rowinfos[fetchoid] = walked[fetchoid]
+    return rowinfos
+
+
+def _perform_snmpwalks(
     section_name: Optional[SectionName],
     base_oid: str,
-    fetchoid: OID,
+    fetchoids: List[OID],
     *,
     backend: SNMPBackend,
-) -> SNMPRowInfo:
-    added_oids: Set[OID] = set([])
-    rowinfo: SNMPRowInfo = []
+) -> Dict[OID, SNMPRowInfo]:
+    """Walk the fetchoids in all SNMP contexts of the section
+
+    The backend is free to walk the columns of one context at the same time.
+    """
+    added_oids: Dict[OID, Set[OID]] = {fetchoid: set() for fetchoid in fetchoids}
+    rowinfos: Dict[OID, SNMPRowInfo] = {fetchoid: [] for fetchoid in fetchoids}
 
     for context_name in backend.config.snmpv3_contexts_of(section_name):
-        rows = backend.walk(
-            oid=fetchoid,
+        columns = backend.walk_columns(
+            fetchoids,
             # revert back to legacy "possilbly-empty-string"-Type
             # TODO: pass Optional[SectionName] along!
             check_plugin_name=str(section_name) if section_name else "",
@@ -269,23 +296,24 @@ def _perform_snmpwalk(
             context_name=context_name,
         )
 
-        # I've seen a broken device (Mikrotik Router), that broke after an
-        # update to RouterOS v6.22. It would return 9 time the same OID when
-        # .1.3.6.1.2.1.1.1.0 was being walked. We try to detect these situations
-        # by removing any duplicate OID information
-        if len(rows) > 1 and rows[0][0] == rows[1][0]:
-            console.vverbose("Detected broken SNMP agent. Ignoring duplicate OID %s.\n" %
-                             rows[0][0])
-            rows = rows[:1]
-
-        for row_oid, val in rows:
-            if row_oid in added_oids:
-                console.vverbose("Duplicate OID found: %s (%r)\n" % (row_oid, val))
-            else:
-                rowinfo.append((row_oid, val))
-                added_oids.add(row_oid)
-
-    return rowinfo
+        for fetchoid, rows in zip(fetchoids, columns):
+            # I've seen a broken device (Mikrotik Router), that broke after an
+            # update to RouterOS v6.22. It would return 9 time the same OID when
+            # .1.3.6.1.2.1.1.1.0 was being walked. We try to detect these situations
+            # by removing any duplicate OID information
+            if len(rows) > 1 and rows[0][0] == rows[1][0]:
+                console.vverbose("Detected broken SNMP agent. Ignoring duplicate OID %s.\n" %
+                                 rows[0][0])
+                rows = rows[:1]
+
+            for row_oid, val in rows:
+                if row_oid in added_oids[fetchoid]:
+                    console.vverbose("Duplicate OID found: %s (%r)\n" % (row_oid, val))
+                else:
+                    rowinfos[fetchoid].append((row_oid, val))
+                    added_oids[fetchoid].add(row_oid)
+
+    return rowinfos
 
 
 def _sanitize_snmp_encoding(columns: ResultColumnsSanitized,
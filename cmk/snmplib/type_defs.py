@@ -87,6 +87,7 @@ class SNMPBackendEnum(enum.Enum):
     INLINE = "Inline"
     PYSNMP = "PySNMP"
     CLASSIC = "Classic"
+    ASYNC = "Async"
 
     def serialize(self) -> str:
         return self.name
@@ -205,6 +206,25 @@ class SNMPBackend(metaclass=abc.ABCMeta):
              context_name: Optional[SNMPContextName] = None) -> SNMPRowInfo:
         return []
 
+    def walk_columns(self,
+                     oids: Sequence[OID],
+                     check_plugin_name: Optional[_CheckPluginName] = None,
+                     table_base_oid: Optional[OID] = None,
+                     context_name: Optional[SNMPContextName] = None) -> List[SNMPRowInfo]:
+        """Walk the columns of a table
+
+        Backends which are able to walk several OIDs at the same time override this.
+        """
+        return [
+            self.walk(oid,
+                      check_plugin_name=check_plugin_name,
+                      table_base_oid=table_base_oid,
+                      context_name=context_name) for oid in oids
+        ]
+
+    def close(self) -> None:
+        """Release the resources (e.g. sockets) held by the backend"""
+
 
 class SpecialColumn(enum.IntEnum):
     # Until we remove all but the first, its worth having an enum
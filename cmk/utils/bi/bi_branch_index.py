@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Inverted indexes of the branches of the compiled aggregations
+
+The compiler indexes the branches of each aggregation it compiles, merges the
+indexes of all aggregations and saves the result next to the compiled
+aggregations. The computer uses it to find the branches matching a filter
+without testing every branch."""
+
+import bisect
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from cmk.utils.type_defs import HostName, ServiceName
+from cmk.utils.bi.bi_trees import BICompiledAggregation
+
+
+class BIAggregationIndex(NamedTuple):
+    """The branch positions of a single aggregation"""
+    digest: str  # Of the compiled aggregation file, identifies the indexed branches
+    num_branches: int
+    hosts: Dict[HostName, List[int]]
+    services: Dict[ServiceName, List[int]]
+    titles: Dict[str, List[int]]
+    group_names: List[str]  # Paths are also available as names
+    group_paths: List[str]
+
+
+def index_aggregation(compiled_aggregation: BICompiledAggregation,
+                      digest: str) -> BIAggregationIndex:
+    hosts: Dict[HostName, List[int]] = {}
+    services: Dict[ServiceName, List[int]] = {}
+    titles: Dict[str, List[int]] = {}
+    for nr, branch in enumerate(compiled_aggregation.branches):
+        required_elements = branch.required_elements()
+        for host_name in {x.host_name for x in required_elements}:
+            hosts.setdefault(host_name, []).append(nr)
+        for service_description in {
+                x.service_description
+                for x in required_elements
+                if x.service_description is not None
+        }:
+            services.setdefault(service_description, []).append(nr)
+        titles.setdefault(branch.properties.title, []).append(nr)
+
+    group_paths = ["/".join(x) for x in compiled_aggregation.groups.paths]
+    return BIAggregationIndex(
+        digest=digest,
+        num_branches=len(compiled_aggregation.branches),
+        hosts=hosts,
+        services=services,
+        titles=titles,
+        group_names=sorted(set(compiled_aggregation.groups.names + group_paths)),
+        group_paths=group_paths,
+    )
+
+
+class BIBranchIndex:
+    """The branches of all aggregations by host, service, title and group
+
+    The branches are numbered consecutively over all aggregations, this keeps
+    the index small and fast to load."""
+    def __init__(self, aggregation_indexes: Dict[str, BIAggregationIndex]):
+        super().__init__()
+        self._aggr_ids: List[str] = []
+        self._digests: Dict[str, str] = {}
+        self._offsets: List[int] = []
+        self._hosts: Dict[HostName, List[int]] = {}
+        self._services: Dict[ServiceName, List[int]] = {}
+        self._titles: Dict[str, List[int]] = {}
+        self._group_names: Dict[str, List[str]] = {}
+        group_paths: List[Tuple[str, str]] = []
+
+        offset = 0
+        for aggr_id, index in aggregation_indexes.items():
+            self._aggr_ids.append(aggr_id)
+            self._digests[aggr_id] = index.digest
+            self._offsets.append(offset)
+            self._add_branches(self._hosts, offset, index.hosts)
+            self._add_branches(self._services, offset, index.services)
+            self._add_branches(self._titles, offset, index.titles)
+            for group_name in index.group_names:
+                self._group_names.setdefault(group_name, []).append(aggr_id)
+            group_paths.extend((group_path, aggr_id) for group_path in index.group_paths)
+            offset += index.num_branches
+        self._offsets.append(offset)
+        self._group_paths = sorted(group_paths)
+
+    @staticmethod
+    def _add_branches(branches: Dict[str, List[int]], offset: int,
+                      positions: Dict[str, List[int]]) -> None:
+        for key, nrs in positions.items():
+            branches.setdefault(key, []).extend(offset + nr for nr in nrs)
+
+    def digests(self) -> Dict[str, str]:
+        """The digests of the indexed aggregations"""
+        return self._digests
+
+    def num_branches(self) -> Dict[str, int]:
+        """The number of branches of the indexed aggregations"""
+        return {
+            aggr_id: self._offsets[index + 1] - self._offsets[index]
+            for index, aggr_id in enumerate(self._aggr_ids)
+        }
+
+    def branches_of_hosts(self, host_names: Iterable[HostName]) -> Set[int]:
+        return self._union(self._hosts, host_names)
+
+    def branches_of_services(self, service_descriptions: Iterable[ServiceName]) -> Set[int]:
+        return self._union(self._services, service_descriptions)
+
+    def branches_with_titles(self, titles: Iterable[str]) -> Set[int]:
+        return self._union(self._titles, titles)
+
+    def aggregations_of_groups(self, group_names: Iterable[str]) -> Set[str]:
+        return self._union(self._group_names, group_names)
+
+    def aggregations_with_group_path_prefix(self, prefixes: Iterable[str]) -> Set[str]:
+        aggr_ids = set()
+        for prefix in prefixes:
+            # The paths starting with the prefix follow it in the sorted paths
+            index = bisect.bisect_left(self._group_paths, (prefix,))
+            while index < len(self._group_paths) and self._group_paths[index][0].startswith(prefix):
+                aggr_ids.add(self._group_paths[index][1])
+                index += 1
+        return aggr_ids
+
+    def positions(self, branches: Iterable[int]) -> Dict[str, List[int]]:
+        """The positions of the branches in their aggregations"""
+        positions: Dict[str, List[int]] = {}
+        for branch in sorted(branches):
+            index = bisect.bisect_right(self._offsets, branch) - 1
+            positions.setdefault(self._aggr_ids[index], []).append(branch - self._offsets[index])
+        return positions
+
+    @staticmethod
+    def _union(index: Dict, keys: Iterable) -> Set:
+        result: Set = set()
+        for key in keys:
+            result.update(index.get(key, ()))
+        return result
@@ -4,6 +4,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import hashlib
+import math
+import multiprocessing
 import pickle
 import time
 import cmk
@@ -15,11 +18,15 @@ from typing import (
     Optional,
     TypedDict,
     List,
+    NamedTuple,
+    Tuple,
 )
 
 from cmk.utils.log import logger
+from cmk.utils.type_defs import HostName
+from cmk.utils.bi.bi_actions import BICallARuleAction
 from cmk.utils.bi.bi_packs import BIAggregationPacks
-from cmk.utils.bi.bi_searcher import BISearcher
+from cmk.utils.bi.bi_searcher import BIHostChange, BISearcher, BIStructureDependencies
 from cmk.utils.bi.bi_data_fetcher import (
     BIStructureFetcher,
     get_cache_dir,
@@ -31,8 +38,10 @@ from cmk.utils.exceptions import MKGeneralException
 
 from cmk.utils.i18n import _
 from cmk.utils.bi.bi_trees import BICompiledAggregation
+from cmk.utils.bi.bi_branch_index import BIAggregationIndex, BIBranchIndex, index_aggregation
 from cmk.utils.bi.bi_aggregation import BIAggregation
-from cmk.utils.bi.bi_lib import SitesCallback
+from cmk.utils.bi.bi_rule import BIRule
+from cmk.utils.bi.bi_lib import BIHostData, SitesCallback
 
 from cmk.utils.redis import get_redis_client
 if TYPE_CHECKING:
@@ -45,17 +54,52 @@ class ConfigStatus(TypedDict):
     online_sites: Set[SiteProgramStart]
 
 
+class AggregationDependencies(NamedTuple):
+    config: str  # Digest of the aggregation and the rules it calls
+    structure: BIStructureDependencies
+    titles: List[str]
+
+
+class CompilationDependencies(TypedDict):
+    program_starts: Set[SiteProgramStart]
+    hosts: Dict[HostName, Tuple[str, str]]  # Digest and alias of the structure data
+    aggregations: Dict[str, AggregationDependencies]
+
+
+# The structure dependencies and branch titles of the compiled aggregations
+CompilationResult = Dict[str, Tuple[BIStructureDependencies, List[str]]]
+
+# The compiler of the parent process, shared with the forked worker processes
+_worker_compiler: Optional["BICompiler"] = None
+
+
+def _init_compilation_worker(compiler: "BICompiler") -> None:
+    global _worker_compiler
+    _worker_compiler = compiler
+
+
+def _compile_in_worker(task: Tuple[str, List[str]]) -> Tuple[str, CompilationResult, float]:
+    assert _worker_compiler is not None
+    return _worker_compiler._compile_aggregations(*task)
+
+
 class BICompiler:
-    def __init__(self, bi_configuration_file, sites_callback: SitesCallback):
+    def __init__(self, bi_configuration_file, sites_callback: SitesCallback, processes: int = 1):
         self._sites_callback = sites_callback
         self._bi_configuration_file = bi_configuration_file
+        self._processes = processes
 
         self._logger = logger.getChild("bi.compiler")
         self._compiled_aggregations: Dict[str, BICompiledAggregation] = {}
+        self._compiled_aggregation_digests: Dict[str, str] = {}
         self._path_compilation_lock = Path(get_cache_dir(), "compilation.LOCK")
         self._path_compilation_timestamp = Path(get_cache_dir(), "last_compilation")
         self._path_compiled_aggregations = Path(get_cache_dir(), "compiled_aggregations")
         self._path_compiled_aggregations.mkdir(parents=True, exist_ok=True)
+        self._path_compilation_dependencies = Path(get_cache_dir(), "compilation_dependencies")
+        self._path_aggregation_indexes = Path(get_cache_dir(), "aggregation_indexes")
+        self._path_branch_index = Path(get_cache_dir(), "branch_index")
+        self._branch_index: Optional[BIBranchIndex] = None
 
         self._redis_client: Optional['RedisDecoded'] = None
         self._setup()
@@ -69,8 +113,20 @@ class BICompiler:
     def compiled_aggregations(self) -> Dict[str, BICompiledAggregation]:
         return self._compiled_aggregations
 
+    @property
+    def compiled_aggregation_digests(self) -> Dict[str, str]:
+        """The digests of the compiled aggregation files, they change with every compilation"""
+        return self._compiled_aggregation_digests
+
+    @property
+    def branch_index(self) -> Optional[BIBranchIndex]:
+        """The index of the branches of the compiled aggregations"""
+        return self._branch_index
+
     def cleanup(self) -> None:
         self._compiled_aggregations.clear()
+        self._compiled_aggregation_digests.clear()
+        self._branch_index = None
 
     def load_compiled_aggregations(self) -> None:
         try:
@@ -79,16 +135,15 @@ class BICompiler:
             self._load_compiled_aggregations()
 
     def _load_compiled_aggregations(self) -> None:
-        for path_object in self._path_compiled_aggregations.iterdir():
-            if path_object.is_dir():
-                continue
-            aggr_id = path_object.name
-            if aggr_id.endswith(".new") or aggr_id in self._compiled_aggregations:
+        for aggr_id in self._get_compiled_aggregation_ids():
+            if aggr_id in self._compiled_aggregations:
                 continue
 
             self._logger.debug("Loading cached aggregation results %s" % aggr_id)
-            aggr_data = self._load_data(str(path_object))
-            self._compiled_aggregations[aggr_id] = BIAggregation.create_trees_from_schema(aggr_data)
+            self._add_compiled_aggregation(aggr_id)
+
+        if self._branch_index is None:
+            self._branch_index = self._load_branch_index()
 
     def _check_compilation_status(self) -> None:
         current_configstatus = self.compute_current_configstatus()
@@ -105,24 +160,7 @@ class BICompiler:
                 return
 
             self.prepare_for_compilation(current_configstatus["online_sites"])
-
-            # Compile the raw tree
-            for aggregation in self._bi_packs.get_all_aggregations():
-                start = time.time()
-                self._compiled_aggregations[aggregation.id] = aggregation.compile(self.bi_searcher)
-                self._logger.debug("Compilation of %s took %f" %
-                                   (aggregation.id, time.time() - start))
-
-            self._verify_aggregation_title_uniqueness(self._compiled_aggregations)
-
-            for aggr_id, aggr in self._compiled_aggregations.items():
-                start = time.time()
-                result = aggr.serialize()
-                self._logger.debug("Schema dump %s took config took %f (%d branches)" %
-                                   (aggr_id, time.time() - start, len(aggr.branches)))
-                self._save_data(self._path_compiled_aggregations.joinpath(aggr_id), result)
-
-            self._generate_part_of_aggregation_lookup(self._compiled_aggregations)
+            self._compile_outdated_aggregations(current_configstatus["online_sites"])
 
         known_sites = {kv[0]: kv[1] for kv in current_configstatus.get("known_sites", set())}
         self._cleanup_vanished_aggregations()
@@ -130,20 +168,273 @@ class BICompiler:
         store.save_text_to_file(str(self._path_compilation_timestamp),
                                 str(current_configstatus["configfile_timestamp"]))
 
+    def _compile_outdated_aggregations(self, online_sites: Set[SiteProgramStart]) -> None:
+        """Compiles the aggregations affected by the changes since the last compilation
+
+        The dependencies of each compiled aggregation are saved: the digest of its
+        configuration and of the rules it calls, and the parts of the host structure
+        its searches used. The compiled aggregations of the others are kept."""
+        dependencies = self._load_dependencies()
+        aggregations = {
+            aggregation.id: aggregation for aggregation in self._bi_packs.get_all_aggregations()
+        }
+
+        host_changes: List[BIHostChange] = []
+        hosts = dependencies["hosts"]
+        if dependencies["program_starts"] != online_sites:
+            hosts = self._host_digests(self._bi_structure_fetcher.hosts)
+            host_changes = self._host_changes(dependencies["hosts"], hosts)
+
+        compiled_aggregations = set(self._get_compiled_aggregation_ids())
+        new_dependencies: CompilationDependencies = {
+            "program_starts": online_sites,
+            "hosts": hosts,
+            "aggregations": {},
+        }
+        rules = {bi_rule.id: bi_rule for bi_rule in self._bi_packs.get_all_rules()}
+        rule_configs: Dict[str, Dict] = {}
+        outdated: Dict[str, str] = {}
+        for aggr_id, aggregation in aggregations.items():
+            config = self._config_digest(aggregation, rules, rule_configs)
+            aggr_dependencies = dependencies["aggregations"].get(aggr_id)
+            if (aggr_dependencies is None or aggr_dependencies.config != config or
+                    aggr_id not in compiled_aggregations or
+                    aggr_dependencies.structure.is_affected_by(host_changes)):
+                outdated[aggr_id] = config
+            else:
+                new_dependencies["aggregations"][aggr_id] = aggr_dependencies
+
+        self._logger.debug("Compiling %d of %d aggregations (%d hosts changed)" %
+                           (len(outdated), len(aggregations), len(host_changes)))
+
+        for aggr_id, (structure, titles) in self._compile_packs(aggregations,
+                                                                list(outdated)).items():
+            new_dependencies["aggregations"][aggr_id] = AggregationDependencies(
+                outdated[aggr_id], structure, titles)
+
+        self._verify_aggregation_title_uniqueness(
+            {aggr_id: new_dependencies["aggregations"][aggr_id].titles for aggr_id in aggregations})
+
+        # The previous results are needed to update the lookup
+        previously_compiled: Dict[str, BICompiledAggregation] = {}
+        if len(outdated) < len(aggregations):
+            for aggr_id in compiled_aggregations - (set(aggregations) - set(outdated)):
+                previously_compiled[aggr_id] = self._load_compiled_aggregation(aggr_id)[0]
+
+        for aggr_id in outdated:
+            path = self._path_compiled_aggregations.joinpath(aggr_id)
+            path.with_name(path.name + ".new").replace(path)
+            if aggr_id not in self._compiled_aggregations:
+                # Compiled by a worker process
+                self._add_compiled_aggregation(aggr_id)
+
+        if len(outdated) < len(aggregations):
+            self._update_part_of_aggregation_lookup(
+                previously_compiled,
+                {aggr_id: self._compiled_aggregations[aggr_id] for aggr_id in outdated})
+        else:
+            self._generate_part_of_aggregation_lookup(self._compiled_aggregations)
+
+        self._save_aggregation_indexes(aggregations, outdated)
+        self._save_data(self._path_compilation_dependencies, new_dependencies)
+
+    def _save_aggregation_indexes(self, aggregations: Dict[str, BIAggregation],
+                                  outdated: Dict[str, str]) -> None:
+        previous_indexes = self._load_aggregation_indexes(
+        ) if len(outdated) < len(aggregations) else {}
+        aggregation_indexes: Dict[str, BIAggregationIndex] = {}
+        for aggr_id in aggregations:
+            index = previous_indexes.get(aggr_id)
+            if aggr_id in outdated or index is None:
+                if aggr_id not in self._compiled_aggregations:
+                    self._add_compiled_aggregation(aggr_id)
+                index = index_aggregation(self._compiled_aggregations[aggr_id],
+                                          self._compiled_aggregation_digests[aggr_id])
+            aggregation_indexes[aggr_id] = index
+        self._branch_index = BIBranchIndex(aggregation_indexes)
+        self._save_data(self._path_aggregation_indexes, aggregation_indexes)
+        self._save_data(self._path_branch_index, self._branch_index)
+
+    def _load_aggregation_indexes(self) -> Dict[str, BIAggregationIndex]:
+        try:
+            if self._path_aggregation_indexes.exists():
+                return self._load_data(self._path_aggregation_indexes)
+        except (pickle.UnpicklingError, EOFError, AttributeError, TypeError) as e:
+            self._logger.warning("Can not load aggregation indexes %s" % str(e))
+        return {}
+
+    def _load_branch_index(self) -> Optional[BIBranchIndex]:
+        try:
+            if self._path_branch_index.exists():
+                return self._load_data(self._path_branch_index)
+        except (pickle.UnpicklingError, EOFError, AttributeError, TypeError) as e:
+            self._logger.warning("Can not load branch index %s" % str(e))
+        return None
+
+    def _compile_packs(self, aggregations: Dict[str, BIAggregation],
+                       aggr_ids: List[str]) -> CompilationResult:
+        """Compiles the aggregations pack wise, in parallel with more than one process
+
+        The worker processes are forked after the structure data has been loaded and
+        share it with this process. The compiled aggregations are saved to *.new files,
+        they are renamed after the titles have been verified."""
+        if not aggr_ids:
+            return {}
+
+        # Large packs are split, so that they don't keep a single process busy
+        chunk_size = math.ceil(len(aggr_ids) / self._processes)
+        aggr_ids_of_packs: Dict[str, List[str]] = {}
+        for aggr_id in aggr_ids:
+            aggr_ids_of_packs.setdefault(aggregations[aggr_id].pack_id, []).append(aggr_id)
+        tasks = sorted(
+            ((pack_id, pack_aggr_ids[index:index + chunk_size])
+             for pack_id, pack_aggr_ids in aggr_ids_of_packs.items()
+             for index in range(0, len(pack_aggr_ids), chunk_size)),
+            key=lambda task: -len(task[1]),
+        )
+
+        start = time.time()
+        result: CompilationResult = {}
+        durations_of_packs: Dict[str, float] = {}
+        processes = min(self._processes, len(tasks))
+        if processes > 1:
+            with multiprocessing.get_context("fork").Pool(
+                    processes=processes,
+                    initializer=_init_compilation_worker,
+                    initargs=(self,),
+            ) as pool:
+                results = list(pool.imap_unordered(_compile_in_worker, tasks))
+        else:
+            results = [self._compile_aggregations(*task) for task in tasks]
+
+        for pack_id, task_result, duration in results:
+            result.update(task_result)
+            durations_of_packs[pack_id] = durations_of_packs.get(pack_id, 0.0) + duration
+
+        for pack_id, duration in durations_of_packs.items():
+            self._logger.info("Compilation of %d aggregations of pack %s took %f" %
+                              (len(aggr_ids_of_packs[pack_id]), pack_id, duration))
+        self._logger.info(
+            "Compilation of %d aggregations took %f (%d processes, %f in total)" %
+            (len(aggr_ids), time.time() - start, processes, sum(durations_of_packs.values())))
+        return result
+
+    def _compile_aggregations(self, pack_id: str,
+                              aggr_ids: List[str]) -> Tuple[str, CompilationResult, float]:
+        start_pack = time.time()
+        bi_pack = self._bi_packs.get_pack_mandatory(pack_id)
+        result: CompilationResult = {}
+        for aggr_id in aggr_ids:
+            # Compile the raw tree
+            start = time.time()
+            with self.bi_searcher.record_dependencies() as structure:
+                aggr = bi_pack.get_aggregation_mandatory(aggr_id).compile(self.bi_searcher)
+            self._compiled_aggregations[aggr_id] = aggr
+            result[aggr_id] = (structure, [branch.properties.title for branch in aggr.branches])
+            self._logger.debug("Compilation of %s took %f" % (aggr_id, time.time() - start))
+
+            start = time.time()
+            schema = aggr.serialize()
+            self._logger.debug("Schema dump %s took config took %f (%d branches)" %
+                               (aggr_id, time.time() - start, len(aggr.branches)))
+            raw_data = pickle.dumps(schema)
+            store.save_bytes_to_file(self._path_compiled_aggregations.joinpath(aggr_id + ".new"),
+                                     raw_data)
+            self._compiled_aggregation_digests[aggr_id] = hashlib.md5(raw_data).hexdigest()
+        return pack_id, result, time.time() - start_pack
+
+    @staticmethod
+    def _config_digest(aggregation: BIAggregation, rules: Dict[str, BIRule],
+                       rule_configs: Dict[str, Dict]) -> str:
+        """Digest of the aggregation and the rules it calls (rule_configs caches their configs)"""
+        called_rules: Dict[str, Optional[Dict]] = {}
+        actions = [aggregation.node.action]
+        while actions:
+            action = actions.pop()
+            if not isinstance(action, BICallARuleAction) or action.rule_id in called_rules:
+                continue
+            bi_rule = rules.get(action.rule_id)
+            if bi_rule is None:
+                called_rules[action.rule_id] = None
+                continue
+            if bi_rule.id not in rule_configs:
+                rule_configs[bi_rule.id] = bi_rule.serialize()
+            called_rules[bi_rule.id] = rule_configs[bi_rule.id]
+            actions.extend(bi_node.action for bi_node in bi_rule.get_nodes())
+
+        return hashlib.sha256(
+            repr((aggregation.pack_id, aggregation.serialize(),
+                  sorted(called_rules.items()))).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _host_digests(hosts: Dict[HostName, BIHostData]) -> Dict[HostName, Tuple[str, str]]:
+        return {
+            host_name: (hashlib.md5(
+                repr((
+                    host.site_id,
+                    sorted(host.tags),
+                    sorted(host.labels.items()),
+                    host.folder,
+                    sorted((description, sorted(service.tags), sorted(service.labels.items()))
+                           for description, service in host.services.items()),
+                    host.children,
+                    host.parents,
+                    host.alias,
+                )).encode("utf-8")).hexdigest(), host.alias) for host_name, host in hosts.items()
+        }
+
+    @staticmethod
+    def _host_changes(old_hosts: Dict[HostName, Tuple[str, str]],
+                      new_hosts: Dict[HostName, Tuple[str, str]]) -> List[BIHostChange]:
+        return [
+            BIHostChange(
+                host_name,
+                old_hosts[host_name][1] if host_name in old_hosts else None,
+                new_hosts[host_name][1] if host_name in new_hosts else None,
+            )
+            for host_name in old_hosts.keys() | new_hosts.keys()
+            if old_hosts.get(host_name) != new_hosts.get(host_name)
+        ]
+
+    def _load_dependencies(self) -> CompilationDependencies:
+        try:
+            if self._path_compilation_dependencies.exists():
+                return self._load_data(self._path_compilation_dependencies)
+        except (pickle.UnpicklingError, EOFError, AttributeError, TypeError) as e:
+            self._logger.warning("Can not load compilation dependencies %s" % str(e))
+        return {"program_starts": set(), "hosts": {}, "aggregations": {}}
+
+    def _get_compiled_aggregation_ids(self) -> List[str]:
+        return [
+            path_object.name
+            for path_object in self._path_compiled_aggregations.iterdir()
+            if not path_object.is_dir() and not path_object.name.endswith(".new")
+        ]
+
+    def _add_compiled_aggregation(self, aggr_id: str) -> None:
+        (self._compiled_aggregations[aggr_id],
+         self._compiled_aggregation_digests[aggr_id]) = self._load_compiled_aggregation(aggr_id)
+
+    def _load_compiled_aggregation(self, aggr_id: str) -> Tuple[BICompiledAggregation, str]:
+        """The compiled aggregation and the digest of its file"""
+        raw_data = store.load_bytes_from_file(self._path_compiled_aggregations.joinpath(aggr_id))
+        return (BIAggregation.create_trees_from_schema(pickle.loads(raw_data)),
+                hashlib.md5(raw_data).hexdigest())
+
     def _cleanup_vanished_aggregations(self):
-        valid_aggregations = list(self._compiled_aggregations.keys())
+        valid_aggregations = {
+            aggregation.id for aggregation in self._bi_packs.get_all_aggregations()
+        }
         for path_object in self._path_compiled_aggregations.iterdir():
             if path_object.is_dir():
                 continue
             if path_object.name not in valid_aggregations:
                 path_object.unlink(missing_ok=True)
 
-    def _verify_aggregation_title_uniqueness(
-            self, compiled_aggregations: Dict[str, BICompiledAggregation]) -> None:
+    def _verify_aggregation_title_uniqueness(self, branch_titles: Dict[str, List[str]]) -> None:
         used_titles: Dict[str, str] = {}
-        for aggr_id, bi_aggregation in compiled_aggregations.items():
-            for bi_branch in bi_aggregation.branches:
-                branch_title = bi_branch.properties.title
+        for aggr_id, titles in branch_titles.items():
+            for branch_title in titles:
                 if branch_title in used_titles:
                     raise MKGeneralException(
                         _("The aggregation titles are not unique. \"%s\" is created "
@@ -268,7 +559,9 @@ class BICompiler:
             if lookup_lock.owned():
                 lookup_lock.release()
 
-    def _generate_part_of_aggregation_lookup(self, compiled_aggregations):
+    @staticmethod
+    def _part_of_aggregation_map(
+            compiled_aggregations: Dict[str, BICompiledAggregation]) -> Dict[str, List[str]]:
         part_of_aggregation_map: Dict[str, List[str]] = {}
         for aggr_id, compiled_aggregation in compiled_aggregations.items():
             for branch in compiled_aggregation.branches:
@@ -279,6 +572,28 @@ class BICompiler:
                     key = "bi:aggregation_lookup:%s:%s" % (host_name, service_description)
                     part_of_aggregation_map.setdefault(key, []).append(
                         "%s\t%s" % (aggr_id, branch.properties.title))
+        return part_of_aggregation_map
+
+    def _update_part_of_aggregation_lookup(
+            self, previously_compiled: Dict[str, BICompiledAggregation],
+            compiled_aggregations: Dict[str, BICompiledAggregation]) -> None:
+        """Replaces the entries of the recompiled (or vanished) aggregations"""
+        client = self._get_redis_client()
+        if not client.exists("bi:aggregation_lookup"):
+            # Will be generated from all aggregations, see _check_redis_lookup_integrity()
+            return
+
+        # Lists which become empty are removed by redis
+        pipeline = client.pipeline()
+        for key, values in self._part_of_aggregation_map(previously_compiled).items():
+            for value in values:
+                pipeline.lrem(key, 0, value)
+        for key, values in self._part_of_aggregation_map(compiled_aggregations).items():
+            pipeline.lpush(key, *values)
+        pipeline.execute()
+
+    def _generate_part_of_aggregation_lookup(self, compiled_aggregations):
+        part_of_aggregation_map = self._part_of_aggregation_map(compiled_aggregations)
 
         client = self._get_redis_client()
 
@@ -4,13 +4,13 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-import copy
 from typing import NamedTuple, List, Tuple, Set, Dict, Optional, Iterator
 
 import cmk.utils.plugin_registry
 from cmk.utils.type_defs import ServiceName
 from cmk.utils.bi.bi_lib import RequiredBIElement, BIHostSpec
 from cmk.utils.bi.bi_trees import BICompiledRule, BICompiledAggregation, NodeResultBundle
+from cmk.utils.bi.bi_branch_index import BIBranchIndex, index_aggregation
 
 BIAggregationFilter = NamedTuple("BIAggregationFilter", [
     ("hosts", List[BIHostSpec]),
@@ -50,10 +50,38 @@ bi_computer_postprocessing_registry = BIComputerPostprocessingRegistry()
 
 
 class BIComputer:
-    def __init__(self, compiled_aggregations, bi_status_fetcher):
+    def __init__(self,
+                 compiled_aggregations,
+                 bi_status_fetcher,
+                 branch_index: Optional[BIBranchIndex] = None,
+                 aggregation_digests: Optional[Dict[str, str]] = None):
         self._compiled_aggregations: Dict[str, BICompiledAggregation] = compiled_aggregations
         self._bi_status_fetcher = bi_status_fetcher
-        self._legacy_branch_cache = {}
+        self._branch_index = branch_index
+        self._aggregation_digests = aggregation_digests or {}
+        self._branch_index_verified = False
+
+    @property
+    def branch_index(self) -> BIBranchIndex:
+        """The index of the branches, it is rebuilt if it does not match the aggregations
+
+        The aggregations and the index are loaded without the compilation lock,
+        a concurrent compilation may replace the index in between. The digests
+        of the aggregation files tell whether they are the indexed ones."""
+        if not self._branch_index_verified:
+            digests = {
+                aggr_id: self._aggregation_digests.get(aggr_id, "")
+                for aggr_id in self._compiled_aggregations
+            }
+            if (self._branch_index is None or "" in digests.values() or
+                    self._branch_index.digests() != digests):
+                self._branch_index = BIBranchIndex({
+                    aggr_id: index_aggregation(compiled_aggregation, digests[aggr_id])
+                    for aggr_id, compiled_aggregation in self._compiled_aggregations.items()
+                })
+            self._branch_index_verified = True
+        assert self._branch_index is not None
+        return self._branch_index
 
     def compute_aggregation_result(
         self,
@@ -66,9 +94,10 @@ class BIComputer:
         if not compiled_aggregation:
             return []
 
-        for branch in compiled_aggregation.branches:
-            if branch.properties.title == title:
-                return self.compute_results([(compiled_aggregation, [branch])])
+        positions = self.branch_index.positions(self.branch_index.branches_with_titles([title]))
+        if aggr_id in positions:
+            return self.compute_results([(compiled_aggregation,
+                                          [compiled_aggregation.branches[positions[aggr_id][0]]])])
         return []
 
     def compute_result_for_filter(
@@ -82,9 +111,10 @@ class BIComputer:
     def get_required_aggregations(
         self, bi_aggregation_filter: BIAggregationFilter
     ) -> List[Tuple[BICompiledAggregation, List[BICompiledRule]]]:
+        used_aggregations = self._get_used_aggregations(bi_aggregation_filter)
+        used_branches = self._get_used_branches(bi_aggregation_filter)
         return [(compiled_aggregation,
-                 self.get_filtered_aggregation_branches(compiled_aggregation,
-                                                        bi_aggregation_filter))
+                 self._filter_branches(compiled_aggregation, used_aggregations, used_branches))
                 for compiled_aggregation in self._compiled_aggregations.values()]
 
     def get_required_elements(
@@ -119,55 +149,67 @@ class BIComputer:
     def get_filtered_aggregation_branches(
             self, compiled_aggregation: BICompiledAggregation,
             bi_aggregation_filter: BIAggregationFilter) -> List[BICompiledRule]:
-        if not self._use_aggregation(compiled_aggregation, bi_aggregation_filter):
+        return self._filter_branches(compiled_aggregation,
+                                     self._get_used_aggregations(bi_aggregation_filter),
+                                     self._get_used_branches(bi_aggregation_filter))
+
+    def _filter_branches(self, compiled_aggregation: BICompiledAggregation,
+                         used_aggregations: Optional[Set[str]],
+                         used_branches: Optional[Dict[str, List[int]]]) -> List[BICompiledRule]:
+        if used_aggregations is not None and compiled_aggregation.id not in used_aggregations:
             return []
-
-        used_branches = []
-        for compiled_branch in compiled_aggregation.branches:
-            if not self._use_aggregation_branch(compiled_branch, bi_aggregation_filter):
-                continue
-            used_branches.append(compiled_branch)
-        return used_branches
-
-    def _use_aggregation(self, compiled_aggregation: BICompiledAggregation,
-                         bi_aggregation_filter: BIAggregationFilter) -> bool:
+        if used_branches is None:
+            return list(compiled_aggregation.branches)
+        return [
+            compiled_aggregation.branches[nr]
+            for nr in used_branches.get(compiled_aggregation.id, [])
+        ]
+
+    def _get_used_aggregations(self,
+                               bi_aggregation_filter: BIAggregationFilter) -> Optional[Set[str]]:
+        """The IDs of the aggregations matching the filter, None if all match"""
+        used_aggregations: Optional[Set[str]] = None
+        for aggr_ids in self._aggregation_filter_matches(bi_aggregation_filter):
+            used_aggregations = (aggr_ids if used_aggregations is None else used_aggregations &
+                                 aggr_ids)
+        return used_aggregations
+
+    def _aggregation_filter_matches(
+            self, bi_aggregation_filter: BIAggregationFilter) -> Iterator[Set[str]]:
         # Filter aggregation ID
-        if bi_aggregation_filter.aggr_ids and compiled_aggregation.id not in bi_aggregation_filter.aggr_ids:
-            return False
+        if bi_aggregation_filter.aggr_ids:
+            yield set(bi_aggregation_filter.aggr_ids)
 
         # Filter aggregation group names
         # Note: Paths are also available as names
-        group_names = set(compiled_aggregation.groups.names +
-                          ["/".join(x) for x in compiled_aggregation.groups.paths])
-        if bi_aggregation_filter.group_names and len(
-                group_names.intersection(bi_aggregation_filter.group_names)) == 0:
-            return False
+        if bi_aggregation_filter.group_names:
+            yield self.branch_index.aggregations_of_groups(bi_aggregation_filter.group_names)
 
         # Filter aggregation group paths
-        group_paths = compiled_aggregation.groups.paths
-        if bi_aggregation_filter.group_path_prefix and not self._matches_group_path(
-                group_paths, bi_aggregation_filter.group_path_prefix):
-            return False
-
-        return True
-
-    def _use_aggregation_branch(self, compiled_branch: BICompiledRule,
-                                bi_aggregation_filter: BIAggregationFilter) -> bool:
-        required_elements = compiled_branch.required_elements()
-        required_hosts = {x[1] for x in required_elements}
-        required_services = {x[2] for x in required_elements if x[2] is not None}
-        if bi_aggregation_filter.hosts and len(
-                required_hosts.intersection(bi_aggregation_filter.hosts)) == 0:
-            return False
-
-        if bi_aggregation_filter.services and len(
-                required_services.intersection(bi_aggregation_filter.services)) == 0:
-            return False
-
-        if bi_aggregation_filter.aggr_titles and compiled_branch.properties.title not in bi_aggregation_filter.aggr_titles:
-            return False
-
-        return True
+        if bi_aggregation_filter.group_path_prefix:
+            yield self.branch_index.aggregations_with_group_path_prefix(
+                bi_aggregation_filter.group_path_prefix)
+
+    def _get_used_branches(
+            self, bi_aggregation_filter: BIAggregationFilter) -> Optional[Dict[str, List[int]]]:
+        """The positions of the matching branches per aggregation ID, None if all match"""
+        used_branches: Optional[Set[int]] = None
+        for branches in self._branch_filter_matches(bi_aggregation_filter):
+            used_branches = branches if used_branches is None else used_branches & branches
+        if used_branches is None:
+            return None
+        return self.branch_index.positions(used_branches)
+
+    def _branch_filter_matches(self,
+                               bi_aggregation_filter: BIAggregationFilter) -> Iterator[Set[int]]:
+        if bi_aggregation_filter.hosts:
+            yield self.branch_index.branches_of_hosts(bi_aggregation_filter.hosts)
+
+        if bi_aggregation_filter.services:
+            yield self.branch_index.branches_of_services(bi_aggregation_filter.services)
+
+        if bi_aggregation_filter.aggr_titles:
+            yield self.branch_index.branches_with_titles(bi_aggregation_filter.aggr_titles)
 
     #   .--Legacy--------------------------------------------------------------.
     #   |                  _                                                   |
@@ -187,10 +229,7 @@ class BIComputer:
     def convert_to_legacy_results(self, results: List[Tuple[BICompiledAggregation,
                                                             List[NodeResultBundle]]],
                                   bi_aggregation_filter: BIAggregationFilter) -> List[Dict]:
-        try:
-            return self._legacy_postprocessing(results, bi_aggregation_filter)
-        finally:
-            self._legacy_branch_cache = {}
+        return self._legacy_postprocessing(results, bi_aggregation_filter)
 
     def _legacy_postprocessing(self, results: List[Tuple[BICompiledAggregation,
                                                          List[NodeResultBundle]]],
@@ -242,11 +281,7 @@ class BIComputer:
 
     def _get_legacy_branch(self, compiled_aggregation: BICompiledAggregation,
                            node_result_bundle: NodeResultBundle, aggr_group: str) -> Dict:
-        title = node_result_bundle.instance.properties.title
-        if title not in self._legacy_branch_cache:
-            legacy_branch = compiled_aggregation.convert_result_to_legacy_format(node_result_bundle)
-            self._legacy_branch_cache[title] = legacy_branch
-        else:
-            legacy_branch = copy.deepcopy(self._legacy_branch_cache[title])
+        # Converting the branch again is much cheaper than copying a converted one
+        legacy_branch = compiled_aggregation.convert_result_to_legacy_format(node_result_bundle)
         legacy_branch["aggr_group"] = aggr_group
         return legacy_branch
@@ -144,15 +144,15 @@ class BIStructureFetcher:
             self._marshal_save_data(str(path), hosts)
 
     def _read_cached_data(self, required_program_starts: Set[SiteProgramStart]) -> None:
-        required_sites = {x[0] for x in required_program_starts}
-        for path_object, (site_id, _timestamp) in self._get_site_data_files():
+        for path_object, (site_id, timestamp) in self._get_site_data_files():
             if site_id in self._have_sites:
                 # This data was already read during the live query
                 continue
 
-            if site_id not in required_sites:
+            if (site_id, timestamp) not in required_program_starts:
                 # The data for this site is no longer required
                 # The site probably got disabled in the distributed monitoring page
+                # or this is the data of a previous program start, which is kept for a while
                 continue
 
             site_data = self._marshal_load_data(str(path_object))
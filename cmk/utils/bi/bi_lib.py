@@ -366,6 +366,14 @@ class ABCBISearcher(metaclass=abc.ABCMeta):
     def search_services(self, conditions: Dict) -> List[BIServiceSearchMatch]:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_host(self, host_name: HostName) -> BIHostData:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_hosts(self, host_names: Iterable[HostName]) -> List[BIHostData]:
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def get_host_name_matches(self, hosts: List[BIHostData],
                               pattern: str) -> Tuple[List[BIHostData], Dict]:
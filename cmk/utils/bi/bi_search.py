@@ -174,10 +174,11 @@ class BIHostSearch(ABCBISearch):
                 if child in handled_children:
                     continue
                 handled_children.add(child)
+                child_host = bi_searcher.get_host(child)
                 search_result = {
                     "$1$": search_match.match_groups[0] if search_match.match_groups else "",
-                    "$HOSTNAME$": bi_searcher.hosts[child].name,
-                    "$HOSTALIAS$": bi_searcher.hosts[child].alias
+                    "$HOSTNAME$": child_host.name,
+                    "$HOSTALIAS$": child_host.alias
                 }
                 search_results.append(search_result)
         return search_results
@@ -211,9 +212,7 @@ class BIHostSearch(ABCBISearch):
             all_children.update(search_match.host.children)
 
         # Filter childrens known to bi_searcher
-        children_host_data: List[BIHostData] = [
-            bi_searcher.hosts[x] for x in all_children if x in bi_searcher.hosts
-        ]
+        children_host_data: List[BIHostData] = bi_searcher.get_hosts(all_children)
 
         # Apply host choice and host tags search
         matched_hosts, _matched_re_groups = bi_searcher.filter_host_choice(
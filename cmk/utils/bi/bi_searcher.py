@@ -4,7 +4,8 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from typing import Dict, List, Tuple
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 from cmk.utils.bi.bi_lib import ABCBISearcher, BIHostData, BIHostSearchMatch, BIServiceSearchMatch
 from cmk.utils.regex import regex
@@ -22,6 +23,51 @@ from cmk.utils.type_defs import HostName, TaggroupIDToTagCondition
 
 # Search data used by bi_searcher
 
+
+class BIHostChange(NamedTuple):
+    """A host which was added (old_alias is None), removed (new_alias is None) or changed"""
+    name: HostName
+    old_alias: Optional[str]
+    new_alias: Optional[str]
+
+
+class BIStructureDependencies:
+    """The parts of the host structure a compilation depends on
+
+    Recorded by the searcher: the hosts whose data was used and the patterns
+    the names and aliases of all hosts were searched with. Hosts which did not
+    match these patterns did not influence the result, as long as they still
+    don't match them."""
+    def __init__(self) -> None:
+        super().__init__()
+        self.all_hosts = False
+        self.host_names: Set[HostName] = set()
+        self.host_name_patterns: Set[str] = set()
+        self.host_alias_patterns: Set[str] = set()
+
+    def is_affected_by(self, changes: List[BIHostChange]) -> bool:
+        if not changes:
+            return False
+        if self.all_hosts:
+            return True
+
+        name_patterns = [regex(pattern) for pattern in self.host_name_patterns]
+        alias_patterns = [regex(pattern) for pattern in self.host_alias_patterns]
+        for change in changes:
+            if change.name in self.host_names:
+                return True
+            # The names of existing hosts do not change, they only match other patterns when
+            # they are added or removed
+            if (change.old_alias is None or change.new_alias is None) and any(
+                    pattern.match(change.name) for pattern in name_patterns):
+                return True
+            if any(
+                    pattern.match(alias) for alias in [change.old_alias, change.new_alias]
+                    if alias is not None for pattern in alias_patterns):
+                return True
+        return False
+
+
 #   .--BISearcher----------------------------------------------------------.
 #   |         ____ ___ ____                      _                         |
 #   |        | __ )_ _/ ___|  ___  __ _ _ __ ___| |__   ___ _ __           |
@@ -33,10 +79,39 @@ from cmk.utils.type_defs import HostName, TaggroupIDToTagCondition
 
 
 class BISearcher(ABCBISearcher):
+    def __init__(self):
+        super().__init__()
+        self._dependencies: Optional[BIStructureDependencies] = None
+
     def set_hosts(self, hosts: Dict[HostName, BIHostData]) -> None:
         self.cleanup()
         self.hosts = hosts
 
+    @contextmanager
+    def record_dependencies(self) -> Iterator[BIStructureDependencies]:
+        """Records the parts of the host structure the searches within the context depend on"""
+        self._dependencies = BIStructureDependencies()
+        try:
+            yield self._dependencies
+        finally:
+            self._dependencies = None
+
+    def _record_hosts(self, hosts: List[BIHostData]) -> None:
+        if self._dependencies is not None:
+            self._dependencies.host_names.update(host.name for host in hosts)
+
+    def get_host(self, host_name: HostName) -> BIHostData:
+        if self._dependencies is not None:
+            self._dependencies.host_names.add(host_name)
+        return self.hosts[host_name]
+
+    def get_hosts(self, host_names: Iterable[HostName]) -> List[BIHostData]:
+        """The data of the known hosts of the given names"""
+        host_names = list(host_names)
+        if self._dependencies is not None:
+            self._dependencies.host_names.update(host_names)
+        return [self.hosts[x] for x in host_names if x in self.hosts]
+
     def cleanup(self) -> None:
         # Note: Do not call clear() on hosts
         #       This would clear the reference we've got on set_hosts
@@ -57,6 +132,8 @@ class BISearcher(ABCBISearcher):
         condition: Dict,
     ) -> Tuple[List[BIHostData], Dict]:
         if condition["type"] == "all_hosts":
+            if self._dependencies is not None:
+                self._dependencies.all_hosts = True
             return hosts, self._host_match_groups(hosts)
 
         if condition["type"] == "host_name_regex":
@@ -77,10 +154,14 @@ class BISearcher(ABCBISearcher):
     ) -> Tuple[List[BIHostData], Dict]:
 
         if pattern == "(.*)":
+            if self._dependencies is not None:
+                self._dependencies.all_hosts = True
             return hosts, self._host_match_groups(hosts)
 
         is_regex_match = any(map(lambda x: x in pattern, ["(", ")", "*", "$", "|", "[", "]"]))
         if not is_regex_match:
+            if self._dependencies is not None:
+                self._dependencies.host_names.add(pattern)
             host = self.hosts.get(pattern)
             if host:
                 return [host], {pattern: (pattern,)}
@@ -114,6 +195,9 @@ class BISearcher(ABCBISearcher):
             matched_hosts.append(host)
             matched_re_groups[host.name] = pattern_match_cache[host.name]
 
+        if self._dependencies is not None:
+            self._dependencies.host_name_patterns.add(pattern_with_anchor)
+        self._record_hosts(matched_hosts)
         return matched_hosts, matched_re_groups
 
     def get_host_alias_matches(
@@ -122,6 +206,8 @@ class BISearcher(ABCBISearcher):
         pattern: str,
     ) -> Tuple[List[BIHostData], Dict]:
         if pattern == "(.*)":
+            if self._dependencies is not None:
+                self._dependencies.all_hosts = True
             return hosts, self._host_match_groups(hosts, "alias")
 
         # TODO: alias matches currently costs way more performance than the host matches
@@ -135,6 +221,10 @@ class BISearcher(ABCBISearcher):
                 continue
             matched_hosts.append(host)
             matched_re_groups[host.name] = tuple(match.groups())
+
+        if self._dependencies is not None:
+            self._dependencies.host_alias_patterns.add(pattern)
+        self._record_hosts(matched_hosts)
         return matched_hosts, matched_re_groups
 
     def get_service_description_matches(
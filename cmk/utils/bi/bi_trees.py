@@ -399,13 +399,13 @@ class BIRemainingResult(ABCBICompiledNode):
                             bi_searcher: ABCBISearcher) -> List[ABCBICompiledNode]:
         postprocessed_nodes: List[ABCBICompiledNode] = []
         for host_name in self.host_names:
-            site_id = bi_searcher.hosts[host_name].site_id
+            host = bi_searcher.get_host(host_name)
             used_services = services_of_host.get(host_name, set())
-            for service_description in set(bi_searcher.hosts[host_name].services) - used_services:
+            for service_description in set(host.services) - used_services:
                 postprocessed_nodes.append(
                     BICompiledLeaf(host_name=host_name,
                                    service_description=service_description,
-                                   site_id=site_id))
+                                   site_id=host.site_id))
         return postprocessed_nodes
 
     def required_elements(self) -> Set[RequiredBIElement]:
@@ -475,23 +475,33 @@ class BICompiledAggregation:
                 "output": item.output,
             }
 
-        def create_tree_state(bundle: NodeResultBundle, is_toplevel=False):
+        def create_tree_state(bundle: NodeResultBundle, tree_node: Dict[str, Any]):
             response = []
             response.append(generate_state(bundle.actual_result))
             response.append(generate_state(bundle.assumed_result))
-            if is_toplevel:
-                response.append(self.create_aggr_tree(bundle.instance))
-            else:
-                response.append(self.eval_result_node(bundle.instance))
+            response.append(tree_node)
             if bundle.nested_results:
-                response.append(list(map(create_tree_state, bundle.nested_results)))
+                # The nodes of the tree state are the ones of the tree, evaluating them
+                # again for every level is expensive for large branches
+                tree_nodes = {
+                    id(node): nested_tree_node
+                    for node, nested_tree_node in zip(bundle.instance.nodes, tree_node["nodes"])
+                }
+                response.append([
+                    create_tree_state(
+                        nested_bundle,
+                        tree_nodes.get(id(nested_bundle.instance)) or
+                        self.eval_result_node(nested_bundle.instance),
+                    ) for nested_bundle in bundle.nested_results
+                ])
             return tuple(response)
 
         bi_compiled_branch = node_result_bundle.instance
+        aggr_tree = self.create_aggr_tree(bi_compiled_branch)
 
         response = {
-            "aggr_tree": self.create_aggr_tree(bi_compiled_branch),
-            "aggr_treestate": create_tree_state(node_result_bundle, is_toplevel=True),
+            "aggr_tree": aggr_tree,
+            "aggr_treestate": create_tree_state(node_result_bundle, aggr_tree),
             "aggr_state": generate_state(node_result_bundle.actual_result),
             "aggr_assumed_state": generate_state(node_result_bundle.assumed_result),
             "aggr_effective_state":
@@ -16,6 +16,7 @@ import io
 import itertools
 import operator
 import re
+import socket
 import statistics
 import time
 from typing import (
@@ -52,8 +53,25 @@ Tables = Dict[TableName, Dict[SiteName, ResultList]]
 class FakeSocket:
     def __init__(self, mock_live: MockSingleSiteConnection) -> None:
         self.mock_live = mock_live
+        self._readable: Optional[Tuple[socket.socket, socket.socket]] = None
 
-    def settimeout(self, timeout: Optional[int]) -> None:
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._readable is not None:
+            for sock in self._readable:
+                sock.close()
+            self._readable = None
+
+    def fileno(self) -> int:
+        """A file descriptor which is always readable, to make selectors work"""
+        if self._readable is None:
+            self._readable = socket.socketpair()
+            self._readable[1].send(b"\0")
+        return self._readable[0].fileno()
+
+    def settimeout(self, timeout: Optional[float]) -> None:
         pass
 
     def connect(self, address: str) -> None:
@@ -62,6 +80,11 @@ class FakeSocket:
     def recv(self, length: int) -> bytes:
         return self.mock_live.socket_recv(length)
 
+    def recv_into(self, buffer: memoryview) -> int:
+        data = self.mock_live.socket_recv(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
     def send(self, data: bytes) -> None:
         return self.mock_live.socket_send(data)
 
@@ -87,7 +110,7 @@ def _make_livestatus_response(response) -> str:
     """
     data = repr(response)
     code = 200
-    length = len(data)
+    length = len(data.encode('utf-8'))
     return f"{code:<3} {length:>11}\n{data}"
 
 
@@ -474,7 +497,7 @@ class MockSingleSiteConnection:
     def __init__(self, site_name, multisite_connection) -> None:
         self._site_name = site_name
         self._multisite = multisite_connection
-        self._last_response: Optional[io.StringIO] = None
+        self._last_response: Optional[io.BytesIO] = None
         self._prepend_site = False
         self._expected_queries: List[Tuple[str, MatchType]] = []
 
@@ -546,13 +569,13 @@ class MockSingleSiteConnection:
     def socket_recv(self, length: int) -> bytes:
         if self._last_response is None:
             raise LivestatusTestingError("Nothing sent yet. Can't receive!")
-        return self._last_response.read(length).encode('utf-8')
+        return self._last_response.read(length)
 
     def socket_send(self, data: bytes) -> None:
         if data[-2:] == b"\n\n":
             data = data[:-2]
         response = self.result_of_next_query(data.decode('utf-8'))
-        self._last_response = io.StringIO(_make_livestatus_response(response))
+        self._last_response = io.BytesIO(_make_livestatus_response(response).encode('utf-8'))
 
     def __enter__(self):
         pass
@@ -8,6 +8,7 @@ from dataclasses import asdict, dataclass
 from contextlib import suppress
 import json
 import logging
+import os
 from pathlib import Path
 import time
 from typing import (
@@ -20,9 +21,12 @@ from typing import (
     Literal,
     NewType,
     Optional,
+    Sequence,
     Tuple,
+    Union,
 )
 
+import numpy as np  # type: ignore[import]
 from six import ensure_str
 
 import livestatus
@@ -35,7 +39,7 @@ from cmk.utils.type_defs import Timestamp, Seconds, MetricName, ServiceName, Hos
 logger = logging.getLogger("cmk.prediction")
 
 TimeWindow = Tuple[Timestamp, Timestamp, Seconds]
-RRDColumnFunction = Callable[[Timestamp, Timestamp], "TimeSeries"]
+RRDColumnFunction = Callable[[Sequence[Tuple[Timestamp, Timestamp]]], List["TimeSeries"]]
 TimeSeriesValue = Optional[float]
 TimeSeriesValues = List[TimeSeriesValue]
 ConsolidationFunctionName = str
@@ -80,6 +84,26 @@ class PredictionInfo:
         return json.dumps(asdict(self))
 
 
+@dataclass(frozen=True)
+class PredictionRequest:
+    """What a check last asked a prediction of a metric to be computed with"""
+    dsname: MetricName
+    cf: ConsolidationFunctionName
+    params: PredictionParameters
+
+    @classmethod
+    def loads(cls, raw: str) -> 'PredictionRequest':
+        data = json.loads(raw)
+        return cls(
+            dsname=MetricName(data["dsname"]),
+            cf=ConsolidationFunctionName(data["cf"]),
+            params=dict(data["params"]),
+        )
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self))
+
+
 @dataclass(frozen=True)
 class PredictionData:
     columns: List[str]
@@ -144,6 +168,16 @@ def aggregation_functions(series: TimeSeriesValues,
     raise ValueError("Invalid Aggregation function %s, only max, min, average allowed" % aggr)
 
 
+def _to_array(values: TimeSeriesValues) -> np.ndarray:
+    return np.array(values, dtype=float)
+
+
+def _to_values(array: np.ndarray) -> TimeSeriesValues:
+    values = array.astype(object)
+    values[np.isnan(array)] = None
+    return values.tolist()
+
+
 class TimeSeries:
     """Describes the returned time series returned by livestatus
 
@@ -153,8 +187,13 @@ class TimeSeries:
     - The Series describes the interval [start; end[
     - Start has no associated value to it.
 
+    The values are available as list (None for missing values) and as NumPy
+    array of floats (NaN for missing values) for vectorized computations.
+    Both are converted into each other on demand, as the list may be modified
+    in place, accessing it discards the array.
+
     args:
-        data : List
+        data : List or array
             Includes [start, end, step, *values]
         timewindow: tuple
             describes (start, end, step), in this case data has only values
@@ -163,7 +202,7 @@ class TimeSeries:
 
     """
     def __init__(self,
-                 data: TimeSeriesValues,
+                 data: Union[TimeSeriesValues, np.ndarray],
                  timewindow: Optional[Tuple[float, float, float]] = None,
                  **metadata: str) -> None:
         if timewindow is None:
@@ -176,9 +215,39 @@ class TimeSeries:
         self.start = int(timewindow[0])
         self.end = int(timewindow[1])
         self.step = int(timewindow[2])
-        self.values = data
+        self._values: Optional[TimeSeriesValues] = None
+        self._array: Optional[np.ndarray] = None
+        if isinstance(data, np.ndarray):
+            self.array = data
+        else:
+            self.values = data
         self.metadata = metadata
 
+    @property
+    def values(self) -> TimeSeriesValues:
+        if self._values is None:
+            assert self._array is not None
+            self._values = _to_values(self._array)
+        self._array = None
+        return self._values
+
+    @values.setter
+    def values(self, values: TimeSeriesValues) -> None:
+        self._values = values
+        self._array = None
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            assert self._values is not None
+            self._array = _to_array(self._values)
+        return self._array
+
+    @array.setter
+    def array(self, array: np.ndarray) -> None:
+        self._array = array
+        self._values = None
+
     @property
     def twindow(self) -> TimeWindow:
         return self.start, self.end, self.step
@@ -189,19 +258,23 @@ class TimeSeries:
         twindow : 3-tuple, (start, end, step)
              description of target time interval
         """
-        upsa = []
-        i = 0
+        if twindow == self.twindow:
+            return self.values
+        return _to_values(self.bfill_upsample_array(twindow, shift))
+
+    def bfill_upsample_array(self, twindow: TimeWindow, shift: Seconds) -> np.ndarray:
+        """Like bfill_upsample(), but returns an array"""
+        if twindow == self.twindow:
+            return self.array
         start, end, step = twindow
-        current_times = rrd_timestamps(self.twindow)
-        if start != self.start or end != self.end or step != self.step:
-            for t in range(start, end, step):
-                if t >= current_times[i] + shift:
-                    i += 1
-                upsa.append(self.values[i])
-
-            return upsa
-
-        return self.values
+        # Every target time gets the value of the first own timestamp (shifted into the target
+        # window) it has not passed yet, the last value is filled up to the end.
+        indices = np.searchsorted(
+            np.arange(self.start + self.step, self.end + self.step, self.step) + shift,
+            np.arange(start, end, step),
+            side="right",
+        )
+        return self.array[np.minimum(indices, len(self) - 1)]
 
     def downsample(self,
                    twindow: TimeWindow,
@@ -213,26 +286,50 @@ class TimeSeries:
         cf : str ('max', 'average', 'min')
              consolidation function imitating RRD methods
         """
-        dwsa = []
-        i = 0
-        co: TimeSeriesValues = []
-        start, end, step = twindow
-        desired_times = rrd_timestamps(twindow)
-        if start != self.start or end != self.end or step != self.step:
-            for t, val in self.time_data_pairs():
-                if t > desired_times[i]:
-                    dwsa.append(aggregation_functions(co, cf))
-                    co = []
-                    i += 1
-                co.append(val)
-
-            diff_len = len(desired_times) - len(dwsa)
-            if diff_len > 0:
-                dwsa.append(aggregation_functions(co, cf))
-                dwsa = dwsa + [None] * (diff_len - 1)
-
-            return dwsa
-        return self.values
+        if twindow == self.twindow:
+            return self.values
+        return _to_values(self.downsample_array(twindow, cf))
+
+    def downsample_array(self,
+                         twindow: TimeWindow,
+                         cf: ConsolidationFunctionName = 'max') -> np.ndarray:
+        """Like downsample(), but returns an array"""
+        if twindow == self.twindow:
+            return self.array
+        aggr = (cf or "max").lower()
+        if aggr not in ("average", "max", "min"):
+            raise ValueError("Invalid Aggregation function %s, only max, min, average allowed" %
+                             aggr)
+
+        desired_times = np.array(rrd_timestamps(twindow), dtype=int)
+        # Each value is consolidated into the first desired timestamp not before its own one,
+        # the ones after the last desired timestamp are dropped
+        indices = np.searchsorted(
+            desired_times,
+            np.arange(self.start + self.step, self.end + self.step, self.step)[:len(self)],
+            side="left",
+        )
+        in_window = indices < len(desired_times)
+        indices = indices[in_window]
+        values = self.array[in_window]
+
+        result = np.full(len(desired_times), np.nan)
+        if not len(indices):
+            return result
+
+        # The indices are sorted, so each consolidated group starts where the index changes
+        starts = np.flatnonzero(np.diff(indices, prepend=-1))
+        groups = indices[starts]
+        if aggr == "max":
+            result[groups] = np.fmax.reduceat(values, starts)
+        elif aggr == "min":
+            result[groups] = np.fmin.reduceat(values, starts)
+        else:
+            valid = ~np.isnan(values)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[groups] = (np.add.reduceat(np.where(valid, values, 0.0), starts) /
+                                  np.add.reduceat(valid.astype(int), starts))
+        return result
 
     def time_data_pairs(self) -> List[Tuple[Timestamp, TimeSeriesValue]]:
         return list(zip(rrd_timestamps(self.twindow), self.values))
@@ -250,7 +347,7 @@ class TimeSeries:
         return self.values[i]
 
     def __len__(self) -> int:
-        return len(self.values)
+        return len(self._values) if self._values is not None else len(self.array)
 
     def __iter__(self) -> Iterator[TimeSeriesValue]:
         yield from self.values
@@ -305,40 +402,67 @@ def get_rrd_data(hostname: HostName,
           x---v---v---v---v---y
 
     """
+    return get_rrd_data_of_windows(hostname, service_description, varname, cf,
+                                   [(fromtime, untiltime)], max_entries)[0]
+
+
+def get_rrd_data_of_windows(hostname: HostName,
+                            service_description: ServiceName,
+                            varname: MetricName,
+                            cf: ConsolidationFunctionName,
+                            time_windows: Sequence[Tuple[Timestamp, Timestamp]],
+                            max_entries: int = 400) -> List[TimeSeries]:
+    """Fetch the RRD data of all time windows with a single livestatus query
 
+    Every window is requested as a column of its own, so each of them is
+    answered with the best resolution available for its time range, just
+    like separate calls of get_rrd_data() would do.
+    """
     step = 1
     rpn = "%s.%s" % (varname, cf.lower())  # "MAX" -> "max"
-    point_range = ":".join(
-        livestatus.lqencode(str(x)) for x in (fromtime, untiltime, step, max_entries))
-    column = "rrddata:m1:%s:%s" % (rpn, point_range)
+    columns = [
+        "rrddata:m%d:%s:%s" % (nr, rpn, ":".join(
+            livestatus.lqencode(str(x))
+            for x in (fromtime, untiltime, step, max_entries)))
+        for nr, (fromtime, untiltime) in enumerate(time_windows, 1)
+    ]
 
-    lql = livestatus_lql([hostname], [column], service_description) + "OutputFormat: python\n"
+    lql = livestatus_lql([hostname], columns, service_description) + "OutputFormat: python\n"
 
     try:
         connection = livestatus.SingleSiteConnection("unix:%s" %
                                                      cmk.utils.paths.livestatus_unix_socket)
-        response = connection.query_value(lql)
+        response = connection.query_row(lql)
     except livestatus.MKLivestatusNotFoundError as e:
         if cmk.utils.debug.enabled():
             raise
         raise MKGeneralException("Cannot get historic metrics via Livestatus: %s" % e)
 
-    if response is None:
+    if any(data is None for data in response):
         raise MKGeneralException("Cannot retrieve historic data with Nagios Core")
 
-    return TimeSeries(response)
+    return [TimeSeries(data) for data in response]
 
 
 def rrd_datacolum(hostname: HostName, service_description: ServiceName, varname: MetricName,
                   cf: ConsolidationFunctionName) -> RRDColumnFunction:
     "Partial helper function to get rrd data"
 
-    def time_boundaries(fromtime: Timestamp, untiltime: Timestamp) -> TimeSeries:
-        return get_rrd_data(hostname, service_description, varname, cf, fromtime, untiltime)
+    def time_boundaries(time_windows: Sequence[Tuple[Timestamp, Timestamp]]) -> List[TimeSeries]:
+        return get_rrd_data_of_windows(hostname, service_description, varname, cf, time_windows)
 
     return time_boundaries
 
 
+def _service_dir(host_name: HostName, service_description: ServiceName) -> Path:
+    return Path(
+        cmk.utils.paths.var_dir,
+        "prediction",
+        host_name,
+        cmk.utils.pnp_cleanup(service_description),
+    )
+
+
 class PredictionStore:
     def __init__(
         self,
@@ -346,13 +470,15 @@ class PredictionStore:
         service_description: ServiceName,
         dsname: MetricName,
     ) -> None:
-        self._dir = Path(
-            cmk.utils.paths.var_dir,
-            "prediction",
-            host_name,
-            cmk.utils.pnp_cleanup(service_description),
-            cmk.utils.pnp_cleanup(dsname),
-        )
+        self._dir = _service_dir(host_name, service_description) / cmk.utils.pnp_cleanup(dsname)
+
+    @staticmethod
+    def requests(host_name: HostName,
+                 service_description: ServiceName) -> Iterator[PredictionRequest]:
+        """The requests of all metrics of the service"""
+        for path in sorted(_service_dir(host_name, service_description).glob("*/request")):
+            with suppress(IOError, ValueError, KeyError):
+                yield PredictionRequest.loads(path.read_text())
 
     def available_predictions(self) -> Iterable[PredictionInfo]:
         return (tg_info for f in self._dir.glob('*.info')
@@ -364,16 +490,38 @@ class PredictionStore:
     def _info_file(self, timegroup: Timegroup) -> Path:
         return self._dir / f'{timegroup}.info'
 
+    def _request_file(self) -> Path:
+        return self._dir / "request"
+
     def save_predictions(
         self,
         info: PredictionInfo,
         data_for_pred: PredictionData,
     ) -> None:
         self._dir.mkdir(exist_ok=True, parents=True)
-        with self._info_file(info.name).open("w") as fname:
-            fname.write(info.dumps())
-        with self._data_file(info.name).open("w") as fname:
-            fname.write(data_for_pred.dumps())
+        self._save_file(self._data_file(info.name), data_for_pred.dumps())
+        self._save_file(self._info_file(info.name), info.dumps())
+
+    def save_request(self, request: PredictionRequest) -> None:
+        """Remember the request for the computation ahead of time, in case it changed"""
+        # Compared serialized, as that turns the tuples of the parameters into lists
+        last_request = self.get_request()
+        if last_request is not None and last_request.dumps() == request.dumps():
+            return
+        self._dir.mkdir(exist_ok=True, parents=True)
+        self._save_file(self._request_file(), request.dumps())
+
+    def get_request(self) -> Optional[PredictionRequest]:
+        with suppress(IOError, ValueError, KeyError):
+            return PredictionRequest.loads(self._request_file().read_text())
+        return None
+
+    @staticmethod
+    def _save_file(file_path: Path, content: str) -> None:
+        # Replaced atomically, the checks read the files while they are computed ahead of time
+        tmp_path = file_path.with_name(".%s.%d.new" % (file_path.name, os.getpid()))
+        tmp_path.write_text(content)
+        tmp_path.rename(file_path)
 
     def clean_prediction_files(self, timegroup: Timegroup, force: bool = False) -> None:
         # In previous versions it could happen that the files were created with 0 bytes of size
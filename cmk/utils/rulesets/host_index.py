@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Bitset based index of the hosts known to the ruleset matcher
+
+Every host gets an integer position. Sets of hosts are represented as Python
+ints where bit N is set when the host at position N is part of the set. This
+way the host conditions of a rule (tags, labels, folder, host names) can be
+evaluated with a few bitwise operations instead of looking at every host.
+Hosts are only converted back to names once a set is really needed.
+"""
+
+from itertools import compress
+from typing import Callable, Dict, Iterable, List, Set, Tuple, cast
+
+from cmk.utils.regex import regex
+from cmk.utils.type_defs import (
+    HostName,
+    Labels,
+    TagCondition,
+    TagConditionNE,
+    TagConditionNOR,
+    TagConditionOR,
+    TaggroupID,
+    TagID,
+    TagsOfHosts,
+)
+
+HostMask = int
+
+# Translates the "0"/"1" characters of bin() to bytes usable as compress() selectors
+_BIN_TO_SELECTORS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def _mask_from_positions(positions: Iterable[int], num_hosts: int) -> HostMask:
+    """Build the bitset in one go. OR-ing single bits into a growing int would
+    be quadratic in the number of hosts."""
+    buf = bytearray((num_hosts + 7) // 8)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, "little")
+
+
+class HostBitsetIndex:
+    """Maps hosts to bit positions and keeps per tag, per label and per folder bitsets"""
+    def __init__(self, hosts: Iterable[HostName], host_tags: TagsOfHosts,
+                 host_paths: Dict[HostName, str]) -> None:
+        super(HostBitsetIndex, self).__init__()
+        self._hosts: List[HostName] = sorted(hosts)
+        self._positions: Dict[HostName,
+                              int] = {hostname: pos for pos, hostname in enumerate(self._hosts)}
+        self.all_hosts: HostMask = (1 << len(self._hosts)) - 1
+
+        tag_positions: Dict[Tuple[TaggroupID, TagID], List[int]] = {}
+        path_positions: Dict[str, List[int]] = {}
+        for pos, hostname in enumerate(self._hosts):
+            for tag in host_tags.get(hostname, {}).items():
+                tag_positions.setdefault(tag, []).append(pos)
+            path_positions.setdefault(host_paths.get(hostname, "/"), []).append(pos)
+
+        self._tag_masks: Dict[Tuple[TaggroupID, TagID], HostMask] = {
+            tag: _mask_from_positions(positions, len(self._hosts))
+            for tag, positions in tag_positions.items()
+        }
+        self._path_masks: Dict[str, HostMask] = {
+            path: _mask_from_positions(positions, len(self._hosts))
+            for path, positions in path_positions.items()
+        }
+        self._folder_masks: Dict[str, HostMask] = {}
+
+        # The labels of a host may be computed using rulesets. They are only
+        # indexed for the hosts that are really asked for.
+        self._label_masks: Dict[Tuple[str, str], HostMask] = {}
+        self._labels_indexed: HostMask = 0
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def __contains__(self, hostname: object) -> bool:
+        return hostname in self._positions
+
+    def mask_of(self, hostnames: Iterable[HostName]) -> HostMask:
+        positions = self._positions
+        return _mask_from_positions((positions[h] for h in hostnames if h in positions),
+                                    len(self._hosts))
+
+    def hosts_of(self, mask: HostMask) -> Set[HostName]:
+        if not mask:
+            return set()
+        return set(compress(self._hosts, bin(mask)[:1:-1].encode().translate(_BIN_TO_SELECTORS)))
+
+    def clear_labels(self) -> None:
+        self._label_masks.clear()
+        self._labels_indexed = 0
+
+    def folder_mask(self, folder_path: str) -> HostMask:
+        """Hosts located in the given folder, including its subfolders"""
+        try:
+            return self._folder_masks[folder_path]
+        except KeyError:
+            pass
+
+        mask = 0
+        for path, path_mask in self._path_masks.items():
+            if path.startswith(folder_path):
+                mask |= path_mask
+        self._folder_masks[folder_path] = mask
+        return mask
+
+    def tag_condition_mask(self, taggroup_id: TaggroupID, tag_condition: TagCondition) -> HostMask:
+        """Equivalent to ruleset_matcher.matches_tag_condition() for all hosts at once"""
+        if isinstance(tag_condition, dict):
+            if "$ne" in tag_condition:
+                return self.all_hosts & ~self._tag_masks.get(
+                    (taggroup_id, cast(TagConditionNE, tag_condition)["$ne"]), 0)
+
+            if "$or" in tag_condition:
+                return self._tag_masks_or(taggroup_id, cast(TagConditionOR, tag_condition)["$or"])
+
+            if "$nor" in tag_condition:
+                return self.all_hosts & ~self._tag_masks_or(
+                    taggroup_id,
+                    cast(TagConditionNOR, tag_condition)["$nor"],
+                )
+
+            raise NotImplementedError()
+
+        return self._tag_masks.get((taggroup_id, tag_condition), 0)
+
+    def _tag_masks_or(self, taggroup_id: TaggroupID, tag_ids: Iterable[TagID]) -> HostMask:
+        mask = 0
+        for tag_id in tag_ids:
+            mask |= self._tag_masks.get((taggroup_id, tag_id), 0)
+        return mask
+
+    def host_name_mask(self, host_entries, candidates: HostMask) -> HostMask:
+        """Equivalent to RulesetOptimizer.matches_host_name() for the candidate hosts"""
+        if not host_entries:
+            return candidates
+
+        negate, entries = (True, host_entries["$nor"]) if isinstance(host_entries, dict) \
+                                                         else (False, host_entries)
+
+        mask = self.mask_of(entry for entry in entries if not isinstance(entry, dict))
+
+        patterns = [regex(entry["$regex"]) for entry in entries if isinstance(entry, dict)]
+        if patterns:
+            mask |= self.mask_of(hostname for hostname in self.hosts_of(candidates & ~mask) if any(
+                p.match(hostname) is not None for p in patterns))
+
+        if negate:
+            return candidates & ~mask
+        return candidates & mask
+
+    def labels_mask(
+        self,
+        required_labels: Dict,
+        candidates: HostMask,
+        labels_of_host: Callable[[HostName], Labels],
+    ) -> HostMask:
+        """Equivalent to ruleset_matcher.matches_labels() for the candidate hosts"""
+        self._index_labels(candidates, labels_of_host)
+
+        mask = candidates
+        for label_id, label_spec in required_labels.items():
+            if isinstance(label_spec, dict):
+                mask &= ~self._label_masks.get((label_id, label_spec["$ne"]), 0)
+            else:
+                mask &= self._label_masks.get((label_id, label_spec), 0)
+        return mask
+
+    def _index_labels(self, candidates: HostMask, labels_of_host: Callable[[HostName],
+                                                                           Labels]) -> None:
+        missing = candidates & ~self._labels_indexed
+        if not missing:
+            return
+
+        label_positions: Dict[Tuple[str, str], List[int]] = {}
+        for hostname in self.hosts_of(missing):
+            pos = self._positions[hostname]
+            for label in labels_of_host(hostname).items():
+                label_positions.setdefault(label, []).append(pos)
+
+        for label, positions in label_positions.items():
+            self._label_masks[label] = self._label_masks.get(label, 0) | _mask_from_positions(
+                positions, len(self._hosts))
+        self._labels_indexed |= missing
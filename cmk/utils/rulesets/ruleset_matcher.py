@@ -5,10 +5,12 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """This module provides generic Check_MK ruleset processing functionality"""
 
-from typing import Any, cast, Dict, Generator, List, Optional, Pattern, Set, Tuple, TYPE_CHECKING
+from typing import Any, cast, Dict, Generator, Hashable, List, Optional, Set, Tuple, TYPE_CHECKING
 
 from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.regex import regex
+from cmk.utils.rulesets.host_index import HostBitsetIndex
+from cmk.utils.rulesets.service_description_matcher import ServiceDescriptionMatcher
 from cmk.utils.rulesets.tuple_rulesets import (
     ALL_HOSTS,
     ALL_SERVICES,
@@ -38,9 +40,8 @@ if TYPE_CHECKING:
 
 LabelConditions = Dict  # TODO: Optimize this
 PreprocessedHostRuleset = Dict[HostName, List[RuleValue]]
-PreprocessedPattern = Tuple[bool, Pattern[str]]
-PreprocessedServiceRuleset = List[Tuple[RuleValue, Set[HostName], LabelConditions, Tuple,
-                                        PreprocessedPattern]]
+PreprocessedServiceRule = Tuple[RuleValue, Set[HostName], LabelConditions, Tuple]
+PreprocessedServiceRuleset = Tuple[List[PreprocessedServiceRule], ServiceDescriptionMatcher]
 
 
 class RulesetMatchObject:
@@ -132,11 +133,21 @@ class RulesetMatcher:
                 merged_dict.setdefault(key, value)
         return merged_dict
 
-    def get_host_ruleset_values(self, match_object: RulesetMatchObject, ruleset: List,
-                                is_binary: bool) -> Generator:
+    def get_host_ruleset_values(self,
+                                match_object: RulesetMatchObject,
+                                ruleset: List,
+                                is_binary: bool,
+                                ruleset_id: Optional[Hashable] = None) -> Generator:
         """Returns a generator of the values of the matched rules
-        Replaces host_extra_conf"""
-        self.tuple_transformer.transform_in_place(ruleset, is_service=False, is_binary=is_binary)
+        Replaces host_extra_conf
+
+        The preprocessed ruleset is cached by id(ruleset). Callers matching short lived
+        rulesets give them a unique ruleset_id instead, these rulesets have to be in the
+        dict format already."""
+        if ruleset_id is None:
+            self.tuple_transformer.transform_in_place(ruleset,
+                                                      is_service=False,
+                                                      is_binary=is_binary)
 
         # When the requested host is part of the local sites configuration,
         # then use only the sites hosts for processing the rules
@@ -145,7 +156,8 @@ class RulesetMatcher:
 
         optimized_ruleset = self.ruleset_optimizer.get_host_ruleset(ruleset,
                                                                     with_foreign_hosts,
-                                                                    is_binary=is_binary)
+                                                                    is_binary=is_binary,
+                                                                    ruleset_id=ruleset_id)
 
         assert match_object.host_name is not None
         for value in optimized_ruleset.get(match_object.host_name, []):
@@ -175,61 +187,48 @@ class RulesetMatcher:
                 merged_dict.setdefault(key, value)
         return merged_dict
 
-    def get_service_ruleset_values(self, match_object: RulesetMatchObject, ruleset: List,
-                                   is_binary: bool) -> Generator:
+    def get_service_ruleset_values(self,
+                                   match_object: RulesetMatchObject,
+                                   ruleset: List,
+                                   is_binary: bool,
+                                   ruleset_id: Optional[Hashable] = None) -> Generator:
         """Returns a generator of the values of the matched rules
-        Replaces service_extra_conf"""
-        self.tuple_transformer.transform_in_place(ruleset, is_service=True, is_binary=is_binary)
+        Replaces service_extra_conf
+
+        See get_host_ruleset_values() for the ruleset_id."""
+        if ruleset_id is None:
+            self.tuple_transformer.transform_in_place(ruleset, is_service=True, is_binary=is_binary)
 
         with_foreign_hosts = match_object.host_name not in \
                                 self.ruleset_optimizer.all_processed_hosts()
         optimized_ruleset = self.ruleset_optimizer.get_service_ruleset(ruleset,
                                                                        with_foreign_hosts,
-                                                                       is_binary=is_binary)
+                                                                       is_binary=is_binary,
+                                                                       ruleset_id=ruleset_id)
 
-        for value, hosts, service_labels_condition, service_labels_condition_cache_id, service_description_condition in optimized_ruleset:
-            if match_object.service_description is None:
-                continue
+        if match_object.service_description is None:
+            return
+
+        rules, service_description_matcher = optimized_ruleset
+        for index in service_description_matcher.matching_rules(match_object.service_description):
+            value, hosts, service_labels_condition, service_labels_condition_cache_id = rules[index]
 
             if match_object.host_name not in hosts:
                 continue
 
-            service_cache_id = (match_object.service_cache_id, service_description_condition,
-                                service_labels_condition_cache_id)
-
-            if service_cache_id in self._service_match_cache:
-                match = self._service_match_cache[service_cache_id]
-            else:
-                match = self._matches_service_conditions(service_description_condition,
-                                                         service_labels_condition, match_object)
-                self._service_match_cache[service_cache_id] = match
-
-            if match:
-                yield value
-
-    def _matches_service_conditions(self, service_description_condition: Tuple[bool, Pattern[str]],
-                                    service_labels_condition: Dict[str, str],
-                                    match_object: RulesetMatchObject) -> bool:
-        if not self._matches_service_description_condition(service_description_condition,
-                                                           match_object):
-            return False
-
-        if service_labels_condition \
-           and not matches_labels(match_object.service_labels, service_labels_condition):
-            return False
-
-        return True
+            if service_labels_condition:
+                service_cache_id = (match_object.service_cache_id,
+                                    service_labels_condition_cache_id)
+                try:
+                    match = self._service_match_cache[service_cache_id]
+                except KeyError:
+                    match = matches_labels(match_object.service_labels, service_labels_condition)
+                    self._service_match_cache[service_cache_id] = match
 
-    def _matches_service_description_condition(self,
-                                               service_description_condition: Tuple[bool,
-                                                                                    Pattern[str]],
-                                               match_object: RulesetMatchObject) -> bool:
-        negate, pattern = service_description_condition
+                if not match:
+                    continue
 
-        if match_object.service_description is not None \
-            and pattern.match(match_object.service_description) is not None:
-            return not negate
-        return negate
+            yield value
 
     # TODO: Find a way to use the generic get_host_ruleset_values
     def get_values_for_generic_agent_host(self, ruleset: Ruleset) -> List[RuleValue]:
@@ -282,7 +281,7 @@ class RulesetOptimizer:
         super(RulesetOptimizer, self).__init__()
         self._ruleset_matcher = ruleset_matcher
         self._labels = labels
-        self._host_tags = {hn: set(tags_of_host.items()) for hn, tags_of_host in host_tags.items()}
+        self._host_tags_of_hosts = host_tags
         self._host_paths = host_paths
         self._clusters_of = clusters_of
         self._nodes_of = nodes_of
@@ -295,25 +294,15 @@ class RulesetOptimizer:
         # may contain a reduced set of hosts, since each process handles a subset
         self._all_processed_hosts = self._all_configured_hosts
 
-        # A factor which indicates how much hosts share the same host tag configuration (excluding folders).
-        # len(all_processed_hosts) / len(different tag combinations)
-        # It is used to determine the best rule evualation method
-        self._all_processed_hosts_similarity = 1.0
-
         self._service_ruleset_cache: Dict = {}
         self._host_ruleset_cache: Dict = {}
         self._all_matching_hosts_match_cache: Dict = {}
 
-        # Reference dirname -> hosts in this dir including subfolders
-        self._folder_host_lookup: Dict[Tuple[bool, str], Set[HostName]] = {}
-
-        # Provides a list of hosts with the same hosttags, excluding the folder
-        self._hosts_grouped_by_tags: Dict[Tuple[Tuple[TaggroupID, TagID], ...], Set[HostName]] = {}
-        # Reference hostname -> tag group reference
-        self._host_grouped_ref: Dict[HostName, Tuple[Tuple[TaggroupID, TagID], ...]] = {}
-
-        # TODO: Clean this one up?
-        self._initialize_host_lookup()
+        # Each host gets a position in this index. All host conditions of the rules
+        # are evaluated on bitsets of these positions.
+        self._host_index = HostBitsetIndex(self._all_configured_hosts, host_tags, host_paths)
+        self._all_configured_hosts_mask = self._host_index.all_hosts
+        self._all_processed_hosts_mask = self._host_index.all_hosts
 
     def clear_ruleset_caches(self) -> None:
         self._host_ruleset_cache.clear()
@@ -322,6 +311,7 @@ class RulesetOptimizer:
     def clear_caches(self) -> None:
         self._host_ruleset_cache.clear()
         self._all_matching_hosts_match_cache.clear()
+        self._host_index.clear_labels()
 
     def all_processed_hosts(self) -> Set[HostName]:
         """Returns a set of all processed hosts"""
@@ -340,32 +330,27 @@ class RulesetOptimizer:
 
         self._all_processed_hosts.update(nodes_and_clusters)
 
-        # The folder host lookup includes a list of all -processed- hosts within a given
-        # folder. Any update with set_all_processed hosts invalidates this cache, because
-        # the scope of relevant hosts has changed. This is -good-, since the values in this
-        # lookup are iterated one by one later on in all_matching_hosts
-        self._folder_host_lookup = {}
-
-        self._adjust_processed_hosts_similarity()
-
-    def _adjust_processed_hosts_similarity(self) -> None:
-        """ This function computes the tag similarities between of the processed hosts
-        The result is a similarity factor, which helps finding the most perfomant operation
-        for the current hostset """
-        used_groups = {
-            self._host_grouped_ref.get(hostname, ()) for hostname in self._all_processed_hosts
-        }
-
-        if not used_groups:
-            self._all_processed_hosts_similarity = 1.0
-            return
-
-        self._all_processed_hosts_similarity = (1.0 * len(self._all_processed_hosts) /
-                                                len(used_groups))
+        # Hosts which are not configured have no position in the index yet. This
+        # does not happen during regular operation, but has to be handled anyways.
+        if any(hostname not in self._host_index for hostname in self._all_processed_hosts):
+            self._host_index = HostBitsetIndex(
+                self._all_configured_hosts | self._all_processed_hosts,
+                self._host_tags_of_hosts,
+                self._host_paths,
+            )
+            self._all_configured_hosts_mask = self._host_index.mask_of(self._all_configured_hosts)
+
+        # The scope of relevant hosts has changed. Results computed for the previous
+        # scope must not be used anymore.
+        self._all_processed_hosts_mask = self._host_index.mask_of(self._all_processed_hosts)
+        self._all_matching_hosts_match_cache.clear()
 
-    def get_host_ruleset(self, ruleset: Ruleset, with_foreign_hosts: bool,
-                         is_binary: bool) -> PreprocessedHostRuleset:
-        cache_id = id(ruleset), with_foreign_hosts
+    def get_host_ruleset(self,
+                         ruleset: Ruleset,
+                         with_foreign_hosts: bool,
+                         is_binary: bool,
+                         ruleset_id: Optional[Hashable] = None) -> PreprocessedHostRuleset:
+        cache_id = id(ruleset) if ruleset_id is None else ruleset_id, with_foreign_hosts
 
         if cache_id in self._host_ruleset_cache:
             return self._host_ruleset_cache[cache_id]
@@ -391,9 +376,12 @@ class RulesetOptimizer:
 
         return host_values
 
-    def get_service_ruleset(self, ruleset: Ruleset, with_foreign_hosts: bool,
-                            is_binary: bool) -> PreprocessedServiceRuleset:
-        cache_id = id(ruleset), with_foreign_hosts
+    def get_service_ruleset(self,
+                            ruleset: Ruleset,
+                            with_foreign_hosts: bool,
+                            is_binary: bool,
+                            ruleset_id: Optional[Hashable] = None) -> PreprocessedServiceRuleset:
+        cache_id = id(ruleset) if ruleset_id is None else ruleset_id, with_foreign_hosts
 
         if cache_id in self._service_ruleset_cache:
             return self._service_ruleset_cache[cache_id]
@@ -406,7 +394,8 @@ class RulesetOptimizer:
 
     def _convert_service_ruleset(self, ruleset: Ruleset, with_foreign_hosts: bool,
                                  is_binary: bool) -> PreprocessedServiceRuleset:
-        new_rules: PreprocessedServiceRuleset = []
+        new_rules: List[PreprocessedServiceRule] = []
+        service_description_conditions = []
         for rule in ruleset:
             if "options" in rule and "disabled" in rule["options"]:
                 continue
@@ -421,31 +410,12 @@ class RulesetOptimizer:
                 (label_id, _tags_or_labels_cache_id(label_spec))
                 for label_id, label_spec in service_labels_condition.items())
 
-            # And now preprocess the configured patterns in the servlist
             new_rules.append(
-                (rule["value"], hosts, service_labels_condition, service_labels_condition_cache_id,
-                 self._convert_pattern_list(rule["condition"].get("service_description"))))
-        return new_rules
-
-    def _convert_pattern_list(self, patterns: List[str]) -> PreprocessedPattern:
-        """Compiles a list of service match patterns to a to a single regex
-
-        Reducing the number of individual regex matches improves the performance dramatically.
-        This function assumes either all or no pattern is negated (like WATO creates the rules).
-        """
-        if not patterns:
-            return False, regex(u"")  # Match everything
+                (rule["value"], hosts, service_labels_condition, service_labels_condition_cache_id))
+            service_description_conditions.append(rule["condition"].get("service_description"))
 
-        negate, patterns = parse_negated_condition_list(patterns)
-
-        pattern_parts = []
-        for p in patterns:
-            if isinstance(p, dict):
-                pattern_parts.append(p["$regex"])
-            else:
-                pattern_parts.append(p)
-
-        return negate, regex("(?:%s)" % "|".join("(?:%s)" % p for p in pattern_parts))
+        # The service description patterns of all rules are matched in one go
+        return new_rules, ServiceDescriptionMatcher(service_description_conditions)
 
     def _all_matching_hosts(self, condition: Dict[str, Any],
                             with_foreign_hosts: bool) -> Set[HostName]:
@@ -471,63 +441,34 @@ class RulesetOptimizer:
         except KeyError:
             pass
 
-        if with_foreign_hosts:
-            valid_hosts = self._all_configured_hosts
-        else:
-            valid_hosts = self._all_processed_hosts
-
-        # Thin out the valid hosts further. If the rule is located in a folder
-        # we only need the intersection of the folders hosts and the previously determined valid_hosts
-        valid_hosts = self.get_hosts_within_folder(rule_path,
-                                                   with_foreign_hosts).intersection(valid_hosts)
+        index = self._host_index
+        valid_hosts = (self._all_configured_hosts_mask
+                       if with_foreign_hosts else self._all_processed_hosts_mask)
 
-        if tag_conditions and hostlist is None and not labels:
-            # TODO: Labels could also be optimized like the tags
-            matched_by_tags = self._match_hosts_by_tags(cache_id, valid_hosts, tag_conditions)
-            if matched_by_tags is not None:
-                return matched_by_tags
-
-        matching: Set[HostName] = set()
-        only_specific_hosts = (hostlist is not None and not isinstance(hostlist, dict) and
-                               all(not isinstance(x, dict) for x in hostlist))
+        # Thin out the valid hosts step by step, the cheap conditions first. The
+        # labels may need to be computed, so they are only looked at for the hosts
+        # that are left after all other conditions.
+        valid_hosts &= index.folder_mask(rule_path)
 
         if hostlist == []:
-            pass  # Empty host list -> Nothing matches
-
-        elif not tag_conditions and not labels and not hostlist:
-            # If no tags are specified and the hostlist only include @all (all hosts)
-            matching = valid_hosts
-
-        elif not tag_conditions and not labels and only_specific_hosts and hostlist is not None:
-            # If no tags are specified and there are only specific hosts we already have the matches
-            matching = valid_hosts.intersection(hostlist)
-
-        else:
-            # If the rule has only exact host restrictions, we can thin out the list of hosts to check
-            if only_specific_hosts and hostlist is not None:
-                hosts_to_check = valid_hosts.intersection(hostlist)
-            else:
-                hosts_to_check = valid_hosts
-
-            for hostname in hosts_to_check:
-                # When no tag matching is requested, do not filter by tags. Accept all hosts
-                # and filter only by hostlist
-                if tag_conditions and not self.matches_host_tags(
-                        self._host_tags[hostname],
-                        tag_conditions,
-                ):
-                    continue
+            valid_hosts = 0  # Empty host list -> Nothing matches
 
-                if labels:
-                    host_labels = self._labels.labels_of_host(self._ruleset_matcher, hostname)
-                    if not matches_labels(host_labels, labels):
-                        continue
+        for taggroup_id, tag_condition in tag_conditions.items():
+            if not valid_hosts:
+                break
+            valid_hosts &= index.tag_condition_mask(taggroup_id, tag_condition)
 
-                if not self.matches_host_name(hostlist, hostname):
-                    continue
+        if hostlist and valid_hosts:
+            valid_hosts = index.host_name_mask(hostlist, valid_hosts)
 
-                matching.add(hostname)
+        if labels and valid_hosts:
+            valid_hosts = index.labels_mask(
+                labels,
+                valid_hosts,
+                lambda hostname: self._labels.labels_of_host(self._ruleset_matcher, hostname),
+            )
 
+        matching = index.hosts_of(valid_hosts)
         self._all_matching_hosts_match_cache[cache_id] = matching
         return matching
 
@@ -592,92 +533,10 @@ class RulesetOptimizer:
             rule_path,
         )
 
-    # TODO: Generalize this optimization: Build some kind of key out of the tag conditions
-    # (positive, negative, ...). Make it work with the new tag group based "$or" handling.
-    def _match_hosts_by_tags(
-        self,
-        cache_id,
-        valid_hosts: Set[HostName],
-        tag_conditions: TaggroupIDToTagCondition,
-    ):
-        matching = set()
-        negative_match_tags = set()
-        positive_match_tags = set()
-        for taggroup_id, tag_condition in tag_conditions.items():
-            if isinstance(tag_condition, dict):
-                if "$ne" in tag_condition:
-                    negative_match_tags.add((
-                        taggroup_id,
-                        cast(TagConditionNE, tag_condition)["$ne"],
-                    ))
-                    continue
-
-                if "$or" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
-
-                if "$nor" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
-
-                raise NotImplementedError()
-
-            positive_match_tags.add((taggroup_id, tag_condition))
-
-        # TODO:
-        #if has_specific_folder_tag or self._all_processed_hosts_similarity < 3.0:
-        if self._all_processed_hosts_similarity < 3.0:
-            # Without shared folders
-            for hostname in valid_hosts:
-                if (positive_match_tags <= self._host_tags[hostname] and
-                        not negative_match_tags.intersection(self._host_tags[hostname])):
-                    matching.add(hostname)
-
-            self._all_matching_hosts_match_cache[cache_id] = matching
-            return matching
-
-        # With shared folders
-        checked_hosts: Set[str] = set()
-        for hostname in valid_hosts:
-            if hostname in checked_hosts:
-                continue
-
-            hosts_with_same_tag = self._filter_hosts_with_same_tags_as_host(hostname, valid_hosts)
-            checked_hosts.update(hosts_with_same_tag)
-
-            if (positive_match_tags <= self._host_tags[hostname] and
-                    not negative_match_tags.intersection(self._host_tags[hostname])):
-                matching.update(hosts_with_same_tag)
-
-        self._all_matching_hosts_match_cache[cache_id] = matching
-        return matching
-
-    def _filter_hosts_with_same_tags_as_host(
-        self,
-        hostname: HostName,
-        hosts: Set[HostName],
-    ):
-        return self._hosts_grouped_by_tags[self._host_grouped_ref[hostname]].intersection(hosts)
-
     def get_hosts_within_folder(self, folder_path: str, with_foreign_hosts: bool) -> Set[HostName]:
-        cache_id = with_foreign_hosts, folder_path
-        if cache_id not in self._folder_host_lookup:
-            hosts_in_folder = set()
-            relevant_hosts = self._all_configured_hosts if with_foreign_hosts else self._all_processed_hosts
-
-            for hostname in relevant_hosts:
-                host_path = self._host_paths.get(hostname, "/")
-                if host_path.startswith(folder_path):
-                    hosts_in_folder.add(hostname)
-
-            self._folder_host_lookup[cache_id] = hosts_in_folder
-            return hosts_in_folder
-
-        return self._folder_host_lookup[cache_id]
-
-    def _initialize_host_lookup(self):
-        for hostname in self._all_configured_hosts:
-            group_ref = tuple(sorted(self._host_tags[hostname]))
-            self._hosts_grouped_by_tags.setdefault(group_ref, set()).add(hostname)
-            self._host_grouped_ref[hostname] = group_ref
+        relevant_hosts = (self._all_configured_hosts_mask
+                          if with_foreign_hosts else self._all_processed_hosts_mask)
+        return self._host_index.hosts_of(relevant_hosts & self._host_index.folder_mask(folder_path))
 
 
 def _tags_or_labels_cache_id(tag_or_label_spec):
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Matches a service description against the conditions of all rules of a ruleset
+
+Most service description conditions are plain strings or start with a literal
+prefix ("Interface ", "Filesystem /", ...). These prefixes are put into a trie
+which is walked once per service description. Only the rules whose patterns
+really need regex logic are evaluated with a regex, and only if their literal
+prefix matched.
+"""
+
+from typing import Any, Dict, Optional, Pattern, Sequence, Set, Tuple
+
+from cmk.utils.regex import regex
+from cmk.utils.type_defs import ServiceName
+
+# Characters which end the literal prefix of a pattern
+_REGEX_META_CHARS = frozenset(".^$*+?{}[]\\|()")
+# Quantifiers which make the preceding character optional
+_OPTIONAL_QUANTIFIERS = frozenset("*?{")
+
+# Kind of check needed after the literal prefix of an alternative has matched
+_PREFIX = 0  # Nothing more to check
+_EXACT = 1  # The description has to end after the prefix
+_REGEX = 2  # The regex of the alternative has to match
+
+_Entry = Tuple[int, int, Optional[Pattern[str]]]
+
+
+def split_literal_prefix(pattern: str) -> Tuple[str, str]:
+    """Split a pattern into the literal prefix every match starts with and the rest
+
+    >>> split_literal_prefix("Interface 1")
+    ('Interface 1', '')
+    >>> split_literal_prefix("CPU load$")
+    ('CPU load', '$')
+    >>> split_literal_prefix("Filesystem /var.*")
+    ('Filesystem /var', '.*')
+    >>> split_literal_prefix("Interfaces?")
+    ('Interface', 's?')
+    >>> split_literal_prefix("Foo|Bar")
+    ('', 'Foo|Bar')
+    """
+    if "|" in pattern:
+        return "", pattern  # The alternatives may not share the prefix
+
+    for pos, char in enumerate(pattern):
+        if char in _REGEX_META_CHARS:
+            if char in _OPTIONAL_QUANTIFIERS and pos > 0:
+                pos -= 1
+            return pattern[:pos], pattern[pos:]
+    return pattern, ""
+
+
+class ServiceDescriptionMatcher:
+    """Computes the indices of all rules whose service description condition matches
+
+    The conditions have the format of the "service_description" rule condition:
+    None or an empty list (matches everything), a list of patterns or a {"$nor": [...]}
+    negated list of patterns. Like the compiled regex of the single rules did, every
+    pattern is matched against the beginning of the service description.
+    """
+    def __init__(self, conditions: Sequence[Any]) -> None:
+        super(ServiceDescriptionMatcher, self).__init__()
+        # Trie of the literal prefixes. The entries of the alternatives ending at a
+        # node are stored with the key "", which can not be a character.
+        self._trie: Dict[str, Any] = {}
+        self._negated: Set[int] = set()
+        self._match_all: Set[int] = set()
+        self._cache: Dict[ServiceName, Tuple[int, ...]] = {}
+
+        for index, condition in enumerate(conditions):
+            self._add_condition(index, condition)
+
+    def _add_condition(self, index: int, condition: Any) -> None:
+        if not condition:
+            self._match_all.add(index)
+            return
+
+        if isinstance(condition, dict) and "$nor" in condition:
+            self._negated.add(index)
+            condition = condition["$nor"]
+
+        if not condition:
+            # An empty negated list matches nothing, like the empty regex would
+            self._trie.setdefault("", []).append((index, _PREFIX, None))
+            return
+
+        for pattern in condition:
+            if isinstance(pattern, dict):
+                pattern = pattern["$regex"]
+
+            # Compile all patterns, also the literal ones, to get the usual
+            # error handling for invalid patterns
+            compiled = regex(pattern)
+            prefix, rest = split_literal_prefix(pattern)
+            if not rest:
+                entry: _Entry = (index, _PREFIX, None)
+            elif rest == "$":
+                entry = (index, _EXACT, None)
+            else:
+                entry = (index, _REGEX, compiled)
+
+            node = self._trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node.setdefault("", []).append(entry)
+
+    def matching_rules(self, service_description: ServiceName) -> Tuple[int, ...]:
+        """Returns the sorted indices of all rules matching the service description"""
+        try:
+            return self._cache[service_description]
+        except KeyError:
+            pass
+
+        matched = self._match_patterns(service_description)
+        result = tuple(sorted((matched ^ self._negated) | self._match_all))
+        self._cache[service_description] = result
+        return result
+
+    def _match_patterns(self, service_description: ServiceName) -> Set[int]:
+        matched: Set[int] = set()
+        node = self._trie
+        depth = 0
+        length = len(service_description)
+        while True:
+            for index, kind, pattern in node.get("", ()):
+                if index in matched:
+                    continue
+
+                if kind == _PREFIX:
+                    matched.add(index)
+                elif kind == _EXACT:
+                    # Like "$" in a regex also accept a trailing newline
+                    if depth == length or (depth == length - 1 and
+                                           service_description[depth] == "\n"):
+                        matched.add(index)
+                elif pattern is not None and pattern.match(service_description) is not None:
+                    matched.add(index)
+
+            if depth == length:
+                return matched
+
+            node = node.get(service_description[depth])
+            if node is None:
+                return matched
+            depth += 1
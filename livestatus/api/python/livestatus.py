@@ -6,13 +6,30 @@
 """MK Livestatus Python API"""
 import ast
 import contextlib
+import json
 import os
 import re
+import selectors
 import socket
 import ssl
 import threading
 import time
-from typing import Any, AnyStr, Dict, List, NewType, Optional, Pattern, Set, Tuple, Type, Union
+from typing import (
+    Any,
+    AnyStr,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    NewType,
+    NoReturn,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 # TODO: Find a better solution for this issue. Astroid 2.x bug prevents us from using NewType :(
 # (https://github.com/PyCQA/pylint/issues/2296)
@@ -56,6 +73,30 @@ def _ensure_unicode(value: Union[str, bytes]) -> str:
     return value.decode("utf-8")
 
 
+def _decode_python3(data: str) -> Any:
+    r"""Decode a response of the output format "python3"
+
+    The strings of this format are prefixed with "u" and double quoted. They
+    contain no double quotes and only \u escapes. Without the prefixes and
+    with null instead of None the response is JSON, which is decoded much
+    faster than with ast.literal_eval. Responses containing blobs ("b"
+    prefixed) or \U escapes have no JSON equivalent and are decoded with
+    ast.literal_eval.
+
+    >>> _decode_python3('[[u"menu",-1,None,[u"\\u00e4"],{u"x":1.5e+10}],\n[u"",b"\\x00"]]\n')
+    [['menu', -1, None, ['ä'], {'x': 15000000000.0}], ['', b'\x00']]
+    """
+    parts = data.split('"')
+    outside = "\0".join(parts[0::2])
+    if outside.count("u\0") == len(parts) // 2 and "\\U" not in data:
+        parts[0::2] = outside.replace("u\0", "\0").replace("None", "null").split("\0")
+        try:
+            return json.loads('"'.join(parts))
+        except ValueError:
+            pass
+    return ast.literal_eval(data)
+
+
 class MKLivestatusException(Exception):
     pass
 
@@ -288,6 +329,14 @@ QueryTypes = Union[str, bytes, Query]
 OnlySites = Optional[List[SiteId]]
 DeadSite = Dict[str, Union[str, int, Exception, SiteConfiguration]]
 
+
+class SiteQueryStats(NamedTuple):
+    """Timing and size of the response of a site to a query"""
+    latency: float  # seconds until the first byte of the response arrived
+    duration: float  # seconds until the response was complete
+    bytes_received: int
+
+
 #.
 #   .--SingleSiteConn------------------------------------------------------.
 #   |  ____  _             _      ____  _ _        ____                    |
@@ -348,6 +397,9 @@ class SingleSiteConnection(Helpers):
     # a class-variable for this case, so we activate this across all sites at once.
     collect_queries = threading.local()
 
+    # Number of bytes received and decoded at once by query_iter()
+    receive_chunk_size = 256 * 1024
+
     def __init__(self,
                  socketurl: str,
                  site_name: Optional[str] = None,
@@ -481,16 +533,16 @@ class SingleSiteConnection(Helpers):
         if self.socket is None:
             raise MKLivestatusSocketError("Socket to '%s' is not connected" % self.socketurl)
 
-        result = b""
+        result = bytearray(size)
+        view = memoryview(result)
         # Timeout is only honored when connecting
         self.socket.settimeout(None)
-        while size > 0:
-            packet = self.socket.recv(size)
-            if not packet:
+        while view:
+            length = self.socket.recv_into(view)
+            if not length:
                 raise MKLivestatusSocketClosed(
                     "Read zero data from socket, nagios server closed connection")
-            size -= len(packet)
-            result += packet
+            view = view[length:]
         return result
 
     def do_query(self, query_obj: Query, add_headers: str = "") -> LivestatusResponse:
@@ -550,34 +602,7 @@ class SingleSiteConnection(Helpers):
                       suppress_exceptions: Tuple[Type[Exception], ...],
                       timeout_at: Optional[float] = None) -> LivestatusResponse:
         try:
-            # Headers are always ASCII encoded
-            resp = self.receive_data(16)
-            code = resp[0:3].decode("ascii")
-            try:
-                length = int(resp[4:15].lstrip())
-            except Exception:
-                self.disconnect()
-                raise MKLivestatusSocketError(
-                    "Malformed output. Livestatus TCP socket might be unreachable or wrong"
-                    "encryption settings are used.")
-
-            data = self.receive_data(length).decode("utf-8")
-
-            if code == "200":
-                try:
-                    return ast.literal_eval(data)
-                except (ValueError, SyntaxError):
-                    self.disconnect()
-                    raise MKLivestatusSocketError("Malformed output")
-
-            elif code == "404":
-                raise MKLivestatusTableNotFoundError("Not Found (%s): %s" % (code, data.strip()))
-
-            elif code == "502":
-                raise MKLivestatusBadGatewayError(data.strip())
-
-            else:
-                raise MKLivestatusQueryError("%s: %s" % (code, data.strip()))
+            return self._decode_response(self.receive_data(self._receive_header()))
 
         except (MKLivestatusSocketClosed, IOError) as e:
             # In case of an IO error or the other side having
@@ -617,6 +642,126 @@ class SingleSiteConnection(Helpers):
             # FIXME: ? self.disconnect()
             raise MKLivestatusSocketError("Unhandled exception: %s" % e)
 
+    def _receive_header(self) -> int:
+        """Receive the response header and return the length of the response
+
+        The responses to failed queries are received completely and raised.
+        """
+        code, length = self._parse_header(self.receive_data(16))
+        if code != "200":
+            self._raise_error(code, self.receive_data(length))
+        return length
+
+    def _parse_header(self, header: bytes) -> Tuple[str, int]:
+        """Return the status code and the length of the response"""
+        # Headers are always ASCII encoded
+        code = header[0:3].decode("ascii")
+        try:
+            return code, int(header[4:15].lstrip())
+        except Exception:
+            self.disconnect()
+            raise MKLivestatusSocketError(
+                "Malformed output. Livestatus TCP socket might be unreachable or wrong"
+                "encryption settings are used.")
+
+    def _raise_error(self, code: str, response: bytes) -> NoReturn:
+        data = response.decode("utf-8")
+
+        if code == "404":
+            raise MKLivestatusTableNotFoundError("Not Found (%s): %s" % (code, data.strip()))
+
+        if code == "502":
+            raise MKLivestatusBadGatewayError(data.strip())
+
+        raise MKLivestatusQueryError("%s: %s" % (code, data.strip()))
+
+    def _decode_response(self, response: bytes) -> LivestatusResponse:
+        try:
+            return _decode_python3(response.decode("utf-8"))
+        except (ValueError, SyntaxError):
+            self.disconnect()
+            raise MKLivestatusSocketError("Malformed output")
+
+    def _receive_rows(self, length: int) -> Iterator[LivestatusRow]:
+        """Receive and decode the rows of a response chunk by chunk
+
+        Livestatus writes every row of a "python3" response to its own line,
+        so all complete lines of a chunk can be decoded together.
+        """
+        pending = b""
+        first = True
+        while length > 0:
+            data = pending + self.receive_data(min(length, self.receive_chunk_size))
+            length -= len(data) - len(pending)
+            if length > 0:
+                end = data.rfind(b"\n") + 1
+                data, pending = data[:end], data[end:]
+                if not data:
+                    continue
+
+            text = data.decode("utf-8").strip()
+            if first and text.startswith("["):
+                text = text[1:]
+            first = False
+            if length <= 0 and text.endswith("]"):
+                text = text[:-1]
+            text = text.rstrip(",\n ")
+            if not text:
+                continue
+
+            try:
+                rows = _decode_python3("[%s]" % text)
+            except (ValueError, SyntaxError):
+                self.disconnect()
+                raise MKLivestatusSocketError("Malformed output")
+            yield from rows
+
+    def query_iter(self,
+                   query: 'QueryTypes',
+                   add_headers: Union[str, bytes] = "") -> Iterator[LivestatusRow]:
+        """Issue a query and yield the rows while the response is received
+
+        In contrast to query() the response is received and decoded in chunks
+        of receive_chunk_size bytes. Only the rows of the current chunk are
+        kept in memory. Stopping the iteration early closes the connection.
+        """
+        normalized_add_headers = _ensure_unicode(add_headers)
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        if self.limit is not None:
+            normalized_query = Query("%sLimit: %d\n" % (normalized_query, self.limit),
+                                     normalized_query.suppress_exceptions)
+
+        str_query = self.build_query(normalized_query, normalized_add_headers)
+        for retry in [True, False]:
+            try:
+                self.send_query(str_query)
+                length = self._receive_header()
+                break
+            except (MKLivestatusSocketClosed, IOError) as e:
+                # Most likely a persistent connection closed by the other side
+                self.disconnect()
+                if not retry:
+                    raise MKLivestatusSocketError(str(e))
+            except normalized_query.suppress_exceptions:
+                raise
+            except Exception as e:
+                raise MKLivestatusSocketError("Unhandled exception: %s" % e)
+
+        complete = False
+        try:
+            for row in self._receive_rows(length):
+                if self.prepend_site:
+                    row.insert(0, b"")
+                yield row
+            complete = True
+        except (MKLivestatusSocketClosed, IOError) as e:
+            raise MKLivestatusSocketError(str(e))
+        finally:
+            if not complete:
+                # The rest of the response is still waiting in the socket
+                self.disconnect()
+
     def set_prepend_site(self, p: bool) -> None:
         self.prepend_site = p
 
@@ -700,6 +845,95 @@ class SingleSiteConnection(Helpers):
 # it possible to connect/disconnect while an object is instantiated.
 
 
+class _ResponseReceiver:
+    """Receives the response of a site without blocking
+
+    Used by MultiSiteConnection.query_parallel() to receive the responses of
+    all sites at the same time. read() is called whenever the socket is
+    readable and receives everything available into a preallocated buffer.
+    """
+    def __init__(self, connection: SingleSiteConnection, query: str,
+                 timeout: Optional[float]) -> None:
+        super(_ResponseReceiver, self).__init__()
+        self.connection = connection
+        self.query = query
+        self.sent_at = time.time()
+        self.deadline = None if timeout is None else self.sent_at + timeout
+        self.first_byte_at: Optional[float] = None
+        self.bytes_received = 0
+        self.registered = False
+        self.retried = False
+        self._socket: Optional[socket.socket] = None
+        self._code: Optional[str] = None
+        self._buffer = bytearray(16)
+        self._view = memoryview(self._buffer)
+
+    def register(self, selector: selectors.BaseSelector, sitename: SiteId) -> None:
+        if self.connection.socket is None:
+            raise MKLivestatusSocketError("Socket to '%s' is not connected" %
+                                          self.connection.socketurl)
+        self._socket = self.connection.socket
+        self._socket.settimeout(0.0)
+        selector.register(self._socket, selectors.EVENT_READ, sitename)
+        self.registered = True
+
+    def unregister(self, selector: selectors.BaseSelector) -> None:
+        if self._socket is None:
+            return
+        selector.unregister(self._socket)
+        self.registered = False
+        try:
+            self._socket.settimeout(None)
+        except IOError:
+            pass
+        self._socket = None
+
+    def retry(self, selector: selectors.BaseSelector, sitename: SiteId) -> None:
+        """Send the query again on a new connection"""
+        self.retried = True
+        self.connection.disconnect()
+        self.connection.connect()
+        self.connection.send_query(self.query)
+        self.register(selector, sitename)
+
+    def read(self) -> bool:
+        """Receive the available data and return whether the response is complete"""
+        assert self._socket is not None
+        while self._view:
+            try:
+                length = self._socket.recv_into(self._view)
+            except (BlockingIOError, ssl.SSLWantReadError):
+                return False
+            if not length:
+                raise MKLivestatusSocketClosed(
+                    "Read zero data from socket, nagios server closed connection")
+
+            if self.first_byte_at is None:
+                self.first_byte_at = time.time()
+            self.bytes_received += length
+            self._view = self._view[length:]
+
+            if not self._view and self._code is None:
+                self._code, size = self.connection._parse_header(self._buffer)
+                self._buffer = bytearray(size)
+                self._view = memoryview(self._buffer)
+        return True
+
+    def response(self) -> LivestatusResponse:
+        """Decode the complete response or raise the error it reports"""
+        if self._code != "200":
+            self.connection._raise_error(str(self._code), self._buffer)
+        return self.connection._decode_response(self._buffer)
+
+    def stats(self) -> SiteQueryStats:
+        now = time.time()
+        return SiteQueryStats(
+            latency=(self.first_byte_at or now) - self.sent_at,
+            duration=now - self.sent_at,
+            bytes_received=self.bytes_received,
+        )
+
+
 class MultiSiteConnection(Helpers):
     def __init__(self,
                  sites: SiteConfigurations,
@@ -714,6 +948,11 @@ class MultiSiteConnection(Helpers):
         self.only_sites: OnlySites = None
         self.limit: Optional[int] = None
         self.parallelize = True
+        # Seconds to wait for the response of a site in query_parallel()
+        self.query_timeout: Optional[float] = 120.0
+        # Timing and size of the responses to the last query, only query_parallel()
+        # measures them. Every query resets them.
+        self.query_stats: Dict[SiteId, SiteQueryStats] = {}
 
         # Status host: A status host helps to prevent trying to connect
         # to a remote site which is unreachable. This is done by looking
@@ -888,6 +1127,10 @@ class MultiSiteConnection(Helpers):
         """Impose Limit on number of returned datasets (distributed among sites)"""
         self.limit = limit
 
+    def set_query_timeout(self, timeout: Optional[float]) -> None:
+        """Mark sites as dead which do not answer a query within timeout seconds"""
+        self.query_timeout = timeout
+
     def dead_sites(self) -> Dict[SiteId, DeadSite]:
         return self.deadsites
 
@@ -921,6 +1164,7 @@ class MultiSiteConnection(Helpers):
         return self.query_non_parallel(normalized_query, normalized_add_headers)
 
     def query_non_parallel(self, query: Query, add_headers: str = u"") -> LivestatusResponse:
+        self.query_stats = {}
         result = LivestatusResponse([])
         stillalive = []
         limit = self.limit
@@ -952,10 +1196,54 @@ class MultiSiteConnection(Helpers):
         self.connections = stillalive
         return result
 
+    def query_iter(self,
+                   query: 'QueryTypes',
+                   add_headers: Union[str, bytes] = u"") -> Iterator[LivestatusRow]:
+        """Yield the rows of all sites, one site after the other
+
+        See SingleSiteConnection.query_iter(). Sites failing during the query
+        are marked as dead, the rows they already sent have been yielded.
+        """
+        normalized_add_headers = _ensure_unicode(add_headers)
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        self.query_stats = {}
+        limit = self.limit
+        for sitename, site, connection in list(self.connections):
+            if self.only_sites is not None and sitename not in self.only_sites:
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit_header = "Limit: %d\n" % limit
+            else:
+                limit_header = ""
+
+            try:
+                for row in connection.query_iter(normalized_query,
+                                                 normalized_add_headers + limit_header):
+                    if self.prepend_site:
+                        row.insert(0, sitename)
+                    if limit is not None:
+                        limit -= 1
+                    yield row
+            except normalized_query.suppress_exceptions:
+                continue
+            except LivestatusTestingError:
+                raise
+            except Exception as e:
+                connection.disconnect()
+                self.deadsites[sitename] = {
+                    "exception": e,
+                    "site": site,
+                }
+                self.connections = [c for c in self.connections if c[0] != sitename]
+
     # New parallelized version of query(). The semantics differs in the handling
     # of Limit: since all sites are queried in parallel, the Limit: is simply
     # applied to all sites - resulting in possibly more results then Limit requests.
     def query_parallel(self, query: Query, add_headers: str = u"") -> LivestatusResponse:
+        self.query_stats = {}
         stillalive = []
         if self.only_sites is not None:
             connect_to_sites = [c for c in self.connections if c[0] in self.only_sites]
@@ -971,10 +1259,12 @@ class MultiSiteConnection(Helpers):
             limit_header = u""
 
         # First send all queries
+        receivers: Dict[SiteId, _ResponseReceiver] = {}
         for sitename, site, connection in connect_to_sites:
             try:
                 str_query = connection.build_query(query, add_headers + limit_header)
                 connection.send_query(str_query)
+                receivers[sitename] = _ResponseReceiver(connection, str_query, self.query_timeout)
             except LivestatusTestingError:
                 raise
             except Exception as e:
@@ -983,33 +1273,106 @@ class MultiSiteConnection(Helpers):
                     "site": site,
                 }
 
-        # Then retrieve all answers. We will be as slow as the slowest of all
-        # connections.
+        # Then receive the answers of all sites as they arrive. A slow site
+        # does not delay reading from the others.
+        sites = {sitename: site for sitename, site, _connection in connect_to_sites}
+        responses = self._receive_responses(receivers, sites, query.suppress_exceptions)
+
+        # Keep the order of the sites in the result
         result = LivestatusResponse([])
         for sitename, site, connection in connect_to_sites:
-            try:
-                str_query = connection.build_query(query, add_headers + limit_header)
-                r = connection.recv_response(str_query, query.suppress_exceptions)
-                stillalive.append((sitename, site, connection))
-                if self.prepend_site:
-                    for row in r:
-                        row.insert(0, sitename)
-                result += r
-            except query.suppress_exceptions:
-                stillalive.append((sitename, site, connection))
+            if sitename not in responses:
                 continue
-            except LivestatusTestingError:
-                raise
-            except Exception as e:
-                connection.disconnect()
-                self.deadsites[sitename] = {
-                    "exception": e,
-                    "site": site,
-                }
+            stillalive.append((sitename, site, connection))
+            if self.prepend_site:
+                for row in responses[sitename]:
+                    row.insert(0, sitename)
+            result += responses[sitename]
 
         self.connections = stillalive
         return result
 
+    def _receive_responses(
+        self,
+        receivers: Dict[SiteId, _ResponseReceiver],
+        sites: SiteConfigurations,
+        suppress_exceptions: Tuple[Type[Exception], ...],
+    ) -> Dict[SiteId, LivestatusResponse]:
+        responses: Dict[SiteId, LivestatusResponse] = {}
+        with selectors.DefaultSelector() as selector:
+            for sitename, receiver in receivers.items():
+                try:
+                    receiver.register(selector, sitename)
+                except (IOError, ValueError) as e:
+                    self._mark_dead(sitename, sites[sitename], receiver.connection, e)
+
+            while selector.get_map():
+                deadlines = [
+                    receiver.deadline
+                    for receiver in receivers.values()
+                    if receiver.deadline is not None and receiver.registered
+                ]
+                timeout = max(0.0, min(deadlines) - time.time()) if deadlines else None
+
+                for key, _events in selector.select(timeout):
+                    sitename = key.data
+                    receiver = receivers[sitename]
+                    try:
+                        if not receiver.read():
+                            continue
+                    except (MKLivestatusSocketClosed, IOError) as e:
+                        receiver.unregister(selector)
+                        if receiver.bytes_received or receiver.retried:
+                            self._mark_dead(sitename, sites[sitename], receiver.connection,
+                                            MKLivestatusSocketError(str(e)))
+                            continue
+                        # Most likely a persistent connection closed by the other side
+                        try:
+                            receiver.retry(selector, sitename)
+                        except LivestatusTestingError:
+                            raise
+                        except Exception as e:
+                            self._mark_dead(sitename, sites[sitename], receiver.connection, e)
+                        continue
+                    except LivestatusTestingError:
+                        raise
+                    except Exception as e:
+                        receiver.unregister(selector)
+                        self._mark_dead(sitename, sites[sitename], receiver.connection, e)
+                        continue
+
+                    receiver.unregister(selector)
+                    self.query_stats[sitename] = receiver.stats()
+                    try:
+                        responses[sitename] = receiver.response()
+                    except suppress_exceptions:
+                        responses[sitename] = LivestatusResponse([])
+                    except LivestatusTestingError:
+                        raise
+                    except Exception as e:
+                        self._mark_dead(sitename, sites[sitename], receiver.connection,
+                                        MKLivestatusSocketError("Unhandled exception: %s" % e))
+
+                now = time.time()
+                for sitename, receiver in receivers.items():
+                    if receiver.registered and receiver.deadline is not None \
+                            and receiver.deadline <= now:
+                        receiver.unregister(selector)
+                        self.query_stats[sitename] = receiver.stats()
+                        self._mark_dead(
+                            sitename, sites[sitename], receiver.connection,
+                            MKLivestatusSocketError("No response within %.1f seconds" %
+                                                    (now - receiver.sent_at)))
+        return responses
+
+    def _mark_dead(self, sitename: SiteId, site: SiteConfiguration,
+                   connection: SingleSiteConnection, exception: Exception) -> None:
+        connection.disconnect()
+        self.deadsites[sitename] = {
+            "exception": exception,
+            "site": site,
+        }
+
     # TODO: Is this SiteId(...) the way to go? Without this mypy complains about incompatible bytes
     # vs. Optional[SiteId]
     def command(self, command: AnyStr, sitename: Optional[SiteId] = SiteId("local")) -> None:
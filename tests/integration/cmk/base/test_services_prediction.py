@@ -7,6 +7,7 @@
 from dataclasses import asdict
 from datetime import datetime
 import json
+import math
 import time
 
 import pytest  # type: ignore[import]
@@ -166,9 +167,10 @@ def test_retieve_grouped_data_from_rrd(cfg_setup, utcdate, timezone, params, ref
     hostname, service_description, dsname = 'test-prediction', "CPU load", 'load15'
     rrd_datacolumn = cmk.utils.prediction.rrd_datacolum(hostname, service_description, dsname,
                                                         "MAX")
-    result = prediction._retrieve_grouped_data_from_rrd(rrd_datacolumn, time_windows)
+    twindow, slices = prediction._retrieve_grouped_data_from_rrd(rrd_datacolumn, time_windows)
 
-    assert result == reference
+    assert (twindow, [[None if math.isnan(v) else v for v in row] for row in slices.tolist()
+                     ]) == reference
 
 
 def _load_expected_result(path: str) -> object:
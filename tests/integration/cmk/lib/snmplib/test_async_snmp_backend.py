@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+
+import pytest  # type: ignore[import]
+
+from cmk.utils.type_defs import SectionName
+
+import cmk.snmplib.snmp_table as snmp_table
+from cmk.snmplib.type_defs import (
+    BackendOIDSpec,
+    BackendSNMPTree,
+    SNMPBackendEnum,
+    SNMPHostConfig,
+    SpecialColumn,
+)
+
+from cmk.core_helpers.snmp_backend import ClassicSNMPBackend
+from cmk.core_helpers.snmp_backend.asynchronous import AsyncSNMPBackend
+
+logger = logging.getLogger(__name__)
+
+# The agent is simulated by the snmpsimd instances started by the conftest.py
+
+COLUMNS = [
+    ".1.3.6.1.2.1.2.2.1.1",
+    ".1.3.6.1.2.1.2.2.1.2",
+    ".1.3.6.1.2.1.2.2.1.6",
+    ".1.3.6.1.2.1.2.2.1.10",
+    ".1.3.6.1.2.1.4.21.1.1",
+    ".1.3.6.1.2.1.1.9.1.3",
+]
+
+
+def _config(is_bulkwalk_host, is_ipv6_primary=False):
+    return SNMPHostConfig(
+        is_ipv6_primary=is_ipv6_primary,
+        ipaddress="::1" if is_ipv6_primary else "127.0.0.1",
+        hostname="localhost",
+        credentials="public",
+        port=1337,
+        is_bulkwalk_host=is_bulkwalk_host,
+        is_snmpv2or3_without_bulkwalk_host=True,
+        bulk_walk_size_of=10,
+        timing={},
+        oid_range_limits=[],
+        snmpv3_contexts=[],
+        character_encoding=None,
+        is_usewalk_host=False,
+        snmp_backend=SNMPBackendEnum.ASYNC,
+    )
+
+
+@pytest.mark.parametrize("is_bulkwalk_host", [True, False])
+@pytest.mark.parametrize("is_ipv6_primary", [True, False])
+def test_walk_columns_like_classic_backend(is_bulkwalk_host, is_ipv6_primary):
+    config = _config(is_bulkwalk_host, is_ipv6_primary)
+    classic = ClassicSNMPBackend(config._replace(snmp_backend=SNMPBackendEnum.CLASSIC), logger)
+    backend = AsyncSNMPBackend(config, logger)
+
+    assert backend.walk_columns(COLUMNS) == [classic.walk(oid) for oid in COLUMNS]
+
+
+@pytest.mark.parametrize("oid", [
+    ".1.3.6.1.2.1.1.1.0",
+    ".1.3.6.1.2.1.2.2.1.6.2",
+    ".1.3.6.1.2.1.1.9.1.*",
+    ".1.3.100.200.300.400",
+])
+def test_get_like_classic_backend(oid):
+    config = _config(is_bulkwalk_host=True)
+    classic = ClassicSNMPBackend(config._replace(snmp_backend=SNMPBackendEnum.CLASSIC), logger)
+    assert AsyncSNMPBackend(config, logger).get(oid) == classic.get(oid)
+
+
+def test_get_snmp_table_like_classic_backend():
+    tree = BackendSNMPTree(
+        base=".1.3.6.1.2.1.2.2.1",
+        oids=[
+            BackendOIDSpec(SpecialColumn.END, "string", False),
+            BackendOIDSpec("2", "string", False),
+            BackendOIDSpec("6", "binary", False),
+            BackendOIDSpec("10", "string", False),
+        ],
+    )
+    config = _config(is_bulkwalk_host=True)
+    tables = [
+        snmp_table.get_snmp_table(
+            section_name=SectionName("interfaces"),
+            tree=tree,
+            walk_cache={},
+            backend=backend,
+        ) for backend in (
+            ClassicSNMPBackend(config._replace(snmp_backend=SNMPBackendEnum.CLASSIC), logger),
+            AsyncSNMPBackend(config, logger),
+        )
+    ]
+    assert tables[0] == tables[1]
+    assert tables[1]
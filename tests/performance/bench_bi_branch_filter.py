@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the filtering of the branches of the compiled BI aggregations
+
+Creates aggregations with one branch per host (the host and its services)
+and filters them like the GUI does, e.g. for the aggregations a host is part
+of on the host detail page. The branches are found once by testing every
+branch, like before the branch index, and once with the branch index. The
+index saved by the compiler is loaded once per request.
+
+    python3 tests/performance/bench_bi_branch_filter.py --aggregations 500 --branches 100
+"""
+
+import argparse
+import pickle
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from cmk.utils.bi.bi_branch_index import BIBranchIndex, index_aggregation
+from cmk.utils.bi.bi_computer import BIAggregationFilter, BIComputer
+from cmk.utils.bi.bi_lib import BIAggregationComputationOptions, BIAggregationGroups
+from cmk.utils.bi.bi_rule_interface import BIRuleProperties
+from cmk.utils.bi.bi_trees import BICompiledAggregation, BICompiledLeaf, BICompiledRule
+
+
+def _aggregations(num_aggregations: int, num_branches: int,
+                  num_services: int) -> Dict[str, BICompiledAggregation]:
+    aggregations = {}
+    for aggr_nr in range(num_aggregations):
+        branches = []
+        for branch_nr in range(num_branches):
+            host_name = "host%d" % (aggr_nr * num_branches + branch_nr)
+            branches.append(
+                BICompiledRule(
+                    "host",
+                    "pack",
+                    [BICompiledLeaf(host_name, None, site_id="site")] + [
+                        BICompiledLeaf(host_name, "Service %d" % nr, site_id="site")
+                        for nr in range(num_services)
+                    ],
+                    [("site", host_name)],
+                    BIRuleProperties({
+                        "title": "Host %s" % host_name,
+                        "comment": "",
+                        "state_messages": {},
+                        "docu_url": "",
+                        "icon": "",
+                    }),
+                    None,
+                    {},
+                ))
+        aggr_id = "aggr%d" % aggr_nr
+        aggregations[aggr_id] = BICompiledAggregation(
+            aggr_id,
+            branches,
+            BIAggregationComputationOptions({
+                "disabled": False,
+                "use_hard_states": False,
+                "escalate_downtimes_as_warn": False,
+            }),
+            {},
+            BIAggregationGroups({
+                "names": ["Group %d" % (aggr_nr % 10)],
+                "paths": [["Path", "%d" % (aggr_nr % 10)]],
+            }),
+        )
+    return aggregations
+
+
+def _scan(aggregations: Dict[str, BICompiledAggregation],
+          bi_aggregation_filter: BIAggregationFilter) -> List[Tuple[str, List[str]]]:
+    """The filtering before the branch index"""
+    result = []
+    for compiled_aggregation in aggregations.values():
+        group_names = set(compiled_aggregation.groups.names +
+                          ["/".join(x) for x in compiled_aggregation.groups.paths])
+        if ((bi_aggregation_filter.aggr_ids and
+             compiled_aggregation.id not in bi_aggregation_filter.aggr_ids) or
+            (bi_aggregation_filter.group_names and
+             not group_names.intersection(bi_aggregation_filter.group_names)) or
+            (bi_aggregation_filter.group_path_prefix and
+             not any("/".join(group_path).startswith(prefix)
+                     for prefix in bi_aggregation_filter.group_path_prefix
+                     for group_path in compiled_aggregation.groups.paths))):
+            result.append((compiled_aggregation.id, []))
+            continue
+
+        titles = []
+        for branch in compiled_aggregation.branches:
+            required_elements = branch.required_elements()
+            if ((bi_aggregation_filter.hosts and
+                 not {x[1] for x in required_elements}.intersection(bi_aggregation_filter.hosts)) or
+                (bi_aggregation_filter.services and
+                 not {x[2] for x in required_elements if x[2] is not None}.intersection(
+                     bi_aggregation_filter.services)) or
+                (bi_aggregation_filter.aggr_titles and
+                 branch.properties.title not in bi_aggregation_filter.aggr_titles)):
+                continue
+            titles.append(branch.properties.title)
+        result.append((compiled_aggregation.id, titles))
+    return result
+
+
+def _timed(function: Callable, repetitions: int) -> Tuple[float, Any]:
+    start = time.time()
+    for _nr in range(repetitions):
+        result = function()
+    return (time.time() - start) / repetitions, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--aggregations", type=int, default=500)
+    parser.add_argument("--branches", type=int, default=100, help="per aggregation")
+    parser.add_argument("--services", type=int, default=10, help="per branch")
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    aggregations = _aggregations(args.aggregations, args.branches, args.services)
+    digests = {aggr_id: "digest of %s" % aggr_id for aggr_id in aggregations}
+    saved_index = pickle.dumps(
+        BIBranchIndex({
+            aggr_id: index_aggregation(aggr, digests[aggr_id])
+            for aggr_id, aggr in aggregations.items()
+        }))
+    host_name = "host%d" % (args.aggregations * args.branches // 2)
+    filters = [
+        ("host", BIAggregationFilter([host_name], [], [], [], [], [])),
+        ("service", BIAggregationFilter([], ["Service 1"], [], [], [], [])),
+        ("host and service", BIAggregationFilter([host_name], ["Service 1"], [], [], [], [])),
+        ("title", BIAggregationFilter([], [], [], ["Host %s" % host_name], [], [])),
+        ("group", BIAggregationFilter([], [], [], [], ["Group 1"], [])),
+        ("group path prefix", BIAggregationFilter([], [], [], [], [], ["Path/1"])),
+    ]
+
+    print("%d aggregations, %d branches" % (len(aggregations), args.aggregations * args.branches))
+    load_time, branch_index = _timed(
+        lambda: BIComputer(aggregations, None, pickle.loads(saved_index), digests).branch_index, 1)
+    print("loading the branch index: %.1f ms" % (1000 * load_time))
+    print("%-20s %10s %12s %12s" % ("filter", "branches", "scan [ms]", "index [ms]"))
+    bi_computer = BIComputer(aggregations, None, branch_index, digests)
+    for name, bi_aggregation_filter in filters:
+        scan_time, scanned = _timed(lambda: _scan(aggregations, bi_aggregation_filter),
+                                    args.repetitions)
+        index_time, required_aggregations = _timed(
+            lambda: bi_computer.get_required_aggregations(bi_aggregation_filter), args.repetitions)
+        assert [(aggr.id, [branch.properties.title
+                           for branch in branches])
+                for aggr, branches in required_aggregations] == scanned
+        print("%-20s %10d %12.1f %12.1f" % (name, sum(
+            len(titles) for _aggr_id, titles in scanned), 1000 * scan_time, 1000 * index_time))
+
+
+if __name__ == "__main__":
+    main()
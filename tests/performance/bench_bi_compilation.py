@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the recompilation of the BI aggregations after changes
+
+Compiles a synthetic setup of packs with one aggregation per host (the host
+and its services) plus one aggregation of all hosts with a given tag, then
+measures the recompilation after the services of a single host changed
+(core restart) and after a rule of a single pack changed. The initial
+compilation is what every change cost before. The total includes reading
+the configuration and loading all compiled aggregations, which every GUI
+request using BI does anyway.
+
+    python3 tests/performance/bench_bi_compilation.py --packs 100 --aggregations 100
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from fakeredis import FakeRedis, FakeServer  # type: ignore[import]
+
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.bi import bi_compiler
+from cmk.utils.bi.bi_aggregation import BIAggregation
+from cmk.utils.bi.bi_lib import SitesCallback
+from cmk.utils.bi.bi_rule import BIRule
+
+
+def _rule(rule_id: str, title: str) -> Dict:
+    config = BIRule.schema()().dump({"id": rule_id})
+    config["params"]["arguments"] = ["HOSTNAME"]
+    config["properties"]["title"] = title
+    config["nodes"] = [{
+        "search": {
+            "type": "empty"
+        },
+        "action": {
+            "type": "state_of_host",
+            "host_regex": "$HOSTNAME$"
+        },
+    }, {
+        "search": {
+            "type": "empty"
+        },
+        "action": {
+            "type": "state_of_service",
+            "host_regex": "$HOSTNAME$",
+            "service_regex": ".*"
+        },
+    }]
+    return config
+
+
+def _aggregation(aggr_id: str, rule_id: str, host_choice: Dict, host_tags: Dict) -> Dict:
+    config = BIAggregation.schema()().dump({"id": aggr_id})
+    config["node"] = {
+        "search": {
+            "type": "host_search",
+            "conditions": {
+                "host_choice": host_choice,
+                "host_folder": "",
+                "host_labels": {},
+                "host_tags": host_tags,
+            },
+            "refer_to": "host",
+        },
+        "action": {
+            "type": "call_a_rule",
+            "rule_id": rule_id,
+            "params": {
+                "arguments": ["$HOSTNAME$"]
+            },
+        },
+    }
+    return config
+
+
+def _packs(num_packs: int, num_aggregations: int) -> List[Dict]:
+    packs = []
+    for pack_nr in range(num_packs):
+        packs.append({
+            "id": "pack%d" % pack_nr,
+            "title": "Pack %d" % pack_nr,
+            "contact_groups": [],
+            "public": True,
+            "rules": [_rule("host%d" % pack_nr, "Host $HOSTNAME$")],
+            "aggregations": [
+                _aggregation("aggr%d_%d" % (pack_nr, nr), "host%d" % pack_nr, {
+                    "type": "host_name_regex",
+                    "pattern": "host%d" % (pack_nr * num_aggregations + nr)
+                }, {}) for nr in range(num_aggregations)
+            ],
+        })
+
+    packs[0]["rules"].append(_rule("tagged", "$HOSTNAME$ (tagged)"))
+    packs[0]["aggregations"].append(
+        _aggregation("tagged", "tagged", {"type": "all_hosts"}, {"criticality": "prod"}))
+    return packs
+
+
+class _Site:
+    def __init__(self, num_hosts: int, num_services: int) -> None:
+        self.program_start = 1
+        self.hosts = {
+            "host%d" % nr: ["Service %d" % svc_nr for svc_nr in range(num_services)
+                           ] for nr in range(num_hosts)
+        }
+
+    def query(self, query: str, only_sites=None) -> List[List]:
+        if query.startswith("GET status"):
+            return [["site", self.program_start]]
+        if query.startswith("GET hosts"):
+            return [[
+                "site", host_name, {
+                    "criticality": "prod" if host_name.endswith("7") else "test"
+                }, {}, [], [], host_name, "/wato/hosts.mk"
+            ] for host_name in self.hosts]
+        return [["site", host_name, description, {}, {}]
+                for host_name, descriptions in self.hosts.items()
+                for description in descriptions]
+
+
+def _compile(site: _Site, path: Path, compiled: List[str]) -> Tuple[float, float]:
+    """Time of the compilation and of the whole loading of the compiled aggregations"""
+    del compiled[:]
+    start = time.time()
+    compiler = bi_compiler.BICompiler(
+        str(path), SitesCallback(lambda: {"site": {
+            "state": "online"
+        }}, site.query))
+    check_compilation_status = compiler._check_compilation_status
+    compilation_times = []
+
+    def timed_check_compilation_status():
+        compilation_start = time.time()
+        check_compilation_status()
+        compilation_times.append(time.time() - compilation_start)
+
+    compiler._check_compilation_status = timed_check_compilation_status  # type: ignore[assignment]
+    compiler.load_compiled_aggregations()
+    return compilation_times[0], time.time() - start
+
+
+def _save_config(path: Path, packs: List[Dict]) -> None:
+    store.save_object_to_file(path, {"packs": packs})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--packs", type=int, default=100)
+    parser.add_argument("--aggregations", type=int, default=100, help="per pack")
+    parser.add_argument("--services", type=int, default=10, help="per host")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_bi_compilation_")
+    cmk.utils.paths.tmp_dir = tmp_dir + "/tmp"
+    cmk.utils.paths.default_config_dir = tmp_dir + "/etc"
+    path = Path(cmk.utils.paths.default_config_dir, "multisite.d", "wato", "bi_config.bi")
+    path.parent.mkdir(parents=True)
+    server = FakeServer()
+    bi_compiler.get_redis_client = lambda: FakeRedis(server=server, decode_responses=True)
+
+    compiled: List[str] = []
+    compile_aggregation = BIAggregation.compile
+
+    def compile_and_record(self, bi_searcher):
+        compiled.append(self.id)
+        return compile_aggregation(self, bi_searcher)
+
+    BIAggregation.compile = compile_and_record  # type: ignore[assignment]
+
+    packs = _packs(args.packs, args.aggregations)
+    site = _Site(args.packs * args.aggregations, args.services)
+    _save_config(path, packs)
+
+    print("%-24s %14s %12s %12s" % ("change", "aggregations", "compile [s]", "total [s]"))
+    times = _compile(site, path, compiled)
+    print("%-24s %14d %12.2f %12.2f" % (("initial compilation", len(compiled)) + times))
+
+    site.hosts["host42"].append("New service")
+    site.program_start += 1
+    times = _compile(site, path, compiled)
+    print("%-24s %14d %12.2f %12.2f" % (("services of one host", len(compiled)) + times))
+
+    time.sleep(0.01)  # The change must be noticed by the mtime
+    packs[1]["rules"][0]["properties"]["title"] = "Host $HOSTNAME$ of pack 1"
+    _save_config(path, packs)
+    times = _compile(site, path, compiled)
+    print("%-24s %14d %12.2f %12.2f" % (("rule of one pack", len(compiled)) + times))
+
+    time.sleep(0.01)
+    _save_config(path, packs)
+    times = _compile(site, path, compiled)
+    print("%-24s %14d %12.2f %12.2f" % (("unrelated config change", len(compiled)) + times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the compilation of the BI aggregations with multiple processes
+
+Compiles the synthetic setup of bench_bi_compilation.py from scratch with
+the given numbers of processes. The compilation includes reading the
+structure data from the sites and saving the compiled aggregations, the
+total additionally reading the configuration and loading all compiled
+aggregations.
+
+    python3 tests/performance/bench_bi_parallel_compilation.py --processes 1 4 8
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+from fakeredis import FakeRedis, FakeServer  # type: ignore[import]
+
+import cmk.utils.paths
+from cmk.utils.bi import bi_compiler
+from cmk.utils.bi.bi_lib import SitesCallback
+
+from bench_bi_compilation import _packs, _save_config, _Site
+
+
+def _compile(site: _Site, path: Path, processes: int) -> Tuple[float, float]:
+    """Time of the compilation and of the whole loading of the compiled aggregations"""
+    start = time.time()
+    compiler = bi_compiler.BICompiler(str(path),
+                                      SitesCallback(lambda: {"site": {
+                                          "state": "online"
+                                      }}, site.query),
+                                      processes=processes)
+    check_compilation_status = compiler._check_compilation_status
+    compilation_times = []
+
+    def timed_check_compilation_status():
+        compilation_start = time.time()
+        check_compilation_status()
+        compilation_times.append(time.time() - compilation_start)
+
+    compiler._check_compilation_status = timed_check_compilation_status  # type: ignore[assignment]
+    compiler.load_compiled_aggregations()
+    return compilation_times[0], time.time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--packs", type=int, default=100)
+    parser.add_argument("--aggregations", type=int, default=100, help="per pack")
+    parser.add_argument("--services", type=int, default=10, help="per host")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_bi_parallel_compilation_")
+    cmk.utils.paths.tmp_dir = tmp_dir + "/tmp"
+    cmk.utils.paths.default_config_dir = tmp_dir + "/etc"
+    path = Path(cmk.utils.paths.default_config_dir, "multisite.d", "wato", "bi_config.bi")
+    path.parent.mkdir(parents=True)
+    site = _Site(args.packs * args.aggregations, args.services)
+    _save_config(path, _packs(args.packs, args.aggregations))
+
+    print("%10s %12s %12s" % ("processes", "compile [s]", "total [s]"))
+    for processes in args.processes:
+        # Start from scratch, without any compiled aggregations
+        shutil.rmtree(cmk.utils.paths.tmp_dir, ignore_errors=True)
+        server = FakeServer()
+        bi_compiler.get_redis_client = lambda: FakeRedis(server=server, decode_responses=True)
+        print("%10d %12.2f %12.2f" % ((processes,) + _compile(site, path, processes)))
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
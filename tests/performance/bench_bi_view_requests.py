@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark repeated requests of a BI view with all aggregations
+
+Every request computes all branches of the aggregations (one branch per host
+with its services) and converts them to the rows of the view, one row per
+branch and group of its aggregation. Between the requests the state of the
+given number of services changes. The time of fetching the status data is
+not included.
+
+    python3 tests/performance/bench_bi_view_requests.py --requests 10 --hosts 1000 --groups 3
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, Tuple
+
+from cmk.utils.bi.bi_aggregation_functions import BIAggregationFunctionWorst
+from cmk.utils.bi.bi_computer import BIAggregationFilter, BIComputer
+from cmk.utils.bi.bi_lib import (
+    BIAggregationComputationOptions,
+    BIAggregationGroups,
+    BIHostSpec,
+    BIHostStatusInfoRow,
+    BIServiceWithFullState,
+)
+from cmk.utils.bi.bi_rule_interface import BIRuleProperties
+from cmk.utils.bi.bi_trees import BICompiledAggregation, BICompiledLeaf, BICompiledRule
+
+
+def _aggregations(num_hosts: int, num_services: int,
+                  num_groups: int) -> Dict[str, BICompiledAggregation]:
+    aggregations = {}
+    for aggr_nr in range(10):
+        branches = []
+        for host_nr in range(aggr_nr, num_hosts, 10):
+            host_name = "host%d" % host_nr
+            branches.append(
+                BICompiledRule(
+                    "host",
+                    "pack",
+                    [BICompiledLeaf(host_name, None, site_id="site")] + [
+                        BICompiledLeaf(host_name, "Service %d" % nr, site_id="site")
+                        for nr in range(num_services)
+                    ],
+                    [("site", host_name)],
+                    BIRuleProperties({
+                        "title": "Host %s" % host_name,
+                        "comment": "",
+                        "state_messages": {},
+                        "docu_url": "",
+                        "icon": "",
+                    }),
+                    BIAggregationFunctionWorst({
+                        "type": "worst",
+                        "count": 1,
+                        "restrict_state": 2
+                    }),
+                    {},
+                ))
+        aggr_id = "aggr%d" % aggr_nr
+        aggregations[aggr_id] = BICompiledAggregation(
+            aggr_id,
+            branches,
+            BIAggregationComputationOptions({
+                "disabled": False,
+                "use_hard_states": False,
+                "escalate_downtimes_as_warn": False,
+            }),
+            {},
+            BIAggregationGroups({
+                "names": ["Group %d/%d" % (aggr_nr, nr) for nr in range(num_groups)],
+                "paths": []
+            }),
+        )
+    return aggregations
+
+
+class _StatusFetcher:
+    def __init__(self, num_hosts: int, num_services: int) -> None:
+        self.assumed_states: Dict = {}
+        self.states = {
+            BIHostSpec("site", "host%d" % host_nr): BIHostStatusInfoRow(
+                0, True, 0, "UP", 0, True, False, {
+                    "Service %d" % nr: BIServiceWithFullState(0, True, "OK", 0, 1, 1, 0, False,
+                                                              True) for nr in range(num_services)
+                }, {}) for host_nr in range(num_hosts)
+        }
+
+    def change_states(self, num_changes: int, rng: random.Random) -> None:
+        for host_spec in rng.sample(sorted(self.states), num_changes):
+            services = self.states[host_spec].services_with_fullstate
+            service = rng.choice(sorted(services))
+            state = rng.choice([0, 1, 2])
+            services[service] = services[service]._replace(state=state,
+                                                           hard_state=state,
+                                                           plugin_output="State %d" % state)
+
+
+def _simulate(args) -> Tuple[List[float], List[float], int]:
+    aggregations = _aggregations(args.hosts, args.services, args.groups)
+    bi_status_fetcher = _StatusFetcher(args.hosts, args.services)
+    rng = random.Random(42)
+    bi_aggregation_filter = BIAggregationFilter([], [], [], [], [], [])
+    compute_times = []
+    convert_times = []
+    for _nr in range(args.requests):
+        bi_status_fetcher.change_states(args.changes, rng)
+        bi_computer = BIComputer(aggregations, bi_status_fetcher)
+        start = time.time()
+        results = bi_computer.compute_results(
+            bi_computer.get_required_aggregations(bi_aggregation_filter))
+        compute_times.append(time.time() - start)
+        start = time.time()
+        rows = bi_computer.convert_to_legacy_results(results, bi_aggregation_filter)
+        convert_times.append(time.time() - start)
+    return compute_times, convert_times, len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--hosts", type=int, default=1000, help="one branch per host")
+    parser.add_argument("--services", type=int, default=10, help="per host")
+    parser.add_argument("--groups", type=int, default=3, help="per aggregation")
+    parser.add_argument("--changes", type=int, default=20, help="changed services per request")
+    args = parser.parse_args()
+
+    compute_times, convert_times, num_rows = _simulate(args)
+    print("%10s %10s %14s %14s" % ("requests", "rows", "compute [ms]", "convert [ms]"))
+    print("%10d %10d %14.1f %14.1f" %
+          (args.requests, num_rows, 1000 * sum(compute_times) / len(compute_times),
+           1000 * sum(convert_times) / len(convert_times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the open events of the Event Console with a replay of messages
+
+Fills the event status with the given number of open events of 1000 hosts
+and 50 rules and replays messages against it, doing for every message what
+the event server does for a counting rule with a per-host event limit:
+counting the message on the event of its host, checking the limit, looking
+up an event by its id (like a status command) and replacing the oldest event
+of the host.
+
+    python3 tests/performance/bench_event_store.py --open-events 1000 10000 100000
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import cmk.ec.export as ec
+from cmk.ec.event import Event
+from cmk.ec.history import History
+from cmk.ec.main import EventStatus, Perfcounters, StatusTableEvents, StatusTableHistory
+
+NUM_HOSTS = 1000
+NUM_RULES = 50
+
+COUNT = {
+    "count": 1000000,
+    "count_ack": False,
+    "separate_host": True,
+    "separate_application": False,
+    "separate_match_groups": False,
+}
+
+
+def _event(nr: int) -> Event:
+    host = "host%d" % (nr % NUM_HOSTS)
+    now = time.time()
+    return Event(
+        rule_id="rule%d" % (nr % NUM_RULES),
+        text="message %d" % nr,
+        phase="counting",
+        count=1,
+        time=now,
+        first=now,
+        last=now,
+        comment="",
+        host=host,
+        core_host=host,
+        host_in_downtime=False,
+        ipaddress="127.0.0.1",
+        application="",
+        pid=0,
+        priority=3,
+        facility=1,
+        match_groups=(),
+    )
+
+
+def _replay(tmp_dir: str, num_open: int, num_messages: int) -> float:
+    logger = logging.getLogger("bench")
+    settings = ec.settings("bench", Path(tmp_dir), Path(tmp_dir), ["mkeventd"])
+    config = ec.default_config()
+    history = History(settings, config, logger, StatusTableEvents.columns,
+                      StatusTableHistory.columns)
+    event_status = EventStatus(settings, config, Perfcounters(logger), history, logger)
+    for nr in range(num_open):
+        event_status.new_event(_event(nr))
+
+    rng = random.Random(0)
+    start = time.time()
+    for _nr in range(num_messages):
+        message_nr = rng.randrange(num_open)
+        event = _event(message_nr)
+        with event_status.lock:
+            event_status.count_event(None, event, {}, COUNT)
+            event_status.get_num_existing_events_by("by_host", event)
+            event_status.event(rng.randint(1, num_open))
+            event_status.remove_oldest_event("by_host", event)
+            event_status.new_event(_event(message_nr))
+    return num_messages / (time.time() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--open-events", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    print("%12s %12s" % ("open events", "events/s"))
+    for num_open in args.open_events:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print("%12d %12.0f" % (num_open, _replay(tmp_dir, num_open, args.messages)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the graph data cache with users watching the same dashboard
+
+Every user refreshes a dashboard of graphs showing the last hours once a
+minute, the users are spread over the minute. The graph data is fetched
+once without and once with the cache from a simulated livestatus, which
+needs the given latency per query, per RRD column and per point of RRD data
+and whose response is decoded like a real one.
+
+The cache is kept in an emulated redis by default, whose round trips cost
+much more than those of a real redis daemon. Use the redis of a site with
+--redis-url unix://$OMD_ROOT/tmp/run/redis (its cache is flushed).
+
+    python3 tests/performance/bench_graph_cache.py --users 30 --minutes 30
+"""
+
+import argparse
+import json
+import time
+from typing import List, Optional
+
+from fakeredis import FakeRedis, FakeServer  # type: ignore[import]
+from redis import Redis
+
+import cmk.gui.plugins.metrics.rrd_fetch as rrd_fetch
+import cmk.gui.plugins.metrics.rrd_cache as rrd_cache
+
+
+class _FakeLivestatus:
+    def __init__(self, latency: float, column_latency: float, point_latency: float) -> None:
+        self.latency = latency
+        self.column_latency = column_latency
+        self.point_latency = point_latency
+        self.now = 0
+        self.queries = 0
+        self.points = 0
+
+    def set_only_sites(self, sites: Optional[List[str]] = None) -> None:
+        pass
+
+    def query(self, query: str) -> List[List]:
+        lines = query.split("\n")
+        columns = lines[1].split()[3:]
+        services = [(line.split(" = ", 1)[1], lines[nr + 1].split(" = ", 1)[1])
+                    for nr, line in enumerate(lines)
+                    if line.startswith("Filter: host_name")]
+        rows = []
+        points = 0
+        for host_name, service_description in services:
+            row: List = [host_name, service_description]
+            for column in columns:
+                start, end, step = map(int, column.split(":")[-3:])
+                start -= start % step
+                end += -end % step
+                row.append([start, end, step] + [
+                    None if t >= self.now else float(hash((host_name, column[:20], t)) % 100)
+                    for t in range(start, end, step)
+                ])
+                points += (end - start) // step
+            rows.append(row)
+        self.queries += 1
+        self.points += points
+        time.sleep(self.latency + self.column_latency * len(rows) * len(columns) +
+                   self.point_latency * points)
+        return json.loads(json.dumps(rows))
+
+
+class _NoCache(rrd_cache.RRDCache):
+    def load(self, columns, step, start_time):
+        return {}
+
+    def save(self, columns, step, hits, misses, points_fetched):
+        pass
+
+
+def _dashboard(num_graphs: int, num_services: int) -> List:
+    return [{
+        "consolidation_function": "max",
+        "metrics": [{
+            "expression": ("rrd", "site", "host%d" % nr, "Interface %d" % graph, perfvar, None, 1.0)
+        } for nr in range(num_services) for perfvar in ["in", "out"]],
+    } for graph in range(num_graphs)]
+
+
+def _simulate(args, live: _FakeLivestatus, dashboard: List) -> List[float]:
+    start = 1600000000
+    refresh_times = []
+    for second in sorted(minute * 60 + user * 60 // args.users
+                         for minute in range(args.minutes)
+                         for user in range(args.users)):
+        live.now = start + second
+        refresh_start = time.time()
+        for graph_recipe in dashboard:
+            rrd_fetch.fetch_rrd_data_for_graph(graph_recipe, {
+                "time_range": (live.now - args.hours * 3600, live.now),
+                "step": 60,
+            })
+        refresh_times.append(time.time() - refresh_start)
+    return refresh_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--minutes", type=int, default=30, help="simulated time")
+    parser.add_argument("--graphs", type=int, default=10, help="per dashboard")
+    parser.add_argument("--services", type=int, default=5, help="per graph")
+    parser.add_argument("--hours", type=int, default=4, help="time range of the graphs")
+    parser.add_argument("--latency", type=float, default=2, help="ms per livestatus query")
+    parser.add_argument("--column-latency", type=float, default=0.2, help="ms per RRD column")
+    parser.add_argument("--point-latency", type=float, default=1, help="us per point")
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        rrd_cache.get_redis_client = lambda: Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        server = FakeServer()
+        rrd_cache.get_redis_client = lambda: FakeRedis(server=server, decode_responses=True)
+    dashboard = _dashboard(args.graphs, args.services)
+
+    print("%8s %10s %12s %12s %14s %10s" %
+          ("cache", "refreshes", "queries", "points", "refresh [ms]", "hit rate"))
+    cache_class = rrd_cache.RRDCache
+    for name, used_cache_class in [("without", _NoCache), ("with", cache_class)]:
+        live = _FakeLivestatus(args.latency / 1000, args.column_latency / 1000,
+                               args.point_latency / 1000000)
+        rrd_fetch.sites.live = lambda: live  # type: ignore[assignment]
+        rrd_cache.RRDCache = used_cache_class  # type: ignore[misc]
+        rrd_cache.get_rrd_cache.cache_clear()
+        client = rrd_cache.get_redis_client()
+        client.delete(*client.keys("graphs:rrd_cache:*") or ["graphs:rrd_cache:stats"])
+
+        refresh_times = _simulate(args, live, dashboard)
+
+        stats = cache_class().statistics()
+        lookups = stats["hits"] + stats["misses"]
+        print("%8s %10d %12d %12d %14.1f %10s" %
+              (name, len(refresh_times), live.queries, live.points,
+               1000 * sum(refresh_times) / len(refresh_times), "%.1f%%" %
+               (100.0 * stats["hits"] / lookups) if lookups else "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark history queries of the Event Console with the file and the SQLite archive
+
+Writes a month of history files (one per day) with the given number of
+entries of 1000 hosts, runs typical queries of the GUI and check_mkevents
+against them, migrates them into the SQLite archive and runs the queries
+again.
+
+    python3 tests/performance/bench_history.py --entries 100000 1000000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cmk.ec.export as ec
+from cmk.ec.history import History, quote_tab
+from cmk.ec.main import StatusTableEvents, StatusTableHistory
+from cmk.ec.query import QueryGET
+
+NUM_DAYS = 30
+NUM_HOSTS = 1000
+
+logger = logging.getLogger("bench")
+
+
+class _StatusServer:
+    def __init__(self, history: History) -> None:
+        self._table = StatusTableHistory(logger, history)
+
+    def table(self, name: str) -> StatusTableHistory:
+        return self._table
+
+
+def _write_history_files(history_dir: Path, num_entries: int, now: float) -> None:
+    history_dir.mkdir(parents=True)
+    per_day = num_entries // NUM_DAYS
+    for day in range(NUM_DAYS):
+        start = now - (NUM_DAYS - day) * 86400
+        with (history_dir / ("%d.log" % start)).open("wb") as f:
+            for nr in range(day * per_day, (day + 1) * per_day):
+                if nr % 10:
+                    text = "connection from 10.0.%d.%d closed" % (nr % 256, nr % 7)
+                else:
+                    text = "backup of volume %d failed" % nr
+                event = {
+                    "id": nr,
+                    "host": "host%d" % (nr % NUM_HOSTS),
+                    "text": text,
+                    "first": start,
+                    "last": start,
+                    "match_groups": (),
+                }
+                entry_time = start + (nr - day * per_day) * 86400.0 / per_day
+                columns = [quote_tab(str(entry_time)), b"NEW", b"", b""]
+                columns += [
+                    quote_tab(event.get(colname[6:], defval))
+                    for colname, defval in StatusTableEvents.columns
+                ]
+                f.write(b"\t".join(columns) + b"\n")
+
+
+def _queries(num_entries: int, now: float) -> Dict[str, List[str]]:
+    return {
+        "event id": ["Filter: event_id = %d" % (num_entries // 2)],
+        "host": ["Filter: event_host = host42"],
+        "host in": ["Filter: event_host in HOST42 host43"],
+        "last hour": ["Filter: history_time >= %f" % (now - 3600), "Limit: 1000"],
+        "text": ["Filter: event_text ~~ backup of volume 4711"],
+    }
+
+
+def _run(history: History, headers: List[str]) -> float:
+    start = time.time()
+    query = QueryGET(_StatusServer(history), ["GET history"] + headers, logger)
+    list(query.table.query(query))
+    return time.time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[100000])
+    args = parser.parse_args()
+
+    print("%10s %12s %10s %12s" % ("entries", "query", "file [s]", "sqlite [s]"))
+    for num_entries in args.entries:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            now = time.time()
+            settings = ec.settings("bench", Path(tmp_dir), Path(tmp_dir), ["mkeventd"])
+            _write_history_files(settings.paths.history_dir.value, num_entries, now)
+            config = ec.default_config()
+            config["history_lifetime"] = NUM_DAYS + 1
+            history = History(settings, config, logger, StatusTableEvents.columns,
+                              StatusTableHistory.columns)
+            queries = _queries(num_entries, now)
+            file_durations = {name: _run(history, headers) for name, headers in queries.items()}
+
+            start = time.time()
+            config["archive_mode"] = "sqlite"
+            history.reload_configuration(config)
+            print("%10d %12s %10s %12.3f" % (num_entries, "migration", "", time.time() - start))
+
+            for name, headers in queries.items():
+                print("%10d %12s %10.3f %12.3f" %
+                      (num_entries, name, file_durations[name], _run(history, headers)))
+
+
+if __name__ == "__main__":
+    main()
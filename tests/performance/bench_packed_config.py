@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the helper startup with the pickled and the sharded packed config
+
+Writes a synthetic helper configuration in both formats and measures, in a
+fresh process each, the time and the peak RSS for loading the configuration
+and looking up the host specific values of a single host.
+
+    python3 tests/performance/bench_packed_config.py --hosts 10000 50000 100000
+"""
+
+import argparse
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from cmk.base import sharded_config
+
+# Same as cmk.base.config.PackedConfigStore.sharded_variable_names
+SHARDED_VARIABLES = [
+    "host_attributes",
+    "ipaddresses",
+    "ipv6addresses",
+    "explicit_snmp_communities",
+]
+
+
+def _make_config(num_hosts: int) -> Dict[str, Any]:
+    hostnames = ["host%06d" % i for i in range(num_hosts)]
+    return {
+        "all_hosts": ["%s|lan|prod|cmk-agent|/wato/" % h for h in hostnames],
+        "host_paths": {h: "/wato/folder%d/hosts.mk" % (i % 100) for i, h in enumerate(hostnames)},
+        "ipaddresses": {
+            h: "10.%d.%d.%d" % (i >> 16, (i >> 8) & 255, i & 255) for i, h in enumerate(hostnames)
+        },
+        "explicit_snmp_communities": {h: "community%d" % i for i, h in enumerate(hostnames[::4])},
+        "host_attributes": {
+            h: {
+                "alias": "Alias of %s" % h,
+                "ipaddress": "10.0.0.1",
+                "labels": {
+                    "os": "linux",
+                    "location": "rack %d" % (i % 40)
+                },
+                "contactgroups": (True, ["all", "admins"]),
+                "meta_data": {
+                    "created_at": 1600000000.0 + i,
+                    "created_by": "automation"
+                },
+            } for i, h in enumerate(hostnames)
+        },
+        "some_rules": [{
+            "condition": {},
+            "value": i
+        } for i in range(1000)],
+    }
+
+
+def _measure(path: Path, num_hosts: int) -> None:
+    """Executed in a fresh process: load the config and access one host"""
+    start = time.time()
+    if sharded_config.is_sharded_config(path):
+        config = sharded_config.read_sharded_config(path)
+    else:
+        with path.open("rb") as f:
+            config = pickle.load(f)
+    hostname = "host%06d" % (num_hosts // 2)
+    assert config["ipaddresses"].get(hostname) is not None
+    assert config["host_attributes"].get(hostname, {}).get("alias")
+    duration = time.time() - start
+    print("%.4f %d" % (duration, _max_rss_kb()))
+
+
+def _max_rss_kb() -> int:
+    # ru_maxrss survives the exec() of the forked benchmark process. VmHWM does not.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run(path: Path, num_hosts: int):
+    output = subprocess.check_output(
+        [sys.executable, __file__, "--measure",
+         str(path), "--hosts",
+         str(num_hosts)],
+        encoding="utf-8",
+    )
+    duration, max_rss_kb = output.split()
+    return float(duration), int(max_rss_kb)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--hosts", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--measure", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(args.measure, args.hosts[0])
+        return
+
+    print("%8s %-8s %10s %10s %12s" % ("hosts", "format", "size [MB]", "load [s]", "max RSS [MB]"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_hosts in args.hosts:
+            config = _make_config(num_hosts)
+
+            pickled_path = Path(tmp_dir, "pickled.mk")
+            with pickled_path.open("wb") as f:
+                pickle.dump(config, f)
+
+            sharded_path = Path(tmp_dir, "sharded.mk")
+            sharded_config.write_sharded_config(sharded_path, config, SHARDED_VARIABLES)
+
+            for name, path in [("pickled", pickled_path), ("sharded", sharded_path)]:
+                duration, max_rss_kb = _run(path, num_hosts)
+                print("%8d %-8s %10.1f %10.3f %12.1f" % (num_hosts, name, path.stat().st_size /
+                                                         1024.0**2, duration, max_rss_kb / 1024.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the refresh of the prediction of one metric
+
+Computes the prediction of every period with synthetic RRD data, once like
+before (one livestatus query per slice, statistics in pure Python) and once
+with the current implementation (one query for all slices, statistics on
+NumPy arrays). The round trip of a livestatus query is simulated by the
+given latency, the last two days have a resolution of one minute, the older
+data is consolidated to five minutes.
+
+    python3 tests/performance/bench_prediction.py --horizon 90 --latency 5
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import List, Sequence, Tuple
+
+from cmk.utils.prediction import TimeSeries
+
+from cmk.base import prediction
+
+
+def _rrd_data(fromtime: int, untiltime: int, step: int) -> TimeSeries:
+    # Like rrdtool, the returned interval is aligned to the step and contains the queried one
+    start = fromtime - fromtime % step
+    end = untiltime + -untiltime % step
+    random.seed(fromtime)
+    values = [
+        None if random.random() < 0.01 else random.uniform(0, 100)
+        for _t in range(start, end, step)
+    ]
+    return TimeSeries([start, end, step] + values)  # type: ignore[list-item]
+
+
+class _FakeRRD:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.queries = 0
+        # Range of the archive with the finest resolution
+        self.fine_since = time.time() - 2 * 86400
+
+    def __call__(self, time_windows: Sequence[Tuple[int, int]]) -> List[TimeSeries]:
+        self.queries += 1
+        time.sleep(self.latency)
+        return [
+            _rrd_data(start, end, 60 if start >= self.fine_since else 300)
+            for start, end in time_windows
+        ]
+
+
+def _std_dev(point_line, average):
+    samples = len(point_line)
+    if samples == 1:
+        return abs(average)
+    return math.sqrt(abs(sum(p**2 for p in point_line) - average**2 * samples) / float(samples - 1))
+
+
+def _previous_implementation(rrd: _FakeRRD, time_windows):
+    from_time = time_windows[0][0]
+    slices = [(rrd([(start, end)])[0], from_time - start) for start, end in time_windows]
+    twindow = slices[0][0].twindow
+    upsampled = [ts.bfill_upsample(twindow, shift) for ts, shift in slices]
+
+    descriptors = []
+    for time_column in zip(*upsampled):
+        point_line = [x for x in time_column if x is not None]
+        if point_line:
+            average = sum(point_line) / float(len(point_line))
+            descriptors.append(
+                [average, min(point_line),
+                 max(point_line),
+                 _std_dev(point_line, average)])
+        else:
+            descriptors.append([None, None, None, None])
+    return descriptors
+
+
+def _current_implementation(rrd: _FakeRRD, time_windows):
+    return prediction._calculate_data_for_prediction(time_windows, rrd).points
+
+
+def _measure(implementation, rrd: _FakeRRD, time_windows, repetitions: int):
+    rrd.queries = 0
+    start = time.time()
+    for _nr in range(repetitions):
+        result = implementation(rrd, time_windows)
+    return (time.time() - start) / repetitions, rrd.queries // repetitions, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--horizon", type=int, default=90, help="days")
+    parser.add_argument("--latency", type=float, default=5, help="ms per livestatus query")
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    rrd = _FakeRRD(args.latency / 1000)
+    now = int(time.time())
+    print("%8s %8s %8s %10s %14s %10s %14s %8s" %
+          ("period", "slices", "points", "queries", "previous [ms]", "queries", "current [ms]",
+           "speedup"))
+    for name, period_info in prediction._PREDICTION_PERIODS.items():
+        timegroup = period_info.groupby(now)[0]
+        time_windows = prediction._time_slices(now, args.horizon * 86400, period_info, timegroup)
+
+        previous, previous_queries, expected = _measure(_previous_implementation, rrd, time_windows,
+                                                        args.repetitions)
+        current, current_queries, result = _measure(_current_implementation, rrd, time_windows,
+                                                    args.repetitions)
+        for computed, reference in zip(result, expected):
+            if reference[0] is None:
+                assert computed == reference
+            else:
+                assert all(math.isclose(c, r, rel_tol=1e-9) for c, r in zip(computed, reference))
+
+        print("%8s %8d %8d %10d %14.1f %10d %14.1f %7.1fx" %
+              (name, len(time_windows), len(result), previous_queries, previous * 1000,
+               current_queries, current * 1000, previous / current))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the rule matching of the Event Console with and without prefilter
+
+Compiles the given number of rules, every one matching a message of a
+different product with a regular expression, and processes messages of which
+one in hundred is matched (and dropped) by a rule.
+
+    python3 tests/performance/bench_rule_matching.py --rules 10 100 1000
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import cmk.ec.export as ec
+from cmk.ec.event import create_event_from_line
+from cmk.ec.history import History
+from cmk.ec.main import (
+    EventServer,
+    EventStatus,
+    ECLock,
+    Perfcounters,
+    StatusTableEvents,
+    StatusTableHistory,
+    default_slave_status_master,
+)
+from cmk.ec.rule_prefilter import RulePrefilter
+
+NUM_MESSAGES = 5000
+
+
+def _rule_packs(num_rules: int) -> List[Dict[str, Any]]:
+    return [{
+        "id": "bench",
+        "disabled": False,
+        "rules": [{
+            "id": "rule%d" % nr,
+            "match": "product%d: (backup|restore) of (.*) failed" % nr,
+            "drop": True,
+        } for nr in range(num_rules)],
+    }]
+
+
+def _messages(num_rules: int) -> List[str]:
+    rng = random.Random(0)
+    messages = []
+    for nr in range(NUM_MESSAGES):
+        if nr % 100:
+            text = "service%d: connection from 10.1.%d.%d closed" % (nr, nr % 256, nr % 7)
+        else:
+            text = "product%d: backup of /var/lib/%d failed" % (rng.randrange(num_rules), nr)
+        messages.append("<78>Jun  1 12:00:00 host%d %s" % (nr % 50, text))
+    return messages
+
+
+def _measure(tmp_dir: str, num_rules: int, prefilter: bool) -> float:
+    logger = logging.getLogger("bench")
+    settings = ec.settings("bench", Path(tmp_dir), Path(tmp_dir), ["mkeventd"])
+    config = ec.default_config()
+    perfcounters = Perfcounters(logger)
+    history = History(settings, config, logger, StatusTableEvents.columns,
+                      StatusTableHistory.columns)
+    event_status = EventStatus(settings, config, perfcounters, history, logger)
+    event_server = EventServer(logger,
+                               settings, config, default_slave_status_master(), perfcounters,
+                               ECLock(logger), history, event_status, StatusTableEvents.columns,
+                               False)
+    event_server.compile_rules(_rule_packs(num_rules))
+    if not prefilter:
+        event_server._rule_prefilter = RulePrefilter([])
+
+    events = [create_event_from_line(line, None, logger) for line in _messages(num_rules)]
+    start = time.time()
+    for event in events:
+        event_server.process_event(event)
+    return len(events) / (time.time() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print("%8s %20s %20s" % ("rules", "without [events/s]", "prefilter [events/s]"))
+    for num_rules in args.rules:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print("%8d %20.0f %20.0f" % (
+                num_rules,
+                _measure(tmp_dir, num_rules, prefilter=False),
+                _measure(tmp_dir, num_rules, prefilter=True),
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the host condition matching of the RulesetOptimizer
+
+Builds a synthetic configuration (by default 100k hosts and 5k rules) and
+measures the time needed to compute the matching hosts of all rules.
+
+    python3 tests/performance/bench_ruleset_matcher.py --hosts 100000 --rules 5000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from cmk.utils.rulesets.ruleset_matcher import RulesetMatcher
+
+TAG_GROUPS = {
+    "agent": ["cmk-agent", "all-agents", "special-agents", "no-agent"],
+    "criticality": ["prod", "critical", "test", "offline"],
+    "networking": ["lan", "wan", "dmz"],
+    "snmp_ds": ["no-snmp", "snmp-v1", "snmp-v2"],
+    "site": ["site%d" % i for i in range(10)],
+}
+
+
+class _StaticLabels:
+    def __init__(self, labels: Dict[str, Dict[str, str]]) -> None:
+        self._labels = labels
+
+    def labels_of_host(self, ruleset_matcher, hostname):
+        return self._labels[hostname]
+
+
+def _make_config(num_hosts: int, rnd: random.Random):
+    hostnames = ["host%06d" % i for i in range(num_hosts)]
+    folders = ["/wato/f%d/sub%d/" % (i % 50, i % 7) for i in range(200)]
+    host_tags = {
+        hostname: {group: rnd.choice(tags) for group, tags in TAG_GROUPS.items()
+                  } for hostname in hostnames
+    }
+    host_paths = {hostname: rnd.choice(folders) for hostname in hostnames}
+    host_labels = {
+        hostname: {
+            "os": rnd.choice(["linux", "windows", "aix"]),
+            "env": rnd.choice(["a", "b"])
+        } for hostname in hostnames
+    }
+    return hostnames, folders, host_tags, host_paths, host_labels
+
+
+def _make_conditions(num_rules: int, hostnames: List[str], folders: List[str],
+                     rnd: random.Random) -> List[Dict]:
+    conditions = []
+    for _nr in range(num_rules):
+        condition: Dict = {}
+        host_tags = {}
+        for group, tags in rnd.sample(sorted(TAG_GROUPS.items()), rnd.randint(0, 3)):
+            host_tags[group] = rnd.choice([
+                rnd.choice(tags),
+                {
+                    "$ne": rnd.choice(tags)
+                },
+                {
+                    "$or": rnd.sample(tags, 2)
+                },
+                {
+                    "$nor": rnd.sample(tags, 2)
+                },
+            ])
+        if host_tags:
+            condition["host_tags"] = host_tags
+        if rnd.random() < 0.3:
+            condition["host_folder"] = rnd.choice(folders).rsplit("/", 2)[0] + "/"
+        if rnd.random() < 0.1:
+            condition["host_labels"] = {"os": rnd.choice(["linux", {"$ne": "windows"}])}
+        if rnd.random() < 0.2:
+            entries = rnd.sample(hostnames, rnd.randint(1, 20))
+            condition["host_name"] = {"$nor": entries} if rnd.random() < 0.3 else entries
+        elif rnd.random() < 0.05:
+            condition["host_name"] = [{"$regex": "host00%d" % rnd.randint(0, 9)}]
+        conditions.append(condition)
+    return conditions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--hosts", type=int, default=100000)
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    hostnames, folders, host_tags, host_paths, host_labels = _make_config(args.hosts, rnd)
+    conditions = _make_conditions(args.rules, hostnames, folders, rnd)
+
+    start = time.time()
+    matcher = RulesetMatcher(
+        tag_to_group_map={},
+        host_tags=host_tags,
+        host_paths=host_paths,
+        labels=_StaticLabels(host_labels),  # type: ignore[arg-type]
+        all_configured_hosts=set(hostnames),
+        clusters_of={},
+        nodes_of={},
+    )
+    setup_duration = time.time() - start
+
+    optimizer = matcher.ruleset_optimizer
+    start = time.time()
+    num_matches = sum(
+        len(optimizer._all_matching_hosts(condition, with_foreign_hosts=False))
+        for condition in conditions)
+    match_duration = time.time() - start
+
+    print("Hosts: %d, rules: %d" % (args.hosts, args.rules))
+    print("Index setup:   %.2f s" % setup_duration)
+    print("Rule matching: %.2f s (%.2f ms/rule, %d host matches)" %
+          (match_duration, 1000.0 * match_duration / max(1, args.rules), num_matches))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark saving, loading and replicating the event status of the Event Console
+
+Creates the given number of open events, changes one percent of them
+between two saves and measures writing the complete snapshot, appending
+the changes to the journal, loading snapshot plus journal and assembling
+the replication response for a slave being up to date before the changes.
+
+    python3 tests/performance/bench_status_journal.py --events 10000 100000 500000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import cmk.ec.export as ec
+from cmk.ec.history import History
+from cmk.ec.main import (
+    ECLock,
+    EventStatus,
+    Perfcounters,
+    StatusTableEvents,
+    StatusTableHistory,
+    replication_send,
+)
+
+logger = logging.getLogger("bench")
+
+
+def _event_status(tmp_dir: str) -> EventStatus:
+    settings = ec.settings("bench", Path(tmp_dir), Path(tmp_dir), ["mkeventd"])
+    settings.paths.status_file.value.parent.mkdir(parents=True, exist_ok=True)
+    config = ec.default_config()
+    config["archive_mode"] = "sqlite"  # don't measure the writing of history files
+    config["last_reload"] = 0
+    history = History(settings, config, logger, StatusTableEvents.columns,
+                      StatusTableHistory.columns)
+    return EventStatus(settings, config, Perfcounters(logger), history, logger)
+
+
+def _fill(event_status: EventStatus, num_events: int) -> None:
+    now = time.time()
+    for nr in range(num_events):
+        event_status.new_event({
+            "rule_id": "rule%d" % (nr % 100),
+            "text": "connection from 10.0.%d.%d closed" % (nr % 256, nr % 7),
+            "phase": "open",
+            "count": 1,
+            "time": now,
+            "first": now,
+            "last": now,
+            "comment": "",
+            "host": "host%d" % (nr % 1000),
+            "ipaddress": "10.0.0.1",
+            "application": "sshd",
+            "pid": nr,
+            "priority": 3,
+            "facility": 1,
+            "match_groups": (),
+            "core_host": "host%d" % (nr % 1000),
+            "host_in_downtime": False,
+        })
+
+
+def _change(event_status: EventStatus) -> None:
+    for event in event_status.events()[::100]:
+        event["phase"] = "ack"
+        event_status.update_event(event)
+
+
+def _measure(function: Callable[[], object]) -> float:
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(
+        "%10s %14s %14s %10s %16s %16s" %
+        ("events", "snapshot [s]", "journal [s]", "load [s]", "full repl. [s]", "delta repl. [s]"))
+    for num_events in args.events:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            event_status = _event_status(tmp_dir)
+            _fill(event_status, num_events)
+            snapshot = _measure(event_status.save_status)
+            position = event_status.change_position()
+            _change(event_status)
+            journal = _measure(event_status.save_status)
+            load = _measure(lambda: _event_status(tmp_dir).load_status(None))
+            full = _measure(lambda: repr(
+                replication_send(event_status._config, ECLock(logger), event_status, 0)))
+            delta = _measure(lambda: repr(
+                replication_send(event_status._config, ECLock(logger), event_status, 0, position)))
+            print("%10d %14.3f %14.3f %10.3f %16.3f %16.3f" %
+                  (num_events, snapshot, journal, load, full, delta))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the StoredWalkSNMPBackend with the text and the compiled walk format
+
+Writes a synthetic walk of a switch with the given number of interfaces and
+walks the columns of the interface table, like a fetcher of a simulated host
+does. Loading the walk is included in the measurement.
+
+    python3 tests/performance/bench_stored_walk.py --interfaces 100 1000 10000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import cmk.utils.paths
+
+import cmk.snmplib.snmp_cache as snmp_cache
+from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPHostConfig
+
+import cmk.core_helpers.snmp_backend.compiled_walk as compiled_walk
+from cmk.core_helpers.snmp_backend import StoredWalkSNMPBackend
+
+IF_TABLE = ".1.3.6.1.2.1.2.2.1"
+IF_X_TABLE = ".1.3.6.1.2.1.31.1.1.1"
+COLUMNS = ["%s.%d" % (IF_TABLE, c) for c in range(1, 23)
+          ] + ["%s.%d" % (IF_X_TABLE, c) for c in range(1, 20)]
+
+
+def _make_walk(num_interfaces: int) -> str:
+    lines = [
+        ".1.3.6.1.2.1.1.1.0 Simulated switch",
+        ".1.3.6.1.2.1.1.2.0 .1.3.6.1.4.1.9.1.1208",
+    ]
+    for column in COLUMNS:
+        for index in range(1, num_interfaces + 1):
+            if column.endswith(".2") or column.endswith(".1.1.1.1"):
+                value = "GigabitEthernet1/0/%d" % index
+            elif column.endswith(".6"):
+                value = "\"00 12 79 62 %02X %02X \"" % (index >> 8, index & 255)
+            else:
+                value = str(index * 4711)
+            lines.append("%s.%d %s" % (column, index, value))
+    # The text format needs to be sorted numerically
+    lines.sort(key=lambda l: [int(s) for s in l.split(None, 1)[0].strip(".").split(".")])
+    return "\n".join(lines) + "\n"
+
+
+def _walk_all_columns(backend: StoredWalkSNMPBackend) -> float:
+    snmp_cache.host_cache().clear()
+    compiled_walk.cleanup_compiled_walks()
+    start = time.time()
+    num_rows = sum(len(backend.walk(column)) for column in COLUMNS)
+    duration = time.time() - start
+    assert num_rows > 0
+    return duration
+
+
+def _backend() -> StoredWalkSNMPBackend:
+    return StoredWalkSNMPBackend(
+        SNMPHostConfig(
+            is_ipv6_primary=False,
+            hostname="switch",
+            ipaddress="127.0.0.1",
+            credentials="public",
+            port=161,
+            is_bulkwalk_host=False,
+            is_snmpv2or3_without_bulkwalk_host=False,
+            bulk_walk_size_of=0,
+            timing={},
+            oid_range_limits=[],
+            snmpv3_contexts=[],
+            character_encoding=None,
+            is_usewalk_host=True,
+            snmp_backend=SNMPBackendEnum.CLASSIC,
+        ), logging.getLogger("bench"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--interfaces", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print("%10s %8s %12s %12s %12s" %
+          ("interfaces", "OIDs", "compile [s]", "text [s]", "compiled [s]"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cmk.utils.paths.snmpwalks_dir = tmp_dir
+        walk_path = Path(tmp_dir, "switch")
+        for num_interfaces in args.interfaces:
+            compiled_path = compiled_walk.compiled_walk_path("switch")
+            if compiled_path.exists():
+                compiled_path.unlink()
+            walk_path.write_text(_make_walk(num_interfaces))
+            backend = _backend()
+
+            text_duration = _walk_all_columns(backend)
+
+            start = time.time()
+            lines: List[str] = StoredWalkSNMPBackend.read_walk_data(str(walk_path))
+            num_oids = compiled_walk.compile_walk(lines, compiled_path)
+            compile_duration = time.time() - start
+
+            compiled_duration = _walk_all_columns(backend)
+
+            print("%10d %8d %12.3f %12.3f %12.3f" %
+                  (num_interfaces, num_oids, compile_duration, text_duration, compiled_duration))
+
+
+if __name__ == "__main__":
+    main()
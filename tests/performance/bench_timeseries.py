@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the time series arithmetic and resampling of the graphs
+
+Combines the given number of series (1% of the values missing) with every
+operator of the graph expressions and resamples them like the alignment of
+the RRD data of a graph does, once point wise like before and once with the
+vectorized implementation, and checks both give the same results.
+
+    python3 tests/performance/bench_timeseries.py --points 10000 --operands 50
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from cmk.utils.prediction import aggregation_functions, rrd_timestamps, TimeSeries
+from cmk.utils.type_defs import Seconds
+
+import cmk.gui.plugins.metrics.timeseries as ts
+
+
+def _series(num_points: int, step: Seconds) -> TimeSeries:
+    values = [
+        None if random.random() < 0.01 else random.uniform(-100, 100) for _nr in range(num_points)
+    ]
+    return TimeSeries([0, num_points * step, step] + values)  # type: ignore[list-item]
+
+
+def _point_wise_math(operator_id: str, operands: List[TimeSeries]) -> TimeSeries:
+    _op_title, op_func = ts.time_series_operators()[operator_id]
+    return TimeSeries([ts.op_func_wrapper(op_func, tsp) for tsp in zip(*operands)],
+                      operands[0].twindow)
+
+
+def _point_wise_downsample(series: TimeSeries, twindow, cf):
+    dwsa = []
+    i = 0
+    co: List = []
+    desired_times = rrd_timestamps(twindow)
+    for t, val in series.time_data_pairs():
+        if t > desired_times[i]:
+            dwsa.append(aggregation_functions(co, cf))
+            co = []
+            i += 1
+        co.append(val)
+    diff_len = len(desired_times) - len(dwsa)
+    if diff_len > 0:
+        dwsa.append(aggregation_functions(co, cf))
+        dwsa = dwsa + [None] * (diff_len - 1)
+    return dwsa
+
+
+def _point_wise_upsample(series: TimeSeries, twindow):
+    upsa = []
+    i = 0
+    current_times = rrd_timestamps(series.twindow)
+    for t in range(*twindow):
+        if t >= current_times[i]:
+            i += 1
+        upsa.append(series.values[i])
+    return upsa
+
+
+def _measure(function: Callable[[], object], repetitions: int):
+    start = time.time()
+    for _nr in range(repetitions):
+        result = function()
+    return (time.time() - start) / repetitions, result
+
+
+def _fresh(operands: List[TimeSeries]) -> List[TimeSeries]:
+    # As fetched from the RRDs, the values are lists
+    return [TimeSeries(list(operand.values), operand.twindow) for operand in operands]
+
+
+def _same(result, expected) -> bool:
+    return len(result) == len(expected) and all(
+        (r is None and e is None) or
+        (r is not None and e is not None and abs(r - e) <= 1e-9 * max(1, abs(e)))
+        for r, e in zip(result, expected))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--operands", type=int, default=50)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(42)
+    operands = [_series(args.points, 60) for _nr in range(args.operands)]
+
+    print("%-22s %14s %16s %8s" % ("operation", "point wise [ms]", "vectorized [ms]", "speedup"))
+    for operator_id in ts.time_series_operators():
+        used = operands[:2] if operator_id in ("-", "/") else operands
+        before, expected = _measure(lambda: _point_wise_math(operator_id, used), args.repetitions)
+        after, result = _measure(lambda: ts.time_series_math(operator_id, _fresh(used)).values,
+                                 args.repetitions)
+        assert _same(result, expected.values), operator_id
+        print("%-22s %14.1f %16.1f %7.1fx" %
+              ("%s of %d" % (operator_id, len(used)), before * 1000, after * 1000, before / after))
+
+    # Chained like nested graph expressions, the results stay arrays
+    before, expected = _measure(
+        lambda: _point_wise_math(
+            "-", [_point_wise_math("+", operands),
+                  _point_wise_math("MAX", operands)]), args.repetitions)
+    after, result = _measure(
+        lambda: ts.time_series_math("-", [
+            ts.time_series_math("+", _fresh(operands)),
+            ts.time_series_math("MAX", _fresh(operands))
+        ]).values, args.repetitions)
+    assert _same(result, expected.values)
+    print("%-22s %14.1f %16.1f %7.1fx" %
+          ("(+) - (MAX)", before * 1000, after * 1000, before / after))
+
+    fine = operands[0]
+    coarse_twindow = (0, args.points * 60, 300)
+    before, expected = _measure(lambda: _point_wise_downsample(fine, coarse_twindow, "average"),
+                                args.repetitions)
+    after, result = _measure(lambda: _fresh([fine])[0].downsample(coarse_twindow, "average"),
+                             args.repetitions)
+    assert _same(result, expected)
+    print("%-22s %14.1f %16.1f %7.1fx" %
+          ("downsample", before * 1000, after * 1000, before / after))
+
+    coarse = TimeSeries(expected, coarse_twindow)
+    before, expected = _measure(lambda: _point_wise_upsample(coarse, fine.twindow),
+                                args.repetitions)
+    after, result = _measure(lambda: _fresh([coarse])[0].bfill_upsample(fine.twindow, 0),
+                             args.repetitions)
+    assert _same(result, expected)
+    print("%-22s %14.1f %16.1f %7.1fx" % ("upsample", before * 1000, after * 1000, before / after))
+
+
+if __name__ == "__main__":
+    main()
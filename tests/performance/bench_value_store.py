@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Benchmark the value store with the default and the binary format
+
+Writes the counters of a synthetic switch (4 counters per interface) and
+measures loading them in a fresh store, committing a change of all of them
+(a regular check of the host) and committing a change of 10% of them.
+
+    python3 tests/performance/bench_value_store.py --keys 10000 50000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple, Type
+
+from cmk.base.api.agent_based.value_store._utils import (
+    _BinaryStaticValueStore,
+    _StaticValueStore,
+)
+
+COUNTERS = ["in_octets", "out_octets", "in_errors", "out_errors"]
+
+
+def _counters(num_keys: int, now: float) -> Dict[Tuple[str, str, str], Any]:
+    return {("interfaces", str(index // len(COUNTERS)), COUNTERS[index % len(COUNTERS)]):
+            (now, index * 4711) for index in range(num_keys)}
+
+
+def _measure(store_class: Type[_StaticValueStore], num_keys: int) -> Tuple[float, float, float]:
+    store_class("switch", lambda msg: None).disksync(updated=_counters(num_keys, 1.0).items())
+
+    start = time.time()
+    svs = store_class("switch", lambda msg: None)
+    load_duration = time.time() - start
+
+    updated = _counters(num_keys, 2.0)
+    start = time.time()
+    svs.disksync(updated=updated.items())
+    commit_all_duration = time.time() - start
+
+    updated = _counters(num_keys // 10, 3.0)
+    start = time.time()
+    svs.disksync(updated=updated.items())
+    commit_some_duration = time.time() - start
+
+    assert len(svs) == num_keys
+    return load_duration, commit_all_duration, commit_some_duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--keys", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+
+    print("%8s %8s %10s %16s %16s" %
+          ("keys", "format", "load [s]", "commit all [s]", "commit 10% [s]"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _StaticValueStore.STORAGE_PATH = Path(tmp_dir)
+        _BinaryStaticValueStore.STORAGE_PATH = Path(tmp_dir, ".binary")
+        for num_keys in args.keys:
+            for name, store_class in [
+                ("repr", _StaticValueStore),
+                ("binary", _BinaryStaticValueStore),
+            ]:
+                print("%8d %8s %10.3f %16.3f %16.3f" %
+                      (num_keys, name, *_measure(store_class, num_keys)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Send syslog messages to the Event Console at a constant rate
+
+Replays the lines of a file (or synthetic messages) via UDP or TCP to the
+builtin syslog server of a running Event Console. When the status socket of
+the site is given, the received and dropped messages and the latency from
+receiving a message to matching the rules are printed every second.
+
+    python3 tests/performance/syslog_load.py --rate 5000 --duration 60 \\
+        --status-socket ~/tmp/run/mkeventd/status
+"""
+
+import argparse
+import ast
+import itertools
+import socket
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+STATUS_COLUMNS = [
+    "status_messages",
+    "status_queue_drops",
+    "status_message_queue_length",
+    "status_average_latency_time",
+    "status_average_processing_time",
+]
+
+
+def _synthetic_lines() -> Iterator[bytes]:
+    for nr in itertools.count():
+        yield b"<78>%s host%d sshd[%d]: connection from 10.0.%d.%d closed" % (
+            time.strftime("%b %d %H:%M:%S").encode(),
+            nr % 100,
+            nr % 32768,
+            nr % 256,
+            nr % 7,
+        )
+
+
+def _replayed_lines(path: Path) -> Iterator[bytes]:
+    lines = [line for line in path.read_bytes().splitlines() if line]
+    if not lines:
+        raise SystemExit("No lines in %s" % path)
+    return itertools.cycle(lines)
+
+
+def _query_status(path: Path) -> Optional[List]:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(str(path))
+            s.sendall(b"GET status\nColumns: %s\n" % " ".join(STATUS_COLUMNS).encode())
+            s.shutdown(socket.SHUT_WR)
+            response = b""
+            while chunk := s.recv(4096):
+                response += chunk
+        return ast.literal_eval(response.decode("utf-8"))[1]
+    except (OSError, ValueError, SyntaxError, IndexError):
+        return None
+
+
+def _connect(args: argparse.Namespace) -> socket.socket:
+    if args.protocol == "tcp":
+        return socket.create_connection((args.host, args.port))
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.connect((args.host, args.port))
+    return s
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=514)
+    parser.add_argument("--protocol", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--rate", type=int, default=1000, help="messages per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--file", type=Path, help="syslog lines to replay")
+    parser.add_argument("--status-socket", type=Path, help="status socket of the Event Console")
+    args = parser.parse_args()
+
+    lines = _replayed_lines(args.file) if args.file else _synthetic_lines()
+    sock = _connect(args)
+
+    print("%8s %10s %12s %10s %8s %14s %16s" %
+          ("time [s]", "sent", "received", "dropped", "queued", "latency [ms]", "processing [ms]"))
+    sent = 0
+    start = time.time()
+    next_report = start + 1
+    # Messages are sent in slices of 10 ms to keep the rate constant
+    while (now := time.time()) < start + args.duration:
+        for line in itertools.islice(lines, int((now - start) * args.rate) - sent):
+            if args.protocol == "tcp":
+                sock.sendall(line + b"\n")
+            else:
+                try:
+                    sock.send(line)
+                except ConnectionRefusedError:
+                    pass  # Nobody listening (yet), like any syslog sender we don't care
+            sent += 1
+
+        if now >= next_report:
+            next_report += 1
+            status = _query_status(args.status_socket) if args.status_socket else None
+            if status is None:
+                print("%8.0f %10d" % (now - start, sent))
+            else:
+                messages, drops, queued, latency, processing = status
+                print(
+                    "%8.0f %10d %12d %10d %8d %14.3f %16.3f" %
+                    (now - start, sent, messages, drops, queued, latency * 1000, processing * 1000))
+        time.sleep(0.01)
+
+    sock.close()
+    print("Sent %d messages in %.1f s" % (sent, time.time() - start))
+
+
+if __name__ == "__main__":
+    main()
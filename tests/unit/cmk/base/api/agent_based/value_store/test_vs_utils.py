@@ -5,11 +5,14 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 # pylint: disable=protected-access
+from typing import NamedTuple
+
 import pytest  # type: ignore[import]
 
 from cmk.utils import store
 from cmk.utils.type_defs import CheckPluginName
 from cmk.base.api.agent_based.value_store._utils import (
+    _BinaryStaticValueStore,
     _DynamicValueStore,
     _EffectiveValueStore,
     _StaticValueStore,
@@ -20,6 +23,11 @@ from cmk.base.api.agent_based.value_store._utils import (
 _TEST_KEY = ("check", "item", "user-key")
 
 
+class _Counter(NamedTuple):
+    timestamp: float
+    value: int
+
+
 class Test_DynamicValueStore:
     @staticmethod
     def test_init():
@@ -140,6 +148,128 @@ class Test_StaticValueStore:
         assert list(svs.items()) == list(expected_values.items())
 
 
+class Test_BinaryStaticValueStore:
+    @pytest.fixture(autouse=True)
+    def storage_path(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(_StaticValueStore, "STORAGE_PATH", tmp_path)
+        monkeypatch.setattr(_BinaryStaticValueStore, "STORAGE_PATH", tmp_path / ".binary")
+        return tmp_path
+
+    @staticmethod
+    def _store():
+        return _BinaryStaticValueStore("test-host", lambda msg: None)
+
+    def test_empty(self):
+        assert dict(self._store()) == {}
+
+    def test_store_and_load(self):
+        self._store().disksync(updated=[
+            (("check1", None, "key"), 23),
+            (("check2", "item", "key"), (1.5, [None, {
+                "a": b"b"
+            }])),
+        ])
+        assert dict(self._store()) == {
+            ("check1", None, "key"): 23,
+            ("check2", "item", "key"): (1.5, [None, {
+                "a": b"b"
+            }]),
+        }
+
+    def test_only_changes_are_appended(self, storage_path):
+        svs = self._store()
+        svs.disksync(updated=[(("check", str(i), "key"), i) for i in range(1000)])
+        path = storage_path / ".binary" / "test-host"
+        size = path.stat().st_size
+
+        svs.disksync(updated=[(("check", "0", "key"), 0), (("check", "1", "key"), -1)])
+        assert size < path.stat().st_size < size + 100
+
+        svs.disksync(removed={("check", "2", "key")})
+        assert dict(self._store()) == {
+            **{("check", str(i), "key"): i for i in range(3, 1000)},
+            ("check", "0", "key"): 0,
+            ("check", "1", "key"): -1,
+        }
+
+    def test_load_changes_of_other_process(self):
+        svs_1 = self._store()
+        svs_2 = self._store()
+        svs_1.disksync(updated=[(_TEST_KEY, 1)])
+        svs_2.disksync()
+        assert svs_2[_TEST_KEY] == 1
+
+        svs_1.disksync(updated=[(_TEST_KEY, 2)])
+        svs_2.disksync(updated=[(("check2", None, "key"), 3)])
+        assert dict(svs_2) == {_TEST_KEY: 2, ("check2", None, "key"): 3}
+        svs_1.disksync()
+        assert dict(svs_1) == {_TEST_KEY: 2, ("check2", None, "key"): 3}
+
+    def test_compaction(self, storage_path):
+        svs = self._store()
+        svs.disksync(updated=[(("check", str(i), "key"), i) for i in range(100)])
+        size = (storage_path / ".binary" / "test-host").stat().st_size
+        for value in range(100):
+            svs.disksync(updated=[(("check", str(i), "key"), value) for i in range(20)])
+
+        assert (storage_path / ".binary" / "test-host").stat().st_size < 3 * size
+        assert dict(self._store()) == {
+            **{("check", str(i), "key"): i for i in range(100)},
+            **{("check", str(i), "key"): 99 for i in range(20)},
+        }
+
+    def test_incomplete_record_is_ignored(self, storage_path):
+        self._store().disksync(updated=[(_TEST_KEY, 1)])
+        with (storage_path / ".binary" / "test-host").open("ab") as f:
+            f.write(b"\xff\x00\x00\x00incomplete")
+
+        svs = self._store()
+        assert dict(svs) == {_TEST_KEY: 1}
+        svs.disksync(updated=[(_TEST_KEY, 2)])
+        assert dict(self._store()) == {_TEST_KEY: 2}
+
+    def test_undecodable_record_is_ignored(self, storage_path, caplog):
+        self._store().disksync(updated=[(_TEST_KEY, 1)])
+        with (storage_path / ".binary" / "test-host").open("ab") as f:
+            f.write(b"\x05\x00\x00\x00bogus")
+
+        svs = self._store()
+        assert dict(svs) == {_TEST_KEY: 1}
+        assert "Ignoring the values behind offset" in caplog.text
+        svs.disksync(updated=[(("check2", None, "key"), 2)])
+        assert dict(self._store()) == {_TEST_KEY: 1, ("check2", None, "key"): 2}
+
+    def test_other_format_is_reset(self, storage_path, caplog):
+        path = storage_path / ".binary" / "test-host"
+        path.parent.mkdir()
+        path.write_bytes(b"CMKVST01\x05\x00\x00\x00bogus")
+
+        svs = self._store()
+        assert dict(svs) == {}
+        assert "is not a value store file of this version" in caplog.text
+        svs.disksync(updated=[(_TEST_KEY, 1)])
+        assert dict(self._store()) == {_TEST_KEY: 1}
+
+    def test_tuple_subclass(self):
+        self._store().disksync(updated=[(_TEST_KEY, _Counter(1.5, 23))])
+        assert self._store()[_TEST_KEY] == _Counter(1.5, 23)
+
+    def test_migration(self, storage_path):
+        store.save_object_to_file(storage_path / "test-host", {_TEST_KEY: 42})
+
+        assert dict(self._store()) == {_TEST_KEY: 42}
+        assert not (storage_path / "test-host").exists()
+        assert dict(self._store()) == {_TEST_KEY: 42}
+
+    def test_migration_back(self, storage_path):
+        self._store().disksync(updated=[(_TEST_KEY, 42)])
+
+        assert dict(_StaticValueStore("test-host", lambda msg: None)) == {_TEST_KEY: 42}
+        assert not (storage_path / ".binary" / "test-host").exists()
+        assert dict(_StaticValueStore("test-host", lambda msg: None)) == {_TEST_KEY: 42}
+        assert dict(self._store()) == {_TEST_KEY: 42}
+
+
 class Test_EffectiveValueStore:
     @staticmethod
     def _get_store() -> _EffectiveValueStore:
@@ -227,8 +357,9 @@ class Test_ValueStore:
 
 class TestValueStoreManager:
     @staticmethod
-    def test_namespace_context():
-        vsm = ValueStoreManager("test-host")
+    @pytest.mark.parametrize("binary_format", [False, True])
+    def test_namespace_context(binary_format):
+        vsm = ValueStoreManager("test-host", binary_format=binary_format)
         service_inner = (CheckPluginName("unit_test_inner"), None)
         service_outer = (CheckPluginName("unit_test_outer"), None)
 
@@ -9,6 +9,7 @@ import pytest  # type: ignore[import]
 from testlib.base import Scenario  # type: ignore[import]
 
 from cmk.core_helpers import FetcherType
+from cmk.core_helpers.controller import GlobalConfig
 
 import cmk.base.config as config
 from cmk.base.sources import fetcher_configuration
@@ -62,3 +63,12 @@ def test_generates_correct_sections(hostname, tags, fetchers, monkeypatch):
     make_scenario(hostname, tags).apply(monkeypatch)
     conf = fetcher_configuration.fetchers(config.HostConfig.make_host_config(hostname))
     assert [FetcherType[f["fetcher_type"]] for f in conf["fetchers"]] == fetchers
+
+
+def test_global_config(monkeypatch):
+    Scenario().apply(monkeypatch)
+    monkeypatch.setattr(config, "max_concurrent_fetchers", 3)
+    global_config = GlobalConfig.deserialize(fetcher_configuration.global_config(6))
+    assert global_config.cmc_log_level == 6
+    assert global_config.cluster_max_cachefile_age == 90
+    assert global_config.max_concurrent_fetchers == 3
@@ -25,6 +25,7 @@ from cmk.core_helpers.paths import ConfigSerial, LATEST_SERIAL
 
 import cmk.base.api.agent_based.register as agent_based_register
 import cmk.base.config as config
+import cmk.base.sharded_config as sharded_config
 from cmk.base.api.agent_based.checking_classes import CheckPlugin
 from cmk.base.api.agent_based.type_defs import ParsedSectionName, SNMPSectionPlugin
 from cmk.base.check_utils import Service
@@ -2156,6 +2157,43 @@ class TestPackedConfigStore:
             "abc": 1,
         }
 
+    def test_write_sharded_variables(self, serial):
+        store = config.PackedConfigStore(config.PackedConfigStore.from_serial(serial).path,
+                                         sharded=True)
+        store.write({
+            "abc": 1,
+            "ipaddresses": {
+                "host1": "127.0.0.1",
+            },
+            "host_attributes": {
+                "host1": {
+                    "alias": "Host 1",
+                },
+                "host2": {},
+            },
+        })
+
+        helper_config = store.read()
+        assert helper_config["abc"] == 1
+        assert helper_config["ipaddresses"].get("host1") == "127.0.0.1"
+        assert helper_config["ipaddresses"].get("host2") is None
+        assert helper_config["host_attributes"]["host2"] == {}
+        assert "ipv6addresses" not in helper_config
+
+    def test_read_sharded_format(self, serial):
+        store = config.PackedConfigStore(config.PackedConfigStore.from_serial(serial).path,
+                                         sharded=True)
+        store.write({"abc": 1, "ipaddresses": {"host1": "127.0.0.1"}})
+
+        helper_config = config.PackedConfigStore.from_serial(serial).read()
+        assert helper_config["abc"] == 1
+        assert helper_config["ipaddresses"].get("host1") == "127.0.0.1"
+
+    def test_pickled_format_is_default(self, store):
+        store.write({"abc": 1})
+
+        assert not sharded_config.is_sharded_config(store.path)
+
 
 @pytest.mark.parametrize("params, expected_result", [
     (
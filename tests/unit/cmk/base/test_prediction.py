@@ -9,6 +9,10 @@ import time
 from pprint import pprint
 import pytest  # type: ignore[import]
 
+import cmk.utils.paths
+import cmk.utils.prediction
+from cmk.utils.prediction import PredictionRequest, PredictionStore, TimeSeries
+
 from cmk.base import prediction
 from testlib import on_time
 
@@ -120,3 +124,70 @@ def test_time_slices(utcdate, timezone, horizon, period_info, timegroup, result)
     ])
 def test_data_stats(slices, result):
     assert prediction._data_stats(slices) == result
+
+
+def test_retrieve_grouped_data_from_rrd():
+    requested = []
+
+    def rrd_column(time_windows):
+        requested.append(time_windows)
+        return [
+            TimeSeries([1000, 1180, 60, 1, 2, 3]),
+            TimeSeries([900, 1080, 180, 4]),
+        ]
+
+    twindow, slices = prediction._retrieve_grouped_data_from_rrd(rrd_column, [(1000, 1180),
+                                                                              (900, 1080)])
+    assert requested == [[(1000, 1180), (900, 1080)]]
+    assert twindow == (1000, 1180, 60)
+    assert slices.tolist() == [[1, 2, 3], [4, 4, 4]]
+
+
+@pytest.fixture(name="prediction_dir")
+def fixture_prediction_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+
+    def rrd_data(hostname, service_description, varname, cf, time_windows, max_entries=400):
+        return [
+            TimeSeries([start, end, 3600] + [1.0] * ((end - start) // 3600))
+            for start, end in time_windows
+        ]
+
+    monkeypatch.setattr(cmk.utils.prediction, "get_rrd_data_of_windows", rrd_data)
+    return tmp_path
+
+
+_PARAMS = {"period": "hour", "horizon": 3, "levels_upper": ("absolute", (1.0, 2.0))}
+_REQUEST = PredictionRequest(dsname="load15", cf="MAX", params=_PARAMS)
+
+
+def test_due_predictions(prediction_dir):
+    with on_time("2021-03-01 23:30", "UTC"):
+        now = int(time.time())
+        assert prediction.due_predictions("host", "CPU load", _REQUEST, now,
+                                          3600) == [now, now + 1800]
+        assert prediction.due_predictions("host", "CPU load", _REQUEST, now, 600) == [now]
+
+        prediction.compute_prediction("host", "CPU load", _REQUEST, now - 84600)
+        assert prediction.due_predictions("host", "CPU load", _REQUEST, now, 3600) == [now + 1800]
+
+        prediction.compute_prediction("host", "CPU load", _REQUEST, now + 1800)
+        assert prediction.due_predictions("host", "CPU load", _REQUEST, now, 3600) == []
+
+
+def test_get_levels_uses_last_known_prediction(prediction_dir):
+    store = PredictionStore("host", "CPU load", "load15")
+    with on_time("2021-03-01 12:00", "UTC"):
+        now = int(time.time())
+        assert prediction.get_levels("host", "CPU load", "load15", _PARAMS,
+                                     "MAX") == (None, (None, None, None, None))
+        assert store.get_request() == PredictionRequest.loads(_REQUEST.dumps())
+
+        # Outdated, but the best there is until the next one is computed
+        prediction.compute_prediction("host", "CPU load", _REQUEST, now - 2 * 86400)
+        assert prediction.get_levels("host", "CPU load", "load15", _PARAMS,
+                                     "MAX") == (1.0, (2.0, 3.0, None, None))
+
+        other_params = dict(_PARAMS, horizon=5)
+        prediction.get_levels("host", "CPU load", "load15", other_params, "MAX")
+        assert store.get_request().params["horizon"] == 5
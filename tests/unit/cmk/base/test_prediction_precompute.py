@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pytest  # type: ignore[import]
+
+import cmk.utils.paths
+import cmk.utils.prediction
+from cmk.utils.prediction import PredictionRequest, PredictionStore, TimeSeries
+
+from testlib import on_time
+
+from cmk.base import prediction, prediction_precompute
+
+_PREDICTIVE = {"period": "wday", "horizon": 90, "levels_upper": ("absolute", (1.0, 2.0))}
+
+
+@pytest.mark.parametrize("params, result", [
+    (None, False),
+    ((5.0, 10.0), False),
+    ({
+        "levels": (5.0, 10.0)
+    }, False),
+    (_PREDICTIVE, True),
+    ({
+        "load": _PREDICTIVE
+    }, True),
+    ({
+        "levels": ("predictive", _PREDICTIVE)
+    }, True),
+    ([{
+        "tp_default_value": {},
+        "tp_values": [("24x7", {
+            "load": _PREDICTIVE
+        })]
+    }], True),
+])
+def test_has_predictive_levels(params, result):
+    assert prediction_precompute.has_predictive_levels(params) is result
+
+
+def test_precompute_predictions(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+    monkeypatch.setattr(prediction_precompute, "services_with_predictive_levels",
+                        lambda: iter([("host", "CPU load"), ("host", "Memory")]))
+
+    def rrd_data(hostname, service_description, varname, cf, time_windows, max_entries=400):
+        if varname == "broken":
+            raise cmk.utils.prediction.MKGeneralException("Cannot get historic metrics")
+        return [TimeSeries([start, end, 3600] + [1.0] * 24) for start, end in time_windows]
+
+    monkeypatch.setattr(cmk.utils.prediction, "get_rrd_data_of_windows", rrd_data)
+
+    for dsname in ["load1", "load15"]:
+        PredictionStore("host", "CPU load", dsname).save_request(
+            PredictionRequest(dsname=dsname, cf="MAX", params=_PREDICTIVE))
+    PredictionStore("host", "Memory", "broken").save_request(
+        PredictionRequest(dsname="broken", cf="MAX", params=_PREDICTIVE))
+    # Not configured anymore
+    PredictionStore("other", "CPU load", "load1").save_request(
+        PredictionRequest(dsname="load1", cf="MAX", params=_PREDICTIVE))
+
+    with on_time("2021-03-03 12:00", "UTC"):
+        status = prediction_precompute.precompute_predictions(2)
+        assert (status["computed"], status["failed"]) == (2, 1)
+        assert (status["services"], status["covered"]) == (2, 1)
+        assert prediction.get_levels("host", "CPU load", "load1", _PREDICTIVE,
+                                     "MAX") == (1.0, (2.0, 3.0, None, None))
+        assert not list(PredictionStore("other", "CPU load", "load1").available_predictions())
+
+    # Nothing is due until the next slice begins within the hour
+    with on_time("2021-03-03 22:59", "UTC"):
+        assert prediction_precompute.precompute_predictions(1)["computed"] == 0
+    with on_time("2021-03-03 23:01", "UTC"):
+        assert prediction_precompute.precompute_predictions(1)["computed"] == 2
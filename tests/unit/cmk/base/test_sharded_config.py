@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pickle
+
+import pytest
+
+from cmk.base import sharded_config
+
+CONFIG = {
+    "abc": 1,
+    "ipaddresses": {
+        "host1": "127.0.0.1",
+        "hüst2": "127.0.0.2",
+    },
+    "host_attributes": {
+        "host1": {
+            "alias": "Host 1"
+        },
+        "host3": {},
+    },
+    "explicit_snmp_communities": {},
+}
+
+SHARDED = ["ipaddresses", "ipv6addresses", "host_attributes", "explicit_snmp_communities"]
+
+
+@pytest.fixture(name="path")
+def fixture_path(tmp_path):
+    path = tmp_path / "precompiled_check_config.mk"
+    sharded_config.write_sharded_config(path, CONFIG, SHARDED)
+    return path
+
+
+def test_is_sharded_config(path, tmp_path):
+    assert sharded_config.is_sharded_config(path)
+
+    pickled_path = tmp_path / "pickled.mk"
+    pickled_path.write_bytes(pickle.dumps(CONFIG))
+    assert not sharded_config.is_sharded_config(pickled_path)
+
+
+def test_read_sharded_config(path):
+    config = sharded_config.read_sharded_config(path)
+    assert config == CONFIG
+    assert sorted(config) == ["abc", "explicit_snmp_communities", "host_attributes", "ipaddresses"]
+    assert isinstance(config["ipaddresses"], sharded_config.LazyHostMapping)
+
+
+def test_lazy_host_mapping(path):
+    ipaddresses = sharded_config.read_sharded_config(path)["ipaddresses"]
+    assert ipaddresses["hüst2"] == "127.0.0.2"
+    assert ipaddresses.get("host3") is None
+    assert ipaddresses.get("unknown") is None
+    assert "host1" in ipaddresses
+    assert sorted(ipaddresses) == ["host1", "hüst2"]
+    assert len(ipaddresses) == 2
+
+    with pytest.raises(KeyError):
+        _ = ipaddresses["host3"]
+
+
+def test_lazy_host_mapping_pickles_to_dict(path):
+    config = sharded_config.read_sharded_config(path)
+    assert pickle.loads(pickle.dumps(config["host_attributes"])) == {
+        "host1": {
+            "alias": "Host 1"
+        },
+        "host3": {},
+    }
+
+
+def test_no_magic(tmp_path):
+    path = tmp_path / "broken.mk"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        sharded_config.ShardedConfigReader(path)
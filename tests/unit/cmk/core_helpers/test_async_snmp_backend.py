@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+import socket
+import threading
+
+import pytest  # type: ignore[import]
+from pyasn1.codec.ber import decoder, encoder  # type: ignore[import]
+from pysnmp.proto import api, rfc1905  # type: ignore[import]
+
+from cmk.utils.exceptions import MKSNMPError
+
+from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPHostConfig
+
+from cmk.core_helpers.snmp_backend.asynchronous import AsyncSNMPBackend
+
+P_MOD = api.protoModules[api.protoVersion2c]
+
+MIB = {
+    "1.3.6.1.2.1.1.1.0": P_MOD.OctetString(b"Linux zeus"),
+    "1.3.6.1.2.1.1.2.0": P_MOD.ObjectIdentifier("1.3.6.1.4.1.8072.3.2.10"),
+    "1.3.6.1.2.1.1.3.0": P_MOD.TimeTicks(449613886),
+    "1.3.6.1.2.1.2.2.1.1.1": P_MOD.Integer(1),
+    "1.3.6.1.2.1.2.2.1.1.2": P_MOD.Integer(2),
+    "1.3.6.1.2.1.2.2.1.1.3": P_MOD.Integer(3),
+    "1.3.6.1.2.1.2.2.1.2.1": P_MOD.OctetString(b"lo"),
+    "1.3.6.1.2.1.2.2.1.2.2": P_MOD.OctetString(b"eth0"),
+    "1.3.6.1.2.1.2.2.1.2.3": P_MOD.OctetString(b"eth1"),
+    "1.3.6.1.2.1.2.2.1.6.1": P_MOD.OctetString(b""),
+    "1.3.6.1.2.1.2.2.1.6.2": P_MOD.OctetString(b"\x00\x12yb\xf9@"),
+    "1.3.6.1.2.1.2.2.1.10.1": P_MOD.Counter32(324),
+    "1.3.6.1.2.1.2.2.1.10.2": P_MOD.Counter32(4294967295),
+    "1.3.6.1.2.1.4.20.1.1.127.0.0.1": P_MOD.IpAddress("127.0.0.1"),
+    "1.3.6.1.2.1.31.1.1.1.6.2": P_MOD.Counter64(15833452),
+}
+
+
+def _oid_key(oid):
+    return tuple(int(x) for x in oid.split("."))
+
+
+class SimulatedAgent:
+    """Answers GET, GETNEXT and GETBULK requests of SNMP v2c from a dict"""
+    def __init__(self, mib, drop_requests=0):
+        self.requests = []
+        self._drop_requests = drop_requests
+        self._oids = sorted(mib, key=_oid_key)
+        self._mib = mib
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                data, address = self._socket.recvfrom(65535)
+            except OSError:
+                return
+
+            message, _rest = decoder.decode(data, asn1Spec=P_MOD.Message())
+            pdu = P_MOD.apiMessage.getPDU(message)
+            oid = str(P_MOD.apiPDU.getVarBinds(pdu)[0][0])
+            self.requests.append((pdu.__class__.__name__, oid))
+            if self._drop_requests:
+                self._drop_requests -= 1
+                continue
+
+            response = P_MOD.apiPDU.getResponse(pdu)
+            P_MOD.apiPDU.setVarBinds(response, self._var_binds(pdu, oid))
+            response_message = P_MOD.apiMessage.getResponse(message)
+            P_MOD.apiMessage.setPDU(response_message, response)
+            self._socket.sendto(encoder.encode(response_message), address)
+
+    def _var_binds(self, pdu, oid):
+        if pdu.tagSet == P_MOD.GetRequestPDU.tagSet:
+            return [(oid, self._mib.get(oid, rfc1905.noSuchObject))]
+
+        count = 1
+        if pdu.tagSet == P_MOD.GetBulkRequestPDU.tagSet:
+            count = int(P_MOD.apiBulkPDU.getMaxRepetitions(pdu))
+
+        following = [o for o in self._oids if _oid_key(o) > _oid_key(oid)][:count]
+        var_binds = [(o, self._mib[o]) for o in following]
+        if len(var_binds) < count:
+            var_binds.append((oid, rfc1905.endOfMibView))
+        return var_binds
+
+
+def _backend(port, **kwargs):
+    config = SNMPHostConfig(
+        is_ipv6_primary=False,
+        hostname="zeus",
+        ipaddress="127.0.0.1",
+        credentials="public",
+        port=port,
+        is_bulkwalk_host=True,
+        is_snmpv2or3_without_bulkwalk_host=True,
+        bulk_walk_size_of=2,
+        timing={
+            "timeout": 0.2,
+            "retries": 2
+        },
+        oid_range_limits=[],
+        snmpv3_contexts=[],
+        character_encoding=None,
+        is_usewalk_host=False,
+        snmp_backend=SNMPBackendEnum.ASYNC,
+    )
+    return AsyncSNMPBackend(config._replace(**kwargs), logging.getLogger("test"))
+
+
+@pytest.fixture(name="agent")
+def fixture_agent():
+    with SimulatedAgent(MIB) as agent:
+        yield agent
+
+
+@pytest.mark.parametrize("is_bulkwalk_host", [True, False])
+def test_walk(agent, is_bulkwalk_host):
+    backend = _backend(agent.port, is_bulkwalk_host=is_bulkwalk_host)
+    assert backend.walk(".1.3.6.1.2.1.2.2.1.2") == [
+        (".1.3.6.1.2.1.2.2.1.2.1", b"lo"),
+        (".1.3.6.1.2.1.2.2.1.2.2", b"eth0"),
+        (".1.3.6.1.2.1.2.2.1.2.3", b"eth1"),
+    ]
+    backend.close()
+
+
+def test_walk_value_types(agent):
+    backend = _backend(agent.port)
+    assert backend.walk(".1.3.6.1.2.1.1") == [
+        (".1.3.6.1.2.1.1.1.0", b"Linux zeus"),
+        (".1.3.6.1.2.1.1.2.0", b".1.3.6.1.4.1.8072.3.2.10"),
+        (".1.3.6.1.2.1.1.3.0", b"449613886"),
+    ]
+    assert backend.walk(".1.3.6.1.2.1.2.2.1.6") == [
+        (".1.3.6.1.2.1.2.2.1.6.1", b""),
+        (".1.3.6.1.2.1.2.2.1.6.2", b"\x00\x12yb\xf9@"),
+    ]
+    assert backend.walk(".1.3.6.1.2.1.4.20.1.1") == [
+        (".1.3.6.1.2.1.4.20.1.1.127.0.0.1", b"127.0.0.1"),
+    ]
+    assert backend.walk(".1.3.6.1.2.1.31.1.1.1.6") == [
+        (".1.3.6.1.2.1.31.1.1.1.6.2", b"15833452"),
+    ]
+
+
+def test_walk_scalar_and_missing_oids(agent):
+    backend = _backend(agent.port)
+    assert backend.walk(".1.3.6.1.2.1.1.1.0") == [(".1.3.6.1.2.1.1.1.0", b"Linux zeus")]
+    assert backend.walk(".1.3.6.1.2.1.99") == []
+
+
+def test_walk_columns_concurrently(agent):
+    backend = _backend(agent.port)
+    columns = [
+        ".1.3.6.1.2.1.2.2.1.1",
+        ".1.3.6.1.2.1.2.2.1.2",
+        ".1.3.6.1.2.1.2.2.1.10",
+    ]
+    assert backend.walk_columns(columns) == [backend.walk(oid) for oid in columns]
+    # The first request of every column is sent before waiting for any response
+    assert agent.requests[:3] == [("GetBulkRequestPDU", oid.lstrip(".")) for oid in columns]
+
+
+def test_get(agent):
+    backend = _backend(agent.port)
+    assert backend.get(".1.3.6.1.2.1.1.1.0") == b"Linux zeus"
+    assert backend.get(".1.3.6.1.2.1.1.99.0") is None
+    assert backend.get(".1.3.6.1.2.1.2.2.1.2.*") == b"lo"
+    assert backend.get(".1.3.6.1.2.1.99.*") is None
+
+
+def test_retry_lost_request():
+    with SimulatedAgent(MIB, drop_requests=1) as agent:
+        backend = _backend(agent.port)
+        assert backend.get(".1.3.6.1.2.1.1.1.0") == b"Linux zeus"
+        assert len(agent.requests) == 2
+
+
+def test_timeout():
+    with SimulatedAgent(MIB, drop_requests=3) as agent:
+        backend = _backend(agent.port)
+        with pytest.raises(MKSNMPError, match="Timeout: No Response from"):
+            backend.walk(".1.3.6.1.2.1.1")
+        assert len(agent.requests) == 3
+
+
+def test_unknown_host():
+    backend = _backend(161, ipaddress="bla.invalid")
+    with pytest.raises(MKSNMPError, match="Unknown host"):
+        backend.walk(".1.3.6.1.2.1.1")
@@ -4,21 +4,32 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import contextlib
 import logging
+import multiprocessing
+import os
+import time
+from pathlib import Path
 
 import pytest  # type: ignore[import]
 
+from cmk.utils.exceptions import MKTimeout
 from cmk.utils.paths import core_helper_config_dir
 
+from cmk.core_helpers import controller, FetcherType
+from cmk.core_helpers.agent import DefaultAgentFileCache
 from cmk.core_helpers.controller import (
+    _run_fetchers_concurrently,
     GlobalConfig,
     make_global_config_path,
     make_local_config_path,
     write_bytes,
 )
 from cmk.core_helpers.paths import ConfigSerial
-from cmk.core_helpers.protocol import CMCMessage
+from cmk.core_helpers.program import ProgramFetcher
+from cmk.core_helpers.protocol import CMCMessage, PayloadType
 from cmk.core_helpers.snmp import SNMPPluginStore
+from cmk.core_helpers.type_defs import Mode
 
 
 class TestGlobalConfig:
@@ -33,6 +44,13 @@ class TestGlobalConfig:
     def test_deserialization(self, global_config):
         assert GlobalConfig.deserialize(global_config.serialize()) == global_config
 
+    def test_deserialization_max_concurrent_fetchers(self, global_config):
+        serialized = global_config._replace(max_concurrent_fetchers=4).serialize()
+        assert GlobalConfig.deserialize(serialized).max_concurrent_fetchers == 4
+
+        del serialized["fetcher_config"]["max_concurrent_fetchers"]
+        assert GlobalConfig.deserialize(serialized).max_concurrent_fetchers == 1
+
 
 class TestControllerApi:
     def test_controller_log(self):
@@ -59,3 +77,126 @@ class TestControllerApi:
         captured = capfdbinary.readouterr()
         assert captured.out == b"123"
         assert captured.err == b""
+
+
+class _FakeTime:
+    """A monotonic clock which does not advance"""
+    @staticmethod
+    def monotonic():
+        return 1000.0
+
+
+class TestConcurrentFetchers:
+    # Never set, a worker waiting for it hangs until the pool is terminated
+    _hang = multiprocessing.Event()
+
+    @staticmethod
+    def _program_fetcher(cmdline):
+        return ProgramFetcher(
+            DefaultAgentFileCache(
+                "hostname",
+                base_path=Path(os.devnull),
+                max_age=0,
+                disabled=True,
+                use_outdated=True,
+                simulation=False,
+            ),
+            cmdline=cmdline,
+            stdin=None,
+            is_cmc=True,
+        )
+
+    @pytest.fixture
+    def fake_timeout_control(self, monkeypatch):
+        """Replaces the alarm of the worker processes
+
+        The fetchers are told apart by their command line, which is part of the message."""
+        @contextlib.contextmanager
+        def _timeout_control(timeout, *, message):
+            if "times out" in message:
+                raise MKTimeout(message)
+            if "hangs" in message:
+                self._hang.wait()
+            yield
+
+        monkeypatch.setattr(controller, "timeout_control", _timeout_control)
+        monkeypatch.setattr(controller, "time", _FakeTime)
+
+    @staticmethod
+    def _run(fetchers, deadline, max_workers):
+        messages: list = []
+        _run_fetchers_concurrently(
+            fetchers,
+            Mode.CHECKING,
+            deadline=deadline,
+            timeout_message="timeout",
+            max_workers=max_workers,
+            messages=messages,
+        )
+        return messages
+
+    def test_results_in_fetcher_order(self, tmp_path):
+        # The fetchers finish in the order 1, 2, 0
+        for name in ["fifo0", "fifo2"]:
+            os.mkfifo(tmp_path / name)
+        fetchers = (
+            self._program_fetcher("read x < %s; echo '<<<section0>>>'" % (tmp_path / "fifo0")),
+            self._program_fetcher("echo '<<<section1>>>'; echo > %s" % (tmp_path / "fifo2")),
+            self._program_fetcher("read x < %s; echo '<<<section2>>>'; echo > %s" %
+                                  (tmp_path / "fifo2", tmp_path / "fifo0")),
+        )
+        messages = self._run(fetchers, time.monotonic() + 60, 3)
+
+        assert [m.header.fetcher_type for m in messages] == [FetcherType.PROGRAM] * 3
+        assert [m.raw_data.ok for m in messages] == [
+            b"<<<section0>>>\n",
+            b"<<<section1>>>\n",
+            b"<<<section2>>>\n",
+        ]
+
+    @pytest.mark.usefixtures("fake_timeout_control")
+    def test_timed_out_fetcher_does_not_affect_the_others(self):
+        fetchers = (
+            self._program_fetcher("echo '<<<first>>>'"),
+            self._program_fetcher("echo times out"),
+            self._program_fetcher("echo '<<<last>>>'"),
+        )
+        messages = self._run(fetchers, 1060.0, 3)
+
+        assert messages[0].raw_data.ok == b"<<<first>>>\n"
+        assert messages[1].header.payload_type is PayloadType.ERROR
+        assert isinstance(messages[1].raw_data.error, MKTimeout)
+        assert messages[2].raw_data.ok == b"<<<last>>>\n"
+
+    @pytest.mark.usefixtures("fake_timeout_control")
+    @pytest.mark.parametrize("max_workers, fetcher_timeout", [
+        (1, 20),
+        (2, 30),
+        (3, 60),
+    ])
+    def test_remaining_time_is_split_among_the_rounds(self, max_workers, fetcher_timeout):
+        fetchers = tuple(self._program_fetcher("echo %d times out" % nr) for nr in range(3))
+        messages = self._run(fetchers, 1060.0, max_workers)
+
+        assert [
+            str(m.raw_data.error).endswith("timed out after %d seconds" % fetcher_timeout)
+            for m in messages
+        ] == [True] * 3
+
+    @pytest.mark.usefixtures("fake_timeout_control")
+    def test_deadline_of_the_command(self):
+        fetchers = (
+            self._program_fetcher("echo hangs"),
+            self._program_fetcher("echo '<<<fast>>>'"),
+        )
+        messages: list = []
+        with pytest.raises(MKTimeout):
+            _run_fetchers_concurrently(
+                fetchers,
+                Mode.CHECKING,
+                deadline=1000.0,
+                timeout_message="timeout",
+                max_workers=2,
+                messages=messages,
+            )
+        assert messages == []
@@ -12,6 +12,7 @@ from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPHostConfig
 import cmk.core_helpers.factory as factory
 
 from cmk.core_helpers.snmp_backend import ClassicSNMPBackend
+from cmk.core_helpers.snmp_backend.asynchronous import AsyncSNMPBackend
 try:
     from cmk.core_helpers.cee.snmp_backend import pysnmp_backend  # type: ignore[import]
 except ImportError:
@@ -61,6 +62,19 @@ def test_factory_snmp_backend_pysnmp(snmp_config):
                           pysnmp_backend.PySNMPBackend)
 
 
+def test_factory_snmp_backend_async(snmp_config):
+    snmp_config = snmp_config._replace(snmp_backend=SNMPBackendEnum.ASYNC)
+    assert isinstance(factory.backend(snmp_config, logging.getLogger()), AsyncSNMPBackend)
+
+
+def test_factory_snmp_backend_async_snmpv3(snmp_config):
+    snmp_config = snmp_config._replace(
+        snmp_backend=SNMPBackendEnum.ASYNC,
+        credentials=("noAuthNoPriv", "noAuthNoPrivUser"),
+    )
+    assert isinstance(factory.backend(snmp_config, logging.getLogger()), ClassicSNMPBackend)
+
+
 def test_factory_snmp_backend_unknown_backend(snmp_config):
     with pytest.raises(NotImplementedError, match="Unknown SNMP backend"):
         snmp_config = snmp_config._replace(snmp_backend="bla")
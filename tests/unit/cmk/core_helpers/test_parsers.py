@@ -9,6 +9,7 @@
 import copy
 import itertools
 import logging
+import random
 import time
 from collections import defaultdict
 
@@ -20,7 +21,7 @@ from cmk.utils.type_defs import AgentRawData, SectionName
 
 from cmk.snmplib.type_defs import SNMPRawData, SNMPRawDataSection
 
-from cmk.core_helpers.agent import AgentParser, SectionMarker
+from cmk.core_helpers.agent import AgentParser, NOOPParser, SectionMarker
 from cmk.core_helpers.cache import PersistedSections, SectionStore
 from cmk.core_helpers.snmp import SNMPParser
 from cmk.core_helpers.type_defs import AgentRawDataSection, NO_SELECTION
@@ -403,6 +404,105 @@ class TestAgentParser:
         assert store.load() == {}
 
 
+class TestAgentParserMarkerScanning:
+    """The marker scanning parser is equivalent to feeding every line to the state machine"""
+    @pytest.fixture
+    def parser(self):
+        return AgentParser(
+            "testhost",
+            SectionStore[AgentRawDataSection]("/dev/null", logger=logging.getLogger("test")),
+            check_interval=0,
+            keep_outdated=True,
+            translation={},
+            encoding_fallback="ascii",
+            simulation=False,
+            logger=logging.getLogger("test"),
+        )
+
+    @staticmethod
+    def parse_line_by_line(parser, raw_data):
+        state = NOOPParser(
+            parser.hostname,
+            {},
+            {},
+            translation=parser.translation,
+            encoding_fallback=parser.encoding_fallback,
+            logger=logging.getLogger("test"),
+        )
+        for line in raw_data.split(b"\n"):
+            state = state(line.rstrip(b"\r"))
+        return state.sections, state.piggyback_sections
+
+    @staticmethod
+    def random_agent_output(seed):
+        rnd = random.Random(seed)
+        pieces = [
+            b"<<<a>>>",
+            b"<<<b:nostrip()>>>",
+            b"<<<c:sep(59):persist(1000)>>>",
+            b"<<<a:cached(10,20)>>>",
+            b"  <<<d>>>  ",
+            b"<<<>>>",
+            b"<<<<piggy>>>>",
+            b"<<<<other piggy>>>>",
+            b"<<<<testhost>>>>",
+            b"<<<<>>>>",
+            b"<<<a:cached(x)>>>",
+            b"<<<<>>>",
+            b"<<<<<>>>>>",
+            b"no <<<marker>>>",
+            b"<<<no marker",
+            b"",
+            b"   ",
+            b"\t\x0b",
+            b"  leading and trailing space  ",
+            b"trailing cr\r",
+            b"\r",
+            b"\xc3\xa4\xc3\xb6 umlauts",
+            b"<<",
+            b"x>>>",
+        ]
+        return b"\n".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 60)))
+
+    @pytest.mark.parametrize("raw_data", [
+        b"",
+        b"<<<a>>>",
+        b"<<<a>>>\n",
+        b"<<<a>>>\r\nline\r\n<<<>>>\r\n",
+        b"garbage\n<<<a>>>\n1\n2",
+        b"<<<a>>>\n<<<<piggy>>>>\n<<<b>>>\n1\n<<<<>>>>\n2",
+        b"<<<a:nostrip()>>>\n  1  \n\n \n2 \r\n",
+        b"<<<a>>>\n  1  \n<<<<testhost>>>>\n2\n<<<<>>>>\n3",
+        b"<<<<piggy>>>>\n<<<>>>\n<<<a>>>\nline",
+        b"<<<a:cached(x)>>>\nignored\n<<<b>>>\nline",
+    ])
+    def test_equivalence(self, parser, raw_data):
+        assert parser._parse_host_section(raw_data) == self.parse_line_by_line(parser, raw_data)
+
+    @pytest.mark.parametrize("seed", range(200))
+    def test_equivalence_random(self, parser, seed):
+        raw_data = self.random_agent_output(seed)
+        assert parser._parse_host_section(raw_data) == self.parse_line_by_line(parser, raw_data)
+
+    @pytest.mark.parametrize("seed", range(50))
+    def test_selection(self, parser, seed):
+        raw_data = self.random_agent_output(seed)
+        selection = {SectionName("a"), SectionName("b")}
+        sections, piggyback_sections = parser._parse_host_section(raw_data, selection=selection)
+        expected_sections, expected_piggyback_sections = self.parse_line_by_line(parser, raw_data)
+
+        def select(sections):
+            return {
+                header: lines if header.name in selection else []
+                for header, lines in sections.items()
+            }
+
+        assert sections == select(expected_sections)
+        assert piggyback_sections == {
+            header: select(sections) for header, sections in expected_piggyback_sections.items()
+        }
+
+
 class TestSectionMarker:
     def test_options_serialize_options(self):
         section_header = SectionMarker.from_headerline(b"<<<" + b":".join((
@@ -4,9 +4,19 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import logging
+import os
+from pathlib import Path
+
 import pytest  # type: ignore[import]
 
+import cmk.utils.paths
+
+import cmk.snmplib.snmp_cache as snmp_cache
+from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPHostConfig
+
 import cmk.core_helpers.snmp_backend._utils as utils
+import cmk.core_helpers.snmp_backend.compiled_walk as compiled_walk
 from cmk.core_helpers.snmp_backend import StoredWalkSNMPBackend
 
 
@@ -48,3 +58,93 @@ def create_files(tmpdir):
     p1.write(".1.2.3 foo\n.1.2.4 bar\nfoobar\n")
     p2 = (tmpdir / "walkdata").join("2.txt")
     p2.write(".1.2.3 foo\n\n\n.1.2.5 test\n")
+
+
+WALK = """.1.3.6.1.2.1.1.1.0 Linux zeus 4.8.6.5-smp #2 SMP
+.1.3.6.1.2.1.1.2.0 .1.3.6.1.4.1.8072.3.2.10
+.1.3.6.1.2.1.1.3.0 449613886
+.1.3.6.1.2.1.1.4.0 "multi line
+contact"
+.1.3.6.1.2.1.1.9.1.2.1 .1.3.6.1.6.3.10.3.1.1
+.1.3.6.1.2.1.1.9.1.2.2 .1.3.6.1.6.3.11.3.1.1
+.1.3.6.1.2.1.2.2.1.6.1
+.1.3.6.1.2.1.2.2.1.6.2 "00 12 79 62 F9 40 "
+.1.3.6.1.2.1.2.2.1.6.10 "C:\\\\"
+.1.3.6.1.4.1.2.3 4
+"""
+
+
+class TestCompiledWalk:
+    @pytest.fixture(name="backend")
+    def fixture_backend(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cmk.utils.paths, "snmpwalks_dir", str(tmp_path))
+        (tmp_path / "zeus").write_text(WALK)
+        snmp_cache.host_cache().clear()
+        compiled_walk.cleanup_compiled_walks()
+        yield StoredWalkSNMPBackend(
+            SNMPHostConfig(
+                is_ipv6_primary=False,
+                hostname="zeus",
+                ipaddress="127.0.0.1",
+                credentials="public",
+                port=161,
+                is_bulkwalk_host=False,
+                is_snmpv2or3_without_bulkwalk_host=False,
+                bulk_walk_size_of=0,
+                timing={},
+                oid_range_limits=[],
+                snmpv3_contexts=[],
+                character_encoding=None,
+                is_usewalk_host=True,
+                snmp_backend=SNMPBackendEnum.CLASSIC,
+            ), logging.getLogger("test"))
+        snmp_cache.host_cache().clear()
+        compiled_walk.cleanup_compiled_walks()
+
+    @pytest.mark.parametrize("oid", [
+        ".1.3.6.1.2.1.1",
+        ".1.3.6.1.2.1.1.1.0",
+        ".1.3.6.1.2.1.1.9.1",
+        ".1.3.6.1.2.1.1.9.1.*",
+        ".1.3.6.1.2.1.1.9.1.2.1.*",
+        ".1.3.6.1.2.1.2.2.1.6",
+        ".1.3.6.1.2.1.2.2.1.6.1",
+        ".1.3.6.1.2",
+        ".1.3.6.1.4.1.2.3",
+        ".1.3.6.1.5",
+        ".1",
+    ])
+    def test_walk_like_text_format(self, backend, oid):
+        text_rows = backend.walk(oid)
+        text_value = backend.get(oid)
+        assert compiled_walk.load_compiled_walk("zeus") is None
+
+        compiled_walk.compile_walk(
+            StoredWalkSNMPBackend.read_walk_data(cmk.utils.paths.snmpwalks_dir + "/zeus"),
+            compiled_walk.compiled_walk_path("zeus"),
+        )
+        snmp_cache.host_cache().clear()
+        compiled_walk.cleanup_compiled_walks()
+
+        assert compiled_walk.load_compiled_walk("zeus") is not None
+        assert backend.walk(oid) == text_rows
+        assert backend.get(oid) == text_value
+
+    def test_outdated_compiled_walk_is_ignored(self, backend):
+        walk_path = Path(cmk.utils.paths.snmpwalks_dir, "zeus")
+        compiled_walk.compile_walk(
+            StoredWalkSNMPBackend.read_walk_data(str(walk_path)),
+            compiled_walk.compiled_walk_path("zeus"),
+        )
+        compiled_mtime = compiled_walk.compiled_walk_path("zeus").stat().st_mtime
+        os.utime(walk_path, (compiled_mtime + 10, compiled_mtime + 10))
+        assert compiled_walk.load_compiled_walk("zeus") is None
+
+    def test_compiled_walk_without_text_walk(self, backend):
+        walk_path = Path(cmk.utils.paths.snmpwalks_dir, "zeus")
+        compiled_walk.compile_walk(
+            StoredWalkSNMPBackend.read_walk_data(str(walk_path)),
+            compiled_walk.compiled_walk_path("zeus"),
+        )
+        walk_path.unlink()
+        assert backend.walk(".1.3.6.1.4.1") == [(".1.3.6.1.4.1.2.3", b"4")]
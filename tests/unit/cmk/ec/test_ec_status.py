@@ -6,7 +6,9 @@
 
 import ast
 import logging
+import os
 import pathlib  # pylint: disable=import-error
+import socket
 import threading
 import time
 
@@ -206,3 +208,135 @@ def test_mkevent_query_filters(
     status_server.handle_client(status_socket, True, '127.0.0.1')
     response = status_socket.get_response()
     assert (len(response) == 2) is is_match
+
+
+def test_remove_oldest_event_of_host(event_status):
+    for host in ["a", "b", "a"]:
+        event_status.new_event(CMKEventConsole.new_event({"host": host, "core_host": host}))
+
+    event_status.remove_oldest_event("by_host", {"host": "a"})
+
+    assert [e["id"] for e in event_status.events()] == [2, 3]
+    assert event_status.num_existing_events_by_host[("a", "a")] == 1
+
+
+def test_count_event_follows_changed_host(event_status, event_server):
+    count = {
+        "count": 3,
+        "count_ack": False,
+        "separate_host": False,
+        "separate_application": False,
+        "separate_match_groups": False,
+    }
+    event_status.new_event(
+        CMKEventConsole.new_event({
+            "host": "a",
+            "core_host": "a",
+            "host_in_downtime": False,
+            "phase": "counting",
+        }))
+    for host in ["b", "c"]:
+        event = CMKEventConsole.new_event({
+            "host": host,
+            "core_host": host,
+            "host_in_downtime": False
+        })
+        event_status.count_event(event_server, event, {}, count)
+
+    assert [(e["count"], e["host"]) for e in event_status.events()] == [(3, "c")]
+
+    event_status.remove_oldest_event("by_host", {"host": "c"})
+    assert event_status.events() == []
+
+
+def test_rule_status(event_server, status_server):
+    event_server.compile_rules([{
+        "id": "pack",
+        "disabled": False,
+        "rules": [
+            {
+                "id": "disk",
+                "match": "disk full",
+                "drop": True
+            },
+            {
+                "id": "link",
+                "match": "link (up|down)",
+                "drop": True
+            },
+        ],
+    }])
+    for text in ["Disk full on /var", "ssh login", "Link down"]:
+        event_server.process_event(CMKEventConsole.new_event({"text": text}))
+
+    s = FakeStatusSocket(b"GET rules\nColumns: rule_id rule_hits rule_tries rule_skips")
+    status_server.handle_client(s, True, "127.0.0.1")
+    assert s.get_response() == [
+        ["rule_id", "rule_hits", "rule_tries", "rule_skips"],
+        ["disk", 1, 1, 2],
+        ["link", 1, 1, 1],
+    ]
+
+
+def test_message_queue():
+    queue = cmk.ec.main.MessageQueue(3)
+    assert queue.put(b"a\nb\n", None, drop_when_full=True) == 0
+    assert queue.put(b"c\nd\n", ("1.2.3.4", 514), drop_when_full=True) == 1
+    assert queue.is_full()
+    # Stream sources are read chunk-wise and never dropped
+    assert queue.put(b"e", None, drop_when_full=False) == 0
+    assert [(line, address) for line, address, _received in queue.get_batch(2)] == [
+        (b"a", None),
+        (b"b", None),
+    ]
+    assert [line for line, _address, _received in queue.get_batch(10)] == [b"c", b"e"]
+    assert len(queue) == 0
+
+
+def test_message_queue_status(event_server, status_server, monkeypatch):
+    monkeypatch.setattr(event_server, "process_line", lambda line, address: None)
+    event_server.reload_configuration({
+        **event_server._config,
+        "message_queue_len": 2,
+        "last_reload": 0,
+    })
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        receiver.bind(("127.0.0.1", 0))
+        for nr in range(3):
+            sender.sendto(b"message %d" % nr, receiver.getsockname())
+        event_server.receive_syslog_datagrams(receiver)
+    finally:
+        receiver.close()
+        sender.close()
+
+    columns = b"status_message_queue_length status_message_queue_max_length status_queue_drops"
+    s = FakeStatusSocket(b"GET status\nColumns: " + columns)
+    status_server.handle_client(s, True, "127.0.0.1")
+    assert s.get_response()[1] == [2, 2, 1]
+
+    event_server.process_message_queue()
+    assert len(event_server._message_queue) == 0
+    assert event_server._perfcounters._counters["messages"] == 2
+    assert "latency" in event_server._perfcounters._times
+
+
+def test_queued_messages_are_processed_on_termination(event_server, monkeypatch):
+    processed = []
+    monkeypatch.setattr(event_server, "process_line", lambda line, address: processed.append(line))
+    read_end, write_end = os.pipe()
+    monkeypatch.setattr(event_server, "open_pipe", lambda: read_end)
+    monkeypatch.setattr(event_server, "_eventsocket", None, raising=False)
+    event_server.message_batch_size = 2
+    event_server.enqueue_raw_lines(b"message 1\nmessage 2\nmessage 3\n", None)
+
+    event_server.terminate()
+    try:
+        event_server.serve()
+    finally:
+        os.close(read_end)
+        os.close(write_end)
+    assert processed == ["message 1", "message 2", "message 3"]
+    assert len(event_server._message_queue) == 0
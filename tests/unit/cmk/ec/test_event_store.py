@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import random
+
+import pytest  # type: ignore[import]
+
+from cmk.ec.event_store import EventStore
+
+
+def _event(event_id, rule_id="rule", host="host", match_groups=()):
+    return {
+        "id": event_id,
+        "rule_id": rule_id,
+        "host": host,
+        "match_groups": match_groups,
+    }
+
+
+def _ids(events):
+    return [event["id"] for event in events]
+
+
+def test_order_and_lookup():
+    store = EventStore([_event(3), _event(1, host="other"), _event(2)])
+    assert _ids(store) == [3, 1, 2]
+    assert _ids(store.to_list()) == [3, 1, 2]
+    assert len(store) == 3
+    assert 1 in store
+    assert store.get(1)["host"] == "other"
+    assert store.get(4) is None
+    assert store.oldest()["id"] == 3
+    assert _ids(store.by_host("host")) == [3, 2]
+    assert _ids(store.by_rule("rule")) == [3, 1, 2]
+    assert store.num_by_host("other") == 1
+    assert store.num_by_rule("unknown") == 0
+
+
+def test_add_duplicate_id():
+    store = EventStore([_event(1)])
+    with pytest.raises(KeyError):
+        store.add(_event(1))
+
+
+def test_remove():
+    event = _event(1)
+    store = EventStore([event, _event(2)])
+    with pytest.raises(KeyError):
+        store.remove(_event(1))  # not the same event
+    store.remove(event)
+    assert _ids(store) == [2]
+    assert list(store.by_host("host")) == [store.get(2)]
+    with pytest.raises(KeyError):
+        store.remove(event)
+
+
+def test_update_keeps_order():
+    events = [_event(1, host="a"), _event(2, host="b"), _event(3, host="a")]
+    store = EventStore(events)
+    events[1]["host"] = "a"
+    events[1]["match_groups"] = ("x",)
+    store.update(events[1])
+    assert _ids(store.by_host("a")) == [1, 2, 3]
+    assert list(store.by_host("b")) == []
+    assert _ids(store.by_rule_and_match_groups("rule", ["x"])) == [2]
+    assert _ids(store.by_rule_and_match_groups("rule", ())) == [1, 3]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_indexes_match_filtered_list(seed):
+    rng = random.Random(seed)
+    store = EventStore()
+    reference = []
+    for event_id in range(300):
+        action = rng.random()
+        if action < 0.6 or not reference:
+            event = _event(event_id, rng.choice("ab"), rng.choice("xyz"),
+                           tuple(rng.choice(["", "1", "2"]) for _ in range(rng.randint(0, 2))))
+            store.add(event)
+            reference.append(event)
+        elif action < 0.8:
+            event = rng.choice(reference)
+            store.remove(event)
+            reference.remove(event)
+        else:
+            event = rng.choice(reference)
+            event["host"] = rng.choice("xyz")
+            event["match_groups"] = (rng.choice(["1", "2"]),)
+            store.update(event)
+
+        assert store.to_list() == reference
+        for rule_id in "ab":
+            assert list(store.by_rule(rule_id)) == [e for e in reference if e["rule_id"] == rule_id]
+            for match_groups in [(), ("1",), ("2",), ("1", "2")]:
+                assert list(store.by_rule_and_match_groups(rule_id, match_groups)) == [
+                    e for e in reference
+                    if e["rule_id"] == rule_id and tuple(e["match_groups"]) == match_groups
+                ]
+        for host in "xyz":
+            assert list(store.by_host(host)) == [e for e in reference if e["host"] == host]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+
+import pytest  # type: ignore[import]
+
+from testlib import CMKEventConsole
+
+import cmk.ec.export as ec
+from cmk.ec.history import History
+from cmk.ec.main import StatusTableEvents, StatusTableHistory
+from cmk.ec.query import QueryGET
+
+logger = logging.getLogger("cmk.mkeventd")
+
+COLUMNS = ("history_what event_id event_host event_text event_match_groups"
+           " event_contact_groups event_host_in_downtime event_count")
+
+
+class FakeStatusServer:
+    def __init__(self, history):
+        self._table = StatusTableHistory(logger, history)
+
+    def table(self, name):
+        assert name == "history"
+        return self._table
+
+
+def _history(tmp_path, archive_mode):
+    settings = ec.settings("1.2.3i45", tmp_path, tmp_path, ["mkeventd"])
+    config = ec.default_config()
+    config["archive_mode"] = archive_mode
+    return History(settings, config, logger, StatusTableEvents.columns, StatusTableHistory.columns)
+
+
+def _add_events(history):
+    for nr in range(30):
+        history.add(
+            CMKEventConsole.new_event({
+                "id": nr,
+                "host": "Host%d" % (nr % 3) if nr % 7 else "\u212aost",
+                "text": "disk %d_full" % nr if nr % 2 else "link down",
+                "match_groups": ("a", str(nr)) if nr % 5 else (),
+                "contact_groups": ["admins"] if nr % 4 else None,
+                "host_in_downtime": nr % 2 == 0,
+            }), "NEW" if nr % 3 else "DELETE", "me", "info")
+
+
+def _query(history, *headers):
+    query = QueryGET(FakeStatusServer(history),
+                     ["GET history", "Columns: %s" % COLUMNS] + list(headers), logger)
+    return list(query.table.query(query))
+
+
+@pytest.mark.parametrize("headers", [
+    [],
+    ["Filter: event_id = 7"],
+    ["Filter: event_id >= 20", "Filter: event_id < 25"],
+    ["Filter: event_host = Host1"],
+    ["Filter: event_host in host2 HOST0"],
+    ["Filter: event_text ~~ DISK"],
+    ["Filter: event_text ~~ (DISK|link) .*"],
+    ["Filter: event_text ~ disk 1._full"],
+    ["Filter: event_text =~ LINK DOWN"],
+    ["Filter: event_host ~~ \u212aost"],
+    ["Filter: event_text = link down", "Filter: history_what = NEW"],
+    ["Filter: history_time > 0"],
+    ["Filter: event_host_in_downtime = 1"],
+])
+def test_sqlite_answers_like_files(tmp_path, headers):
+    file_history = _history(tmp_path / "file", "file")
+    sqlite_history = _history(tmp_path / "sqlite", "sqlite")
+    _add_events(file_history)
+    _add_events(sqlite_history)
+
+    file_rows = _query(file_history, *headers)
+    sqlite_rows = _query(sqlite_history, *headers)
+    assert file_rows[0] == sqlite_rows[0]
+    assert len(sqlite_rows) > 1
+    assert sorted(file_rows[1:]) == sorted(sqlite_rows[1:])
+
+
+def test_sqlite_newest_first_and_limit(tmp_path):
+    history = _history(tmp_path, "sqlite")
+    _add_events(history)
+    rows = _query(history, "Limit: 3")
+    assert [row[1] for row in rows[1:]] == [29, 28, 27]
+
+
+def test_sqlite_migrates_history_files(tmp_path):
+    history = _history(tmp_path, "file")
+    _add_events(history)
+    expected = _query(history)
+
+    history._config["archive_mode"] = "sqlite"
+    history.reload_configuration(history._config)
+    assert sorted(_query(history)) == sorted(expected)
+
+    # Imported files are not imported again
+    history.reload_configuration(history._config)
+    assert len(_query(history)) == len(expected)
+
+
+def test_sqlite_housekeeping(tmp_path, monkeypatch):
+    history = _history(tmp_path, "sqlite")
+    _add_events(history)
+    monkeypatch.setattr("time.time", lambda: 10**10)
+    history.add(CMKEventConsole.new_event({"id": 100}), "NEW")
+    history.housekeeping()
+    assert [row[1] for row in _query(history)[1:]] == [100]
+
+    history.flush()
+    assert _query(history) == [COLUMNS.split()]
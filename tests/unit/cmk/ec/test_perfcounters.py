@@ -130,3 +130,18 @@ def test_perfcounters_correct_status_values():
 
         else:
             raise NotImplementedError()
+
+
+def test_perfcounters_rule_counters():
+    c = Perfcounters(logger)
+    c.count_rule_try("a", 0.5)
+    c.count_rule_try("a", 0.25)
+    c.count_rule_skips(["a", "b", "b"])
+    assert c._counters["rule_tries"] == 2
+    assert c._counters["rule_skips"] == 3
+    assert c.get_rule_status() == {"a": (2, 1, 0.75), "b": (0, 2, 0.0)}
+
+    c.reset_rule_counters("a")
+    assert c.get_rule_status() == {"b": (0, 2, 0.0)}
+    c.reset_rule_counters(None)
+    assert c.get_rule_status() == {}
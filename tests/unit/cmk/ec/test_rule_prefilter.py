@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+import random
+import re
+
+import pytest  # type: ignore[import]
+
+from cmk.ec.defaults import default_config
+from cmk.ec.main import EventServer, RuleMatcher, make_config
+from cmk.ec.rule_prefilter import LiteralScanner, RulePrefilter, required_literals
+
+WORDS = ["backup", "Backup", "disk", "full", "error", "link", "down", "up", "ssh", "kernel"]
+
+
+def _compile(key, value):
+    return EventServer._compile_matching_value(key, value)
+
+
+@pytest.mark.parametrize("pattern,expected", [
+    ("disk full", {"disk full"}),
+    ("Disk .* full$", {"disk "}),
+    ("(backup|restore) of", {"backup", "restore"}),
+    ("(?:error|warn)ing", {"error", "warn"}),
+    ("(?:error|war)ning", {"ning"}),
+    ("(link )+down", {"link "}),
+    ("(link )?down", {"down"}),
+    ("x(link )?down", {"down"}),
+    ("a.*b", None),
+    ("(backup|) failed", {" failed"}),
+    ("(backup|) of", {" of"}),
+    ("(backup|) o", None),
+    ("[Ee]rror\\d", {"rror"}),
+    ("störung", {"störung"}),
+    ("störung$", {"rung"}),
+    ("(?P<x>abc)(?P=x)", {"abc"}),
+])
+def test_required_literals(pattern, expected):
+    literals = required_literals(_compile("match", pattern))
+    assert (set(literals) if literals is not None else None) == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_scanner_finds_contained_literals(seed):
+    rng = random.Random(seed)
+    literals = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(20)}
+    scanner = LiteralScanner(literals)
+    for _ in range(50):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+        assert scanner.scan(text) == {literal for literal in literals if literal in text}
+
+
+def _random_pattern(rng):
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    if rng.random() < 0.3:
+        return " ".join(words)
+    parts = []
+    for word in words:
+        parts.append(
+            rng.choice([
+                word,
+                "(%s)" % word,
+                "(%s|%s)" % (word, rng.choice(WORDS)),
+                "%s?" % word,
+                "(%s)*" % word,
+                "[%s]%s" % (word[0], word[1:]),
+            ]))
+    return rng.choice([" ", ".*", " .* ", "\\s+"]).join(parts)
+
+
+def _random_rule(rng, nr):
+    rule = {"id": "rule%d" % nr, "pack": "pack"}
+    for key, probability in [
+        ("match", 0.9),
+        ("match_ok", 0.2),
+        ("match_application", 0.3),
+        ("cancel_application", 0.1),
+    ]:
+        if rng.random() < probability:
+            value = _compile(key, _random_pattern(rng))
+            if value is not None:
+                rule[key] = value
+    if rng.random() < 0.05:
+        rule["invert_matching"] = True
+    return rule
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_skipped_rules_do_not_match(seed):
+    rng = random.Random(seed)
+    matcher = RuleMatcher(logging.getLogger("cmk.mkeventd"), make_config(default_config()))
+    rules = [_random_rule(rng, nr) for nr in range(30)]
+    prefilter = RulePrefilter(rules)
+    assert prefilter.num_filtered_rules > 0
+
+    num_skipped = 0
+    for _ in range(100):
+        event = {
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 6))),
+            "application": rng.choice(["", "sshd", "kernel", "backup Full", "Disk"]),
+        }
+        impossible = prefilter.impossible_rules(event)
+        num_skipped += len(impossible)
+        for rule in rules:
+            if rule["id"] in impossible:
+                assert not rule.get("invert_matching")
+                assert not (matcher.event_rule_matches_syslog_application(rule, event, {}) and
+                            matcher.event_rule_matches_message(rule, event, {}))
+    assert num_skipped > 0
+
+
+def test_non_ascii_texts_are_not_prefiltered():
+    rules = [{"id": "kelvin", "pack": "pack", "match": re.compile("kelvin", re.IGNORECASE)}]
+    prefilter = RulePrefilter(rules)
+    assert prefilter.impossible_rules({"text": "celsius", "application": ""}) == {"kelvin"}
+    # The Kelvin sign matches "k" case insensitive
+    assert prefilter.impossible_rules({"text": "\u212aelvin", "application": ""}) == set()
+
+
+def test_duplicate_and_disabled_rules_are_not_prefiltered():
+    rules = [
+        {
+            "id": "a",
+            "pack": "pack",
+            "match": "disk full"
+        },
+        {
+            "id": "a",
+            "pack": "pack",
+            "match": "link down"
+        },
+        {
+            "id": "b",
+            "pack": "pack",
+            "match": "disk full",
+            "disabled": True
+        },
+        {
+            "id": "c",
+            "pack": "pack",
+            "match": "disk full"
+        },
+    ]
+    prefilter = RulePrefilter(rules)
+    assert prefilter.impossible_rules({"text": "ssh login", "application": ""}) == {"c"}
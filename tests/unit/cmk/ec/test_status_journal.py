@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import ast
+import logging
+
+from testlib import CMKEventConsole
+
+import cmk.ec.export as ec
+from cmk.ec.history import History
+from cmk.ec.main import (
+    EventStatus,
+    Perfcounters,
+    StatusTableEvents,
+    StatusTableHistory,
+    replication_send,
+    replication_update_state,
+    ECLock,
+)
+from cmk.ec.status_journal import EventChanges, StatusJournal
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+def test_event_changes():
+    changes = EventChanges(max_removals=2)
+    for event_id in [1, 2, 3, 1]:
+        changes.changed(event_id)
+    assert changes.since(0) == ([1, 3, 2], [])
+    assert changes.since(2) == ([1, 3], [])
+    assert changes.since(4) == ([], [])
+    assert changes.since(5) is None
+
+    changes.removed(3)
+    changes.removed(2)
+    assert changes.since(3) == ([1], [2, 3])
+    # The removal of 3 is forgotten, the changes after it are still known
+    changes.removed(4)
+    assert changes.since(4) is None
+    assert changes.since(5) == ([], [4, 2])
+
+
+def test_journal_belongs_to_snapshot(tmp_path):
+    journal = StatusJournal(tmp_path / "journal", logger)
+    assert list(journal.read("a")) == []
+    assert not journal.intact
+
+    journal.start("a")
+    journal.append([("remove", 1), ("remove", 2)])
+    assert list(journal.read("a")) == [("remove", 1), ("remove", 2)]
+    assert journal.intact and journal.num_records == 2
+
+    assert list(journal.read("b")) == []
+    assert not journal.intact
+
+
+def test_journal_stops_at_interrupted_append(tmp_path):
+    journal = StatusJournal(tmp_path / "journal", logger)
+    journal.start("a")
+    journal.append([("remove", 1)])
+    with (tmp_path / "journal").open("a") as f:
+        f.write("('event', {'id': 2")
+    assert list(journal.read("a")) == [("remove", 1)]
+    assert not journal.intact
+
+
+def _event_status(tmp_path):
+    settings = ec.settings("1.2.3i45", tmp_path, tmp_path, ["mkeventd"])
+    settings.paths.status_file.value.parent.mkdir(parents=True, exist_ok=True)
+    config = ec.default_config()
+    config["last_reload"] = 0
+    history = History(settings, config, logger, StatusTableEvents.columns,
+                      StatusTableHistory.columns)
+    return EventStatus(settings, config, Perfcounters(logger), history, logger)
+
+
+def _new_event(event_status, nr):
+    event_status.new_event(
+        CMKEventConsole.new_event({
+            "host": "host%d" % (nr % 3),
+            "rule_id": "rule%d" % (nr % 2),
+            "core_host": "",
+            "host_in_downtime": False,
+        }))
+
+
+def _change_events(event_status, seed):
+    for nr in range(5):
+        _new_event(event_status, seed + nr)
+    events = event_status.events()
+    event_status.remove_event(events[1])
+    events[0]["phase"] = "ack"
+    events[0]["comment"] = "changed %d" % seed
+    event_status.update_event(events[0])
+    event_status.count_rule_match("rule%d" % seed)
+
+
+def _state(event_status):
+    return (
+        event_status.events(),
+        event_status.get_rule_stats(),
+        event_status._next_event_id,
+        event_status.num_existing_events,
+    )
+
+
+def test_save_and_load_status(tmp_path):
+    event_status = _event_status(tmp_path)
+    for seed in range(4):
+        _change_events(event_status, seed * 10)
+        event_status.save_status()
+    journal = event_status.settings.paths.status_journal_file.value
+    # Header, first save is a snapshot, then (remove, 6 events, status) per save
+    assert len(journal.read_text().splitlines()) == 1 + 3 * 8
+
+    loaded = _event_status(tmp_path)
+    loaded.load_status(None)
+    assert _state(loaded) == _state(event_status)
+
+
+def test_save_status_compacts_journal(tmp_path):
+    event_status = _event_status(tmp_path)
+    event_status.min_journal_records = 0
+    _change_events(event_status, 0)
+    event = event_status.events()[0]
+    for nr in range(10):
+        event["count"] = nr
+        event_status.update_event(event)
+        event_status.save_status()
+        journal = event_status.settings.paths.status_journal_file.value
+        assert len(journal.read_text().splitlines()) <= 1 + len(event_status.events())
+
+    loaded = _event_status(tmp_path)
+    loaded.load_status(None)
+    assert _state(loaded) == _state(event_status)
+
+
+def test_load_status_ignores_journal_of_other_snapshot(tmp_path):
+    event_status = _event_status(tmp_path)
+    _change_events(event_status, 0)
+    event_status.save_status()
+    _change_events(event_status, 10)
+    event_status.save_status()
+    expected = _state(event_status)
+
+    # A snapshot written after the journal
+    status_file = event_status.settings.paths.status_file.value
+    event_status.settings.paths.status_journal_file.value.rename(tmp_path / "journal")
+    event_status._save_snapshot()
+    (tmp_path / "journal").rename(event_status.settings.paths.status_journal_file.value)
+
+    loaded = _event_status(tmp_path)
+    loaded.load_status(None)
+    assert _state(loaded) == expected
+    assert status_file.exists()
+
+
+def _replicate(master, slave, last_update=1):
+    response = replication_send(master._config, ECLock(logger), master, last_update,
+                                slave.master_position)
+    # Like sent over the wire
+    response = ast.literal_eval(repr(response))
+    replication_update_state(slave.settings, slave._config, slave, None, response)
+    return response
+
+
+def test_replication_sends_changes(tmp_path):
+    master = _event_status(tmp_path / "master")
+    slave = _event_status(tmp_path / "slave")
+    _change_events(master, 0)
+
+    assert "status" in _replicate(master, slave)
+    assert _state(slave) == _state(master)
+
+    for seed in [10, 20]:
+        _change_events(master, seed)
+        response = _replicate(master, slave)
+        assert "status" not in response
+        # remove, 5 new events, 1 changed one, status
+        assert len(response["changes"]) == 8
+        assert _state(slave) == _state(master)
+
+    # Local changes on the slave need the complete state again
+    _new_event(slave, 99)
+    assert slave.master_position is None
+    assert "status" in _replicate(master, slave)
+    assert _state(slave) == _state(master)
+
+    # Nothing changed
+    assert _replicate(master, slave)["changes"] == [("status", master._pack_counters())]
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pytest  # type: ignore[import]
+from fakeredis import FakeRedis, FakeServer  # type: ignore[import]
+
+import cmk.gui.plugins.metrics.rrd_cache as rrd_cache
+
+_COLUMN = ("site", "host", "CPU load", "load1", "max", 1.0)
+
+
+@pytest.fixture(name="fake_redis")
+def fixture_fake_redis(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(rrd_cache, "get_redis_client",
+                        lambda: FakeRedis(server=server, decode_responses=True))
+    rrd_cache.get_rrd_cache.cache_clear()
+
+
+@pytest.mark.parametrize("tail, start_time, result", [
+    ([180, 420, 60, 4.5, None, 6.0, 7.0], 130, [120, 420, 60, 3.0, 4.5, None, 6.0, 7.0]),
+    ([300, 420, 60, 6.0, 7.0], 0, [0, 420, 60, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]),
+    ([180, 420, 300, 7.0], 0, None),
+    ([360, 420, 60, 7.0], 0, None),
+    ([150, 420, 60, 4.0, 5.0, 6.0, 7.0], 0, None),
+])
+def test_merge(tail, start_time, result):
+    cached = [0, 300, 60, 1.0, 2.0, 3.0, 4.0, 5.0]
+    assert rrd_cache.tail_start(cached) == 180
+    assert rrd_cache.merge(cached, tail, start_time) == result
+
+
+def test_load_and_save(fake_redis, monkeypatch):
+    monkeypatch.setattr(rrd_cache, "MAX_POINTS", 3)
+    cache = rrd_cache.RRDCache()
+    other = ("site", "host", "CPU load", "load15", "max", 1.0)
+    too_long = ("site", "host", "CPU load", "load5", "max", 1.0)
+    cache.save(
+        {
+            _COLUMN: (1000.0, [0, 180, 60, 1.0, None, 3.0]),
+            other: (1000.0, [60, 240, 60, 2.0, 3.0, 4.0]),
+            too_long: (1000.0, [0, 240, 60, 1.0, 2.0, 3.0, 4.0]),
+        }, 60, 1, 2, 7)
+
+    monkeypatch.setattr(rrd_cache.time, "time", lambda: 1000.0 + rrd_cache.MAX_AGE)
+    assert cache.load([_COLUMN, other, too_long], 60, 30) == {
+        _COLUMN: (1000.0, [0, 180, 60, 1.0, None, 3.0]),
+    }
+    assert not cache.load([_COLUMN], 120, 30)
+    assert cache.statistics() == {
+        "hits": 1,
+        "misses": 2,
+        "points_fetched": 7,
+        "points_served": 10,
+    }
+
+    monkeypatch.setattr(rrd_cache.time, "time", lambda: 1001.0 + rrd_cache.MAX_AGE)
+    assert not cache.load([_COLUMN], 60, 30)
+
+
+def test_redis_unavailable(monkeypatch, caplog):
+    server = FakeServer()
+    server.connected = False
+    monkeypatch.setattr(rrd_cache, "get_redis_client",
+                        lambda: FakeRedis(server=server, decode_responses=True))
+    rrd_cache.get_rrd_cache.cache_clear()
+    for step in [60, 300]:
+        cache = rrd_cache.get_rrd_cache()
+        assert cache.load([_COLUMN], step, 0) == {}
+        cache.save({_COLUMN: (1000.0, [0, 60, 60, 1.0])}, step, 0, 1, 1)
+    assert len([r for r in caplog.records if "Cannot use the graph data cache" in r.message]) == 1
+
+    server.connected = True
+    assert rrd_cache.get_rrd_cache().statistics()["misses"] == 0
+    assert rrd_cache.RRDCache().statistics()["misses"] == 0
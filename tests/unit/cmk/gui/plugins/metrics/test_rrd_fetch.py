@@ -4,6 +4,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import pytest  # type: ignore[import]
+from fakeredis import FakeRedis, FakeServer  # type: ignore[import]
+
 import cmk.gui.plugins.metrics.rrd_fetch as rf
 
 
@@ -12,3 +15,163 @@ def test_needed_elements_of_expression():
         rf.needed_elements_of_expression(('transformation', ('q90percentile', 95.0), [
             ('rrd', u'heute', u'CPU utilization', 'util', 'max')
         ]))) == {('heute', 'CPU utilization', 'util', 'max')}
+
+
+def test_group_needed_rrd_data_by_site():
+    needed = {
+        ("site1", "h1", "CPU load", "load1", "max", 1.0),
+        ("site1", "h1", "CPU load", "load15", "max", 1.0),
+        ("site1", "h2", "CPU load", "load1", "max", 1.0),
+        ("site1", "h2", "CPU load", "load15", "max", 1.0),
+        ("site1", "h3", "CPU load", "load1", "max", 1.0),
+        ("site1", "h1", "_HOST_", "rta", "max", 1.0),
+        ("site2", "h4", "CPU load", "load1", "max", 1.0),
+    }
+    by_site = rf.group_needed_rrd_data_by_site(needed)
+    assert sorted(by_site) == ["site1", "site2"]
+    assert sorted((batch.services, sorted(batch.entries)) for batch in by_site["site1"]) == [
+        ([("h1", "CPU load"), ("h2", "CPU load")], [("load1", "max", 1.0), ("load15", "max", 1.0)]),
+        ([("h1", "_HOST_")], [("rta", "max", 1.0)]),
+        ([("h3", "CPU load")], [("load1", "max", 1.0)]),
+    ]
+    assert by_site["site2"] == [
+        rf.RRDFetchBatch("site2", [("h4", "CPU load")], [("load1", "max", 1.0)])
+    ]
+
+
+def test_rrd_batch_query():
+    batch = rf.RRDFetchBatch("site1", [("h1", "CPU load"), ("h2", "CPU load")],
+                             [("load1", None, 1.0)])
+    assert rf.rrd_batch_query(
+        batch, ["rrddata:load1:load1.max:1:2:60"
+               ]) == ("GET services\n"
+                      "Columns: host_name description rrddata:load1:load1.max:1:2:60\n"
+                      "Filter: host_name = h1\nFilter: description = CPU load\nAnd: 2\n"
+                      "Filter: host_name = h2\nFilter: description = CPU load\nAnd: 2\n"
+                      "Or: 2\n")
+
+    batch = rf.RRDFetchBatch("site1", [("h1", "_HOST_")], [("rta", None, 1.0)])
+    assert rf.rrd_batch_query(
+        batch, ["rrddata:rta:rta.max:1:2:60"]) == ("GET hosts\n"
+                                                   "Columns: host_name rrddata:rta:rta.max:1:2:60\n"
+                                                   "Filter: host_name = h1\n")
+
+
+class _FakeLive:
+    def __init__(self, rows_by_site):
+        self.rows_by_site = rows_by_site
+        self.only_sites = None
+        self.queries = []
+
+    def set_only_sites(self, sites=None):
+        self.only_sites = sites
+
+    def query(self, query):
+        self.queries.append((self.only_sites, query))
+        return self.rows_by_site[self.only_sites[0]]
+
+
+@pytest.fixture(name="fake_redis")
+def fixture_fake_redis(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(rf.rrd_cache, "get_redis_client",
+                        lambda: FakeRedis(server=server, decode_responses=True))
+    rf.rrd_cache.get_rrd_cache.cache_clear()
+
+
+@pytest.mark.usefixtures("fake_redis")
+def test_fetch_rrd_data_for_graph(monkeypatch):
+    live = _FakeLive({
+        "site1": [
+            ["h1", "CPU load", [0, 120, 60, 1.0, 2.0]],
+            ["h2", "CPU load", [0, 120, 60, 3.0, None]],
+        ],
+        "site2": [["h3", "CPU load", [0, 120, 60, 5.0, 6.0]]],
+    })
+    monkeypatch.setattr(rf.sites, "live", lambda: live)
+
+    graph_recipe = {
+        "consolidation_function": "max",
+        "metrics": [{
+            "expression": ("rrd", site, host, "CPU load", "load1", None, 1.0)
+        } for site, host in [("site1", "h1"), ("site1", "h2"), ("site1", "unknown"), ("site2",
+                                                                                      "h3")]],
+    }
+    rrd_data = rf.fetch_rrd_data_for_graph(graph_recipe, {"time_range": (0, 120), "step": 60})
+
+    assert [site for site, _query in live.queries] == [["site1"], ["site2"]]
+    assert {key: list(data) for key, data in rrd_data.items()} == {
+        ("site1", "h1", "CPU load", "load1", None, 1.0): [1.0, 2.0],
+        ("site1", "h2", "CPU load", "load1", None, 1.0): [3.0, None],
+        ("site2", "h3", "CPU load", "load1", None, 1.0): [5.0, 6.0],
+    }
+
+
+class _FakeRRDLive(_FakeLive):
+    """Answers rrddata columns with the start time of each step as value"""
+    def __init__(self, services):
+        super().__init__({})
+        self.services = services
+        self.step = None
+
+    def query(self, query):
+        self.queries.append((self.only_sites, query))
+        columns = query.split("\n")[1].split()[3:]
+        rows = []
+        for host_name, service_description in self.services:
+            if "Filter: host_name = %s\n" % host_name not in query:
+                continue
+            row = [host_name, service_description]
+            for column in columns:
+                start, end, step = map(int, column.split(":")[-3:])
+                step = self.step or step
+                start -= start % step
+                end += -end % step
+                row.append([start, end, step] + [float(t) for t in range(start, end, step)])
+            rows.append(row)
+        return rows
+
+
+@pytest.mark.usefixtures("fake_redis")
+def test_fetch_rrd_data_for_graph_cached(monkeypatch):
+    live = _FakeRRDLive([("h1", "CPU load"), ("h2", "CPU load")])
+    monkeypatch.setattr(rf.sites, "live", lambda: live)
+    graph_recipe = {
+        "consolidation_function": "max",
+        "metrics": [{
+            "expression": ("rrd", "site1", host, "CPU load", "load1", None, 1.0)
+        } for host in ["h1", "h2"]],
+    }
+
+    def fetch(start_time, end_time):
+        rrd_data = rf.fetch_rrd_data_for_graph(graph_recipe, {
+            "time_range": (start_time, end_time),
+            "step": 60
+        })
+        return {key[1]: (ts.twindow, list(ts)) for key, ts in rrd_data.items()}
+
+    def expected(start_time, end_time):
+        data = ((start_time, end_time, 60), [float(t) for t in range(start_time, end_time, 60)])
+        return {"h1": data, "h2": data}
+
+    assert fetch(6000, 12000) == expected(6000, 12000)
+    assert live.queries[-1][1].split("\n")[1].endswith(":6000:12000:60")
+
+    # Only the tail is fetched, starting with the last steps of the cached data
+    assert fetch(6630, 12630) == expected(6600, 12660)
+    assert live.queries[-1][1].split("\n")[1].endswith(":11880:12630:60")
+    assert rf.rrd_cache.get_rrd_cache().statistics() == {
+        "hits": 2,
+        "misses": 2,
+        "points_fetched": 2 * 100 + 2 * 13,
+        "points_served": 2 * 100 + 2 * 101,
+    }
+
+    # The RRD returns another resolution for the tail: everything is fetched again
+    live.queries.clear()
+    live.step = 300
+    fetch(6690, 12690)
+    assert [query.split("\n")[1].rsplit(":", 3)[1:] for _sites, query in live.queries] == [
+        ["12540", "12690", "60"],
+        ["6690", "12690", "60"],
+    ]
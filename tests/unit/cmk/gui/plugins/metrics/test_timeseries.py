@@ -35,3 +35,41 @@ def test_time_series_math_exc(args):
 def test_time_series_math_stable_singles(operator):
     test_ts = ts.TimeSeries([0, 180, 60, 6, 5, 10, None, -2, -3.14])
     assert ts.time_series_math(operator, [test_ts]) == test_ts
+
+
+@pytest.mark.parametrize("operator, num_operands", [
+    ("+", 3),
+    ("*", 3),
+    ("-", 2),
+    ("/", 2),
+    ("MAX", 3),
+    ("MIN", 3),
+    ("AVERAGE", 3),
+    ("MERGE", 3),
+])
+def test_time_series_math_like_point_wise(operator, num_operands):
+    values = [None, 0, 2, -3.5, 7]
+    # All combinations of the values, including all None and zero divisors
+    operands = [
+        ts.TimeSeries([0, 60 * len(values)**num_operands, 60] + [
+            values[point // len(values)**nr % len(values)]
+            for point in range(len(values)**num_operands)
+        ])
+        for nr in range(num_operands)
+    ]
+    _op_title, op_func = ts.time_series_operators()[operator]
+    expected = [ts.op_func_wrapper(op_func, list(tsp)) for tsp in zip(*operands)]
+
+    result = ts.time_series_math(operator, operands)
+    assert result is not None
+    assert result.twindow == operands[0].twindow
+    assert result.values == pytest.approx(expected)
+
+
+def test_time_series_math_shortest_operand():
+    result = ts.time_series_math("+", [
+        ts.TimeSeries([0, 180, 60, 1, 2, 3]),
+        ts.TimeSeries([0, 120, 60, 1, None]),
+    ])
+    assert result is not None
+    assert result.values == [2, 2]
@@ -83,6 +83,7 @@ def test_registered_configvars():
         'apache_process_tuning',
         'archive_orphans',
         'auth_by_http_header',
+        'bi_compilation_processes',
         'builtin_icon_visibility',
         'bulk_discovery_default_settings',
         'check_mk_perfdata_with_times',
@@ -119,6 +120,8 @@ def test_registered_configvars():
         'log_messages',
         'log_rulehits',
         'login_screen',
+        'max_concurrent_fetchers',
+        'message_queue_len',
         'mkeventd_connect_timeout',
         'mkeventd_notify_contactgroup',
         'mkeventd_notify_facility',
@@ -170,6 +173,7 @@ def test_registered_configvars():
         'translate_snmptraps',
         'trusted_certificate_authorities',
         'ui_theme',
+        'use_binary_value_store',
         'use_dns_cache',
         'snmp_backend_default',
         'use_inline_snmp',
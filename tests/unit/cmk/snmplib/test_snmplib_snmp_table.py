@@ -151,3 +151,23 @@ def test_is_classic_at_snmp_v1_host(monkeypatch):
     ))
     assert config_cache.get_host_config("not_included").snmp_config(
         "").snmp_backend == SNMPBackendEnum.INLINE
+
+
+def test_async_backend(monkeypatch):
+    ts = Scenario()
+    ts.set_ruleset("snmp_backend_hosts", [
+        ("async", [], ["async_h"], {}),
+    ])
+    ts.add_host("async_h")
+    ts.add_host("default_h")
+    config_cache = ts.apply(monkeypatch)
+
+    assert config_cache.get_host_config("async_h").snmp_config(
+        "").snmp_backend == SNMPBackendEnum.ASYNC
+    assert config_cache.get_host_config("default_h").snmp_config(
+        "").snmp_backend == SNMPBackendEnum.CLASSIC
+
+    monkeypatch.setattr(config, "snmp_backend_default", "async")
+    # Unlike the inline backend it is also used for SNMP v1 hosts
+    assert config_cache.get_host_config("default_h").snmp_config(
+        "").snmp_backend == SNMPBackendEnum.ASYNC
@@ -116,3 +116,16 @@ def test_state_of_remaining(host_regex, num_host_matches, num_host_matches_unkno
     assert len(results) == 1
     assert isinstance(results[0], BIRemainingResult)
     assert len(results[0].host_names) == num_host_matches_unknown
+
+
+def test_remaining_result_records_its_hosts(bi_searcher_with_sample_config):
+    heute = bi_searcher_with_sample_config.hosts["heute"]
+    used_service = sorted(heute.services)[0]
+    with bi_searcher_with_sample_config.record_dependencies() as dependencies:
+        nodes = BIRemainingResult(["heute"]).compile_postprocess(BIRemainingResult([]),
+                                                                 {"heute": {used_service}},
+                                                                 bi_searcher_with_sample_config)
+    assert dependencies.host_names == {"heute"}
+    assert sorted(
+        node.service_description for node in nodes) == sorted(set(heute.services) - {used_service})
+    assert {node.site_id for node in nodes} == {"heute"}
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+import itertools
+import os
+from pathlib import Path
+
+import pytest  # type: ignore[import]
+from fakeredis import FakeRedis, FakeServer  # type: ignore[import]
+
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.bi import bi_compiler
+from cmk.utils.bi.bi_aggregation import BIAggregation
+from cmk.utils.bi.bi_lib import SitesCallback
+
+
+def _rule(rule_id, title):
+    return {
+        "id": rule_id,
+        "aggregation_function": {
+            "count": 1,
+            "restrict_state": 2,
+            "type": "worst"
+        },
+        "computation_options": {
+            "disabled": False
+        },
+        "node_visualization": {
+            "style_config": {},
+            "type": "none"
+        },
+        "nodes": [{
+            "action": {
+                "host_regex": "$HOSTNAME$",
+                "type": "state_of_host"
+            },
+            "search": {
+                "type": "empty"
+            }
+        }, {
+            "action": {
+                "host_regex": "$HOSTNAME$",
+                "service_regex": ".*",
+                "type": "state_of_service"
+            },
+            "search": {
+                "type": "empty"
+            }
+        }],
+        "params": {
+            "arguments": ["HOSTNAME"]
+        },
+        "properties": {
+            "comment": "",
+            "docu_url": "",
+            "icon": "",
+            "state_messages": {},
+            "title": title
+        },
+    }
+
+
+def _aggregation(aggr_id, rule_id, host_choice):
+    return {
+        "id": aggr_id,
+        "aggregation_visualization": {
+            "ignore_rule_styles": False,
+            "layout_id": "builtin_default",
+            "line_style": "round"
+        },
+        "computation_options": {
+            "disabled": False,
+            "escalate_downtimes_as_warn": False,
+            "use_hard_states": False
+        },
+        "groups": {
+            "names": ["Hosts"],
+            "paths": []
+        },
+        "node": {
+            "action": {
+                "params": {
+                    "arguments": ["$HOSTNAME$"]
+                },
+                "rule_id": rule_id,
+                "type": "call_a_rule"
+            },
+            "search": {
+                "conditions": {
+                    "host_choice": host_choice,
+                    "host_folder": "",
+                    "host_labels": {},
+                    "host_tags": {}
+                },
+                "refer_to": "host",
+                "type": "host_search"
+            }
+        },
+    }
+
+
+def _pack(pack_id, rules, aggregations):
+    return {
+        "id": pack_id,
+        "title": pack_id,
+        "contact_groups": [],
+        "public": True,
+        "rules": rules,
+        "aggregations": aggregations,
+    }
+
+
+class _Site:
+    def __init__(self):
+        self.program_start = 1
+        self.hosts = {
+            "host_a": ["CPU load", "Memory"],
+            "host_b1": ["CPU load"],
+        }
+
+    def query(self, query, only_sites=None):
+        if query.startswith("GET status"):
+            return [["heute", self.program_start]]
+        if query.startswith("GET hosts"):
+            return [["heute", host_name, {}, {}, [], [], host_name, "/wato/hosts.mk"]
+                    for host_name in self.hosts]
+        return [["heute", host_name, description, {}, {}]
+                for host_name, descriptions in self.hosts.items()
+                for description in descriptions]
+
+    def restart(self):
+        self.program_start += 1
+
+
+@pytest.fixture
+def site(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path / "tmp"))
+    monkeypatch.setattr(cmk.utils.paths, "default_config_dir", str(tmp_path / "etc"))
+    Path(cmk.utils.paths.default_config_dir, "multisite.d", "wato").mkdir(parents=True)
+    server = FakeServer()
+    monkeypatch.setattr(bi_compiler, "get_redis_client",
+                        lambda: FakeRedis(server=server, decode_responses=True))
+    return _Site()
+
+
+@pytest.fixture
+def compiled_ids(monkeypatch):
+    compiled = []
+    compile_aggregation = BIAggregation.compile
+
+    def compile_and_record(self, bi_searcher):
+        compiled.append(self.id)
+        return compile_aggregation(self, bi_searcher)
+
+    monkeypatch.setattr(BIAggregation, "compile", compile_and_record)
+    return compiled
+
+
+_config_changes = itertools.count(1)
+
+
+def _save_config(packs):
+    path = Path(cmk.utils.paths.default_config_dir, "multisite.d", "wato", "bi_config.bi")
+    store.save_object_to_file(path, {"packs": packs})
+    # Make sure the change is noticed, even within the resolution of the mtime
+    mtime = path.stat().st_mtime + 10 * next(_config_changes)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _compile(site, path, compiled_ids, processes=1):
+    del compiled_ids[:]
+    compiler = bi_compiler.BICompiler(str(path),
+                                      SitesCallback(lambda: {"heute": {
+                                          "state": "online"
+                                      }}, site.query),
+                                      processes=processes)
+    compiler.load_compiled_aggregations()
+    return compiler, set(compiled_ids)
+
+
+def test_compile_only_outdated_aggregations(site, compiled_ids):
+    rules = [_rule("host", "Host $HOSTNAME$"), _rule("all", "All $HOSTNAME$")]
+    packs = [
+        _pack("pack_a", rules, [
+            _aggregation("aggr_a", "host", {
+                "type": "host_name_regex",
+                "pattern": "host_a"
+            }),
+            _aggregation("aggr_b", "host", {
+                "type": "host_name_regex",
+                "pattern": "host_b.*"
+            }),
+        ]),
+        _pack("pack_all", [], [_aggregation("aggr_all", "all", {"type": "all_hosts"})]),
+    ]
+    path = _save_config(packs)
+
+    compiler, compiled = _compile(site, path, compiled_ids)
+    assert compiled == {"aggr_a", "aggr_b", "aggr_all"}
+    assert compiler.is_part_of_aggregation("host_a", "Memory")
+    assert compiler.branch_index.digests() == compiler.compiled_aggregation_digests
+    digests = dict(compiler.compiled_aggregation_digests)
+
+    # Nothing changed
+    compiler, compiled = _compile(site, _save_config(packs), compiled_ids)
+    assert compiled == set()
+    assert set(compiler.compiled_aggregations) == {"aggr_a", "aggr_b", "aggr_all"}
+    assert compiler.compiled_aggregation_digests == digests
+    assert compiler.branch_index.digests() == digests
+
+    # The services of a host changed
+    site.hosts["host_a"].remove("Memory")
+    site.restart()
+    compiler, compiled = _compile(site, path, compiled_ids)
+    assert compiled == {"aggr_a", "aggr_all"}
+    assert not compiler.is_part_of_aggregation("host_a", "Memory")
+    assert compiler.is_part_of_aggregation("host_a", "CPU load")
+
+    # A host matching a search was added
+    site.hosts["host_b2"] = ["Disk IO"]
+    site.restart()
+    compiler, compiled = _compile(site, path, compiled_ids)
+    assert compiled == {"aggr_b", "aggr_all"}
+    assert [
+        branch.properties.title for branch in compiler.compiled_aggregations["aggr_b"].branches
+    ] == ["Host host_b1", "Host host_b2"]
+    assert compiler.is_part_of_aggregation("host_b2", "Disk IO")
+    assert compiler.branch_index.positions(compiler.branch_index.branches_of_hosts(
+        ["host_b2"])) == {
+            "aggr_b": [1],
+            "aggr_all": [2],
+        }
+
+    # A rule was changed
+    digests = dict(compiler.compiled_aggregation_digests)
+    rules[1]["properties"]["title"] = "Every $HOSTNAME$"
+    compiler, compiled = _compile(site, _save_config(packs), compiled_ids)
+    assert compiled == {"aggr_all"}
+    assert {
+        aggr_id for aggr_id, digest in compiler.compiled_aggregation_digests.items()
+        if digest != digests[aggr_id]
+    } == {"aggr_all"}
+    assert compiler.branch_index.digests() == compiler.compiled_aggregation_digests
+
+    # An aggregation was removed
+    del packs[0]["aggregations"][1]
+    compiler, compiled = _compile(site, _save_config(packs), compiled_ids)
+    assert compiled == set()
+    assert set(compiler.compiled_aggregations) == {"aggr_a", "aggr_all"}
+    assert compiler.is_part_of_aggregation("host_b2", "Disk IO")  # still part of aggr_all
+    assert not compiler.is_part_of_aggregation("host_b1", "Disk IO")
+    assert compiler.branch_index.num_branches() == {"aggr_a": 1, "aggr_all": 3}
+    assert compiler.branch_index.positions(
+        compiler.branch_index.branches_with_titles(["Every host_b2"])) == {
+            "aggr_all": [2]
+        }
+
+
+def test_compile_in_parallel(site, compiled_ids):
+    rules = [_rule("host", "Host $HOSTNAME$")]
+    packs = [
+        _pack("pack_%s" % host_name, rules, [
+            _aggregation("aggr_%s" % host_name, "host", {
+                "type": "host_name_regex",
+                "pattern": host_name
+            })
+        ]) for host_name in site.hosts
+    ]
+    path = _save_config(packs)
+
+    compiler, compiled = _compile(site, path, compiled_ids, processes=2)
+    assert compiled == set()  # Compiled by the worker processes
+    assert {
+        aggr_id: [branch.properties.title for branch in aggr.branches
+                 ] for aggr_id, aggr in compiler.compiled_aggregations.items()
+    } == {
+        "aggr_host_a": ["Host host_a"],
+        "aggr_host_b1": ["Host host_b1"],
+    }
+    assert compiler.is_part_of_aggregation("host_b1", "CPU load")
+    assert not list(compiler._path_compiled_aggregations.glob("*.new"))
+    assert compiler.branch_index.digests() == compiler.compiled_aggregation_digests
+    assert set(compiler.compiled_aggregation_digests) == {"aggr_host_a", "aggr_host_b1"}
+
+    # Nothing changed
+    compiler, compiled = _compile(site, _save_config(packs), compiled_ids, processes=2)
+    assert compiled == set()
+    assert set(compiler.compiled_aggregations) == {"aggr_host_a", "aggr_host_b1"}
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2021 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+import pytest  # type: ignore[import]
+
+from cmk.utils.bi.bi_aggregation_functions import BIAggregationFunctionWorst
+from cmk.utils.bi.bi_branch_index import BIBranchIndex, index_aggregation
+from cmk.utils.bi.bi_computer import BIAggregationFilter, BIComputer
+from cmk.utils.bi.bi_lib import (
+    BIAggregationComputationOptions,
+    BIAggregationGroups,
+    BIHostSpec,
+    BIHostStatusInfoRow,
+    BIServiceWithFullState,
+)
+from cmk.utils.bi.bi_rule_interface import BIRuleProperties
+from cmk.utils.bi.bi_trees import BICompiledAggregation, BICompiledLeaf, BICompiledRule
+
+
+def _branch(title, elements):
+    return BICompiledRule(
+        "rule",
+        "pack",
+        [BICompiledLeaf(host_name, service, site_id="heute") for host_name, service in elements],
+        [("heute", host_name) for host_name, _service in elements],
+        BIRuleProperties({
+            "title": title,
+            "comment": "",
+            "state_messages": {},
+            "docu_url": "",
+            "icon": "",
+        }),
+        BIAggregationFunctionWorst({
+            "type": "worst",
+            "count": 1,
+            "restrict_state": 2
+        }),
+        {},
+    )
+
+
+def _aggregation(aggr_id, branches, names=None, paths=None):
+    return BICompiledAggregation(
+        aggr_id,
+        branches,
+        BIAggregationComputationOptions({
+            "disabled": False,
+            "use_hard_states": False,
+            "escalate_downtimes_as_warn": False,
+        }),
+        {},
+        BIAggregationGroups({
+            "names": names or [],
+            "paths": paths or []
+        }),
+    )
+
+
+_AGGREGATIONS = {
+    aggregation.id: aggregation for aggregation in [
+        _aggregation("hosts", [
+            _branch("Host a", [("host_a", None), ("host_a", "CPU load"), ("host_a", "Memory")]),
+            _branch("Host b", [("host_b", None), ("host_b", "CPU load")]),
+            _branch("Host c", [("host_c", None)]),
+        ],
+                     names=["Hosts"],
+                     paths=[["Servers", "Linux"]]),
+        _aggregation("apps", [
+            _branch("App", [("host_b", "Memory"), ("host_c", "HTTP")]),
+        ],
+                     names=["Applications"],
+                     paths=[["Servers", "Windows"], ["Apps"]]),
+        _aggregation("empty", [], names=["Hosts"]),
+    ]
+}
+
+_DIGESTS = {aggr_id: "digest of %s" % aggr_id for aggr_id in _AGGREGATIONS}
+
+
+def _scanned_branches(bi_aggregation_filter):
+    """The branches the filter matched by testing every branch"""
+    result = []
+    for compiled_aggregation in _AGGREGATIONS.values():
+        group_names = set(compiled_aggregation.groups.names +
+                          ["/".join(x) for x in compiled_aggregation.groups.paths])
+        if ((bi_aggregation_filter.aggr_ids and
+             compiled_aggregation.id not in bi_aggregation_filter.aggr_ids) or
+            (bi_aggregation_filter.group_names and
+             not group_names.intersection(bi_aggregation_filter.group_names)) or
+            (bi_aggregation_filter.group_path_prefix and
+             not any("/".join(group_path).startswith(prefix)
+                     for prefix in bi_aggregation_filter.group_path_prefix
+                     for group_path in compiled_aggregation.groups.paths))):
+            result.append((compiled_aggregation.id, []))
+            continue
+
+        titles = []
+        for branch in compiled_aggregation.branches:
+            required_elements = branch.required_elements()
+            if ((bi_aggregation_filter.hosts and
+                 not {x[1] for x in required_elements}.intersection(bi_aggregation_filter.hosts)) or
+                (bi_aggregation_filter.services and
+                 not {x[2] for x in required_elements if x[2] is not None}.intersection(
+                     bi_aggregation_filter.services)) or
+                (bi_aggregation_filter.aggr_titles and
+                 branch.properties.title not in bi_aggregation_filter.aggr_titles)):
+                continue
+            titles.append(branch.properties.title)
+        result.append((compiled_aggregation.id, titles))
+    return result
+
+
+@pytest.mark.parametrize("bi_aggregation_filter", [
+    BIAggregationFilter([], [], [], [], [], []),
+    BIAggregationFilter(["host_b"], [], [], [], [], []),
+    BIAggregationFilter(["host_b", "host_c"], [], [], [], [], []),
+    BIAggregationFilter(["unknown"], [], [], [], [], []),
+    BIAggregationFilter([], ["Memory"], [], [], [], []),
+    BIAggregationFilter(["host_a"], ["Memory"], [], [], [], []),
+    BIAggregationFilter([], [], ["apps", "empty"], [], [], []),
+    BIAggregationFilter([], [], [], ["Host b", "App"], [], []),
+    BIAggregationFilter([], [], [], [], ["Hosts"], []),
+    BIAggregationFilter([], [], [], [], ["Servers/Windows"], []),
+    BIAggregationFilter([], [], [], [], [], ["Servers"]),
+    BIAggregationFilter([], [], [], [], [], ["Servers/W", "Ap"]),
+    BIAggregationFilter([], [], [], [], [], [""]),
+    BIAggregationFilter(["host_b"], [], [], [], ["Hosts"], ["Servers"]),
+])
+@pytest.mark.parametrize("saved_index", [False, True])
+def test_get_required_aggregations(bi_aggregation_filter, saved_index):
+    branch_index = BIBranchIndex({
+        aggr_id: index_aggregation(compiled_aggregation, _DIGESTS[aggr_id])
+        for aggr_id, compiled_aggregation in _AGGREGATIONS.items()
+    }) if saved_index else None
+    bi_computer = BIComputer(_AGGREGATIONS, None, branch_index, _DIGESTS)
+    assert (bi_computer.branch_index is branch_index) is saved_index
+    assert [(compiled_aggregation.id, [branch.properties.title
+                                       for branch in branches])
+            for compiled_aggregation, branches in bi_computer.get_required_aggregations(
+                bi_aggregation_filter)] == _scanned_branches(bi_aggregation_filter)
+
+
+@pytest.mark.parametrize(
+    "saved_aggregations, saved_digests",
+    [
+        pytest.param({"hosts": _aggregation("hosts", [])}, _DIGESTS, id="other aggregations"),
+        pytest.param(
+            {
+                **_AGGREGATIONS,
+                # Same number of branches, but other hosts
+                "hosts": _aggregation("hosts", [
+                    _branch("Host d", [("host_d", None)]),
+                    _branch("Host e", [("host_e", None)]),
+                    _branch("Host f", [("host_f", None)]),
+                ]),
+            },
+            {
+                **_DIGESTS, "hosts": "digest of the previous compilation"
+            },
+            id="recompiled aggregation",
+        ),
+        pytest.param(_AGGREGATIONS, {}, id="unknown digests"),
+    ])
+def test_outdated_saved_index_is_ignored(saved_aggregations, saved_digests):
+    branch_index = BIBranchIndex({
+        aggr_id: index_aggregation(compiled_aggregation, saved_digests.get(aggr_id, ""))
+        for aggr_id, compiled_aggregation in saved_aggregations.items()
+    })
+    bi_computer = BIComputer(_AGGREGATIONS, None, branch_index, _DIGESTS)
+    assert bi_computer.branch_index is not branch_index
+    assert bi_computer.branch_index.digests() == _DIGESTS
+    assert bi_computer.branch_index.positions(bi_computer.branch_index.branches_of_hosts(
+        ["host_c"])) == {
+            "hosts": [2],
+            "apps": [0],
+        }
+
+
+class _StatusFetcher:
+    def __init__(self):
+        self.assumed_states = {}
+        self.states = {
+            BIHostSpec("heute", host_name): BIHostStatusInfoRow(
+                0, True, 0, "UP", 0, True, False, {
+                    service: BIServiceWithFullState(0, True, "OK", 0, 1, 1, 0, False, True)
+                    for service in ["CPU load", "Memory", "HTTP"]
+                }, {}) for host_name in ["host_a", "host_b", "host_c"]
+        }
+
+    def set_service_state(self, host_name, service, state):
+        services = self.states[BIHostSpec("heute", host_name)].services_with_fullstate
+        services[service] = services[service]._replace(state=state, hard_state=state)
+
+
+def _legacy_results(bi_aggregation_filter, bi_status_fetcher=None):
+    bi_computer = BIComputer(_AGGREGATIONS, bi_status_fetcher or _StatusFetcher())
+    return bi_computer.convert_to_legacy_results(
+        bi_computer.compute_results(bi_computer.get_required_aggregations(bi_aggregation_filter)),
+        bi_aggregation_filter)
+
+
+def _check_nested_tree_states(compiled_aggregation, tree_state, node):
+    for nested_tree_state, nested_node in zip(tree_state[3], node.nodes):
+        assert nested_tree_state[2] == compiled_aggregation.eval_result_node(nested_node)
+        if len(nested_tree_state) > 3:
+            _check_nested_tree_states(compiled_aggregation, nested_tree_state, nested_node)
+
+
+def test_legacy_tree_state():
+    bi_status_fetcher = _StatusFetcher()
+    bi_status_fetcher.set_service_state("host_a", "Memory", 2)
+    results = _legacy_results(BIAggregationFilter([], [], ["hosts"], ["Host a"], [], []),
+                              bi_status_fetcher)
+    assert len(results) == 2
+    for row in results:
+        compiled_aggregation = row["aggr_compiled_aggregation"]
+        tree_state = row["aggr_treestate"]
+        assert tree_state[0]["state"] == 2
+        assert [x[0]["state"] for x in tree_state[3]] == [0, 0, 2]
+        assert tree_state[2] == compiled_aggregation.create_aggr_tree(row["aggr_compiled_branch"])
+        assert tree_state[2] is row["aggr_tree"]
+        _check_nested_tree_states(compiled_aggregation, tree_state, row["aggr_compiled_branch"])
+
+
+def test_legacy_results_of_groups_are_not_shared():
+    results = _legacy_results(BIAggregationFilter([], [], ["apps"], [], [], []))
+    assert sorted(
+        row["aggr_group"] for row in results) == ["Applications", "Apps", "Servers/Windows"]
+    assert results[0]["aggr_treestate"] == results[1]["aggr_treestate"]
+    assert results[0]["aggr_treestate"] is not results[1]["aggr_treestate"]
+    assert results[0]["aggr_compiled_branch"] is results[1]["aggr_compiled_branch"]
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pytest
+
+from cmk.utils.rulesets.host_index import HostBitsetIndex
+
+HOST_TAGS = {
+    "host1": {
+        "agent": "cmk-agent",
+        "criticality": "prod",
+    },
+    "host2": {
+        "agent": "no-agent",
+        "criticality": "test",
+    },
+    "host3": {
+        "agent": "no-agent",
+        "criticality": "prod",
+        "snmp_ds": "snmp-v2",
+    },
+}
+
+HOST_PATHS = {
+    "host1": "/wato/",
+    "host2": "/wato/lvl1/",
+    "host3": "/wato/lvl1a/",
+}
+
+
+@pytest.fixture(name="index")
+def fixture_index():
+    return HostBitsetIndex(HOST_TAGS, HOST_TAGS, HOST_PATHS)
+
+
+def test_mask_roundtrip(index):
+    assert index.hosts_of(index.all_hosts) == {"host1", "host2", "host3"}
+    assert index.hosts_of(index.mask_of(["host3", "unknown"])) == {"host3"}
+    assert index.hosts_of(0) == set()
+
+
+@pytest.mark.parametrize("taggroup_id, tag_condition, expected", [
+    ("agent", "no-agent", {"host2", "host3"}),
+    ("agent", {
+        "$ne": "no-agent"
+    }, {"host1"}),
+    ("criticality", {
+        "$or": ["test", "dev"]
+    }, {"host2"}),
+    ("criticality", {
+        "$nor": ["test", "dev"]
+    }, {"host1", "host3"}),
+    ("snmp_ds", "snmp-v2", {"host3"}),
+    ("snmp_ds", {
+        "$ne": "snmp-v2"
+    }, {"host1", "host2"}),
+    ("unknown", "tag", set()),
+])
+def test_tag_condition_mask(index, taggroup_id, tag_condition, expected):
+    assert index.hosts_of(index.tag_condition_mask(taggroup_id, tag_condition)) == expected
+
+
+@pytest.mark.parametrize("folder_path, expected", [
+    ("/", {"host1", "host2", "host3"}),
+    ("/wato/", {"host1", "host2", "host3"}),
+    ("/wato/lvl1", {"host2", "host3"}),
+    ("/wato/lvl1/", {"host2"}),
+    ("/other/", set()),
+])
+def test_folder_mask(index, folder_path, expected):
+    assert index.hosts_of(index.folder_mask(folder_path)) == expected
+
+
+@pytest.mark.parametrize("host_entries, expected", [
+    (None, {"host1", "host2"}),
+    (["host1", "host3"], {"host1"}),
+    ({
+        "$nor": ["host1"]
+    }, {"host2"}),
+    ([{
+        "$regex": "host[2-9]"
+    }], {"host2"}),
+    ({
+        "$nor": [{
+            "$regex": "host2"
+        }]
+    }, {"host1"}),
+])
+def test_host_name_mask(index, host_entries, expected):
+    candidates = index.mask_of(["host1", "host2"])
+    assert index.hosts_of(index.host_name_mask(host_entries, candidates)) == expected
+
+
+def test_labels_mask_computes_labels_of_candidates_only(index):
+    asked = []
+
+    def labels_of_host(hostname):
+        asked.append(hostname)
+        return {"os": "linux"} if hostname != "host2" else {"os": "windows"}
+
+    candidates = index.mask_of(["host1", "host2"])
+    assert index.hosts_of(index.labels_mask({"os": "linux"}, candidates,
+                                            labels_of_host)) == {"host1"}
+    assert index.hosts_of(index.labels_mask({"os": {
+        "$ne": "linux"
+    }}, candidates, labels_of_host)) == {"host2"}
+    assert sorted(asked) == ["host1", "host2"]
+
+    assert index.hosts_of(index.labels_mask({"os": "linux"}, index.all_hosts,
+                                            labels_of_host)) == {"host1", "host3"}
+    assert sorted(asked) == ["host1", "host2", "host3"]
+
+    index.clear_labels()
+    index.labels_mask({"os": "linux"}, index.mask_of(["host1"]), labels_of_host)
+    assert sorted(asked) == ["host1", "host1", "host2", "host3"]
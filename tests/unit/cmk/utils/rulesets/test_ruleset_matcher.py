@@ -630,6 +630,25 @@ def test_ruleset_optimizer_clear_ruleset_caches(monkeypatch):
     assert not ruleset_optimizer._service_ruleset_cache
 
 
+def test_ruleset_matcher_get_host_ruleset_values_ruleset_id(monkeypatch):
+    ts = Scenario().add_host("host1")
+    config_cache = ts.apply(monkeypatch)
+    matcher = config_cache.ruleset_matcher
+    match_object = RulesetMatchObject(host_name="host1", service_description=None)
+
+    rules = [{"value": "1", "condition": {"host_name": ["host1"]}}]
+    assert list(matcher.get_host_ruleset_values(match_object, rules, False,
+                                                ruleset_id="a")) == ["1"]
+    assert ("a", False) in matcher.ruleset_optimizer._host_ruleset_cache
+
+    # Another ruleset with the same id() is not mixed up with the cached one
+    rules[0]["value"] = "2"
+    assert list(matcher.get_host_ruleset_values(match_object, rules, False,
+                                                ruleset_id="b")) == ["2"]
+    assert list(matcher.get_host_ruleset_values(match_object, rules, False,
+                                                ruleset_id="a")) == ["1"]
+
+
 @pytest.mark.parametrize(
     "taggroud_id, tag_condition, expected_result",
     [
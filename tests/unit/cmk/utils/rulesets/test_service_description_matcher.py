@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import re
+
+import pytest
+
+from cmk.utils.exceptions import MKGeneralException
+from cmk.utils.rulesets.service_description_matcher import ServiceDescriptionMatcher
+
+PATTERNS = [
+    "Interface 1",
+    "Interfaces?",
+    "CPU load$",
+    "Filesystem /var.*",
+    "Foo|Bar",
+    "(?:Disk) IO",
+    "^Mem",
+    r"Interface \d+$",
+    "Inter*face",
+    "",
+]
+
+DESCRIPTIONS = [
+    "Interface 1",
+    "Interface 10",
+    "Interfac",
+    "Interfaces",
+    "CPU load",
+    "CPU load\n",
+    "CPU loads",
+    "Filesystem /var/log",
+    "Foo",
+    "Bar",
+    "Disk IO",
+    "Memory",
+    "Intereface",
+    "",
+]
+
+
+def _regex_matches(pattern, description):
+    return re.match("(?:%s)" % pattern, description) is not None
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS)
+def test_single_patterns_match_like_regex(description):
+    matcher = ServiceDescriptionMatcher([[p] for p in PATTERNS])
+    assert matcher.matching_rules(description) == tuple(
+        index for index, pattern in enumerate(PATTERNS) if _regex_matches(pattern, description))
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS)
+def test_negated_patterns(description):
+    matcher = ServiceDescriptionMatcher([{"$nor": [{"$regex": p}]} for p in PATTERNS])
+    assert matcher.matching_rules(description) == tuple(
+        index for index, pattern in enumerate(PATTERNS) if not _regex_matches(pattern, description))
+
+
+def test_pattern_lists_and_match_all():
+    matcher = ServiceDescriptionMatcher([
+        None,
+        [],
+        {
+            "$nor": []
+        },
+        ["CPU", "Memory"],
+        {
+            "$nor": ["CPU", "Memory"]
+        },
+    ])
+    assert matcher.matching_rules("CPU load") == (0, 1, 3)
+    assert matcher.matching_rules("Disk IO") == (0, 1, 4)
+
+
+def test_result_is_cached():
+    matcher = ServiceDescriptionMatcher([["CPU"]])
+    assert matcher.matching_rules("CPU load") is matcher.matching_rules("CPU load")
+
+
+def test_invalid_pattern():
+    with pytest.raises(MKGeneralException):
+        ServiceDescriptionMatcher([["CPU ("]])
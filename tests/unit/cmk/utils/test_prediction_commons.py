@@ -4,6 +4,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import math
+
+import numpy as np  # type: ignore[import]
 import pytest  # type: ignore[import]
 
 import cmk.utils.prediction as prediction
@@ -58,6 +61,8 @@ def test_rrdtimestamps(twindow, result):
 def test_time_series_upsampling(rrddata, twindow, shift, upsampled):
     ts = prediction.TimeSeries(rrddata)
     assert ts.bfill_upsample(twindow, shift) == upsampled
+    assert [None if math.isnan(v) else v for v in ts.bfill_upsample_array(twindow, shift)
+           ] == upsampled
 
 
 @pytest.mark.parametrize("rrddata, twindow, cf, downsampled", [
@@ -74,6 +79,19 @@ def test_time_series_upsampling(rrddata, twindow, shift, upsampled):
 def test_time_series_downsampling(rrddata, twindow, cf, downsampled):
     ts = prediction.TimeSeries(rrddata)
     assert ts.downsample(twindow, cf) == downsampled
+    assert [None if math.isnan(v) else v for v in ts.downsample_array(twindow, cf)] == downsampled
+
+
+def test_time_series_values_and_array():
+    ts = prediction.TimeSeries([0, 180, 60, 1, None, 3])
+    assert np.array_equal(ts.array, [1.0, np.nan, 3.0], equal_nan=True)
+    ts.values[0] = 5
+    assert ts.array[0] == 5.0
+
+    ts = prediction.TimeSeries(np.array([1.0, np.nan]), (0, 120, 60))
+    assert len(ts) == 2
+    assert ts.values == [1.0, None]
+    assert ts == prediction.TimeSeries([0, 120, 60, 1, None])
 
 
 def test__get_reference_deviation_absolute():
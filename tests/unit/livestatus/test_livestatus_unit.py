@@ -6,9 +6,14 @@
 
 # pylint: disable=redefined-outer-name
 
+import ast
 import errno
+import json
+import re
 import socket
 import ssl
+import threading
+import time
 from contextlib import closing
 
 import pytest  # type: ignore[import]
@@ -212,3 +217,173 @@ def test_local_connection(mock_livestatus):
     live.expect_query("GET status\nColumns: program_start\nColumnHeaders: off")
     with mock_livestatus(expect_status_query=False):
         livestatus.LocalConnection().query_value("GET status\nColumns: program_start")
+
+
+@pytest.mark.parametrize("data", [
+    '[]\n',
+    '[[u"",0,-1,1.5,1e+100,None,[],{}]]\n',
+    '[[u"a\\u0022b\\u005c",[[u"x",2]],{u"k":[u"\\u00e4\\u20ac"]}],\n[u"None",u"u"]]\n',
+    '[[u"\\U0001f600",1]]\n',
+    '[[b"\\x00\\xff",u"x"]]\n',
+    "[['repr', None]]",
+])
+def test_decode_python3(data):
+    assert livestatus._decode_python3(data) == ast.literal_eval(data)
+
+
+def _render_response(rows, code=200):
+    """Render the rows like the output format "python3" does"""
+    data = "[%s]\n" % ",\n".join(
+        re.sub('("[^"]*")', r"u\1", json.dumps(row, separators=(",", ":"))) for row in rows)
+    if code != 200:
+        data = "Some error\n"
+    return ("%-3d %11d\n%s" % (code, len(data), data)).encode("utf-8")
+
+
+def _serve(path, responses, queries, delay=0.0):
+    """Answer the queries sent to the unix socket with the responses in the list
+
+    A response of None closes the connection instead of answering.
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+
+    def serve():
+        with closing(server):
+            while responses:
+                with closing(server.accept()[0]) as conn:
+                    data = b""
+                    while responses:
+                        while b"\n\n" not in data:
+                            packet = conn.recv(4096)
+                            if not packet:
+                                break
+                            data += packet
+                        else:
+                            query, data = data.split(b"\n\n", 1)
+                            queries.append(query.decode("utf-8"))
+                            response = responses.pop(0)
+                            if response is None:
+                                break
+                            time.sleep(delay)
+                            conn.sendall(response)
+                            continue
+                        break
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.fixture()
+def live_server(sock_path):
+    responses = []
+    queries = []
+    yield responses, queries, lambda: _serve(sock_path, responses, queries)
+
+
+_ROWS = [["host%d" % i, i, ["svc%d" % j for j in range(i % 5)], 0.5 * i] for i in range(500)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100, 256 * 1024])
+def test_query_iter(live_server, monkeypatch, chunk_size):
+    responses, queries, start = live_server
+    responses.extend([_render_response(_ROWS)] * 2)
+    start()
+
+    live = livestatus.LocalConnection()
+    monkeypatch.setattr(live, "receive_chunk_size", chunk_size)
+    assert list(live.query_iter("GET hosts\n")) == _ROWS
+    assert live.query("GET hosts\n") == _ROWS
+    assert queries[0] == queries[1]
+
+
+def test_query_iter_stop(live_server):
+    responses, _queries, start = live_server
+    responses.append(_render_response(_ROWS))
+    start()
+
+    live = livestatus.LocalConnection()
+    live.receive_chunk_size = 100
+    rows = live.query_iter("GET hosts\n")
+    assert next(rows) == _ROWS[0]
+    rows.close()
+    assert live.socket is None
+
+
+def test_query_iter_error(live_server):
+    responses, _queries, start = live_server
+    responses.append(_render_response([], code=404))
+    start()
+
+    with pytest.raises(livestatus.MKLivestatusTableNotFoundError):
+        list(livestatus.LocalConnection().query_iter("GET hostz\n"))
+
+
+def _multisite(tmp_path, delays, responses=None):
+    sites = {}
+    for index, delay in enumerate(delays):
+        path = tmp_path / ("site%d" % index)
+        _serve(path, [_render_response([["row of site%d" %
+                                         index]])] if responses is None else responses[index], [],
+               delay)
+        sites["site%d" % index] = {"socket": "unix:%s" % path}
+    return livestatus.MultiSiteConnection(sites)
+
+
+def test_query_parallel(tmp_path):
+    live = _multisite(tmp_path, [0.3, 0.0])
+    live.set_prepend_site(True)
+    assert live.query("GET hosts\n") == [
+        ["site0", "row of site0"],
+        ["site1", "row of site1"],
+    ]
+    assert live.dead_sites() == {}
+    assert sorted(live.query_stats) == ["site0", "site1"]
+    assert live.query_stats["site1"].duration < live.query_stats["site0"].duration
+    assert live.query_stats["site0"].latency >= 0.3
+    assert live.query_stats["site1"].bytes_received == len(_render_response([["row of site1"]]))
+
+
+@pytest.mark.parametrize("query_again", [
+    pytest.param(lambda live: live.query_non_parallel(livestatus.Query("GET hosts\n")),
+                 id="non parallel"),
+    pytest.param(lambda live: list(live.query_iter("GET hosts\n")), id="iter"),
+])
+def test_query_stats_are_reset(tmp_path, query_again):
+    live = _multisite(tmp_path, [0.0, 0.0],
+                      [[_render_response([["row"]])] * 2 for _site in range(2)])
+    live.query("GET hosts\n")
+    assert sorted(live.query_stats) == ["site0", "site1"]
+
+    query_again(live)
+    assert live.query_stats == {}
+
+
+def test_query_parallel_timeout(tmp_path):
+    live = _multisite(tmp_path, [2.0, 0.0])
+    live.set_query_timeout(0.2)
+    start = time.time()
+    assert live.query("GET hosts\n") == [["row of site1"]]
+    assert time.time() - start < 1.0
+    assert list(live.dead_sites()) == ["site0"]
+    assert "No response within" in str(live.dead_sites()["site0"]["exception"])
+    assert live.alive_sites() == ["site1"]
+
+
+def test_query_parallel_errors(tmp_path):
+    live = _multisite(tmp_path, [0.0, 0.0, 0.0], [
+        [_render_response([], code=400)],
+        [b"garbage"],
+        [_render_response([["row of site2"]])],
+    ])
+    assert live.query("GET hosts\n") == [["row of site2"]]
+    assert sorted(live.dead_sites()) == ["site0", "site1"]
+    assert live.alive_sites() == ["site2"]
+
+
+def test_query_parallel_reconnect(tmp_path):
+    live = _multisite(tmp_path, [0.0], [[None, _render_response([["row"]])]])
+    assert live.query("GET hosts\n") == [["row"]]
+    assert live.dead_sites() == {}